@@ -40,6 +40,20 @@ PBKDF2_ITERATIONS_OWASP_2024 = 600000
 # Note: We keep PBKDF2_ITERATIONS at 100k for existing users
 # New users will use Argon2 instead of upgrading PBKDF2
 
+# ===== CALIBRACIÓN ADAPTATIVA DEL KDF =====
+
+# python -m src.infrastructure.crypto.kdf_calibration --apply
+# mide Argon2id/PBKDF2 en el equipo y guarda el perfil en data/kdf_profile.json.
+# Sin perfil se usan los valores fijos de arriba.
+KDF_TARGET_MS = 500                  # Latencia objetivo por derivación de KEK
+KDF_PROFILE_FILE = "kdf_profile.json"
+
+# Suelos de seguridad: la calibración (y un perfil editado a mano) nunca baja de aquí
+ARGON2_MIN_MEMORY_COST = 19456      # OWASP 2023: m=19 MiB, t=2, p=1
+ARGON2_MIN_TIME_COST = 2
+ARGON2_MAX_MEMORY_COST = 1048576    # 1 GiB: techo de la búsqueda de memoria
+PBKDF2_MIN_ITERATIONS = PBKDF2_ITERATIONS_OWASP_2024
+
 # ===== MIGRATION SETTINGS =====
 
 # Log migration events for monitoring
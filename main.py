@@ -1,4 +1,8 @@
+import multiprocessing
+
 from src.main import start_app
 
 if __name__ == "__main__":
+    # Necesario en el ejecutable congelado: la rotación de llaves usa un pool de procesos (spawn)
+    multiprocessing.freeze_support()
     start_app()
@@ -0,0 +1,64 @@
+-- ============================================================================
+-- SCRIPT DE MIGRACIÓN: MARCA DE EVENTO CRÍTICO EN security_audit
+-- ============================================================================
+-- Fecha: 2026-10-18
+-- Objetivo: El contador de críticos del visor global pedía COUNT exacto con un
+--           or(action.ilike.*X*, ...) que recorría todo el histórico en cada
+--           refresco. Cada evento se marca una sola vez al insertarse (columna
+--           critical) y el cliente cuenta critical=is.true con count=estimated.
+-- Base de datos: PostgreSQL (Supabase)
+-- Cliente: SyncManager.get_audit_stats()
+--          (si la columna no existe, el cliente cuenta los críticos de la página cargada)
+-- Clasificación: espejo de src/domain/services/audit_timeline_service.py
+--                (CRITICAL_ACTION_KEYWORDS, CRITICAL_STATUSES)
+-- ============================================================================
+
+-- ==========================
+-- PASO 1: COLUMNA critical
+-- ==========================
+
+ALTER TABLE security_audit ADD COLUMN IF NOT EXISTS critical BOOLEAN;
+
+-- ==========================
+-- PASO 2: TRIGGER (los clientes no envían la marca)
+-- ==========================
+
+CREATE OR REPLACE FUNCTION set_audit_critical()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.critical := UPPER(COALESCE(NEW.action, '')) ~ '(DELETE|PURGE|ADMIN_REVOKE|PHYSICAL_DELETE|ELIMINACION)'
+                    OR UPPER(COALESCE(NEW.status, '')) IN ('DENIED', 'FAIL', 'ERROR');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+SET search_path = public, pg_temp;
+
+DROP TRIGGER IF EXISTS trg_audit_critical ON security_audit;
+CREATE TRIGGER trg_audit_critical
+    BEFORE INSERT OR UPDATE OF action, status ON security_audit
+    FOR EACH ROW EXECUTE FUNCTION set_audit_critical();
+
+-- ==========================
+-- PASO 3: MARCA DEL HISTÓRICO
+-- ==========================
+
+UPDATE security_audit
+SET critical = UPPER(COALESCE(action, '')) ~ '(DELETE|PURGE|ADMIN_REVOKE|PHYSICAL_DELETE|ELIMINACION)'
+               OR UPPER(COALESCE(status, '')) IN ('DENIED', 'FAIL', 'ERROR')
+WHERE critical IS NULL;
+
+-- ==========================
+-- PASO 4: ÍNDICE PARCIAL (los críticos son una fracción pequeña del registro)
+-- ==========================
+
+CREATE INDEX IF NOT EXISTS idx_security_audit_critical ON security_audit(category, timestamp DESC) WHERE critical;
+
+COMMENT ON COLUMN security_audit.critical IS 'Evento crítico (borrados, purgas, revocaciones, estados DENIED/FAIL/ERROR). Calculada por trg_audit_critical.';
+
+-- ==========================
+-- ROLLBACK
+-- ==========================
+-- DROP TRIGGER IF EXISTS trg_audit_critical ON security_audit;
+-- DROP FUNCTION IF EXISTS set_audit_critical();
+-- DROP INDEX IF EXISTS idx_security_audit_critical;
+-- ALTER TABLE security_audit DROP COLUMN IF EXISTS critical;
@@ -0,0 +1,63 @@
+-- ============================================================================
+-- SCRIPT DE MIGRACIÓN: COMPACTACIÓN DE LATIDOS EN security_audit
+-- ============================================================================
+-- Fecha: 2026-10-18
+-- Objetivo: Cada escritorio inserta un HEARTBEAT cada 30-300 s y security_audit
+--           crecía sin límite. La presencia ya vive en session_presence, así que
+--           los latidos antiguos no aportan nada: se borran pasada la ventana de
+--           compactación. El resto de eventos (registro forense central) no se toca.
+-- Base de datos: PostgreSQL (Supabase)
+-- Cliente: la retención local (AuditRepository.apply_retention) es independiente;
+--          aquí solo se compacta la tabla de la nube.
+-- Requiere: migration_session_presence.sql
+-- ============================================================================
+
+-- ==========================
+-- PASO 1: ÍNDICE DE LATIDOS POR ANTIGÜEDAD
+-- ==========================
+
+CREATE INDEX IF NOT EXISTS idx_security_audit_heartbeat_ts
+    ON security_audit(timestamp)
+    WHERE action = 'HEARTBEAT';
+
+-- ==========================
+-- PASO 2: FUNCIÓN compact_security_audit
+-- ==========================
+
+CREATE OR REPLACE FUNCTION compact_security_audit(p_noise_days INTEGER DEFAULT 7, p_batch INTEGER DEFAULT 50000)
+RETURNS INTEGER AS $$
+DECLARE
+    -- Nunca menos de un día: 0 o negativo borraría también los latidos de las sesiones vivas
+    v_cutoff  BIGINT := EXTRACT(EPOCH FROM NOW())::BIGINT - GREATEST(p_noise_days, 1) * 86400;
+    v_deleted INTEGER;
+BEGIN
+    -- Por lotes: no bloquear la tabla en la primera pasada sobre un histórico grande
+    DELETE FROM security_audit
+    WHERE ctid IN (
+        SELECT ctid FROM security_audit
+        WHERE action = 'HEARTBEAT' AND timestamp < v_cutoff
+        LIMIT p_batch
+    );
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+    RETURN v_deleted;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public, pg_temp;
+
+COMMENT ON FUNCTION compact_security_audit IS 'Borra latidos (HEARTBEAT) anteriores a p_noise_days (mínimo 1); la presencia vive en session_presence.';
+
+-- Solo mantenimiento (service_role / pg_cron): ningún cliente puede vaciar el registro
+REVOKE EXECUTE ON FUNCTION compact_security_audit(INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION compact_security_audit(INTEGER, INTEGER) TO service_role;
+
+-- ==========================
+-- PASO 3: PROGRAMACIÓN (requiere la extensión pg_cron)
+-- ==========================
+-- SELECT cron.schedule('compact-security-audit', '*/10 * * * *', 'SELECT compact_security_audit(7)');
+
+-- ==========================
+-- ROLLBACK
+-- ==========================
+-- SELECT cron.unschedule('compact-security-audit');
+-- DROP FUNCTION IF EXISTS compact_security_audit(INTEGER, INTEGER);
+-- DROP INDEX IF EXISTS idx_security_audit_heartbeat_ts;
@@ -0,0 +1,79 @@
+-- ============================================================================
+-- SCRIPT DE MIGRACIÓN: LÍNEA DE TIEMPO DE AUDITORÍA (CATEGORÍA + KEYSET)
+-- ============================================================================
+-- Fecha: 2026-10-18
+-- Objetivo: Que el visor de actividad no descargue 500 eventos globales en cada
+--           refresco para filtrarlos por categoría en el cliente. Cada evento se
+--           clasifica una sola vez al insertarse (columna category) y el visor
+--           pagina por (timestamp, id) con índices que cubren el orden.
+-- Base de datos: PostgreSQL (Supabase)
+-- Cliente: SyncManager.get_audit_page() / get_audit_stats()
+--          (si la columna no existe, el cliente clasifica cada página él mismo)
+-- Clasificación: espejo de src/domain/services/audit_timeline_service.py
+--                (CATEGORY_KEYWORDS, la primera categoría con coincidencia gana)
+-- ============================================================================
+
+-- ==========================
+-- PASO 1: COLUMNA category
+-- ==========================
+
+ALTER TABLE security_audit ADD COLUMN IF NOT EXISTS category TEXT;
+
+-- ==========================
+-- PASO 2: CLASIFICADOR Y TRIGGER
+-- ==========================
+
+CREATE OR REPLACE FUNCTION classify_audit_action(p_action TEXT)
+RETURNS TEXT AS $$
+DECLARE
+    v_action TEXT := UPPER(COALESCE(p_action, ''));
+BEGIN
+    IF v_action ~ '(LOGIN|LOGOUT|SESSION|2FA|ACCESS|AUTH|HEARTBEAT|CONEXION)' THEN
+        RETURN 'AUTH';
+    ELSIF v_action ~ '(ADMIN|USER|ROLE|POLICY|SETTINGS|PURGE|REVOKE|KICK|BLOCK|PERM|GRANT)' THEN
+        RETURN 'ADMIN';
+    ELSIF v_action ~ '(CREATE|UPDATE|READ|DELETE|EXPORT|IMPORT|SECRET|VAULT|AGREGAR|EDITAR|BORRAR|VER|COPIAR|ELIMINACION|PASSWORD|CONTRASENA|LLAVE|KEY)' THEN
+        RETURN 'SECRETS';
+    END IF;
+    RETURN 'SYSTEM';
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Los clientes no envían la categoría: así funcionan igual las versiones antiguas
+CREATE OR REPLACE FUNCTION set_audit_category()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.category := COALESCE(NEW.category, classify_audit_action(NEW.action));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_audit_category ON security_audit;
+CREATE TRIGGER trg_audit_category
+    BEFORE INSERT ON security_audit
+    FOR EACH ROW EXECUTE FUNCTION set_audit_category();
+
+-- ==========================
+-- PASO 3: CLASIFICACIÓN DEL HISTÓRICO
+-- ==========================
+
+UPDATE security_audit SET category = classify_audit_action(action) WHERE category IS NULL;
+
+-- ==========================
+-- PASO 4: ÍNDICES DE PAGINACIÓN (keyset: timestamp DESC, id DESC)
+-- ==========================
+
+CREATE INDEX IF NOT EXISTS idx_security_audit_timeline ON security_audit(timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_security_audit_category_timeline ON security_audit(category, timestamp DESC, id DESC);
+
+COMMENT ON COLUMN security_audit.category IS 'AUTH / SECRETS / ADMIN / SYSTEM. Calculada al insertar por trg_audit_category.';
+
+-- ==========================
+-- ROLLBACK
+-- ==========================
+-- DROP TRIGGER IF EXISTS trg_audit_category ON security_audit;
+-- DROP FUNCTION IF EXISTS set_audit_category();
+-- DROP FUNCTION IF EXISTS classify_audit_action(TEXT);
+-- DROP INDEX IF EXISTS idx_security_audit_timeline;
+-- DROP INDEX IF EXISTS idx_security_audit_category_timeline;
+-- ALTER TABLE security_audit DROP COLUMN IF EXISTS category;
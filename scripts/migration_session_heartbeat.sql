@@ -0,0 +1,96 @@
+-- ============================================================================
+-- SCRIPT DE MIGRACIÓN: HEARTBEAT COMBINADO (PRESENCIA + REVOCACIÓN)
+-- ============================================================================
+-- Fecha: 2026-10-18
+-- Objetivo: Un único round-trip por latido. Antes cada cliente hacía, cada 30 s,
+--           HEAD de conectividad + IP pública + POST security_audit + GET vault_access
+--           + GET security_audit (KICK). session_heartbeat() registra la presencia
+--           y devuelve el estado de revocación en la misma petición.
+-- Base de datos: PostgreSQL (Supabase)
+-- Cliente: SyncManager.send_heartbeat() -> POST /rest/v1/rpc/session_heartbeat
+--          (si la función no existe o se deniega, el cliente vuelve al protocolo antiguo)
+-- Identidad: el cliente usa la anon key (sin sesión de Supabase Auth), así que la función
+--            no puede apoyarse en auth.uid(). Exige que p_user_id exista en users con ese
+--            nombre y que coincida con la cabecera x-guardian-user-id; el nombre registrado
+--            es el de la tabla users, nunca el recibido.
+-- ============================================================================
+
+-- ==========================
+-- PASO 1: COLUMNA ip_address (pendiente desde migration_ip_address)
+-- ==========================
+
+ALTER TABLE security_audit ADD COLUMN IF NOT EXISTS ip_address TEXT;
+
+-- Índice para la búsqueda de expulsiones (KICK) por usuario y dispositivo
+CREATE INDEX IF NOT EXISTS idx_security_audit_kick
+    ON security_audit(user_name, device_info, timestamp)
+    WHERE action = 'KICK';
+
+-- ==========================
+-- PASO 2: FUNCIÓN session_heartbeat
+-- ==========================
+
+CREATE OR REPLACE FUNCTION session_heartbeat(
+    p_user_name   TEXT,
+    p_device      TEXT,
+    p_action      TEXT DEFAULT 'HEARTBEAT',
+    p_status      TEXT DEFAULT 'ONLINE',
+    p_details     TEXT DEFAULT NULL,
+    p_ip_address  TEXT DEFAULT NULL,
+    p_user_id     TEXT DEFAULT NULL,
+    p_vault_id    TEXT DEFAULT NULL,
+    p_kick_window INTEGER DEFAULT 900
+)
+RETURNS JSON AS $$
+DECLARE
+    v_now        BIGINT := EXTRACT(EPOCH FROM NOW())::BIGINT;
+    v_reason     TEXT := NULL;
+    v_user       TEXT;
+    v_header_uid TEXT := NULLIF(current_setting('request.headers', true), '')::JSON ->> 'x-guardian-user-id';
+BEGIN
+    -- 0. Identidad del llamante: un nombre de usuario suelto no basta para escribir en su nombre
+    SELECT UPPER(username) INTO v_user FROM users WHERE id::TEXT = p_user_id;
+    IF v_user IS NULL OR v_user <> UPPER(p_user_name)
+       OR (v_header_uid IS NOT NULL AND v_header_uid <> p_user_id) THEN
+        RAISE EXCEPTION 'session_heartbeat: caller identity mismatch' USING ERRCODE = '42501';
+    END IF;
+
+    INSERT INTO security_audit (timestamp, user_name, action, status, device_info, details, ip_address)
+    VALUES (v_now, v_user, p_action, p_status, p_device, p_details, p_ip_address);
+
+    -- 1. Kill Switch de permisos: el usuario ya no tiene acceso a la bóveda
+    IF p_user_id IS NOT NULL AND p_vault_id IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM vault_access
+        WHERE user_id::TEXT = p_user_id AND vault_id::TEXT = p_vault_id
+    ) THEN
+        v_reason := 'ACCESS';
+    -- 2. Expulsión reciente de este dispositivo (ventana acotada para permitir re-ingreso)
+    ELSIF EXISTS (
+        SELECT 1 FROM security_audit
+        WHERE action = 'KICK' AND user_name = v_user
+          AND device_info = p_device AND timestamp > v_now - p_kick_window
+    ) THEN
+        v_reason := 'KICK';
+    END IF;
+
+    RETURN json_build_object('revoked', v_reason IS NOT NULL, 'reason', v_reason, 'server_time', v_now);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public, pg_temp;
+
+COMMENT ON FUNCTION session_heartbeat IS 'Latido de sesión: registra presencia en security_audit y devuelve el estado de revocación en una sola llamada.';
+
+-- ==========================
+-- PASO 3: PERMISOS (PostgreSQL concede EXECUTE a PUBLIC por defecto)
+-- ==========================
+-- El escritorio se conecta con la anon key: anon es el rol que llama de verdad. Al migrar
+-- a sesiones de Supabase Auth, retirar anon y comprobar auth.uid() en el PASO 0.
+
+REVOKE EXECUTE ON FUNCTION session_heartbeat(TEXT, TEXT, TEXT, TEXT, TEXT, TEXT, TEXT, TEXT, INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION session_heartbeat(TEXT, TEXT, TEXT, TEXT, TEXT, TEXT, TEXT, TEXT, INTEGER) TO anon, authenticated;
+
+-- ==========================
+-- ROLLBACK
+-- ==========================
+-- DROP FUNCTION IF EXISTS session_heartbeat(TEXT, TEXT, TEXT, TEXT, TEXT, TEXT, TEXT, TEXT, INTEGER);
+-- DROP INDEX IF EXISTS idx_security_audit_kick;
@@ -0,0 +1,85 @@
+-- ============================================================================
+-- SCRIPT DE MIGRACIÓN: TABLA DE PRESENCIA POR DISPOSITIVO
+-- ============================================================================
+-- Fecha: 2026-10-18
+-- Objetivo: Que la vista de sesiones no tenga que agrupar en el cliente los
+--           últimos 100 eventos de security_audit (con muchos dispositivos
+--           latiendo cada 30 s, 100 filas solo cubrían una parte de la flota).
+--           Cada evento de auditoría actualiza una única fila por usuario@dispositivo.
+-- Base de datos: PostgreSQL (Supabase)
+-- Cliente: SyncManager.get_session_page() / count_active_sessions()
+--          (si la tabla no existe, el cliente vuelve a agrupar security_audit)
+-- Requiere: migration_session_heartbeat.sql (columna security_audit.ip_address)
+-- ============================================================================
+
+-- ==========================
+-- PASO 1: TABLA session_presence
+-- ==========================
+
+CREATE TABLE IF NOT EXISTS session_presence (
+    session_key TEXT PRIMARY KEY,        -- USER@device
+    user_name   TEXT NOT NULL,
+    device_info TEXT NOT NULL,
+    ip_address  TEXT,
+    action      TEXT,
+    status      TEXT,                    -- REVOKED tras un KICK, hasta el siguiente latido
+    last_seen   BIGINT NOT NULL
+);
+
+-- Orden de paginación (keyset): last_seen DESC, session_key ASC
+CREATE INDEX IF NOT EXISTS idx_session_presence_seen ON session_presence(last_seen DESC, session_key);
+
+COMMENT ON TABLE session_presence IS 'Último evento conocido por usuario y dispositivo. Mantenida por trigger desde security_audit.';
+
+-- ==========================
+-- PASO 2: TRIGGER DESDE security_audit
+-- ==========================
+
+CREATE OR REPLACE FUNCTION upsert_session_presence()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Mismo filtro que aplicaba el cliente: device_info con mensajes de error o detalles no es un dispositivo
+    IF NEW.device_info IS NULL OR LENGTH(NEW.device_info) > 30
+       OR NEW.device_info LIKE '%Sesión%' OR NEW.device_info LIKE '%Login%' THEN
+        RETURN NEW;
+    END IF;
+
+    INSERT INTO session_presence AS p (session_key, user_name, device_info, ip_address, action, status, last_seen)
+    VALUES (UPPER(COALESCE(NEW.user_name, '???')) || '@' || NEW.device_info, UPPER(COALESCE(NEW.user_name, '???')),
+            NEW.device_info, NEW.ip_address, NEW.action, NEW.status, NEW.timestamp)
+    ON CONFLICT (session_key) DO UPDATE
+        SET ip_address = COALESCE(EXCLUDED.ip_address, p.ip_address),
+            action     = EXCLUDED.action,
+            status     = EXCLUDED.status,
+            last_seen  = EXCLUDED.last_seen
+        WHERE EXCLUDED.last_seen >= p.last_seen;   -- eventos atrasados (sync de logs offline) no retroceden la presencia
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public, pg_temp;
+
+DROP TRIGGER IF EXISTS trg_session_presence ON security_audit;
+CREATE TRIGGER trg_session_presence
+    AFTER INSERT ON security_audit
+    FOR EACH ROW EXECUTE FUNCTION upsert_session_presence();
+
+-- ==========================
+-- PASO 3: CARGA INICIAL (última hora de auditoría)
+-- ==========================
+
+INSERT INTO session_presence (session_key, user_name, device_info, ip_address, action, status, last_seen)
+SELECT DISTINCT ON (UPPER(user_name), device_info)
+       UPPER(user_name) || '@' || device_info, UPPER(user_name), device_info, ip_address, action, status, timestamp
+FROM security_audit
+WHERE timestamp > EXTRACT(EPOCH FROM NOW())::BIGINT - 3600
+  AND device_info IS NOT NULL AND LENGTH(device_info) <= 30
+  AND device_info NOT LIKE '%Sesión%' AND device_info NOT LIKE '%Login%'
+ORDER BY UPPER(user_name), device_info, timestamp DESC
+ON CONFLICT (session_key) DO NOTHING;
+
+-- ==========================
+-- ROLLBACK
+-- ==========================
+-- DROP TRIGGER IF EXISTS trg_session_presence ON security_audit;
+-- DROP FUNCTION IF EXISTS upsert_session_presence();
+-- DROP TABLE IF EXISTS session_presence;
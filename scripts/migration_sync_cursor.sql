@@ -0,0 +1,56 @@
+-- ============================================================================
+-- SCRIPT DE MIGRACIÓN: CURSOR DELTA CON RELOJ DEL SERVIDOR
+-- ============================================================================
+-- Fecha: 2026-10-18
+-- Objetivo: El pull incremental pedía updated_at >= hwm, pero updated_at lo fija
+--           el cliente que sube (time.time()). Un par con el reloj atrasado más
+--           que la ventana de solape (300 s) escribía filas que el delta de los
+--           demás nunca veía hasta la reconciliación completa diaria.
+--           server_updated_at lo asigna el servidor en cada INSERT/UPDATE.
+-- Base de datos: PostgreSQL (Supabase)
+-- Cliente: SyncManager._plan_pull() / _apply_pull() (CURSOR_COLUMN)
+--          (si la columna no existe, el cliente vuelve a updated_at)
+-- Nota: la columna se crea con NOW() en todas las filas existentes, así que el
+--       primer delta de cada cliente tras la migración trae la tabla completa una vez.
+-- ============================================================================
+
+-- ==========================
+-- PASO 1: COLUMNA server_updated_at
+-- ==========================
+
+ALTER TABLE secrets ADD COLUMN IF NOT EXISTS server_updated_at BIGINT NOT NULL
+    DEFAULT EXTRACT(EPOCH FROM NOW())::BIGINT;
+
+-- ==========================
+-- PASO 2: TRIGGER (el valor del cliente se ignora siempre)
+-- ==========================
+
+CREATE OR REPLACE FUNCTION set_server_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.server_updated_at := EXTRACT(EPOCH FROM clock_timestamp())::BIGINT;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+SET search_path = public, pg_temp;
+
+DROP TRIGGER IF EXISTS trg_secrets_server_updated_at ON secrets;
+CREATE TRIGGER trg_secrets_server_updated_at
+    BEFORE INSERT OR UPDATE ON secrets
+    FOR EACH ROW EXECUTE FUNCTION set_server_updated_at();
+
+-- ==========================
+-- PASO 3: ÍNDICE DEL FILTRO DELTA (server_updated_at=gte.N)
+-- ==========================
+
+CREATE INDEX IF NOT EXISTS idx_secrets_server_updated_at ON secrets(server_updated_at);
+
+COMMENT ON COLUMN secrets.server_updated_at IS 'Epoch (s) del servidor en la última escritura. Cursor del pull incremental.';
+
+-- ==========================
+-- ROLLBACK
+-- ==========================
+-- DROP TRIGGER IF EXISTS trg_secrets_server_updated_at ON secrets;
+-- DROP FUNCTION IF EXISTS set_server_updated_at();
+-- DROP INDEX IF EXISTS idx_secrets_server_updated_at;
+-- ALTER TABLE secrets DROP COLUMN IF EXISTS server_updated_at;
@@ -0,0 +1,41 @@
+from typing import Any, Dict, Optional, Tuple
+
+# Categorías de la línea de tiempo de auditoría. Se calculan UNA vez al escribir el
+# evento (columna security_audit.category) en lugar de escanear cada log en cada refresco.
+# El orden importa: la primera categoría con coincidencia gana (LOGIN_BLOCKED es AUTH,
+# ADMIN_RESET_PASSWORD es ADMIN). scripts/migration_audit_timeline.sql replica estas listas.
+CATEGORY_KEYWORDS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("AUTH", ("LOGIN", "LOGOUT", "SESSION", "2FA", "ACCESS", "AUTH", "HEARTBEAT", "CONEXION")),
+    ("ADMIN", ("ADMIN", "USER", "ROLE", "POLICY", "SETTINGS", "PURGE", "REVOKE", "KICK", "BLOCK",
+               "PERM", "GRANT", "USER_MANAGEMENT")),
+    ("SECRETS", ("CREATE", "UPDATE", "READ", "DELETE", "EXPORT", "IMPORT", "SECRET", "VAULT", "AGREGAR",
+                 "EDITAR", "BORRAR", "VER", "COPIAR", "ELIMINACION", "PASSWORD", "CONTRASENA", "LLAVE", "KEY")),
+)
+DEFAULT_CATEGORY = "SYSTEM"
+CATEGORIES = tuple(c for c, _ in CATEGORY_KEYWORDS) + (DEFAULT_CATEGORY,)
+
+# Eventos que cuentan como críticos en las estadísticas del visor. También se fijan al
+# escribir (columna security_audit.critical); scripts/migration_audit_critical.sql las replica.
+CRITICAL_ACTION_KEYWORDS = ("DELETE", "PURGE", "ADMIN_REVOKE", "PHYSICAL_DELETE", "ELIMINACION")
+CRITICAL_STATUSES = ("DENIED", "FAIL", "ERROR")
+
+_cache: Dict[str, str] = {}
+
+
+def classify_action(action: Optional[str]) -> str:
+    """Categoría de un nombre de acción (el conjunto de acciones es pequeño: se memoiza)."""
+    key = str(action or "").upper()
+    category = _cache.get(key)
+    if category is None:
+        category = next((c for c, words in CATEGORY_KEYWORDS if any(w in key for w in words)), DEFAULT_CATEGORY)
+        if len(_cache) < 4096: _cache[key] = category
+    return category
+
+
+def is_critical_event(action: Optional[str], status: Optional[str]) -> bool:
+    key = str(action or "").upper()
+    return any(x in key for x in CRITICAL_ACTION_KEYWORDS) or str(status or "").upper() in CRITICAL_STATUSES
+
+
+def is_critical(log: Dict[str, Any]) -> bool:
+    return is_critical_event(log.get("action"), log.get("status"))
@@ -0,0 +1,64 @@
+import itertools
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Cabeceras reconocidas por campo (case insensitive, multi-idioma)
+FIELD_VARIANTS: Dict[str, Tuple[str, ...]] = {
+    "service": ("service", "servicio", "app", "sitio"),
+    "username": ("username", "user", "usuario", "login", "email"),
+    "secret": ("secret", "password", "contraseña", "clave", "pwd"),
+    "notes": ("notes", "notas", "comentario", "desc"),
+    "is_private": ("is_private", "privado", "personal"),
+}
+PRIVATE_TRUE = ("1", "True", "true", "S", "Si")
+
+
+class ColumnMapper:
+    """
+    Resolves which source column feeds each field once per header set instead of
+    scanning every key for every field of every row. CSV files have a single header
+    set; JSON arrays usually a handful.
+    """
+    def __init__(self) -> None:
+        self._by_headers: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+        self._lookup = {v: field for field, variants in FIELD_VARIANTS.items() for v in variants}
+
+    def resolve(self, headers: Iterable[Any]) -> Dict[str, Any]:
+        sig = tuple(headers)
+        mapping = self._by_headers.get(sig)
+        if mapping is None:
+            mapping = {}
+            for k in sig:
+                field = self._lookup.get(str(k).strip().lower())
+                if field and field not in mapping: mapping[field] = k
+            self._by_headers[sig] = mapping
+        return mapping
+
+    def normalize(self, row: Dict[str, Any], default_user: str) -> Optional[Tuple[str, str, str, str, int]]:
+        """(service, username, secret, notes, is_private) or None when service/secret are missing."""
+        mapping = self.resolve(row.keys())
+
+        def get(field: str) -> Optional[str]:
+            col = mapping.get(field)
+            val = row.get(col) if col is not None else None
+            return str(val) if val is not None else None
+
+        svc = (get("service") or "").strip()
+        sec = get("secret")
+        if not svc or not sec: return None
+        usr = (get("username") or default_user or "").strip()
+        notes = (get("notes") or "").strip()
+        priv_val = get("is_private")
+        priv = 1 if priv_val and priv_val.strip() in PRIVATE_TRUE else 0
+        return svc, usr, sec, notes, priv
+
+
+def chunked(rows: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Consumes any iterable (DictReader, generator, list) in lists of at most size items."""
+    it = iter(rows)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk: return
+        yield chunk
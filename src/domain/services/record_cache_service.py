@@ -0,0 +1,66 @@
+import logging
+import threading
+from typing import Optional, Any, Dict, Tuple
+from src.infrastructure.secure_memory import SecureBytes
+
+logger = logging.getLogger(__name__)
+
+class RecordCacheService:
+    """
+    Session-scoped cache of decrypted secrets.
+    Entries are keyed by row id and validated against (integrity_hash, version),
+    so any change to the ciphertext in SQLite invalidates the cached plaintext.
+    Plaintexts are held in SecureBytes and zeroed on eviction or clear().
+    """
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._entries: Dict[int, Tuple[Optional[str], Optional[str], SecureBytes]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _fingerprint(integrity: Any, version: Any) -> Tuple[Optional[str], Optional[str]]:
+        return (str(integrity) if integrity else None, str(version) if version is not None else None)
+
+    def get(self, sid: Any, integrity: Any, version: Any) -> Optional[str]:
+        """Returns the cached plaintext if the row fingerprint still matches."""
+        if sid is None: return None
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry and entry[:2] == self._fingerprint(integrity, version):
+                raw = entry[2].get_copy()
+                if raw is not None:
+                    self.hits += 1
+                    return raw.decode("utf-8")
+            self.misses += 1
+            return None
+
+    def put(self, sid: Any, integrity: Any, version: Any, plaintext: str) -> None:
+        if sid is None or plaintext is None: return
+        with self._lock:
+            self._drop(sid)
+            self._entries[sid] = self._fingerprint(integrity, version) + (SecureBytes(plaintext.encode("utf-8")),)
+
+    def evict(self, sid: Any) -> None:
+        with self._lock:
+            self._drop(sid)
+
+    def _drop(self, sid: Any) -> None:
+        entry = self._entries.pop(sid, None)
+        if entry: entry[2].clear()
+
+    def clear(self) -> None:
+        """Zeroes every cached plaintext."""
+        with self._lock:
+            for entry in self._entries.values():
+                entry[2].clear()
+            self._entries = {}
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._entries)
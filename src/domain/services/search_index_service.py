@@ -0,0 +1,82 @@
+import logging
+from typing import Any, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+class SearchIndexService:
+    """
+    In-memory substring index for the vault search box.
+    Each record is one lowercase document (service, username, owner, notes, age bucket...);
+    trigram postings narrow the candidates and a final substring check confirms them.
+    Queries shorter than 3 characters fall back to a linear scan over the documents.
+    Not thread-safe: owned and queried by the UI thread.
+    """
+    GRAM = 3
+
+    def __init__(self) -> None:
+        self._docs: Dict[Any, str] = {}
+        self._postings: Dict[str, Set[Any]] = {}
+
+    @classmethod
+    def _grams(cls, text: str) -> Set[str]:
+        return {text[i:i + cls.GRAM] for i in range(len(text) - cls.GRAM + 1)}
+
+    @staticmethod
+    def normalize(fields: Iterable[Any]) -> str:
+        return " ".join(str(f) for f in fields if f not in (None, "")).lower()
+
+    # --- Mantenimiento incremental ---
+    def upsert(self, doc_id: Any, text: str) -> None:
+        old = self._docs.get(doc_id)
+        if old == text: return
+        if old is not None: self._unlink(doc_id, old)
+        self._docs[doc_id] = text
+        for g in self._grams(text):
+            self._postings.setdefault(g, set()).add(doc_id)
+
+    def remove(self, doc_id: Any) -> None:
+        old = self._docs.pop(doc_id, None)
+        if old is not None: self._unlink(doc_id, old)
+
+    def _unlink(self, doc_id: Any, text: str) -> None:
+        for g in self._grams(text):
+            bucket = self._postings.get(g)
+            if bucket is None: continue
+            bucket.discard(doc_id)
+            if not bucket: del self._postings[g]
+
+    def sync(self, docs: Dict[Any, str]) -> int:
+        """Aligns the index with a full snapshot, re-indexing only documents whose text changed."""
+        changed = 0
+        for doc_id in [d for d in self._docs if d not in docs]:
+            self.remove(doc_id)
+            changed += 1
+        for doc_id, text in docs.items():
+            if self._docs.get(doc_id) != text:
+                self.upsert(doc_id, text)
+                changed += 1
+        return changed
+
+    def clear(self) -> None:
+        self._docs = {}
+        self._postings = {}
+
+    # --- Consulta ---
+    def search(self, query: str) -> Optional[Set[Any]]:
+        """Ids whose document contains query (case-insensitive). None means 'no filter'."""
+        q = (query or "").strip().lower()
+        if not q: return None
+        if len(q) < self.GRAM:
+            return {d for d, text in self._docs.items() if q in text}
+
+        candidates: Optional[Set[Any]] = None
+        for g in sorted(self._grams(q), key=lambda g: len(self._postings.get(g, ()))):
+            bucket = self._postings.get(g)
+            if not bucket: return set()
+            candidates = set(bucket) if candidates is None else candidates & bucket
+            if not candidates: return set()
+        # Los trigramas pueden coincidir en posiciones no contiguas: verificar
+        return {d for d in candidates if q in self._docs[d]}
+
+    def __len__(self) -> int:
+        return len(self._docs)
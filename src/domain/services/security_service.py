@@ -3,6 +3,7 @@ import hashlib
 import base64
 import re
 import logging
+import threading
 from typing import Optional, List, Tuple, Union
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from src.infrastructure.crypto_engine import CryptoEngine
@@ -14,7 +15,9 @@ class SecurityService:
     Orchestrates high-level security operations and key wrapping policies.
     """
     def __init__(self) -> None:
-        pass
+        # Key-hint telemetry: how often the recorded key_type opened the row on first try
+        self._stats_lock = threading.Lock()
+        self._hint_stats = {"hits": 0, "misses": 0, "legacy": 0}
 
     def ensure_bytes(self, data: any) -> Optional[bytes]:
         if data is None: return None
@@ -43,7 +46,7 @@ class SecurityService:
         try:
             pk = self.ensure_bytes(protected_key_blob)
             if pk and len(pk) >= 28:
-                return bytearray(AESGCM(kek).decrypt(pk[:12], pk[12:], None))
+                return bytearray(CryptoEngine.open_with_kek(pk, kek))
         except Exception as e:
             logger.debug(f"Protected key decryption failed: {e}")
         return None
@@ -54,16 +57,70 @@ class SecurityService:
         integrity = hashlib.sha256(encrypted).hexdigest()
         return encrypted, nonce, integrity
 
+    def encrypt_many(self, plains: List[str], key: bytes) -> List[Tuple[bytes, bytes, str]]:
+        """encrypt_data for a batch sharing one key: a single AESGCM context for the whole batch."""
+        aead = AESGCM(bytes(key))
+        out = []
+        for data_plain in plains:
+            nonce = os.urandom(12)
+            encrypted = aead.encrypt(nonce, data_plain.encode("utf-8"), None)
+            out.append((encrypted, nonce, hashlib.sha256(encrypted).hexdigest()))
+        return out
+
     def decrypt_data(self, enc_data: bytes, nonce: bytes, candidate_keys: List[Union[bytes, bytearray]]) -> str:
-        for k in candidate_keys:
+        plain, _ = self._trial_decrypt(enc_data, nonce, [(None, k) for k in candidate_keys])
+        return plain if plain is not None else "[Bloqueado 🔑]"
+
+    def decrypt_with_hint(self, enc_data: bytes, nonce: bytes, keyring: List[Tuple[str, Union[bytes, bytearray]]],
+                          hint: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        """
+        Decrypts with the key class recorded for the row (key_type) first.
+        Only legacy rows or stale hints fall back to trial decryption over the keyring.
+        Returns (plaintext, label of the key that opened it).
+        """
+        if hint:
+            for label, k in keyring:
+                if label != hint: continue
+                plain, _ = self._trial_decrypt(enc_data, nonce, [(label, k)])
+                if plain is not None:
+                    self._count("hits")
+                    return plain, label
+                break
+            self._count("misses")
+        else:
+            self._count("legacy")
+
+        rest = [(label, k) for label, k in keyring if label != hint]
+        plain, label = self._trial_decrypt(enc_data, nonce, rest)
+        if plain is None: return "[Bloqueado 🔑]", None
+        return plain, label
+
+    def _trial_decrypt(self, enc_data: bytes, nonce: bytes, keyring: List[Tuple[Optional[str], Union[bytes, bytearray]]]) -> Tuple[Optional[str], Optional[str]]:
+        for label, k in keyring:
             if not k or len(k) != 32: continue
             try:
                 dec_bytes = AESGCM(k).decrypt(nonce, enc_data, None)
-                return dec_bytes.decode("utf-8")
+                return dec_bytes.decode("utf-8"), label
             except Exception as e:
                 logger.debug(f"Candidate key decryption failed: {e}")
                 continue
-        return "[Bloqueado 🔑]"
+        return None, None
+
+    def _count(self, bucket: str) -> None:
+        with self._stats_lock:
+            self._hint_stats[bucket] += 1
+
+    def key_hint_stats(self) -> dict:
+        """Hit/miss counters for hinted decryption (legacy = rows without key_type)."""
+        with self._stats_lock:
+            stats = dict(self._hint_stats)
+        total = stats["hits"] + stats["misses"] + stats["legacy"]
+        stats["hit_rate"] = round(stats["hits"] / total, 4) if total else 0.0
+        return stats
+
+    def reset_key_hint_stats(self) -> None:
+        with self._stats_lock:
+            self._hint_stats = {"hits": 0, "misses": 0, "legacy": 0}
 
     def wrap_key(self, key_to_wrap: any, password: str, salt: any) -> bytes:
         return CryptoEngine.wrap_vault_key(self.ensure_bytes(key_to_wrap), password, self.ensure_bytes(salt))
@@ -3,6 +3,7 @@ import logging
 import threading
 from typing import Optional, Any, Dict
 from src.infrastructure.secure_memory import SecureBytes
+from src.domain.services.record_cache_service import RecordCacheService
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +29,11 @@ class SessionService:
         self._vault_key: Optional[SecureBytes] = None
         self._master_key: Optional[SecureBytes] = None
         self.kek_candidates: Dict[str, SecureBytes] = {}
+        # Password del login retenida solo hasta drenar la migración KDF diferida (nunca se persiste)
+        self.migration_secret: Optional[SecureBytes] = None
+
+        # Decrypted-record cache (lives and dies with the keys above)
+        self.record_cache = RecordCacheService()
 
     def start_operation(self):
         """Signals that a sensitive operation (like sync) is starting."""
@@ -80,6 +86,7 @@ class SessionService:
             self.user_role = str(role).lower()
             self.current_vault_id = vault_id
             self.session_id = str(uuid.uuid4())
+            self.record_cache.clear()
 
     def clear(self) -> None:
         """Purges session and physically zeroes keys using SecureBytes."""
@@ -87,6 +94,7 @@ class SessionService:
             if self._active_ops > 0:
                 logger.warning(f"Session clear requested while {self._active_ops} ops active. Postponing full zeroing.")
                 self.current_user = None
+                self.record_cache.clear()
                 return
 
             # Zeroing containers
@@ -98,6 +106,8 @@ class SessionService:
                 if hasattr(k, 'clear'):
                     k.clear()
             self.kek_candidates = {}
+            if self.migration_secret: self.migration_secret.clear(); self.migration_secret = None
+            self.record_cache.clear()
 
             self.current_user = None
             self.current_user_id = None
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Monitor de conectividad compartido
+==================================
+
+Un único estado de red por backend para todo el proceso. Sustituye a los sondeos
+que cada widget lanzaba por su cuenta (dashboard cada 1 s, login y esfera de
+bloqueo cada 5 s):
+
+- Salud pasiva: cada petición real al backend (sync, heartbeat, auditoría) informa
+  de su resultado con report_response()/report_failure(). Mientras el tráfico real
+  funcione no hace falta ningún sondeo activo.
+- Sondeo activo solo cuando no hay evidencia reciente: cada HEALTHY_INTERVAL con
+  la red sana, y con backoff exponencial (BACKOFF_BASE .. BACKOFF_MAX, con jitter
+  para que cientos de escritorios no se sincronicen) mientras está caída.
+- Los widgets se suscriben (subscribe) y reciben el estado solo cuando cambia. El
+  hilo de sondeo vive mientras haya suscriptores; sin ellos, is_online() sondea
+  en línea cuando el estado ha caducado.
+"""
+
+import time
+import random
+import logging
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectivityStatus(NamedTuple):
+    internet: Optional[bool]   # None: aún sin evidencia
+    backend: Optional[bool]
+    checked_at: float          # time.monotonic() de la última evidencia
+    failures: int              # sondeos activos fallidos consecutivos
+
+    @property
+    def online(self) -> bool:
+        return bool(self.internet)
+
+
+class ConnectivityMonitor:
+    HEALTHY_INTERVAL = 60.0
+    BACKOFF_BASE = 2.0
+    BACKOFF_MAX = 60.0
+    JITTER = 0.1
+
+    def __init__(self, base_url: str, internet_probe: Optional[Callable[[], bool]] = None,
+                 backend_probe: Optional[Callable[[], bool]] = None) -> None:
+        self.base_url = (base_url or "").rstrip("/")
+        self._internet_probe = internet_probe or self._head_probe
+        self._backend_probe = backend_probe
+        self._cond = threading.Condition()
+        self._probe_lock = threading.Lock()
+        self._subscribers: List[Callable[[ConnectivityStatus], None]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._internet: Optional[bool] = None
+        self._backend: Optional[bool] = None
+        self._checked_at = 0.0
+        self._probed_at = 0.0
+        self._failures = 0
+        self._next_probe = 0.0
+
+    def _head_probe(self) -> bool:
+        try:
+            requests.head(self.base_url, timeout=2.0)
+            return True
+        except requests.RequestException:
+            return False
+
+    def attach_probes(self, internet_probe: Callable[[], bool], backend_probe: Optional[Callable[[], bool]] = None) -> None:
+        """Sustituye los sondeos por los del cliente HTTP (sesión keep-alive ya abierta)."""
+        with self._cond:
+            self._internet_probe = internet_probe
+            self._backend_probe = backend_probe
+
+    # --- ESTADO ---
+    def status(self) -> ConnectivityStatus:
+        with self._cond:
+            return ConnectivityStatus(self._internet, self._backend, self._checked_at, self._failures)
+
+    def _backoff(self) -> float:
+        delay = min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** max(0, self._failures - 1))
+        return delay * random.uniform(1 - self.JITTER, 1 + self.JITTER)
+
+    def _update(self, internet: bool, backend: Optional[bool], active: bool) -> None:
+        now = time.monotonic()
+        with self._cond:
+            before = (self._internet, self._backend)
+            self._internet = internet
+            if backend is not None: self._backend = backend
+            elif not internet: self._backend = False
+            self._checked_at = now
+            if internet and self._backend is not False:
+                self._failures = 0
+                self._next_probe = now + self.HEALTHY_INTERVAL
+            elif active:
+                self._failures += 1
+                self._next_probe = now + self._backoff()
+            else:
+                # Fallo de una petición real: confirmar pronto con un sondeo, sin esperar al intervalo largo
+                self._next_probe = min(self._next_probe, now + self.BACKOFF_BASE)
+            changed = before != (self._internet, self._backend)
+            if changed: self._cond.notify_all()
+            subscribers = list(self._subscribers) if changed else []
+        if changed:
+            logger.info(f"[Connectivity] internet={self._internet} backend={self._backend}")
+        self._notify(subscribers)
+
+    def _notify(self, subscribers: List[Callable[[ConnectivityStatus], None]]) -> None:
+        status = self.status()
+        for callback in subscribers:
+            try:
+                callback(status)
+            except Exception as e:
+                logger.debug(f"Connectivity subscriber failed, dropping it: {e}")
+                self.unsubscribe(callback)
+
+    # --- SALUD PASIVA ---
+    def report_response(self, status_code: int, backend: bool = True) -> None:
+        """
+        Una petición real recibió respuesta: hay red. 5xx marca el backend como caído;
+        un 4xx (permisos, filtros) no dice nada de su salud: eso lo muestra sync_err.
+        """
+        healthy = None if not backend or 400 <= status_code < 500 else status_code < 500
+        self._update(True, healthy, active=False)
+
+    def report_failure(self, error: Optional[BaseException] = None) -> None:
+        """Una petición real no llegó al servidor (conexión rechazada, DNS, timeout)."""
+        logger.debug(f"[Connectivity] Request failed: {error}")
+        self._update(False, None, active=False)
+
+    # --- SONDEO ACTIVO ---
+    def probe(self) -> ConnectivityStatus:
+        """Sondeo inmediato. Llamadas concurrentes comparten el resultado del sondeo en curso."""
+        started = time.monotonic()
+        with self._probe_lock:
+            if self._probed_at >= started: return self.status()
+            if self._backend_probe:
+                backend = self._safe(self._backend_probe)
+                internet = backend or self._safe(self._internet_probe)
+            else:
+                # Sin sondeo de API, el HEAD al host del backend responde por ambos
+                internet = backend = self._safe(self._internet_probe)
+            self._probed_at = time.monotonic()
+            self._update(internet, backend, active=True)
+        return self.status()
+
+    @staticmethod
+    def _safe(probe: Callable[[], bool]) -> bool:
+        try:
+            return bool(probe())
+        except Exception as e:
+            logger.debug(f"Connectivity probe failed: {e}")
+            return False
+
+    def is_online(self) -> bool:
+        """Estado cacheado; solo sondea si ya tocaba (evidencia caducada o backoff cumplido)."""
+        with self._cond:
+            due = self._internet is None or time.monotonic() >= self._next_probe
+        return self.probe().online if due else self.status().online
+
+    def backend_online(self) -> bool:
+        return self.is_online() and bool(self.status().backend)
+
+    # --- SUSCRIPCIONES ---
+    def subscribe(self, callback: Callable[[ConnectivityStatus], None]) -> None:
+        """callback(status) en cada cambio, desde el hilo del monitor (en Qt: emitir una señal)."""
+        with self._cond:
+            if callback not in self._subscribers: self._subscribers.append(callback)
+            known = self._internet is not None
+        self._ensure_thread()
+        if known: self._notify([callback])
+
+    def unsubscribe(self, callback: Callable[[ConnectivityStatus], None]) -> None:
+        with self._cond:
+            if callback in self._subscribers: self._subscribers.remove(callback)
+            self._cond.notify_all()
+
+    def _ensure_thread(self) -> None:
+        with self._cond:
+            if self._thread is not None or not self._subscribers: return
+            self._thread = threading.Thread(target=self._run, name="ConnectivityMonitor", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+                delay = self._next_probe - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+            self.probe()
+
+
+_monitors: Dict[str, ConnectivityMonitor] = {}
+_monitors_lock = threading.Lock()
+
+
+def get_connectivity_monitor(base_url: Optional[str] = None) -> ConnectivityMonitor:
+    """Monitor compartido del backend base_url (por defecto, SUPABASE_URL de la configuración)."""
+    if base_url is None:
+        from config.config import SUPABASE_URL
+        base_url = SUPABASE_URL
+    key = (base_url or "").rstrip("/")
+    with _monitors_lock:
+        if key not in _monitors: _monitors[key] = ConnectivityMonitor(key)
+        return _monitors[key]
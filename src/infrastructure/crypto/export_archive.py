@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Archivo de exportación cifrado por bloques (.vxa)
+================================================
+
+Los registros se escriben en bloques de chunk_rows filas; cada bloque es un JSON
+sellado con AES-256-GCM bajo una llave derivada de la passphrase de exportación
+(KDF y costes en el header, como el envelope v1). Nunca hay texto plano en disco
+ni más de un bloque en memoria.
+
+    preamble : magic(8) | index_offset(8) | header_len(4) | header JSON
+    bloque   : kind(1) | chunk_no(4) | length(4) | nonce(12) | ct+tag
+    AAD      : sha256(header)[:16] | kind | chunk_no | length
+
+El último bloque (kind=INDEX) lista [offset, filas] de cada bloque de datos e
+index_offset apunta a él: lectura aleatoria de cualquier bloque sin descifrar los
+anteriores. Con index_offset=0 (exportación interrumpida) o un índice ilegible el
+lector recorre los bloques en orden y se detiene en el último bloque válido.
+"""
+
+import os
+import json
+import time
+import struct
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from config.crypto_config import ARGON2_MAX_MEMORY_COST
+from src.infrastructure.crypto_engine import CryptoEngine
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_MAGIC = b"VXARCH01"
+ARCHIVE_VERSION = 1
+ARCHIVE_EXTENSION = ".vxa"
+ARCHIVE_FIELDS = ("service", "username", "password", "notes", "is_private")
+DEFAULT_CHUNK_ROWS = 500
+
+KIND_DATA = 0
+KIND_INDEX = 1
+
+_PREAMBLE = struct.Struct(">8sQI")
+_FRAME = struct.Struct(">BII")
+_INDEX_OFFSET_POS = 8
+MAX_HEADER_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+# Tope de coste que aceptamos de un header ajeno (un archivo manipulado no debe agotar RAM/CPU)
+MAX_PBKDF2_ITERATIONS = 10_000_000
+
+
+class ArchiveError(ValueError):
+    """Archivo dañado, truncado o manipulado. chunk: primer bloque ilegible (si se conoce)."""
+
+    def __init__(self, message: str, chunk: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.chunk = chunk
+
+
+def _check_params(params: Any) -> Tuple[int, int, int, int]:
+    try:
+        kdf, cost_a, cost_b, cost_c = (int(v) for v in params)
+    except (TypeError, ValueError):
+        raise ArchiveError("Parámetros KDF ilegibles en el header")
+    if kdf == CryptoEngine.KDF_ARGON2ID:
+        if not (0 < cost_a <= ARGON2_MAX_MEMORY_COST and 0 < cost_b <= 64 and 0 < cost_c <= 64):
+            raise ArchiveError("Costes Argon2id fuera de rango")
+    elif kdf == CryptoEngine.KDF_PBKDF2:
+        if not 0 < cost_a <= MAX_PBKDF2_ITERATIONS:
+            raise ArchiveError("Iteraciones PBKDF2 fuera de rango")
+    else:
+        raise ArchiveError(f"KDF desconocido: {kdf}")
+    return kdf, cost_a, cost_b, cost_c
+
+
+class ArchiveWriter:
+    """
+    Escribe el archivo en path + ".part" y lo renombra al cerrar: un archivo .vxa
+    con ese nombre siempre está completo. abort() descarta lo escrito.
+    """
+
+    def __init__(self, path: Any, passphrase: str, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                 params: Optional[Tuple[int, int, int, int]] = None) -> None:
+        self.path = Path(path)
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.params = _check_params(params or CryptoEngine.current_kdf_params())
+        self.archive_id = os.urandom(16)
+        self.rows = 0
+        salt = os.urandom(16)
+        key = CryptoEngine._derive_for_params(self.params, passphrase, salt)
+        self._aead = AESGCM(bytes(key))
+        check_nonce = os.urandom(CryptoEngine.NONCE_SIZE)
+        header = {
+            "version": ARCHIVE_VERSION, "archive_id": self.archive_id.hex(), "created_at": int(time.time()),
+            "kdf": list(self.params), "salt": salt.hex(), "chunk_rows": self.chunk_rows,
+            # Verificador de passphrase: distingue "passphrase incorrecta" de "bloque dañado"
+            "check": (check_nonce + self._aead.encrypt(check_nonce, b"", self.archive_id)).hex(),
+        }
+        self._header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        self._aad = hashlib.sha256(self._header).digest()[:16]
+        self._pending: List[Dict[str, Any]] = []
+        self._index: List[List[int]] = []
+        self._tmp = self.path.with_name(self.path.name + ".part")
+        self._file = open(self._tmp, "wb")
+        self._file.write(_PREAMBLE.pack(ARCHIVE_MAGIC, 0, len(self._header)) + self._header)
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self._index)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._pending.append({f: record.get(f) for f in ARCHIVE_FIELDS})
+        self.rows += 1
+        if len(self._pending) >= self.chunk_rows: self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending: return
+        offset = self._file.tell()
+        self._seal(KIND_DATA, len(self._index), json.dumps(self._pending, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        self._index.append([offset, len(self._pending)])
+        self._pending = []
+
+    def _seal(self, kind: int, chunk_no: int, payload: bytes) -> None:
+        frame = _FRAME.pack(kind, chunk_no, CryptoEngine.NONCE_SIZE + len(payload) + 16)
+        nonce = os.urandom(CryptoEngine.NONCE_SIZE)
+        self._file.write(frame + nonce + self._aead.encrypt(nonce, payload, self._aad + frame))
+
+    def close(self) -> None:
+        """Sella el último bloque y el índice, apunta el preamble al índice y publica el archivo."""
+        if self._file is None: return
+        self._flush()
+        index_offset = self._file.tell()
+        self._seal(KIND_INDEX, len(self._index), json.dumps({"chunks": self._index, "rows": self.rows}).encode("utf-8"))
+        self._file.seek(_INDEX_OFFSET_POS)
+        self._file.write(struct.pack(">Q", index_offset))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp, self.path)
+
+    def abort(self) -> None:
+        if self._file is None: return
+        self._file.close()
+        self._file = None
+        try: os.remove(self._tmp)
+        except OSError as e: logger.debug(f"Could not remove partial archive {self._tmp}: {e}")
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        if exc_type: self.abort()
+        else: self.close()
+
+
+class ArchiveReader:
+    """
+    Abre un .vxa: ValueError si la passphrase no corresponde, ArchiveError si el archivo
+    está dañado. iter_chunks(start) reanuda desde cualquier bloque; read_chunk(n) usa el índice.
+    """
+
+    def __init__(self, path: Any, passphrase: str) -> None:
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        try:
+            self._open(passphrase)
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self, passphrase: str) -> None:
+        pre = self._file.read(_PREAMBLE.size)
+        if len(pre) < _PREAMBLE.size: raise ArchiveError("Archivo vacío o truncado")
+        magic, index_offset, header_len = _PREAMBLE.unpack(pre)
+        if magic != ARCHIVE_MAGIC: raise ArchiveError("No es un archivo de exportación Vultrax")
+        if header_len > MAX_HEADER_SIZE: raise ArchiveError("Header demasiado grande")
+        raw = self._file.read(header_len)
+        try:
+            header = json.loads(raw.decode("utf-8"))
+            if header["version"] != ARCHIVE_VERSION: raise ArchiveError(f"Versión no soportada: {header['version']}")
+            self.archive_id = bytes.fromhex(header["archive_id"])
+            self.chunk_rows = int(header["chunk_rows"])
+            self.created_at = int(header["created_at"])
+            salt, check = bytes.fromhex(header["salt"]), bytes.fromhex(header["check"])
+        except (ValueError, KeyError, TypeError) as e:
+            if isinstance(e, ArchiveError): raise
+            raise ArchiveError(f"Header ilegible: {e}")
+        self.params = _check_params(header.get("kdf"))
+
+        self._aead = AESGCM(bytes(CryptoEngine._derive_for_params(self.params, passphrase, salt)))
+        try:
+            self._aead.decrypt(check[:CryptoEngine.NONCE_SIZE], check[CryptoEngine.NONCE_SIZE:], self.archive_id)
+        except InvalidTag:
+            raise ValueError("Passphrase incorrecta para este archivo")
+        self._aad = hashlib.sha256(raw).digest()[:16]
+        self._data_start = self._file.tell()
+        self._index = self._load_index(index_offset)
+
+    def _load_index(self, offset: int) -> Optional[Dict[str, Any]]:
+        if not offset: return None
+        try:
+            self._file.seek(offset)
+            frame = self._read_frame()
+            if not frame or frame[0] != KIND_INDEX: raise ArchiveError("El índice no apunta a un bloque índice")
+            index = json.loads(frame[2])
+            if any(int(off) < self._data_start or int(off) >= offset for off, _ in index["chunks"]):
+                raise ArchiveError("Offsets del índice fuera del archivo")
+            if frame[1] != len(index["chunks"]): raise ArchiveError("El índice no cuadra con los bloques")
+            return index
+        except (ArchiveError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"[Archive] Index unreadable in {self.path.name}, falling back to a sequential scan: {e}")
+            return None
+
+    @property
+    def chunk_count(self) -> Optional[int]:
+        """Bloques de datos según el índice; None si el archivo no tiene índice legible."""
+        return len(self._index["chunks"]) if self._index else None
+
+    @property
+    def rows(self) -> Optional[int]:
+        return int(self._index["rows"]) if self._index else None
+
+    def _read_frame(self, skip: bool = False) -> Optional[Tuple[int, int, bytes]]:
+        """(kind, chunk_no, texto plano) del bloque en la posición actual; None en EOF limpio."""
+        frame = self._file.read(_FRAME.size)
+        if not frame: return None
+        if len(frame) < _FRAME.size: raise ArchiveError("Bloque truncado")
+        kind, chunk_no, length = _FRAME.unpack(frame)
+        if kind not in (KIND_DATA, KIND_INDEX) or not (CryptoEngine.NONCE_SIZE + 16 <= length <= MAX_CHUNK_SIZE):
+            raise ArchiveError(f"Cabecera de bloque inválida ({chunk_no})", chunk_no)
+        if skip:
+            self._file.seek(length, os.SEEK_CUR)
+            return kind, chunk_no, b""
+        body = self._file.read(length)
+        if len(body) < length: raise ArchiveError(f"Bloque {chunk_no} truncado", chunk_no)
+        try:
+            plain = self._aead.decrypt(body[:CryptoEngine.NONCE_SIZE], body[CryptoEngine.NONCE_SIZE:], self._aad + frame)
+        except InvalidTag:
+            raise ArchiveError(f"Bloque {chunk_no} dañado o manipulado", chunk_no)
+        return kind, chunk_no, plain
+
+    def _decode(self, chunk_no: int, plain: bytes) -> List[Dict[str, Any]]:
+        try: records = json.loads(plain.decode("utf-8"))
+        except ValueError: raise ArchiveError(f"Bloque {chunk_no} ilegible", chunk_no)
+        if not isinstance(records, list): raise ArchiveError(f"Bloque {chunk_no} ilegible", chunk_no)
+        return records
+
+    def read_chunk(self, n: int) -> List[Dict[str, Any]]:
+        """Acceso aleatorio: descifra solo el bloque n (requiere índice)."""
+        if not self._index: raise ArchiveError("El archivo no tiene índice: usar iter_chunks()")
+        if not 0 <= n < len(self._index["chunks"]): raise IndexError(n)
+        self._file.seek(int(self._index["chunks"][n][0]))
+        frame = self._read_frame()
+        if not frame or frame[0] != KIND_DATA or frame[1] != n:
+            raise ArchiveError(f"El índice no apunta al bloque {n}", n)
+        return self._decode(n, frame[2])
+
+    def iter_chunks(self, start: int = 0) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        (chunk_no, registros) desde el bloque start, uno en memoria cada vez. Sin índice
+        salta los bloques anteriores leyendo solo sus cabeceras. ArchiveError en el primer
+        bloque ilegible, después de entregar todos los válidos anteriores.
+        """
+        if self._index:
+            # Un seek por bloque: el consumidor puede intercalar read_chunk() sin desordenar la lectura
+            for n in range(start, len(self._index["chunks"])):
+                yield n, self.read_chunk(n)
+            return
+
+        self._file.seek(self._data_start)
+        expected = 0
+        while True:
+            pos = self._file.tell()
+            try:
+                frame = self._read_frame(skip=expected < start)
+            except ArchiveError as e:
+                e.chunk = expected
+                raise
+            if frame is None: raise ArchiveError(f"Archivo truncado tras el bloque {expected - 1}", expected)
+            kind, chunk_no, plain = frame
+            if chunk_no != expected:
+                raise ArchiveError(f"Bloque fuera de orden en el offset {pos}", expected)
+            if kind == KIND_INDEX: return
+            if expected >= start: yield chunk_no, self._decode(chunk_no, plain)
+            expected += 1
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "ArchiveReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
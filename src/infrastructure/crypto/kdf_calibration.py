@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Calibración de costes KDF por equipo
+====================================
+
+Mide Argon2id y PBKDF2 en la máquina y elige los parámetros más caros que
+caben en la latencia objetivo, nunca por debajo de los suelos de crypto_config.
+El perfil se guarda en data/kdf_profile.json y CryptoEngine.current_kdf_params()
+lo usa para los wraps nuevos; cada envelope v1 lleva sus propios costes en el
+header, así que el unwrap no depende del perfil vigente.
+
+Uso:
+    python -m src.infrastructure.crypto.kdf_calibration --target-ms 400 --report kdf_report.json --apply
+    python -m src.infrastructure.crypto.kdf_calibration --replay kdf_report.json
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import statistics
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config.crypto_config import (
+    KDF_TARGET_MS, KDF_PROFILE_FILE, ARGON2_PARALLELISM,
+    ARGON2_MIN_MEMORY_COST, ARGON2_MIN_TIME_COST, ARGON2_MAX_MEMORY_COST, PBKDF2_MIN_ITERATIONS
+)
+from src.infrastructure.crypto.kdf_worker import derive_kek, KDF_PBKDF2, KDF_ARGON2ID
+
+logger = logging.getLogger(__name__)
+
+PROFILE_VERSION = 1
+# Entradas fijas: los tiempos solo dependen del equipo y de los parámetros
+CALIBRATION_PASSWORD = "kdf-calibration"
+CALIBRATION_SALT = bytes(range(16))
+PBKDF2_PROBE_ITERATIONS = 100_000
+PBKDF2_STEP = 10_000
+# Fracción de la RAM libre que puede pedir una sola derivación Argon2id
+MEMORY_BUDGET = 0.25
+
+
+def profile_path() -> Path:
+    from src.infrastructure.config.path_manager import PathManager
+    return PathManager.DATA_DIR / KDF_PROFILE_FILE
+
+
+def validate_profile(profile: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Descarta las secciones fuera de suelo o que no caben en el header del envelope."""
+    if not isinstance(profile, dict) or profile.get("version") != PROFILE_VERSION:
+        return None
+    clean = {k: v for k, v in profile.items() if k not in ("argon2id", "pbkdf2")}
+    a = profile.get("argon2id")
+    try:
+        if a and (ARGON2_MIN_MEMORY_COST <= int(a["memory_cost"]) < 2 ** 32
+                  and ARGON2_MIN_TIME_COST <= int(a["time_cost"]) < 2 ** 16
+                  and 1 <= int(a["parallelism"]) < 2 ** 8 and int(a["memory_cost"]) >= 8 * int(a["parallelism"])):
+            clean["argon2id"] = a
+        elif a:
+            logger.warning(f"[KDF] Ignoring Argon2id profile below security floor: {a}")
+        p = profile.get("pbkdf2")
+        if p and PBKDF2_MIN_ITERATIONS <= int(p["iterations"]) < 2 ** 32:
+            clean["pbkdf2"] = p
+        elif p:
+            logger.warning(f"[KDF] Ignoring PBKDF2 profile below security floor: {p}")
+    except (KeyError, TypeError, ValueError) as e:
+        logger.warning(f"[KDF] Malformed KDF profile: {e}")
+        return None
+    return clean if ("argon2id" in clean or "pbkdf2" in clean) else None
+
+
+def load_profile(path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """Perfil calibrado del equipo, o None si no existe o no pasa la validación."""
+    path = Path(path) if path else profile_path()
+    if not path.exists(): return None
+    try:
+        return validate_profile(json.loads(path.read_text(encoding="utf-8")))
+    except (OSError, ValueError) as e:
+        logger.warning(f"[KDF] Could not read KDF profile {path}: {e}")
+        return None
+
+
+def save_profile(profile: Dict[str, Any], path: Optional[Path] = None) -> Path:
+    path = Path(path) if path else profile_path()
+    if validate_profile(profile) is None:
+        raise ValueError("El perfil KDF no supera los suelos de seguridad")
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(profile, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+class KdfCalibrator:
+    """
+    Argon2id: memoria primero (se duplica mientras la predicción lineal quepa en el
+    objetivo y en la RAM) y después pasadas (t escala lineal con el tiempo).
+    PBKDF2: una sonda de 100k iteraciones y extrapolación lineal, en pasos de 10k.
+    """
+
+    def __init__(self, target_ms: float = KDF_TARGET_MS, samples: int = 3,
+                 parallelism: Optional[int] = None, max_memory_cost: Optional[int] = None,
+                 timer: Callable[[], float] = time.perf_counter) -> None:
+        self.target_ms = float(target_ms)
+        self.samples = max(1, int(samples))
+        self.parallelism = parallelism or max(1, min(os.cpu_count() or 1, ARGON2_PARALLELISM))
+        self.max_memory_cost = max_memory_cost or self._memory_cap()
+        self.timer = timer
+        self.trials: List[Dict[str, Any]] = []
+
+    @staticmethod
+    def _memory_cap() -> int:
+        from src.infrastructure.key_rotation import available_memory
+        free = available_memory()
+        by_ram = int(free * MEMORY_BUDGET) // 1024 if free else ARGON2_MAX_MEMORY_COST
+        return max(ARGON2_MIN_MEMORY_COST, min(ARGON2_MAX_MEMORY_COST, by_ram))
+
+    def measure(self, params: Tuple[int, int, int, int]) -> float:
+        """Mediana (ms) de self.samples derivaciones con params; queda registrada en trials."""
+        runs = []
+        for _ in range(self.samples):
+            start = self.timer()
+            if derive_kek(params, CALIBRATION_PASSWORD, CALIBRATION_SALT) is None:
+                raise RuntimeError(f"KDF no disponible para {params}")
+            runs.append(round((self.timer() - start) * 1000, 2))
+        median = round(statistics.median(runs), 2)
+        self.trials.append({"kdf": "argon2id" if params[0] == KDF_ARGON2ID else "pbkdf2",
+                            "params": list(params), "samples_ms": runs, "median_ms": median})
+        return median
+
+    def calibrate_argon2id(self) -> Dict[str, Any]:
+        m, t, p = ARGON2_MIN_MEMORY_COST, ARGON2_MIN_TIME_COST, self.parallelism
+        ms = self.measure((KDF_ARGON2ID, m, t, p))
+        if ms < self.target_ms:
+            while m * 2 <= self.max_memory_cost and ms * 2 <= self.target_ms:
+                m *= 2
+                ms = self.measure((KDF_ARGON2ID, m, t, p))
+            passes = min(2 ** 16 - 1, int(self.target_ms // (ms / t)))
+            if passes > t:
+                t = passes
+                ms = self.measure((KDF_ARGON2ID, m, t, p))
+        return {"memory_cost": m, "time_cost": t, "parallelism": p, "ms": ms,
+                "floor_bound": (m, t) == (ARGON2_MIN_MEMORY_COST, ARGON2_MIN_TIME_COST)}
+
+    def calibrate_pbkdf2(self) -> Dict[str, Any]:
+        probe = self.measure((KDF_PBKDF2, PBKDF2_PROBE_ITERATIONS, 0, 0))
+        fit = int(self.target_ms / probe * PBKDF2_PROBE_ITERATIONS) // PBKDF2_STEP * PBKDF2_STEP
+        iterations = max(PBKDF2_MIN_ITERATIONS, fit)
+        ms = self.measure((KDF_PBKDF2, iterations, 0, 0))
+        return {"iterations": iterations, "ms": ms, "floor_bound": iterations == PBKDF2_MIN_ITERATIONS}
+
+    def run(self, argon2: bool = True) -> Dict[str, Any]:
+        """Calibra ambos KDF y devuelve el informe completo (el perfil va en report["profile"])."""
+        self.trials = []
+        profile: Dict[str, Any] = {"version": PROFILE_VERSION, "target_ms": self.target_ms,
+                                   "calibrated_at": int(time.time()), "host": platform.node()}
+        if argon2: profile["argon2id"] = self.calibrate_argon2id()
+        profile["pbkdf2"] = self.calibrate_pbkdf2()
+        return {
+            "tool": "kdf_calibration", "version": PROFILE_VERSION,
+            "inputs": {"target_ms": self.target_ms, "samples": self.samples, "parallelism": self.parallelism,
+                       "max_memory_cost": self.max_memory_cost,
+                       "floors": {"argon2_memory_cost": ARGON2_MIN_MEMORY_COST, "argon2_time_cost": ARGON2_MIN_TIME_COST,
+                                  "pbkdf2_iterations": PBKDF2_MIN_ITERATIONS}},
+            "environment": environment(),
+            "trials": self.trials,
+            "profile": profile,
+        }
+
+    def replay(self, report: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Repite cada medición de un informe anterior con los mismos parámetros y muestras."""
+        self.trials = []
+        for trial in report.get("trials", []):
+            self.measure(tuple(trial["params"]))
+        return [{"kdf": old["kdf"], "params": old["params"], "before_ms": old["median_ms"], "after_ms": new["median_ms"]}
+                for old, new in zip(report.get("trials", []), self.trials)]
+
+
+def environment() -> Dict[str, Any]:
+    from importlib import metadata
+    from src.infrastructure.key_rotation import available_memory
+
+    def version(dist: str) -> Optional[str]:
+        try: return metadata.version(dist)
+        except Exception: return None
+
+    return {"platform": platform.platform(), "machine": platform.machine(), "processor": platform.processor(),
+            "python": platform.python_version(), "cpu_count": os.cpu_count(), "available_memory": available_memory(),
+            "argon2_cffi": version("argon2-cffi"), "cryptography": version("cryptography")}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Calibra los costes de Argon2id/PBKDF2 para este equipo.")
+    parser.add_argument("--target-ms", type=float, default=KDF_TARGET_MS, help="latencia objetivo por derivación")
+    parser.add_argument("--samples", type=int, default=3, help="mediciones por configuración (se usa la mediana)")
+    parser.add_argument("--report", type=Path, help="guarda el informe JSON completo")
+    parser.add_argument("--apply", action="store_true", help="guarda el perfil en data/ para los próximos wraps")
+    parser.add_argument("--replay", type=Path, help="repite las mediciones de un informe anterior")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        report = json.loads(args.replay.read_text(encoding="utf-8"))
+        calibrator = KdfCalibrator(samples=report["inputs"]["samples"], parallelism=report["inputs"]["parallelism"],
+                                   max_memory_cost=report["inputs"]["max_memory_cost"])
+        for row in calibrator.replay(report):
+            print(f"{row['kdf']:<9} {str(row['params']):<28} {row['before_ms']:>9.1f} ms -> {row['after_ms']:>9.1f} ms")
+        return 0
+
+    from src.infrastructure.crypto_engine import ARGON2_AVAILABLE, ARGON2_ENABLED
+    report = KdfCalibrator(args.target_ms, args.samples).run(argon2=ARGON2_AVAILABLE and ARGON2_ENABLED)
+    profile = report["profile"]
+    for kdf in ("argon2id", "pbkdf2"):
+        if kdf in profile:
+            chosen = {k: v for k, v in profile[kdf].items() if k not in ("ms", "floor_bound")}
+            note = " (suelo de seguridad: el objetivo no es alcanzable en este equipo)" if profile[kdf]["floor_bound"] else ""
+            print(f"{kdf:<9} {chosen} -> {profile[kdf]['ms']:.1f} ms{note}")
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2, sort_keys=True), encoding="utf-8")
+        print(f"Informe: {args.report}")
+    if args.apply:
+        print(f"Perfil guardado en {save_profile(profile)}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""
+Derivación de KEKs para procesos worker (ProcessPoolExecutor).
+Import ligero a propósito: sin config, Qt ni base de datos, para que el arranque
+de cada proceso hijo (spawn) solo cargue argon2 y cryptography.
+"""
+from typing import Optional, Tuple
+
+from argon2.low_level import hash_secret_raw, Type
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.backends import default_backend
+
+# Mismos identificadores que CryptoEngine.KDF_* (header del envelope v1)
+KDF_PBKDF2 = 1
+KDF_ARGON2ID = 2
+KEY_LEN = 32
+
+
+def derive_kek(params: Tuple[int, int, int, int], password: str, salt: bytes) -> Optional[bytes]:
+    """Deriva la KEK para (kdf, cost_a, cost_b, cost_c). None si los parámetros/salt no son válidos."""
+    kdf, cost_a, cost_b, cost_c = params
+    try:
+        if kdf == KDF_ARGON2ID:
+            return hash_secret_raw(password.encode(), salt, time_cost=cost_b, memory_cost=cost_a,
+                                   parallelism=cost_c, hash_len=KEY_LEN, type=Type.ID)
+        if len(salt) < 16:
+            return None
+        return PBKDF2HMAC(algorithm=hashes.SHA256(), length=KEY_LEN, salt=salt,
+                          iterations=cost_a, backend=default_backend()).derive(password.encode("utf-8"))
+    except Exception:
+        return None
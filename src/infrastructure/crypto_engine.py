@@ -14,7 +14,10 @@ Fecha: 2026-01-22
 """
 
 import os
+import hmac
+import struct
 import hashlib
+import threading
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import hashes
@@ -24,6 +27,7 @@ import time
 from functools import wraps
 from typing import Any, Optional, Tuple, List, Dict
 from src.infrastructure.security.rate_limiter import RateLimiter
+from src.infrastructure.secure_memory import SecureBytes
 
 # NEW: Argon2 support
 try:
@@ -42,7 +46,8 @@ try:
     from config.crypto_config import (
         ARGON2_ENABLED, ARGON2_TIME_COST, ARGON2_MEMORY_COST,
         ARGON2_PARALLELISM, ARGON2_HASH_LEN, ARGON2_SALT_LEN,
-        ARGON2_PREFIX, USE_ARGON2_FOR_NEW_USERS
+        ARGON2_PREFIX, USE_ARGON2_FOR_NEW_USERS,
+        ARGON2_MIN_MEMORY_COST, ARGON2_MIN_TIME_COST, ARGON2_MAX_MEMORY_COST, PBKDF2_MIN_ITERATIONS
     )
 except ImportError:
     # Fallback defaults if config not found
@@ -54,6 +59,10 @@ except ImportError:
     ARGON2_SALT_LEN = 16
     ARGON2_PREFIX = "$argon2"
     USE_ARGON2_FOR_NEW_USERS = False
+    ARGON2_MIN_MEMORY_COST = 19456
+    ARGON2_MIN_TIME_COST = 2
+    ARGON2_MAX_MEMORY_COST = 1048576
+    PBKDF2_MIN_ITERATIONS = 600000
 
 logger = logging.getLogger(__name__)
 
@@ -101,6 +110,67 @@ def reset_rate_limits():
             l.attempts.clear()
 
 
+class KekMemo:
+    """
+    Memo de KEKs por operación (login, cambio de password).
+    Cada KEK distinta (algoritmo, parámetros, digest del salt) se deriva una sola vez, se guarda
+    en SecureBytes y se borra al salir del bloque. Las derivaciones de CryptoEngine del mismo
+    hilo lo consultan de forma transparente:
+
+        with KekMemo() as memo:
+            ...  # unwrap / wrap / derive_keke repetidos sobre el mismo (password, salt)
+    """
+    _active = threading.local()
+
+    def __init__(self):
+        # La password no se guarda: solo un HMAC con llave aleatoria de esta operación
+        self._tag_key = os.urandom(32)
+        self._entries: Dict[tuple, SecureBytes] = {}
+        self._previous = None
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def current(cls) -> Optional["KekMemo"]:
+        return getattr(cls._active, "memo", None)
+
+    @staticmethod
+    def scoped(func):
+        """Decorador: ejecuta la función completa dentro de un KekMemo propio."""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with KekMemo():
+                return func(*args, **kwargs)
+        return wrapper
+
+    def get_or_derive(self, algorithm: str, params: tuple, password: str, salt: bytes, derive) -> bytes:
+        key = (algorithm, params, hashlib.sha256(bytes(salt)).digest(),
+               hmac.new(self._tag_key, password.encode("utf-8"), hashlib.sha256).digest())
+        entry = self._entries.get(key)
+        cached = entry.get_copy() if entry is not None else None
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        kek = derive()
+        self._entries[key] = SecureBytes(kek)
+        return kek
+
+    def clear(self) -> None:
+        for entry in self._entries.values():
+            entry.clear()
+        self._entries.clear()
+
+    def __enter__(self):
+        self._previous = KekMemo.current()
+        KekMemo._active.memo = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        KekMemo._active.memo = self._previous
+        self.clear()
+
+
 class CryptoEngine:
     """
     Motor criptográfico centralizado para operaciones de Key Wrapping.
@@ -114,6 +184,23 @@ class CryptoEngine:
     NONCE_SIZE = 12  # Recomendado para AES-GCM
     DEFAULT_ITERATIONS = 100_000  # PBKDF2 iterations (OWASP Standard)
 
+    # --- ENVELOPE DE LLAVES ENVUELTAS (v1) ---
+    # magic(4) | version(1) | kdf(1) | cost_a(4) | cost_b(2) | cost_c(1) | salt_id(4) | nonce(12) | ct+tag
+    # argon2id: cost_a=memoria KiB, cost_b=time_cost, cost_c=parallelism. pbkdf2: cost_a=iteraciones.
+    # El header viaja como AAD de AES-GCM: alterar algoritmo o costes invalida el tag.
+    ENVELOPE_MAGIC = b"PGKW"
+    ENVELOPE_VERSION = 1
+    KDF_PBKDF2 = 1
+    KDF_ARGON2ID = 2
+    _ENVELOPE_HEADER = struct.Struct(">4sBBIHB4s")
+    ENVELOPE_HEADER_SIZE = _ENVELOPE_HEADER.size
+    # El header llega de la nube (vault_access) y se deriva ANTES de comprobar el tag: costes
+    # fuera de este rango se rechazan sin derivar. Mismos techos que el archivo de exportación;
+    # los suelos son los valores más bajos que este código ha escrito nunca.
+    ENVELOPE_MIN_PBKDF2_ITERATIONS = DEFAULT_ITERATIONS
+    ENVELOPE_MAX_PBKDF2_ITERATIONS = 10_000_000
+    ENVELOPE_MAX_ARGON2_COST = 64   # time_cost y parallelism
+
     @staticmethod
     def hash_user_password(password: str, salt: bytes = None) -> tuple[str, bytes]:
         """
@@ -175,10 +262,12 @@ class CryptoEngine:
         if not ARGON2_AVAILABLE:
             raise RuntimeError("Argon2 not available - install argon2-cffi")
         
+        # El hash codifica m/t/p: verificar no depende del perfil vigente
+        _, memory_cost, time_cost, parallelism = CryptoEngine.argon2_params()
         return PasswordHasher(
-            time_cost=ARGON2_TIME_COST,
-            memory_cost=ARGON2_MEMORY_COST,
-            parallelism=ARGON2_PARALLELISM,
+            time_cost=time_cost,
+            memory_cost=memory_cost,
+            parallelism=parallelism,
             hash_len=ARGON2_HASH_LEN,
             salt_len=ARGON2_SALT_LEN,
             type=Type.ID  # Argon2id (hybrid mode)
@@ -363,20 +452,26 @@ class CryptoEngine:
         if len(salt) < 16:
             raise ValueError("Salt must be at least 16 bytes")
             
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=CryptoEngine.KEY_SIZE,
-            salt=salt,
-            iterations=iterations,
-            backend=default_backend()
-        )
-        return kdf.derive(password.encode("utf-8"))
+        def _derive() -> bytes:
+            kdf = PBKDF2HMAC(
+                algorithm=hashes.SHA256(),
+                length=CryptoEngine.KEY_SIZE,
+                salt=salt,
+                iterations=iterations,
+                backend=default_backend()
+            )
+            return kdf.derive(password.encode("utf-8"))
+
+        memo = KekMemo.current()
+        return memo.get_or_derive("pbkdf2", (iterations,), password, salt, _derive) if memo else _derive()
     
     @staticmethod
     def wrap_vault_key(vault_master_key: bytes, user_password: str, user_salt: bytes) -> bytes:
         """
         Encripta (wrap) la vault_master_key usando la password del usuario.
         [UPGRADED] Ahora utiliza Argon2id si está habilitado en la configuración.
+        [ENVELOPE v1] El resultado lleva header con algoritmo, costes y salt_id para que
+        el unwrap haga exactamente una derivación.
         """
         if not isinstance(vault_master_key, bytes):
             raise TypeError("vault_master_key must be bytes")
@@ -384,28 +479,152 @@ class CryptoEngine:
             raise ValueError(f"vault_master_key must be exactly {CryptoEngine.KEY_SIZE} bytes")
             
         # Determinar algoritmo de derivación de KEK
-        if ARGON2_ENABLED and ARGON2_AVAILABLE:
-            try:
-                kek = CryptoEngine.derive_kek_argon2id(user_password, user_salt, 
-                                                   memory_cost=ARGON2_MEMORY_COST,
-                                                   time_cost=ARGON2_TIME_COST,
-                                                   parallelism=ARGON2_PARALLELISM)
-                logger.debug("[Crypto] Wrapping vault key with Argon2id")
-            except Exception as e:
-                logger.warning(f"[Crypto] Argon2 KEK derivation failed, falling back to PBKDF2: {e}")
-                kek = CryptoEngine.derive_kek_from_password(user_password, user_salt, 100000)
-        else:
-            kek = CryptoEngine.derive_kek_from_password(user_password, user_salt, 100000)
+        params = CryptoEngine.current_kdf_params()
+        try:
+            kek = CryptoEngine._derive_for_params(params, user_password, user_salt)
+            logger.debug(f"[Crypto] Wrapping vault key with KDF params {params}")
+        except Exception as e:
+            if params[0] != CryptoEngine.KDF_ARGON2ID: raise
+            logger.warning(f"[Crypto] Argon2 KEK derivation failed, falling back to PBKDF2: {e}")
+            params = CryptoEngine.pbkdf2_params()
+            kek = CryptoEngine._derive_for_params(params, user_password, user_salt)
         
+        return CryptoEngine.wrap_with_kek(vault_master_key, kek, params, user_salt)
+
+    @staticmethod
+    def wrap_with_kek(key: bytes, kek: bytes, params: Tuple[int, int, int, int], salt: bytes) -> bytes:
+        """Envuelve key (envelope v1) con una KEK ya derivada con params sobre salt."""
+        header = CryptoEngine._ENVELOPE_HEADER.pack(
+            CryptoEngine.ENVELOPE_MAGIC, CryptoEngine.ENVELOPE_VERSION, *params, CryptoEngine.salt_id(salt))
         # Generar nonce aleatorio
         nonce = os.urandom(CryptoEngine.NONCE_SIZE)
         
-        # Encriptar vault_master_key con KEK
-        aes_gcm = AESGCM(kek)
-        ciphertext = aes_gcm.encrypt(nonce, vault_master_key, None)
+        # Encriptar la llave con KEK (header autenticado como AAD)
+        ciphertext = AESGCM(bytes(kek)).encrypt(nonce, bytes(key), header)
         
-        # Retornar nonce + ciphertext
-        return nonce + ciphertext
+        # Retornar header + nonce + ciphertext
+        return header + nonce + ciphertext
+
+    @staticmethod
+    def legacy_kdf_cascade() -> List[Tuple[int, int, int, int]]:
+        """Parámetros que prueba unwrap_vault_key sobre blobs legacy, en el mismo orden."""
+        cascade = [(CryptoEngine.KDF_ARGON2ID, ARGON2_MEMORY_COST, ARGON2_TIME_COST, ARGON2_PARALLELISM)] if ARGON2_AVAILABLE else []
+        return cascade + [(CryptoEngine.KDF_PBKDF2, iters, 0, 0) for iters in (100000, 600000, 10000, 1000)]
+
+    # Perfil calibrado del equipo (kdf_calibration); se lee una vez por proceso
+    _kdf_profile: Optional[Dict[str, Any]] = None
+    _kdf_profile_loaded = False
+
+    @staticmethod
+    def kdf_profile() -> Optional[Dict[str, Any]]:
+        """Perfil de data/kdf_profile.json, o None para usar los valores fijos de crypto_config."""
+        if not CryptoEngine._kdf_profile_loaded:
+            from src.infrastructure.crypto.kdf_calibration import load_profile
+            CryptoEngine._kdf_profile = load_profile()
+            CryptoEngine._kdf_profile_loaded = True
+        return CryptoEngine._kdf_profile
+
+    @staticmethod
+    def reload_kdf_profile() -> None:
+        CryptoEngine._kdf_profile, CryptoEngine._kdf_profile_loaded = None, False
+
+    @staticmethod
+    def argon2_params() -> Tuple[int, int, int, int]:
+        a = (CryptoEngine.kdf_profile() or {}).get("argon2id")
+        if a: return (CryptoEngine.KDF_ARGON2ID, int(a["memory_cost"]), int(a["time_cost"]), int(a["parallelism"]))
+        return (CryptoEngine.KDF_ARGON2ID, ARGON2_MEMORY_COST, ARGON2_TIME_COST, ARGON2_PARALLELISM)
+
+    @staticmethod
+    def pbkdf2_params() -> Tuple[int, int, int, int]:
+        p = (CryptoEngine.kdf_profile() or {}).get("pbkdf2")
+        return (CryptoEngine.KDF_PBKDF2, int(p["iterations"]) if p else CryptoEngine.DEFAULT_ITERATIONS, 0, 0)
+
+    @staticmethod
+    def current_kdf_params() -> Tuple[int, int, int, int]:
+        """Parámetros KDF objetivo para nuevos wraps: (kdf, cost_a, cost_b, cost_c)."""
+        if ARGON2_ENABLED and ARGON2_AVAILABLE:
+            return CryptoEngine.argon2_params()
+        return CryptoEngine.pbkdf2_params()
+
+    @staticmethod
+    def salt_id(salt: bytes) -> bytes:
+        """Huella corta (no secreta) del salt: permite descartar un salt equivocado sin derivar."""
+        return hashlib.sha256(bytes(salt)).digest()[:4]
+
+    @staticmethod
+    def _envelope_params_ok(params: Tuple[int, int, int, int]) -> bool:
+        kdf, cost_a, cost_b, cost_c = params
+        if kdf == CryptoEngine.KDF_ARGON2ID:
+            return (ARGON2_MIN_MEMORY_COST <= cost_a <= ARGON2_MAX_MEMORY_COST
+                    and ARGON2_MIN_TIME_COST <= cost_b <= CryptoEngine.ENVELOPE_MAX_ARGON2_COST
+                    and 1 <= cost_c <= CryptoEngine.ENVELOPE_MAX_ARGON2_COST and cost_a >= 8 * cost_c)
+        return CryptoEngine.ENVELOPE_MIN_PBKDF2_ITERATIONS <= cost_a <= CryptoEngine.ENVELOPE_MAX_PBKDF2_ITERATIONS
+
+    @staticmethod
+    def parse_envelope(blob: bytes) -> Optional[Dict[str, Any]]:
+        """
+        Devuelve el header de un wrapped key v1, o None si es un blob legacy (nonce + ct).
+        Lanza ValueError si el header declara costes KDF fuera de rango (blob manipulado).
+        """
+        size = CryptoEngine.ENVELOPE_HEADER_SIZE
+        if not isinstance(blob, (bytes, bytearray)) or len(blob) < size + CryptoEngine.NONCE_SIZE + 16:
+            return None
+        magic, version, kdf, cost_a, cost_b, cost_c, sid = CryptoEngine._ENVELOPE_HEADER.unpack_from(blob)
+        if magic != CryptoEngine.ENVELOPE_MAGIC or version != CryptoEngine.ENVELOPE_VERSION:
+            return None
+        if kdf not in (CryptoEngine.KDF_PBKDF2, CryptoEngine.KDF_ARGON2ID):
+            return None
+        if not CryptoEngine._envelope_params_ok((kdf, cost_a, cost_b, cost_c)):
+            raise ValueError(f"Envelope v1 con parámetros KDF fuera de rango: {(kdf, cost_a, cost_b, cost_c)}")
+        return {"params": (kdf, cost_a, cost_b, cost_c), "salt_id": sid,
+                "algorithm": "argon2id" if kdf == CryptoEngine.KDF_ARGON2ID else "pbkdf2"}
+
+    @staticmethod
+    def below_security_floor(params: Tuple[int, int, int, int]) -> bool:
+        """Costes por debajo del suelo fijo de crypto_config (independiente del perfil del equipo)."""
+        kdf, cost_a, cost_b, _ = params
+        if kdf == CryptoEngine.KDF_ARGON2ID:
+            return cost_a < ARGON2_MIN_MEMORY_COST or cost_b < ARGON2_MIN_TIME_COST
+        return cost_a < PBKDF2_MIN_ITERATIONS
+
+    @staticmethod
+    def needs_rewrap(blob: bytes) -> bool:
+        """
+        True si el blob es legacy o su envelope está por debajo del suelo de seguridad y el
+        perfil de este equipo sí lo supera. El vault key es compartido: comparar con el perfil
+        local haría que dos equipos calibrados distinto lo re-envolvieran en cada login.
+        """
+        try:
+            env = CryptoEngine.parse_envelope(blob)
+        except ValueError:
+            return False   # Manipulado: no se puede abrir, y por tanto tampoco re-envolver
+        if env is None: return True
+        return (CryptoEngine.below_security_floor(env["params"])
+                and not CryptoEngine.below_security_floor(CryptoEngine.current_kdf_params()))
+
+    @staticmethod
+    def open_with_kek(blob: bytes, kek: bytes) -> bytes:
+        """Abre un wrapped key (v1 o legacy) con una KEK ya derivada (p.ej. la KEK de sesión)."""
+        blob = bytes(blob)
+        start = CryptoEngine.ENVELOPE_HEADER_SIZE if CryptoEngine.parse_envelope(blob) else 0
+        aad = blob[:start] or None
+        body = blob[start:]
+        return AESGCM(kek).decrypt(body[:CryptoEngine.NONCE_SIZE], body[CryptoEngine.NONCE_SIZE:], aad)
+
+    @staticmethod
+    def _derive_for_params(params: Tuple[int, int, int, int], password: str, salt: bytes) -> bytes:
+        kdf, cost_a, cost_b, cost_c = params
+        if kdf == CryptoEngine.KDF_ARGON2ID:
+            return CryptoEngine.derive_kek_argon2id(password, salt, memory_cost=cost_a, time_cost=cost_b, parallelism=cost_c)
+        return CryptoEngine.derive_kek_from_password(password, salt, iterations=cost_a)
+
+    @staticmethod
+    def _wipe(buf: Optional[bytearray]) -> None:
+        if not buf: return
+        import ctypes
+        try:
+            ctypes.memset((ctypes.c_char * len(buf)).from_buffer(buf), 0, len(buf))
+        except Exception: pass
     
     @staticmethod
     def derive_kek_argon2id(password: str, salt: bytes, 
@@ -420,15 +639,21 @@ class CryptoEngine:
             raise RuntimeError("Argon2 not available for KEK derivation")
             
         from argon2.low_level import hash_secret_raw, Type
-        return hash_secret_raw(
-            password.encode(), 
-            salt,
-            time_cost=time_cost, 
-            memory_cost=memory_cost,
-            parallelism=parallelism, 
-            hash_len=CryptoEngine.KEY_SIZE, 
-            type=Type.ID
-        )
+
+        def _derive() -> bytes:
+            return hash_secret_raw(
+                password.encode(), 
+                salt,
+                time_cost=time_cost, 
+                memory_cost=memory_cost,
+                parallelism=parallelism, 
+                hash_len=CryptoEngine.KEY_SIZE, 
+                type=Type.ID
+            )
+
+        memo = KekMemo.current()
+        params = (memory_cost, time_cost, parallelism)
+        return memo.get_or_derive("argon2id", params, password, salt, _derive) if memo else _derive()
 
     @staticmethod
     @rate_limit(max_attempts=20, window=30)
@@ -443,6 +668,20 @@ class CryptoEngine:
         if len(wrapped_key) < CryptoEngine.NONCE_SIZE + CryptoEngine.KEY_SIZE:
             raise ValueError("wrapped_key is too short")
 
+        # 0. Envelope v1: una sola derivación con los parámetros registrados
+        env = CryptoEngine.parse_envelope(wrapped_key)
+        if env:
+            if env["salt_id"] != CryptoEngine.salt_id(user_salt):
+                raise ValueError("Error de autenticación: el salt no corresponde a esta llave de bóveda.")
+            kek = None
+            try:
+                kek = bytearray(CryptoEngine._derive_for_params(env["params"], user_password, user_salt))
+                return CryptoEngine.open_with_kek(wrapped_key, bytes(kek)), env["algorithm"]
+            except Exception:
+                raise ValueError("Error de autenticación: El password o la llave de bóveda no coinciden.")
+            finally:
+                CryptoEngine._wipe(kek)
+
         nonce = wrapped_key[:CryptoEngine.NONCE_SIZE]
         ciphertext = wrapped_key[CryptoEngine.NONCE_SIZE:]
         
@@ -565,9 +804,9 @@ def _test_crypto_engine():
     user_a_salt = os.urandom(16)
     wrapped_a = CryptoEngine.wrap_vault_key(vault_key, user_a_password, user_a_salt)
     logger.debug(f"[OK] Wrapped (A): {len(wrapped_a)} bytes")
-    assert len(wrapped_a) == 60  # 12 nonce + 32 plaintext + 16 GCM tag
+    assert len(wrapped_a) == CryptoEngine.ENVELOPE_HEADER_SIZE + 60  # header + 12 nonce + 32 plaintext + 16 GCM tag
     
-    unwrapped_a = CryptoEngine.unwrap_vault_key(wrapped_a, user_a_password, user_a_salt)
+    unwrapped_a, _ = CryptoEngine.unwrap_vault_key(wrapped_a, user_a_password, user_a_salt)
     logger.debug(f"[OK] Unwrapped (A): {len(unwrapped_a)} bytes")
     assert unwrapped_a == vault_key
     logger.debug("[OK] User A recovered vault_key successfully")
@@ -578,7 +817,7 @@ def _test_crypto_engine():
     user_b_salt = os.urandom(16)
     
     wrapped_b = CryptoEngine.wrap_vault_key(vault_key, user_b_password, user_b_salt)
-    unwrapped_b = CryptoEngine.unwrap_vault_key(wrapped_b, user_b_password, user_b_salt)
+    unwrapped_b, _ = CryptoEngine.unwrap_vault_key(wrapped_b, user_b_password, user_b_salt)
     assert unwrapped_b == vault_key
     logger.debug("[OK] User B recovered THE SAME vault_key")
     
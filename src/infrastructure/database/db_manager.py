@@ -3,7 +3,7 @@ import re
 import logging
 import hashlib
 from pathlib import Path
-from typing import Optional, Any
+from typing import Optional, Any, Callable, List
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +16,7 @@ class DBManager:
     def __init__(self, app_data_name: str = "vultrax") -> None:
         self.conn: Optional[sqlite3.Connection] = None
         self.db_path: Optional[Path] = None
+        self._close_hooks: List[Callable[[], None]] = []
         self._initialize_db(app_data_name)
 
     def _initialize_db(self, name: str) -> None:
@@ -75,7 +76,7 @@ class DBManager:
                 CREATE TABLE IF NOT EXISTS security_audit (
                     id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp INTEGER, user_name TEXT, 
                     action TEXT, service TEXT, status TEXT DEFAULT 'SUCCESS', details TEXT, 
-                    device_info TEXT, synced INTEGER DEFAULT 0, user_id TEXT
+                    device_info TEXT, synced INTEGER DEFAULT 0, user_id TEXT, category TEXT, critical INTEGER
                 )
             """)
             
@@ -103,7 +104,9 @@ class DBManager:
                 ("security_audit", "user_id", "TEXT"),
                 ("secrets", "cloud_id", "TEXT"),
                 ("secrets", "version", "TEXT"),
-                ("users", "kdf_version", "INTEGER DEFAULT 1")  # 1 = PBKDF2, 2 = Argon2id
+                ("users", "kdf_version", "INTEGER DEFAULT 1"),  # 1 = PBKDF2, 2 = Argon2id
+                ("security_audit", "category", "TEXT"),  # AUTH/SECRETS/ADMIN/SYSTEM, fijada al escribir
+                ("security_audit", "critical", "INTEGER")  # 0/1, fijada al escribir (estadísticas del visor)
             ]
             for t, c, tp in migrations:
                 try:
@@ -118,9 +121,68 @@ class DBManager:
             self.conn.execute("UPDATE secrets SET synced = 0 WHERE synced IS NULL")
             self.conn.execute("UPDATE secrets SET deleted = 0 WHERE deleted IS NULL")
             self.conn.commit()
+
+            self._backfill_audit_categories()
+            self._backfill_audit_critical()
+            self._ensure_indexes()
         except Exception as e:
             logger.error(f"Error checking or updating schema: {e}")
 
+    # Índices de expresión para los predicados calientes. Las consultas de los repositorios
+    # deben usar EXACTAMENTE la misma expresión (UPPER(owner_name), LOWER(TRIM(service)),
+    # UPPER(user_name)) para que el planificador los elija en lugar de un SCAN.
+    HOT_INDEXES = [
+        # Visibilidad: (is_private = 0 OR UPPER(owner_name) = ?) AND deleted = 0 -> MULTI-INDEX OR.
+        # service/username incluidos para cubrir get_existing_keys sin tocar la tabla.
+        ("idx_secrets_public", "secrets (is_private, deleted, service, username)"),
+        ("idx_secrets_owner", "secrets (UPPER(owner_name), deleted)"),
+        ("idx_secrets_service_norm", "secrets (LOWER(TRIM(service)), deleted)"),
+        ("idx_secrets_cloud_id", "secrets (cloud_id)"),
+        ("idx_audit_timestamp", "security_audit (timestamp)"),
+        ("idx_audit_user_ts", "security_audit (UPPER(user_name), timestamp)"),
+        ("idx_audit_pending", "security_audit (synced) WHERE synced = 0"),
+        # Línea de tiempo: keyset (timestamp, id) DESC por categoría; id es el rowid, ya va en el índice
+        ("idx_audit_category_ts", "security_audit (category, timestamp)"),
+        ("idx_audit_user_category_ts", "security_audit (UPPER(user_name), category, timestamp)"),
+    ]
+
+    def _backfill_audit_categories(self) -> None:
+        """Clasifica una sola vez los eventos escritos antes de existir la columna category."""
+        from src.domain.services.audit_timeline_service import classify_action
+        try:
+            actions = [r[0] for r in self.conn.execute("SELECT DISTINCT action FROM security_audit WHERE category IS NULL")]
+            if not actions: return
+            self.conn.executemany("UPDATE security_audit SET category = ? WHERE category IS NULL AND action IS ?",
+                                  [(classify_action(a), a) for a in actions])
+            self.conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not backfill audit categories: {e}")
+
+    def _backfill_audit_critical(self) -> None:
+        """Marca una sola vez los eventos críticos escritos antes de existir la columna critical."""
+        from src.domain.services.audit_timeline_service import is_critical_event
+        try:
+            pairs = self.conn.execute("SELECT DISTINCT action, status FROM security_audit WHERE critical IS NULL").fetchall()
+            if not pairs: return
+            self.conn.executemany("UPDATE security_audit SET critical = ? WHERE critical IS NULL AND action IS ? AND status IS ?",
+                                  [(int(is_critical_event(a, s)), a, s) for a, s in pairs])
+            self.conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not backfill audit critical flags: {e}")
+
+    def _ensure_indexes(self) -> None:
+        for name, spec in self.HOT_INDEXES:
+            try:
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {spec}")
+            except Exception as e:
+                logger.warning(f"Could not create index {name}: {e}")
+        try:
+            # Estadísticas frescas para el planificador (barato, solo toca tablas que lo necesitan)
+            self.conn.execute("PRAGMA optimize")
+        except Exception as e:
+            logger.debug(f"PRAGMA optimize failed: {e}")
+        self.conn.commit()
+
     def execute(self, query: str, params: tuple = ()) -> sqlite3.Cursor:
         if not self.conn:
             raise RuntimeError("Database connection not initialized")
@@ -130,7 +192,15 @@ class DBManager:
         if self.conn:
             self.conn.commit()
 
+    def on_close(self, hook: Callable[[], None]) -> None:
+        """hook se ejecuta antes de cerrar la conexión (p. ej. vaciar el buffer de auditoría)."""
+        self._close_hooks.append(hook)
+
     def close(self) -> None:
+        for hook in self._close_hooks:
+            try: hook()
+            except Exception as e:
+                logger.error(f"Error in close hook: {e}")
         if self.conn:
             self.conn.close()
 
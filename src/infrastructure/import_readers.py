@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Lectores de importación en streaming (CSV / JSON / XLSX)
+=======================================================
+
+Interfaz común: iterar un ImportReader produce una fila (dict) cada vez sin
+cargar el archivo completo, y progress() estima la fracción leída (0..1) para
+la barra de progreso. bulk_add_secrets consume el iterador por bloques.
+
+    with open_reader(path) as reader:
+        stats = sm.bulk_add_secrets(reader)
+"""
+
+import io
+import os
+import csv
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ImportReader:
+    """Base: subclases implementan _rows() y, si pueden, _position() en bytes."""
+
+    def __init__(self, path: Any) -> None:
+        self.path = Path(path)
+        self.rows_read = 0
+        self.exhausted = False
+        self._size = max(1, os.path.getsize(self.path))
+        self._file = None
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        try:
+            for row in self._rows():
+                self.rows_read += 1
+                yield row
+            self.exhausted = True
+        finally:
+            self.close()
+
+    def _rows(self) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _position(self) -> Optional[int]:
+        try: return self._file.tell() if self._file else None
+        except (OSError, ValueError): return None
+
+    def progress(self) -> float:
+        if self.exhausted: return 1.0
+        pos = self._position()
+        return min(1.0, pos / self._size) if pos is not None else 0.0
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "ImportReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class CsvReader(ImportReader):
+    def _rows(self) -> Iterator[Dict[str, Any]]:
+        self._file = open(self.path, "rb")
+        # Texto sobre el binario: tell() del buffer sigue disponible mientras DictReader itera
+        yield from csv.DictReader(io.TextIOWrapper(self._file, encoding="utf-8-sig", newline=""))
+
+
+class JsonArrayReader(ImportReader):
+    """Parser incremental de un array JSON de objetos: decodifica un elemento cada vez."""
+    BUFFER_SIZE = 64 * 1024
+
+    def _rows(self) -> Iterator[Dict[str, Any]]:
+        decoder = json.JSONDecoder()
+        self._file = open(self.path, "rb")
+        reader = _Utf8Chunks(self._file, self.BUFFER_SIZE)
+        buf, pos = reader.read(), 0
+
+        def skip(chars: str) -> None:
+            nonlocal buf, pos
+            while True:
+                while pos < len(buf) and buf[pos] in chars: pos += 1
+                if pos < len(buf) or reader.eof: return
+                buf, pos = buf[pos:] + reader.read(), 0
+
+        skip(" \t\r\n")
+        if pos >= len(buf) or buf[pos] != "[":
+            raise ValueError("El JSON de importación debe ser un array de registros")
+        pos += 1
+        while True:
+            skip(" \t\r\n,")
+            if pos >= len(buf): raise ValueError("JSON truncado: falta ']'")
+            if buf[pos] == "]": return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+                # Un valor que termina justo al final del buffer podría continuar en el siguiente bloque
+                if end == len(buf) and not reader.eof: raise ValueError("incomplete")
+            except ValueError:
+                if reader.eof: raise
+                buf, pos = buf[pos:] + reader.read(), 0
+                continue
+            pos = end
+            if pos > self.BUFFER_SIZE: buf, pos = buf[pos:], 0
+            if isinstance(item, dict): yield item
+            else: logger.warning(f"[Import] Skipping non-object JSON element: {type(item).__name__}")
+
+
+class _Utf8Chunks:
+    """Lee bloques binarios y los decodifica sin partir caracteres multibyte."""
+
+    def __init__(self, f: Any, size: int) -> None:
+        import codecs
+        self._f, self._size = f, size
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.eof = False
+
+    def read(self) -> str:
+        data = self._f.read(self._size)
+        self.eof = not data
+        return self._decoder.decode(data, final=self.eof)
+
+
+class XlsxReader(ImportReader):
+    """openpyxl en modo read_only: filas bajo demanda, primera fila = cabeceras."""
+    _book = None
+    _total = 0
+
+    def _rows(self) -> Iterator[Dict[str, Any]]:
+        from openpyxl import load_workbook
+        self._book = load_workbook(self.path, read_only=True, data_only=True)
+        sheet = self._book.active
+        self._total = sheet.max_row or 0
+        rows = sheet.iter_rows(values_only=True)
+        headers = next(rows, None)
+        if not headers: return
+        headers = [str(h).strip() if h is not None else f"col{i}" for i, h in enumerate(headers)]
+        for values in rows:
+            if values is None or all(v is None for v in values): continue
+            yield {h: ("" if v is None else v) for h, v in zip(headers, values)}
+
+    def progress(self) -> float:
+        if self.exhausted: return 1.0
+        return min(1.0, (self.rows_read + 1) / self._total) if self._total else 0.0
+
+    def close(self) -> None:
+        if self._book is not None:
+            self._book.close()
+            self._book = None
+
+
+READERS = {".csv": CsvReader, ".json": JsonArrayReader, ".xlsx": XlsxReader}
+
+
+def open_reader(path: Any) -> ImportReader:
+    """Lector según la extensión. ValueError si el formato no está soportado."""
+    ext = Path(path).suffix.lower()
+    if ext not in READERS:
+        raise ValueError(f"Formato de importación no soportado: {ext}")
+    return READERS[ext](path)
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+KeyRotationEngine - Rotación de llaves de bóveda (cambio de password / reset administrativo)
+==========================================================================================
+
+1. plan(): decide por bóveda qué blob(s) y qué salt(s) probar, sin derivar nada.
+   Un envelope v1 aporta algoritmo, costes y salt_id: un único intento por bóveda.
+   Un blob legacy hereda la cascada de unwrap_vault_key por cada salt candidato.
+2. rotate(): deriva por oleadas las KEKs distintas (algoritmo, costes, salt) en un pool
+   de procesos acotado por RAM, abre cada blob con AES-GCM en el proceso principal y
+   re-envuelve todas las llaves con UNA sola KEK de la password nueva.
+"""
+
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.infrastructure.crypto_engine import CryptoEngine
+from src.infrastructure.crypto.kdf_worker import derive_kek
+from src.infrastructure.secure_memory import SecureBytes
+
+logger = logging.getLogger(__name__)
+
+
+def available_memory() -> Optional[int]:
+    """RAM física disponible en bytes (None si la plataforma no la expone)."""
+    try:
+        if hasattr(os, "sysconf") and "SC_AVPHYS_PAGES" in os.sysconf_names:
+            return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+        if os.name == "nt":
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+            stat = MEMORYSTATUSEX()
+            stat.dwLength = ctypes.sizeof(stat)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(stat)):
+                return int(stat.ullAvailPhys)
+    except Exception as e:
+        logger.debug(f"Available memory probe failed: {e}")
+    return None
+
+
+class KeyRotationEngine:
+    """Planifica y ejecuta el re-wrap de todas las llaves de bóveda con la password nueva."""
+
+    MAX_WORKERS = 8
+    # Fracción de la RAM libre que puede ocupar el pool (cada Argon2id reserva su memory_cost en KiB)
+    MEMORY_BUDGET = 0.5
+
+    def __init__(self, old_password: Optional[str], new_password: str, new_salt: bytes,
+                 progress_callback: Optional[Callable[[int, int, int, int], None]] = None,
+                 max_workers: Optional[int] = None) -> None:
+        self.old_password = old_password
+        self.new_password = new_password
+        self.new_salt = bytes(new_salt)
+        self.progress_callback = progress_callback
+        self.max_workers = max_workers or self.memory_bound_workers()
+        self.derivations = 0
+        self._keks: Dict[Tuple, Optional[SecureBytes]] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def memory_bound_workers(cls) -> int:
+        """Procesos simultáneos: min(CPUs, RAM libre * presupuesto / memoria por Argon2id, MAX_WORKERS)."""
+        per_job = CryptoEngine.argon2_params()[1] * 1024
+        free = available_memory()
+        by_ram = int(free * cls.MEMORY_BUDGET) // per_job if free else 2
+        return max(1, min(os.cpu_count() or 1, by_ram, cls.MAX_WORKERS))
+
+    # --- PLAN ---
+
+    def plan(self, accesses: List[Dict[str, Any]], salts: List[bytes],
+             known_keys: Optional[Dict[str, bytes]] = None) -> List[Dict[str, Any]]:
+        """
+        accesses: [{"vault_id", "access_level", "blobs": [wrapped, ...]}] (blobs en orden de preferencia)
+        known_keys: {vault_id.lower(): llave en claro} para bóvedas ya abiertas en sesión
+        Devuelve una tarea por bóveda con sus intentos ordenados (blob, params, salt).
+        """
+        known = known_keys or {}
+        salts = [bytes(s) for s in dict.fromkeys(salts) if s]
+        tasks = []
+        for acc in accesses:
+            v_id = acc["vault_id"]
+            task = {"vault_id": v_id, "access_level": acc.get("access_level") or "member",
+                    "key": known.get(str(v_id).lower()), "attempts": [], "error": None}
+            if task["key"] is None and self.old_password is not None:
+                for blob in acc.get("blobs") or []:
+                    if blob: task["attempts"].extend((bytes(blob), p, s) for p, s in self._candidates(bytes(blob), salts))
+            tasks.append(task)
+        return tasks
+
+    @staticmethod
+    def _candidates(blob: bytes, salts: List[bytes]) -> List[Tuple[Tuple[int, int, int, int], bytes]]:
+        try:
+            env = CryptoEngine.parse_envelope(blob)
+        except ValueError as e:
+            logger.warning(f"[KeyRotation] Skipping wrapped key: {e}")
+            return []
+        if env:
+            return [(env["params"], s) for s in salts if CryptoEngine.salt_id(s) == env["salt_id"]]
+        return [(p, s) for s in salts for p in CryptoEngine.legacy_kdf_cascade()
+                if p[0] != CryptoEngine.KDF_PBKDF2 or len(s) >= 16]
+
+    # --- EJECUCIÓN ---
+
+    def rotate(self, tasks: List[Dict[str, Any]]) -> List[Tuple[str, bytes, str]]:
+        """Ejecuta el plan. Devuelve [(vault_id, new_wrap, access_level)] de las bóvedas rotadas."""
+        total = len(tasks)
+        if not total: return []
+        new_params = CryptoEngine.current_kdf_params()
+        pending = [t for t in tasks if t["key"] is None]
+        done = ok = total - len(pending)
+        errors = 0
+        new_kek = None
+        try:
+            # En los flujos actuales es un acierto del KekMemo: la identidad ya se envolvió con esta KEK
+            new_kek = SecureBytes(CryptoEngine._derive_for_params(new_params, self.new_password, self.new_salt))
+            self._report(done, total, ok, errors)
+
+            while pending:
+                self._derive_wave(pending)
+                still = []
+                for t in pending:
+                    self._try_open(t)
+                    if t["key"] is not None or not self._remaining(t):
+                        done += 1
+                        if t["key"] is not None: ok += 1
+                        else:
+                            errors += 1
+                            t["error"] = "No se pudo abrir la llave con la password actual"
+                            logger.error(f"Failed to re-wrap vault {t['vault_id']}: {t['error']}")
+                    else:
+                        still.append(t)
+                if len(still) != len(pending): self._report(done, total, ok, errors)
+                pending = still
+
+            kek = new_kek.get_copy()
+            return [(t["vault_id"], CryptoEngine.wrap_with_kek(t["key"], kek, new_params, self.new_salt), t["access_level"])
+                    for t in tasks if t["key"] is not None]
+        finally:
+            if new_kek is not None: new_kek.clear()
+            self.close()
+
+    def _remaining(self, task: Dict[str, Any]) -> List[Tuple]:
+        return [a for a in task["attempts"] if (a[1], a[2]) not in self._keks]
+
+    def _derive_wave(self, pending: List[Dict[str, Any]]) -> None:
+        """Siguiente oleada: KEKs aún no derivadas, por rango de intento, hasta llenar el pool."""
+        queues = [self._remaining(t) for t in pending]
+        wave: List[Tuple] = []
+        for rank in range(max(len(q) for q in queues)):
+            for q in queues:
+                if rank < len(q) and (q[rank][1], q[rank][2]) not in wave:
+                    wave.append((q[rank][1], q[rank][2]))
+                if len(wave) >= self.max_workers: break
+            if len(wave) >= self.max_workers: break
+        for key, kek in zip(wave, self._derive_many(wave)):
+            self._keks[key] = SecureBytes(kek) if kek else None
+        self.derivations += len(wave)
+
+    def _derive_many(self, jobs: List[Tuple]) -> List[Optional[bytes]]:
+        if len(jobs) > 1 and self.max_workers > 1:
+            try:
+                if self._pool is None:
+                    # spawn: el proceso padre tiene hilos (Qt, sync) y fork no es seguro
+                    ctx = multiprocessing.get_context("spawn")
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx)
+                return list(self._pool.map(derive_kek, [p for p, s in jobs], [self.old_password] * len(jobs), [s for p, s in jobs]))
+            except Exception as e:
+                logger.warning(f"[Rotation] Process pool unavailable, deriving in-process: {e}")
+                self.close()
+                self.max_workers = 1
+        return [self._derive_inline(p, s) for p, s in jobs]
+
+    def _derive_inline(self, params: Tuple, salt: bytes) -> Optional[bytes]:
+        try:
+            return CryptoEngine._derive_for_params(params, self.old_password, salt)
+        except Exception:
+            return None
+
+    def _try_open(self, task: Dict[str, Any]) -> None:
+        for blob, params, salt in task["attempts"]:
+            entry = self._keks.get((params, salt))
+            kek = entry.get_copy() if entry is not None else None
+            if kek is None: continue
+            try:
+                task["key"] = CryptoEngine.open_with_kek(blob, kek)
+                return
+            except Exception: continue
+
+    def _report(self, done: int, total: int, ok: int, errors: int) -> None:
+        if self.progress_callback:
+            try: self.progress_callback(done, total, ok, errors)
+            except Exception as e: logger.debug(f"Rotation progress callback failed: {e}")
+
+    def close(self) -> None:
+        """Apaga el pool y borra todas las KEKs derivadas."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        for entry in self._keks.values():
+            if entry is not None: entry.clear()
+        self._keks.clear()
@@ -1,4 +1,5 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import logging
 import base64
@@ -6,13 +7,33 @@ import time
 
 logger = logging.getLogger(__name__)
 
+class _HealthReportingAdapter(HTTPAdapter):
+    """Adapter que informa al monitor de conectividad del resultado de cada petición real al backend."""
+
+    def __init__(self, monitor, base_url, **kwargs):
+        self.monitor = monitor
+        self.base_url = base_url
+        super().__init__(**kwargs)
+
+    def send(self, request, *args, **kwargs):
+        ours = self.monitor is not None and request.url.startswith(self.base_url)
+        try:
+            response = super().send(request, *args, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if ours: self.monitor.report_failure(e)
+            raise
+        if ours: self.monitor.report_response(response.status_code, backend="/rest/v1/" in request.url)
+        return response
+
 class RemoteStorageClient:
     """Cliente para intercomunicación con el nodo central (Supabase)."""
     
-    def __init__(self, supabase_url, supabase_key):
+    def __init__(self, supabase_url, supabase_key, pool_size=8, monitor=None):
         self.supabase_url = supabase_url.rstrip("/")
         self.supabase_key = supabase_key
+        self.monitor = monitor
         self.session = requests.Session()
+        self.configure_pool(pool_size)
         self.headers = {}
         self._refresh_identity_headers(None, None, None, "user")
 
@@ -28,9 +49,16 @@ class RemoteStorageClient:
         }
         self.session.headers.update(self.headers)
 
+    def configure_pool(self, pool_size):
+        """Pool keep-alive dimensionado para los workers de sync (pool_block: nunca abre conexiones extra)."""
+        adapter = _HealthReportingAdapter(self.monitor, self.supabase_url, pool_connections=2,
+                                          pool_maxsize=max(1, int(pool_size)), pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
     def check_internet(self):
         try:
-            requests.head(self.supabase_url, timeout=2.0)
+            self.session.head(self.supabase_url, timeout=2.0)
             return True
         except:
             return False
@@ -61,6 +89,17 @@ class RemoteStorageClient:
             raise Exception(f"HTTP {r.status_code}: {r.text}")
         return r.json()
 
+    def count_records(self, table, params="", count="exact"):
+        """
+        COUNT(*) en el servidor sin descargar filas. count: exact | planned | estimated
+        (estimated es exacto en tablas pequeñas y usa la estimación del planificador en las grandes).
+        """
+        url = f"{self.supabase_url}/rest/v1/{table}?select=*&limit=1" + (f"&{params}" if params else "")
+        r = self.session.get(url, headers={"Prefer": f"count={count}"})
+        if r.status_code not in (200, 206):
+            raise Exception(f"HTTP {r.status_code}: {r.text}")
+        return int(r.headers.get("Content-Range", "*/0").rsplit("/", 1)[1])
+
     def delete_record(self, table, record_id):
         url = f"{self.supabase_url}/rest/v1/{table}?id=eq.{record_id}"
         r = self.session.delete(url)
@@ -68,6 +107,24 @@ class RemoteStorageClient:
             logger.error(f"Error deleting record {record_id}: {r.text}")
         return r
 
+    def delete_records(self, table, record_ids):
+        """Borrado en lote: DELETE ?id=in.(...). Lanza excepción si el servidor rechaza el lote."""
+        if not record_ids: return None
+        ids = ",".join(f'"{rid}"' for rid in record_ids)
+        url = f"{self.supabase_url}/rest/v1/{table}?id=in.({ids})"
+        r = self.session.delete(url)
+        if r.status_code not in (200, 204):
+            raise Exception(f"HTTP {r.status_code}: {r.text}")
+        return r
+
+    def call_rpc(self, function, params, timeout=10):
+        """POST /rest/v1/rpc/<function>. Devuelve el JSON de la función (o None si no devuelve nada)."""
+        url = f"{self.supabase_url}/rest/v1/rpc/{function}"
+        r = self.session.post(url, data=json.dumps(params), timeout=timeout)
+        if r.status_code not in (200, 204):
+            raise Exception(f"HTTP {r.status_code}: {r.text}")
+        return r.json() if r.content else None
+
     def get_public_ip(self):
         try:
             return self.session.get("https://api.ipify.org", timeout=3).text
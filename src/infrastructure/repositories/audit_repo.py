@@ -1,36 +1,190 @@
 import time
 import socket
+import sqlite3
+import atexit
 import logging
+import threading
+import weakref
 from typing import List, Dict, Any, Optional
 from src.infrastructure.database.db_manager import DBManager
+from src.infrastructure.storage.audit_archive import AuditArchive, RetentionPolicy
+from src.domain.services.audit_timeline_service import classify_action, is_critical_event
 
 logger = logging.getLogger(__name__)
 
+_INSERT = ("INSERT INTO security_audit (timestamp, user_name, action, service, status, details, device_info, synced, user_id, "
+           "category, critical) VALUES (?,?,?,?,?,?,?,0,?,?,?)")
+
+# Búsqueda libre del visor: mismos campos que mostraba el filtro en memoria, fecha incluida
+_SEARCH = ("(user_name LIKE :q OR action LIKE :q OR service LIKE :q OR details LIKE :q OR status LIKE :q "
+           "OR device_info LIKE :q OR strftime('%Y-%m-%d %H:%M:%S', timestamp, 'unixepoch', 'localtime') LIKE :q)")
+
+# Repositorios vivos: al salir del proceso se vacían sus buffers
+_live_repos: "weakref.WeakSet[AuditRepository]" = weakref.WeakSet()
+
+
+def _flush_all() -> None:
+    for repo in list(_live_repos):
+        repo.close()
+
+
+atexit.register(_flush_all)
+
+
 class AuditRepository:
     """
     Handles persistence of security audit logs.
+    Los eventos se acumulan en memoria y un hilo de fondo los escribe en una sola
+    transacción por lote (por tamaño o por antigüedad). Los eventos críticos se
+    escriben al momento, después de vaciar el buffer para conservar el orden.
+    Los lotes se escriben por una conexión propia: una transacción abierta en la
+    conexión compartida nunca se confirma a medias desde el hilo escritor.
     """
+    FLUSH_SIZE = 64           # eventos por lote
+    FLUSH_INTERVAL = 2.0      # segundos máximos en memoria
+    # Eventos de seguridad que no pueden perderse si el proceso muere: escritura inmediata
+    CRITICAL_ACTIONS = frozenset({
+        "LOGIN_FAIL", "LOGIN_BLOCKED", "KICK", "LOGOUT", "CHANGE PASSWORD", "CAMBIO_PASSWORD",
+        "ADMIN_RESET_PASSWORD", "REGEN_2FA", "KDF_MIGRATION", "LOCAL_RESTORE",
+    })
+    CRITICAL_STATUSES = frozenset({"FAILURE", "FAILED"})
+
+    _device: Optional[str] = None
+
     def __init__(self, db_manager: DBManager) -> None:
         self.db = db_manager
+        self._buffer: List[tuple] = []
+        self._oldest = 0.0
+        self._lock = threading.Lock()        # buffer
+        self._write_lock = threading.Lock()  # un único escritor: conserva el orden entre lotes
+        self._wakeup = threading.Condition(self._lock)
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+        self._writer: Optional[sqlite3.Connection] = None   # con self._write_lock tomado
+        self._writer_path = None
+        _live_repos.add(self)
+        # Cerrar la base sin vaciar el buffer perdía los eventos pendientes
+        db_manager.on_close(self.close)
+
+    @classmethod
+    def device_name(cls) -> str:
+        """Hostname resuelto una vez por proceso (gethostname puede tardar en algunas redes)."""
+        if cls._device is None:
+            try: cls._device = socket.gethostname()
+            except Exception: cls._device = "unknown"
+        return cls._device
 
     def log_event(self, user_name: str, user_id: Optional[str], action: str, 
-                  service: str = "-", status: str = "SUCCESS", details: str = "-", **kwargs: Any) -> None:
+                  service: str = "-", status: str = "SUCCESS", details: str = "-",
+                  sync: Optional[bool] = None, **kwargs: Any) -> None:
+        """
+        Encola el evento; sync=True (o una acción/estado crítico) lo escribe antes de
+        volver. El timestamp se toma aquí, no al vaciar el buffer.
+        """
         try:
-            device = socket.gethostname()
             final_details = details
             target = kwargs.get("target_user", "-")
             if target != "-":
                 final_details = f"{details} | Target: {target}"
-            
-            self.db.execute(
-                "INSERT INTO security_audit (timestamp, user_name, action, service, status, details, device_info, synced, user_id) VALUES (?,?,?,?,?,?,?,0,?)",
-                (int(time.time()), user_name, action, service, status, final_details, device, user_id)
-            )
-            self.db.commit()
+            row = (int(time.time()), user_name, action, service, status, final_details, self.device_name(), user_id,
+                   classify_action(action), int(is_critical_event(action, status)))
         except Exception as e:
             logger.error(f"Error logging event '{action}' for user '{user_name}': {e}")
+            return
+
+        if sync is None:
+            sync = action in self.CRITICAL_ACTIONS or str(status).upper() in self.CRITICAL_STATUSES
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) == 1: self._oldest = time.monotonic()
+            full = len(self._buffer) >= self.FLUSH_SIZE
+            if not sync:
+                self._ensure_flusher()
+                # Despertar al hilo si estaba esperando sin plazo (buffer vacío) o si el lote está lleno
+                if full or len(self._buffer) == 1: self._wakeup.notify()
+                return
+        self.flush()
+
+    def _ensure_flusher(self) -> None:
+        # Con self._lock tomado
+        if self._flusher is None or not self._flusher.is_alive():
+            self._closed = False
+            self._flusher = threading.Thread(target=self._run_flusher, name="audit-flusher", daemon=True)
+            self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        while True:
+            with self._lock:
+                while not self._closed:
+                    if len(self._buffer) >= self.FLUSH_SIZE: break
+                    if self._buffer:
+                        remaining = self.FLUSH_INTERVAL - (time.monotonic() - self._oldest)
+                        if remaining <= 0: break
+                        self._wakeup.wait(remaining)
+                    else:
+                        self._wakeup.wait()
+                if self._closed: return
+            if not self.flush() and self.pending_count():
+                # Fallo de escritura (base cerrada o bloqueada): reintentar en el siguiente intervalo
+                with self._lock:
+                    if not self._closed: self._wakeup.wait(self.FLUSH_INTERVAL)
+
+    def _writer_conn(self) -> sqlite3.Connection:
+        # Con self._write_lock tomado. Se reabre si la base activa cambió (cambio de usuario, restauración)
+        if self._writer is not None and self._writer_path != self.db.db_path:
+            self._close_writer()
+        if self._writer is None:
+            if self.db.conn is None or self.db.db_path is None:
+                raise RuntimeError("Database connection not initialized")
+            self._writer = sqlite3.connect(str(self.db.db_path), timeout=30, check_same_thread=False)
+            self._writer.execute("PRAGMA journal_mode=WAL;")
+            self._writer.execute("PRAGMA synchronous=NORMAL;")
+            self._writer_path = self.db.db_path
+        return self._writer
+
+    def _close_writer(self) -> None:
+        if self._writer is None: return
+        try: self._writer.close()
+        except sqlite3.Error as e:
+            logger.debug(f"Error closing audit writer connection: {e}")
+        self._writer, self._writer_path = None, None
+
+    def flush(self) -> int:
+        """Escribe todo lo pendiente en una transacción. Devuelve cuántos eventos se escribieron."""
+        with self._write_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch: return 0
+            try:
+                conn = self._writer_conn()
+                with conn:
+                    conn.executemany(_INSERT, batch)
+                return len(batch)
+            except Exception as e:
+                logger.error(f"Error writing {len(batch)} audit events: {e}")
+                # Reencolar delante de lo nuevo: el orden se mantiene y el siguiente ciclo reintenta
+                with self._lock:
+                    self._buffer[:0] = batch
+                return 0
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def close(self) -> None:
+        """Vacía el buffer y detiene el hilo (cierre de sesión, bloqueo, cambio de base, salida)."""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify_all()
+            flusher, self._flusher = self._flusher, None
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join(timeout=5)
+        self.flush()
+        with self._write_lock:
+            self._close_writer()
 
     def get_logs(self, user_name: str, role: str, limit: int = 500) -> List[Dict[str, Any]]:
+        self.flush()
         try:
             if str(role).lower() == "admin":
                 query = "SELECT * FROM security_audit ORDER BY timestamp DESC LIMIT ?"
@@ -46,7 +200,67 @@ class AuditRepository:
             logger.error(f"Error reading logs for user '{user_name}': {e}")
             return []
 
+    PAGE_SIZE = 100
+
+    @staticmethod
+    def _timeline_filter(user_name: str, role: str, category: Optional[str], search: Optional[str]):
+        clauses: List[str] = []
+        params: Dict[str, Any] = {}
+        if str(role).lower() != "admin":
+            clauses.append("UPPER(user_name) = :user")
+            params["user"] = str(user_name).upper()
+        if category:
+            clauses.append("category = :category")
+            params["category"] = category
+        if search:
+            clauses.append(_SEARCH)
+            params["q"] = f"%{search}%"
+        return clauses, params
+
+    def get_page(self, user_name: str, role: str, category: Optional[str] = None, search: Optional[str] = None,
+                 cursor: Optional[tuple] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Una página de la línea de tiempo (más recientes primero), keyset por (timestamp, id):
+        el coste no depende de cuánto historial haya. cursor: el "next" de la página anterior.
+        Devuelve {"logs": [...], "next": cursor o None}.
+        """
+        self.flush()
+        limit = limit or self.PAGE_SIZE
+        clauses, params = self._timeline_filter(user_name, role, category, search)
+        if cursor:
+            clauses.append("(timestamp, id) < (:ts, :id)")
+            params["ts"], params["id"] = int(cursor[0]), int(cursor[1])
+        params["limit"] = limit
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        try:
+            cur = self.db.execute(f"SELECT * FROM security_audit {where}ORDER BY timestamp DESC, id DESC LIMIT :limit", params)
+            columns = [d[0] for d in cur.description]
+            logs = [dict(zip(columns, row)) for row in cur]
+        except Exception as e:
+            logger.error(f"Error reading audit timeline for user '{user_name}': {e}")
+            return {"logs": [], "next": None}
+        nxt = (logs[-1]["timestamp"], logs[-1]["id"]) if len(logs) == limit else None
+        return {"logs": logs, "next": nxt}
+
+    def get_stats(self, user_name: str, role: str, category: Optional[str] = None,
+                  search: Optional[str] = None) -> Dict[str, int]:
+        """
+        Totales del visor (eventos, críticos, usuarios) agregados en SQLite, sin materializar filas.
+        critical se fija al escribir: se suma la columna en lugar de evaluar un LIKE por fila.
+        """
+        self.flush()
+        clauses, params = self._timeline_filter(user_name, role, category, search)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        try:
+            row = self.db.execute("SELECT COUNT(*), COALESCE(SUM(critical), 0), COUNT(DISTINCT user_name) "
+                                  f"FROM security_audit {where}", params).fetchone()
+            return {"total": row[0], "critical": row[1], "users": row[2]}
+        except Exception as e:
+            logger.error(f"Error computing audit stats: {e}")
+            return {"total": 0, "critical": 0, "users": 0}
+
     def get_count(self) -> int:
+        self.flush()
         try:
             cursor = self.db.execute("SELECT COUNT(*) FROM security_audit")
             row = cursor.fetchone()
@@ -55,17 +269,71 @@ class AuditRepository:
             logger.debug(f"Error getting audit count: {e}")
             return 0
 
-    def get_pending_logs(self) -> List[tuple]:
+    def get_pending_logs(self, limit: Optional[int] = None) -> List[tuple]:
+        """Pendientes de subir en orden de id (índice parcial idx_audit_pending); limit: tamaño del lote."""
+        self.flush()
         try:
-            cursor = self.db.execute("SELECT * FROM security_audit WHERE synced = 0")
+            query = "SELECT * FROM security_audit WHERE synced = 0 ORDER BY id"
+            cursor = self.db.execute(query + " LIMIT ?", (limit,)) if limit else self.db.execute(query)
             return cursor.fetchall()
         except Exception as e:
             logger.error(f"Error fetching pending audit logs: {e}")
             return []
 
-    def mark_as_synced(self) -> None:
+    def mark_as_synced(self, up_to_id: Optional[int] = None, from_id: Optional[int] = None) -> None:
+        """
+        [from_id, up_to_id]: rango de ids del lote subido. Un lote son los primeros pendientes
+        por id, así que el rango no alcanza nada escrito durante la subida.
+        """
         try:
-            self.db.execute("UPDATE security_audit SET synced = 1 WHERE synced = 0")
+            if up_to_id is None:
+                self.db.execute("UPDATE security_audit SET synced = 1 WHERE synced = 0")
+            else:
+                self.db.execute("UPDATE security_audit SET synced = 1 WHERE synced = 0 AND id BETWEEN ? AND ?",
+                                (from_id if from_id is not None else 0, up_to_id))
             self.db.commit()
         except Exception as e:
             logger.error(f"Error marking audit logs as synced: {e}")
+
+    # --- RETENCIÓN ---
+    def apply_retention(self, policy: RetentionPolicy, archive: AuditArchive, now: Optional[int] = None) -> Dict[str, int]:
+        """
+        Mueve al archivo encadenado los eventos ya sincronizados que superan la política
+        (hot_days; noise_days para latidos) y los borra de security_audit, un segmento
+        por lote. Lo pendiente de subir nunca se archiva.
+        """
+        self.flush()
+        now = int(now if now is not None else time.time())
+        hot_cutoff = now - policy.hot_days * 86400
+        noise_cutoff = max(hot_cutoff, now - policy.noise_days * 86400)
+        stats = {"archived": 0, "segments": 0, "pruned": 0}
+        with self._write_lock:
+            # Un corte entre el segmento y el DELETE deja esas filas en las dos partes: se completa aquí
+            leftover = archive.last_segment_ids()
+            if leftover:
+                self._delete_ids(leftover)
+            noise = ",".join("?" * len(policy.noise_actions)) or "NULL"
+            query = (f"SELECT * FROM security_audit WHERE timestamp < ? AND synced = 1 "
+                     f"AND (timestamp < ? OR action IN ({noise})) AND id > ? ORDER BY id LIMIT ?")
+            last_id = 0
+            while True:
+                cur = self.db.execute(query, (noise_cutoff, hot_cutoff, *policy.noise_actions, last_id, policy.segment_rows))
+                columns = [d[0] for d in cur.description]
+                rows = [dict(zip(columns, r)) for r in cur]
+                if not rows: break
+                archive.append(rows)
+                self._delete_ids([r["id"] for r in rows])
+                last_id = rows[-1]["id"]
+                stats["archived"] += len(rows)
+                stats["segments"] += 1
+                if len(rows) < policy.segment_rows: break
+        if policy.archive_days:
+            stats["pruned"] = archive.prune(now - policy.archive_days * 86400)
+        return stats
+
+    def _delete_ids(self, ids: List[int]) -> None:
+        # Con self._write_lock tomado; en trozos por el límite de parámetros de SQLite
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            self.db.execute(f"DELETE FROM security_audit WHERE id IN ({','.join('?' * len(chunk))})", tuple(chunk))
+        self.db.commit()
@@ -1,7 +1,7 @@
 import sqlite3
 import time
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterator
 from src.infrastructure.database.db_manager import DBManager
 
 logger = logging.getLogger(__name__)
@@ -12,41 +12,63 @@ class SecretRepository:
     """
     def __init__(self, db_manager: DBManager) -> None:
         self.db = db_manager
+        self._listeners: List[Callable[[str, List[Any]], None]] = []
+
+    # --- CHANGE EVENTS ---
+    # kind: "upsert" (ids cambiaron o aparecieron), "delete" (ids eliminados físicamente),
+    # "reset" (cambio masivo: recargar todo). Los listeners pueden ejecutarse en hilos de sync.
+    def add_change_listener(self, callback: Callable[[str, List[Any]], None]) -> None:
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_change_listener(self, callback: Callable[[str, List[Any]], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def notify_change(self, kind: str, ids: Optional[List[Any]] = None) -> None:
+        for cb in list(self._listeners):
+            try:
+                cb(kind, list(ids or []))
+            except Exception as e:
+                logger.debug(f"Secret change listener failed: {e}")
 
     def add_secret(self, service: str, username: str, encrypted_secret: bytes, 
                    nonce: bytes, integrity: str, notes: Optional[str], 
                    is_private: int, owner_name: str, owner_id: Optional[str], 
-                   vault_id: Optional[str], version: Optional[int] = 1) -> Optional[int]:
+                   vault_id: Optional[str], version: Optional[int] = 1, key_type: Optional[str] = None) -> Optional[int]:
         try:
             # If version is None, default to 1
             v_val = version if version is not None else 1
             cursor = self.db.execute(
                 """INSERT OR REPLACE INTO secrets 
-                (service, username, secret, nonce, updated_at, deleted, owner_name, owner_id, integrity_hash, notes, is_private, vault_id, version) 
-                VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?)""",
+                (service, username, secret, nonce, updated_at, deleted, owner_name, owner_id, integrity_hash, notes, is_private, vault_id, version, key_type) 
+                VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?, ?)""",
                 (service, username, sqlite3.Binary(encrypted_secret), sqlite3.Binary(nonce), int(time.time()), 
-                owner_name, owner_id, integrity, notes, int(is_private), vault_id, v_val)
+                owner_name, owner_id, integrity, notes, int(is_private), vault_id, v_val, key_type)
             )
             self.db.commit()
+            self.notify_change("upsert", [cursor.lastrowid])
             return cursor.lastrowid
         except Exception as e:
             logger.error(f"Error adding secret for service '{service}': {e}")
             return None
 
-    def batch_add_secrets(self, records_data: List[tuple]) -> bool:
+    def batch_add_secrets(self, records_data: List[tuple], notify: bool = True) -> bool:
         """
         Inserta múltiples registros en una sola transacción para máximo rendimiento.
-        records_data: Lista de tuplas (service, username, secret_blob, nonce_blob, updated_at, owner_name, owner_id, integrity, notes, is_private, vault_id)
+        records_data: Lista de tuplas (service, username, secret_blob, nonce_blob, updated_at, owner_name, owner_id, integrity, notes, is_private, vault_id, version, key_type)
+        notify=False: el llamador emite un único "reset" al terminar (importación por bloques).
         """
         try:
             self.db.execute("BEGIN TRANSACTION")
             self.db.conn.executemany(
                 """INSERT OR REPLACE INTO secrets 
-                (service, username, secret, nonce, updated_at, deleted, owner_name, owner_id, integrity_hash, notes, is_private, vault_id, version) 
-                VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?)""",
+                (service, username, secret, nonce, updated_at, deleted, owner_name, owner_id, integrity_hash, notes, is_private, vault_id, version, key_type) 
+                VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?, ?)""",
                 records_data
             )
             self.db.commit()
+            if notify: self.notify_change("reset")
             return True
         except Exception as e:
             logger.error(f"Error in batch_add_secrets: {e}")
@@ -57,7 +79,8 @@ class SecretRepository:
 
     def update_secret(self, sid: int, service: str, username: str, 
                       encrypted_secret: bytes, nonce: bytes, integrity: str, 
-                      notes: Optional[str], is_private: int, version: Optional[int] = None) -> None:
+                      notes: Optional[str], is_private: int, version: Optional[int] = None,
+                      key_type: Optional[str] = None) -> None:
         try:
             if version is not None:
                 # Use provided version (useful for sync from cloud)
@@ -69,15 +92,16 @@ class SecretRepository:
                 v_param = None
 
             query = f"""UPDATE secrets SET 
-                service=?, username=?, secret=?, nonce=?, updated_at=?, integrity_hash=?, notes=?, is_private=?, synced=0, {v_query} 
+                service=?, username=?, secret=?, nonce=?, updated_at=?, integrity_hash=?, notes=?, is_private=?, key_type=?, synced=0, {v_query} 
                 WHERE id=?"""
             
-            params = [service, username, sqlite3.Binary(encrypted_secret), sqlite3.Binary(nonce), int(time.time()), integrity, notes, int(is_private)]
+            params = [service, username, sqlite3.Binary(encrypted_secret), sqlite3.Binary(nonce), int(time.time()), integrity, notes, int(is_private), key_type]
             if v_param is not None: params.append(v_param)
             params.append(sid)
 
             self.db.execute(query, tuple(params))
             self.db.commit()
+            self.notify_change("upsert", [sid])
         except Exception as e:
             logger.error(f"Error updating secret ID {sid}: {e}")
 
@@ -96,10 +120,53 @@ class SecretRepository:
             logger.error(f"Error fetching secrets for user '{current_user}': {e}")
             return []
 
+    # Columnas de listado: todo excepto el ciphertext (secret/nonce)
+    METADATA_COLUMNS = ("id", "service", "username", "notes", "updated_at", "deleted", "owner_name", "synced",
+                        "is_private", "vault_id", "key_type", "cloud_id", "owner_id", "version", "integrity_hash")
+
+    def get_metadata(self, current_user: str, include_deleted: bool = False, ids: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Same visibility rules as get_all(), without reading secret/nonce. ids limits the rows;
+        they are queried in chunks to stay below SQLite's host-parameter limit.
+        """
+        try:
+            query = f"SELECT {', '.join(self.METADATA_COLUMNS)} FROM secrets WHERE (is_private = 0 OR UPPER(owner_name) = ?)"
+            params = [str(current_user).upper()]
+            if not include_deleted:
+                query += " AND deleted = 0"
+            if ids is None:
+                cursor = self.db.execute(query, tuple(params))
+                return [dict(zip(self.METADATA_COLUMNS, row)) for row in cursor]
+            ids = list(ids)
+            result = []
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                cursor = self.db.execute(f"{query} AND id IN ({', '.join(['?'] * len(chunk))})", tuple(params + chunk))
+                result.extend(dict(zip(self.METADATA_COLUMNS, row)) for row in cursor)
+            return result
+        except Exception as e:
+            logger.error(f"Error fetching secret metadata for user '{current_user}': {e}")
+            return []
+
+    def get_by_id(self, current_user: str, sid: int) -> Optional[Dict[str, Any]]:
+        """Single visible row including ciphertext (used for on-demand reveal)."""
+        try:
+            cursor = self.db.execute(
+                "SELECT * FROM secrets WHERE id = ? AND (is_private = 0 OR UPPER(owner_name) = ?)",
+                (sid, str(current_user).upper())
+            )
+            row = cursor.fetchone()
+            if not row: return None
+            return dict(zip([d[0] for d in cursor.description], row))
+        except Exception as e:
+            logger.error(f"Error fetching secret ID {sid}: {e}")
+            return None
+
     def delete_secret(self, sid: int) -> None:
         try:
             self.db.execute("UPDATE secrets SET deleted=1, synced=0 WHERE id=?", (sid,))
             self.db.commit()
+            self.notify_change("upsert", [sid])
         except Exception as e:
             logger.error(f"Error marking secret ID {sid} as deleted: {e}")
 
@@ -107,6 +174,7 @@ class SecretRepository:
         try:
             self.db.execute("DELETE FROM secrets WHERE id=?", (sid,))
             self.db.commit()
+            self.notify_change("delete", [sid])
         except Exception as e:
             logger.error(f"Error permanently deleting secret ID {sid}: {e}")
 
@@ -114,6 +182,7 @@ class SecretRepository:
         try:
             self.db.execute("UPDATE secrets SET deleted=0, synced=0 WHERE id=?", (sid,))
             self.db.commit()
+            self.notify_change("upsert", [sid])
         except Exception as e:
             logger.error(f"Error restoring secret ID {sid}: {e}")
 
@@ -125,6 +194,110 @@ class SecretRepository:
             logger.debug(f"Error getting service name for secret ID {sid}: {e}")
             return "Unknown"
 
+    def set_key_hints(self, hints: List[tuple]) -> None:
+        """
+        Backfills key_type for legacy rows. hints: list of (key_type, id).
+        Metadata only: does not touch synced/version, the ciphertext is unchanged.
+        """
+        if not hints: return
+        try:
+            self.db.conn.executemany("UPDATE secrets SET key_type=? WHERE id=?", hints)
+            self.db.commit()
+        except Exception as e:
+            logger.debug(f"Error backfilling key hints: {e}")
+
+    def get_version(self, sid: int) -> Optional[str]:
+        try:
+            row = self.db.execute("SELECT version FROM secrets WHERE id=?", (sid,)).fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            logger.debug(f"Error getting version for secret ID {sid}: {e}")
+            return None
+
+    def get_ids_by_integrity(self, integrity_hashes: List[str]) -> Dict[str, tuple]:
+        """
+        Maps integrity_hash -> (id, version) for freshly inserted rows.
+        Queried in chunks to stay below SQLite's host-parameter limit.
+        """
+        result: Dict[str, tuple] = {}
+        try:
+            for i in range(0, len(integrity_hashes), 500):
+                chunk = integrity_hashes[i:i + 500]
+                placeholders = ", ".join(["?"] * len(chunk))
+                cursor = self.db.execute(
+                    f"SELECT integrity_hash, id, version FROM secrets WHERE integrity_hash IN ({placeholders})",
+                    tuple(chunk)
+                )
+                for integrity, sid, version in cursor:
+                    result[integrity] = (sid, version)
+        except Exception as e:
+            logger.error(f"Error resolving ids by integrity hash: {e}")
+        return result
+
+    def get_sync_state(self, cloud_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Maps cloud_id -> {id, version, updated_at} for the given cloud ids only (no blobs),
+        so a delta pull compares just the rows the server reported as changed.
+        """
+        result: Dict[str, Dict[str, Any]] = {}
+        try:
+            for i in range(0, len(cloud_ids), 500):
+                chunk = cloud_ids[i:i + 500]
+                placeholders = ", ".join(["?"] * len(chunk))
+                cursor = self.db.execute(
+                    f"SELECT cloud_id, id, version, updated_at FROM secrets WHERE cloud_id IN ({placeholders})",
+                    tuple(chunk)
+                )
+                for cloud_id, sid, version, updated_at in cursor:
+                    result[cloud_id] = {"id": sid, "version": version, "updated_at": updated_at}
+        except Exception as e:
+            logger.error(f"Error resolving local sync state: {e}")
+        return result
+
+    def get_pending_cloud_ids(self) -> set:
+        """cloud_ids with local work not yet pushed: unsynced rows plus offline deletions queued in pending_deletes."""
+        try:
+            rows = self.db.execute(
+                "SELECT cloud_id FROM secrets WHERE (synced = 0 OR synced IS NULL) AND cloud_id IS NOT NULL "
+                "UNION SELECT cloud_id FROM pending_deletes"
+            ).fetchall()
+            return {r[0] for r in rows if r[0]}
+        except Exception as e:
+            logger.error(f"Error reading pending cloud ids: {e}")
+            return set()
+
+    def assign_cloud_ids(self, pairs: List[tuple]) -> None:
+        """pairs: list of (cloud_id, id). Single transaction for a whole push batch."""
+        if not pairs: return
+        try:
+            self.db.conn.executemany("UPDATE secrets SET cloud_id=? WHERE id=?", pairs)
+            self.db.commit()
+        except Exception as e:
+            logger.error(f"Error assigning cloud ids: {e}")
+            raise
+
+    def apply_push_results(self, synced: List[tuple], deleted_ids: List[Any]) -> None:
+        """
+        Marks uploaded rows as synced and drops rows whose deletion reached the cloud, in one transaction.
+        synced: list of (id, version) as pushed. A row edited, deleted or restored while its page was
+        in flight no longer matches and stays pending for the next push.
+        """
+        if not synced and not deleted_ids: return
+        synced_ids = [sid for sid, _ in synced]
+        try:
+            self.db.execute("BEGIN TRANSACTION")
+            self.db.conn.executemany("UPDATE secrets SET synced=1 WHERE id=? AND version IS ? AND deleted=0", synced)
+            self.db.conn.executemany("DELETE FROM secrets WHERE id=? AND deleted=1", [(i,) for i in deleted_ids])
+            self.db.commit()
+        except Exception as e:
+            logger.error(f"Error applying push results: {e}")
+            try: self.db.execute("ROLLBACK")
+            except Exception as e2:
+                logger.debug(f"Rollback failed: {e2}")
+            raise
+        if synced_ids: self.notify_change("upsert", synced_ids)
+        if deleted_ids: self.notify_change("delete", deleted_ids)
+
     def check_exists(self, service_name: str) -> bool:
         try:
             target = str(service_name).strip().lower()
@@ -148,14 +321,14 @@ class SecretRepository:
             user_clean = str(current_user).upper()
             
             base_query = "SELECT * FROM secrets"
-            where_clause = " WHERE UPPER(owner_name) = ?" if only_mine else " WHERE is_private = 0 OR UPPER(owner_name) = ?"
+            where_clause = " WHERE UPPER(owner_name) = ?" if only_mine else " WHERE (is_private = 0 OR UPPER(owner_name) = ?)"
             params = [user_clean]
             
             query = base_query + where_clause
             
-            # Pagination Logic
+            # Pagination Logic (prefer iter_encrypted: keyset, no OFFSET rescans)
             if limit is not None:
-                query += " LIMIT ? OFFSET ?"
+                query += " ORDER BY id LIMIT ? OFFSET ?"
                 params.extend([limit, offset])
             
             cursor = self.db.execute(query, tuple(params))
@@ -169,6 +342,43 @@ class SecretRepository:
             logger.error(f"Error fetching encrypted secrets for user '{current_user}': {e}")
             return []
 
+    def _encrypted_scope(self, current_user: str, only_mine: bool, unsynced_only: bool) -> tuple:
+        where = "UPPER(owner_name) = ?" if only_mine else "(is_private = 0 OR UPPER(owner_name) = ?)"
+        if unsynced_only: where += " AND (synced = 0 OR synced IS NULL)"
+        return where, [str(current_user).upper()]
+
+    def count_encrypted(self, current_user: str, only_mine: bool = False, unsynced_only: bool = False) -> int:
+        try:
+            where, params = self._encrypted_scope(current_user, only_mine, unsynced_only)
+            row = self.db.execute(f"SELECT COUNT(*) FROM secrets WHERE {where}", tuple(params)).fetchone()
+            return row[0] if row else 0
+        except Exception as e:
+            logger.error(f"Error counting encrypted secrets for user '{current_user}': {e}")
+            return 0
+
+    def iter_encrypted(self, current_user: str, only_mine: bool = False, after_id: int = 0,
+                       batch: int = 500, unsynced_only: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Keyset pagination over encrypted rows (WHERE id > last ORDER BY id LIMIT batch).
+        Yields one page at a time; each page is a fresh query, so callers may update or
+        delete rows of the current page between iterations without skipping or repeating rows.
+        """
+        where, base_params = self._encrypted_scope(current_user, only_mine, unsynced_only)
+        query = f"SELECT * FROM secrets WHERE {where} AND id > ? ORDER BY id LIMIT ?"
+        last_id = after_id
+        while True:
+            try:
+                cursor = self.db.execute(query, tuple(base_params + [last_id, batch]))
+                cols = [d[0] for d in cursor.description]
+                page = [dict(zip(cols, row)) for row in cursor]
+            except Exception as e:
+                logger.error(f"Error paging encrypted secrets after id {last_id}: {e}")
+                return
+            if not page: return
+            last_id = page[-1]["id"]
+            yield page
+            if len(page) < batch: return
+
     def add_encrypted_direct(self, data_dict: Dict[str, Any]) -> None:
         try:
             cols = ", ".join(data_dict.keys())
@@ -180,8 +390,9 @@ class SecretRepository:
                 else:
                     vals.append(v)
             
-            self.db.execute(f"INSERT OR REPLACE INTO secrets ({cols}) VALUES ({placeholders})", tuple(vals))
+            cursor = self.db.execute(f"INSERT OR REPLACE INTO secrets ({cols}) VALUES ({placeholders})", tuple(vals))
             self.db.commit()
+            self.notify_change("upsert", [data_dict.get("id") or cursor.lastrowid])
         except Exception as e:
             logger.error(f"Error in direct encrypted insertion: {e}")
 
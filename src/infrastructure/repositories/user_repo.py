@@ -1,6 +1,6 @@
 import sqlite3
 import logging
-from typing import Optional, Any, Dict, List
+from typing import Optional, Any, Dict, List, Tuple
 from src.infrastructure.database.db_manager import DBManager
 
 logger = logging.getLogger(__name__)
@@ -125,6 +125,29 @@ class UserRepository:
             logger.error(f"Error saving vault access for '{vault_id}': {e}")
             return False
 
+    def apply_key_rotation(self, username: str, profile_fields: Dict[str, Any],
+                           vault_rows: List[Tuple[str, bytes, str]], synced: int = 1) -> None:
+        """Persists a password rotation (profile columns + every re-wrapped vault access) in one transaction."""
+        import time
+        now = int(time.time())
+        try:
+            self.db.execute("BEGIN TRANSACTION")
+            self.db.conn.executemany(
+                "INSERT OR REPLACE INTO vault_access (vault_id, wrapped_master_key, access_level, updated_at, synced) VALUES (?, ?, ?, ?, ?)",
+                [(v_id, sqlite3.Binary(w_key), lvl, now, synced) for v_id, w_key, lvl in vault_rows]
+            )
+            if profile_fields:
+                cols = ", ".join(f"{c} = ?" for c in profile_fields)
+                vals = [sqlite3.Binary(v) if isinstance(v, (bytes, bytearray)) else v for v in profile_fields.values()]
+                self.db.execute(f"UPDATE users SET {cols} WHERE UPPER(username) = ?", (*vals, str(username).upper()))
+            self.db.commit()
+        except Exception as e:
+            logger.error(f"Error applying key rotation for '{username}': {e}")
+            try: self.db.execute("ROLLBACK")
+            except Exception as e2:
+                logger.debug(f"Rollback failed: {e2}")
+            raise
+
     def get_vault_access(self, vault_id: str) -> Optional[Dict[str, Any]]:
         """Retrieves access details for a specific vault."""
         try:
@@ -2,28 +2,36 @@ import os
 import sqlite3
 import re
 import time
+import json
+import threading
 import logging
 import base64
 import hashlib
 import shutil
-from datetime import datetime
+from contextlib import contextmanager
 from pathlib import Path
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
-from typing import Optional, Any, Dict, List, Tuple
+from typing import Optional, Any, Callable, Dict, Iterable, List, Tuple, Iterator
+from concurrent.futures import ThreadPoolExecutor
 
 # Infrastructure imports
 from src.infrastructure.database.db_manager import DBManager
 from src.infrastructure.repositories.secret_repo import SecretRepository
 from src.infrastructure.repositories.user_repo import UserRepository
 from src.infrastructure.repositories.audit_repo import AuditRepository
-from src.infrastructure.crypto_engine import CryptoEngine
+from src.infrastructure.crypto_engine import CryptoEngine, KekMemo
+from src.infrastructure.key_rotation import KeyRotationEngine
 
 # Domain imports
 from src.domain.services.session_service import SessionService
 from src.domain.services.security_service import SecurityService
+from src.domain.services.import_service import ColumnMapper, chunked
+from src.infrastructure.storage.incremental_backup import IncrementalBackupStore
+from src.infrastructure.storage.audit_archive import AuditArchive, RetentionPolicy
+from src.infrastructure.crypto.export_archive import ArchiveReader, ArchiveWriter, ArchiveError, DEFAULT_CHUNK_ROWS
 
 # Config imports
 from config.config import (
@@ -48,6 +56,12 @@ class SecretsManager:
         self.audit = AuditRepository(self.db)
         self.session = SessionService()
         self.security = SecurityService()
+        # Desglose (ms) del último set_active_user por fase
+        self.last_login_timings: Dict[str, float] = {}
+        # Un único drenado de la cola de migración KDF a la vez (timer de arranque vs. auto-sync)
+        self._kdf_migration_lock = threading.Lock()
+        # Snapshots, restores y prune del almacén de backups locales en serie
+        self._backup_lock = threading.Lock()
         
         # Dynamic properties for legacy compatibility (no more copying values)
         # These properties always reflect current session state
@@ -140,7 +154,12 @@ class SecretsManager:
     def set_meta(self, key: str, value: Any) -> None: self.users.set_meta(key, value)
     
     def _initialize_db(self, name: str) -> None:
+        # Eventos en buffer pertenecen a la base actual: escribirlos antes de cambiar
+        self.audit.flush()
+        # Row ids are per-database: cached plaintexts must not survive a context switch
+        self.session.record_cache.clear()
         self.db._initialize_db(name)
+        self.secrets.notify_change("reset")
 
     def nuclear_reset(self) -> int:
         """Removes local state to force cloud sync. Destructive."""
@@ -178,6 +197,9 @@ class SecretsManager:
         Activates a user session by loading their profile, deriving KEKs, 
         and unwrapping cryptographic keys. Implements auto-healing for 
         corrupt vault keys.
+        Every KEK is derived at most once per login (KekMemo) and the
+        per-phase latency is kept in last_login_timings. The Argon2id
+        upgrade is only queued here (see drain_kdf_migrations).
         """
         new_user = str(username).upper().strip().replace(" ", "")
         
@@ -185,96 +207,217 @@ class SecretsManager:
             return
 
         logger.info(f"[Auth] Activating session for {new_user}")
-        self.reconnect(new_user)
-        profile = self.get_local_user_profile(new_user)
-        
-        if not profile: 
-            logger.warning(f"[Auth] No profile found for {new_user}")
-            return
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        with KekMemo() as memo:
+            with self._timed_phase(timings, "profile"):
+                self.reconnect(new_user)
+                profile = self.get_local_user_profile(new_user)
+            
+            if not profile: 
+                logger.warning(f"[Auth] No profile found for {new_user}")
+                return
 
-        # 1. Setup Session Context
-        self._setup_user_session(new_user, profile)
-        
-        # 2. Key Derivation & Primary Unwrapping
-        v_salt = self._ensure_valid_salt(new_user, profile)
-        kek = self._derive_session_keks(password, v_salt)
-        self.session.personal_key = self.security.decrypt_protected_key(profile.get("protected_key"), kek)
+            # 1. Setup Session Context
+            self._setup_user_session(new_user, profile)
+            
+            # 2. Key Derivation & Primary Unwrapping
+            with self._timed_phase(timings, "session_kek"):
+                v_salt = self._ensure_valid_salt(new_user, profile)
+                kek = self._derive_session_keks(password, v_salt)
+                self.session.personal_key = self.security.decrypt_protected_key(profile.get("protected_key"), kek)
+
+            # 3. Vault Key Acquisition (with fallback and healing)
+            with self._timed_phase(timings, "vault_key"):
+                self._acquire_vault_key(new_user, password, v_salt, profile)
+
+            # 4. Finalize Session
+            self.session.master_key = self.session.personal_key or self.session.vault_key or kek
+            
+            # [SECURITY UPGRADE] PBKDF2 -> Argon2id se encola; drain_kdf_migrations lo ejecuta en segundo plano
+            with self._timed_phase(timings, "kdf_migration"):
+                self._enqueue_kdf_migration(new_user, password, profile)
+
+        timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+        self.last_login_timings = timings
+        logger.info(f"[Perf] Login {new_user}: " + ", ".join(f"{k}={v}ms" for k, v in timings.items()) +
+                    f" | KEK memo hits={memo.hits} derivations={memo.misses}")
+        logger.info(f"Session Started: {self.session.current_user} | ID: {self.session.session_id}")
+
+    @contextmanager
+    def _timed_phase(self, timings: Dict[str, float], name: str):
+        """Acumula en timings[name] los ms transcurridos dentro del bloque."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[name] = round(timings.get(name, 0.0) + (time.perf_counter() - start) * 1000, 1)
+
+    # --- MIGRACIÓN KDF DIFERIDA ---
+    KDF_MIGRATION_META = "kdf_migration:{user}"
+    KDF_MIGRATION_STEPS = ("password_hash", "vault_key", "cloud")
+
+    def _read_json_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self.get_meta(key)
+        try: return json.loads(raw) if raw else None
+        except ValueError: return None
+
+    def _write_json_meta(self, key: str, value: Optional[Dict[str, Any]]) -> None:
+        """Guarda value como JSON en meta; None borra la fila."""
+        if value: self.set_meta(key, json.dumps(value))
+        else:
+            self.db.execute("DELETE FROM meta WHERE key = ?", (key,))
+            self.db.commit()
 
-        # 3. Vault Key Acquisition (with fallback and healing)
-        self._acquire_vault_key(new_user, password, v_salt, profile)
+    def _read_kdf_migration(self, username: str) -> Optional[Dict[str, Any]]:
+        return self._read_json_meta(self.KDF_MIGRATION_META.format(user=username))
 
-        # 4. Finalize Session (with Silent Security Upgrade for Password Hash)
-        self.session.master_key = self.session.personal_key or self.session.vault_key or kek
-        
-        # [SECURITY UPGRADE] Migrate security context to Argon2id if it's currently PBKDF2
-        self._migrate_security_context_to_argon2(new_user, password, profile)
-        
-        logger.info(f"Session Started: {self.session.current_user} | ID: {self.session.session_id}")
+    def _write_kdf_migration(self, username: str, job: Optional[Dict[str, Any]]) -> None:
+        self._write_json_meta(self.KDF_MIGRATION_META.format(user=username), job)
 
-    def _migrate_security_context_to_argon2(self, username: str, password: str, profile: Dict[str, Any]) -> None:
+    def _enqueue_kdf_migration(self, username: str, password: str, profile: Dict[str, Any]) -> None:
         """
-        [ETAPA 2 PLUS] Migrates user security context to Argon2id.
-        Handles both Password Hash upgrade AND Vault Key Re-Wrap.
+        [ETAPA 2 PLUS] Registra en meta los pasos pendientes de la migración a Argon2id
+        (hash de login y re-wrap del vault key) sin derivar nada. La password queda en
+        SecureBytes en la sesión hasta que drain_kdf_migrations termine.
         """
         from src.infrastructure.crypto_engine import ARGON2_AVAILABLE, ARGON2_PREFIX
-        
-        # Check if migration is needed (Current is PBKDF2 or kdf_version is 1)
-        kdf_version = profile.get("kdf_version", 1)
-        stored_hash = profile.get("password_hash")
-        
-        if ARGON2_AVAILABLE and (kdf_version == 1 or not stored_hash.startswith(ARGON2_PREFIX)):
-            try:
-                logger.info(f"[Security Upgrade] Starting full migration to Argon2id for {username}...")
-                
-                # 1. Generate NEW Password Hash (Argon2id)
-                new_hash = CryptoEngine.hash_user_password_argon2(password)
-                
-                # 2. PERFORM RE-WRAP OF VAULT KEY
-                # We already have the decrypted vault_key in our current session!
-                # It was decrypted using the old PBKDF2 KEK during set_active_user flow.
-                current_vault_key = bytes(self.session.vault_key) if self.session.vault_key else None
-                new_wrapped_vault_key = None
-                
-                if current_vault_key:
-                    # Re-wrap using NEW algorithm (Argon2id)
-                    # CryptoEngine.wrap_vault_key now uses Argon2id if available/enabled
-                    new_wrapped_vault_key = CryptoEngine.wrap_vault_key(current_vault_key, password, profile.get("vault_salt"))
-                    logger.debug("[Security Upgrade] Vault key re-wrapped with Argon2id.")
-
-                # 3. Update locally
-                # Update hash and KDF version
-                self.users.update_password_hash(username, new_hash, b'', kdf_version=2)
-                
-                # Update wrapped vault key if re-wrap was successful
-                if new_wrapped_vault_key:
-                    self.users.update_wrapped_vault_key(username, new_wrapped_vault_key)
-                    # Also update vault_access table for consistency
-                    if profile.get("vault_id"):
-                        self.users.save_vault_access(profile["vault_id"], new_wrapped_vault_key, synced=0) # Mark for cloud sync
-
-                # 4. [CLOUD SYNC] Push changes to Supabase
-                try:
-                    from src.infrastructure.user_manager import UserManager
-                    um = UserManager(self)
-                    update_payload = {
-                        "password_hash": new_hash,
-                        "salt": "", 
-                        "kdf_version": 2
-                    }
-                    um.supabase.table("users").update(update_payload).eq("username", username.upper()).execute()
-                    
-                    if new_wrapped_vault_key and profile.get("vault_id") and profile.get("id"):
-                        um.supabase.table("vault_access").update({
-                            "wrapped_master_key": new_wrapped_vault_key.hex()
-                        }).eq("user_id", profile["id"]).eq("vault_id", profile["vault_id"]).execute()
-                        
-                    logger.info(f"[Security Upgrade] Cloud security context for {username} upgraded to Argon2id.")
-                except Exception as ce:
-                    logger.warning(f"Could not sync security migration to cloud: {ce}")
-
-                logger.info(f"[Security Upgrade] Full security migration for {username} completed successfully.")
-            except Exception as e:
-                logger.error(f"Failed to migrate security context to Argon2id: {e}")
+        from src.infrastructure.secure_memory import SecureBytes
+        steps = []
+        if ARGON2_AVAILABLE:
+            stored_hash = profile.get("password_hash") or ""
+            if profile.get("kdf_version", 1) == 1 or not stored_hash.startswith(ARGON2_PREFIX):
+                steps.append("password_hash")
+            v_key_blob = self.security.ensure_bytes(profile.get("wrapped_vault_key"))
+            if v_key_blob and self.session.vault_key and CryptoEngine.needs_rewrap(v_key_blob):
+                steps.append("vault_key")
+
+        job = self._read_kdf_migration(username)
+        if not steps and not job: return
+        job = job or {"steps": [], "attempts": 0, "queued_at": int(time.time()), "last_error": None}
+        job["steps"] = [s for s in self.KDF_MIGRATION_STEPS if s in job["steps"] or s in steps]
+        self._write_kdf_migration(username, job)
+        if any(s != "cloud" for s in job["steps"]):
+            if self.session.migration_secret: self.session.migration_secret.clear()
+            self.session.migration_secret = SecureBytes(password.encode("utf-8"))
+        logger.info(f"[Security Upgrade] KDF migration queued for {username}: {', '.join(job['steps'])}")
+
+    def drain_kdf_migrations(self) -> bool:
+        """
+        Worker de fondo: ejecuta los pasos pendientes de la migración Argon2id del usuario activo.
+        Cada paso comprueba el estado actual antes de escribir (idempotente) y se retira de la cola
+        solo después de persistirse, así que un fallo o un cierre a mitad se reanuda sin repetir trabajo.
+        Devuelve True si la cola queda vacía.
+        """
+        if not self._kdf_migration_lock.acquire(blocking=False): return False
+        try:
+            return self._drain_kdf_migrations(self.session.current_user)
+        finally:
+            self._kdf_migration_lock.release()
+
+    def _drain_kdf_migrations(self, username: Optional[str]) -> bool:
+        job = self._read_kdf_migration(username) if username else None
+        if not job: return True
+
+        secret = self.session.migration_secret
+        if self._only_cloud_left(job): self._release_migration_secret(secret)
+        password = secret.get_copy() if secret else None
+        if not password and not self._only_cloud_left(job):
+            logger.info(f"[Security Upgrade] KDF migration for {username} waits for the next login")
+            return False
+
+        step = None
+        try:
+            with KekMemo():
+                while job["steps"]:
+                    step = job["steps"][0]
+                    changed = getattr(self, f"_kdf_migrate_{step}")(username, password.decode("utf-8") if password else None)
+                    job["steps"].remove(step)
+                    if changed and step != "cloud" and "cloud" not in job["steps"]: job["steps"].append("cloud")
+                    self._write_kdf_migration(username, job)
+                    if self._only_cloud_left(job):
+                        # La subida no usa la password: no retenerla mientras la nube no responda
+                        password = None
+                        self._release_migration_secret(secret)
+        except Exception as e:
+            job["attempts"] = job.get("attempts", 0) + 1
+            job["last_error"] = f"{step}: {e}"
+            self._write_kdf_migration(username, job)
+            logger.warning(f"[Security Upgrade] KDF migration step '{step}' failed for {username} (attempt {job['attempts']}): {e}")
+            self.log_event("KDF_MIGRATION", status="FAILED", details=f"Paso {step} (intento {job['attempts']}): {e}")
+            return False
+        finally:
+            password = None
+
+        self._write_kdf_migration(username, None)
+        self._release_migration_secret(secret)
+        logger.info(f"[Security Upgrade] Full security migration for {username} completed successfully.")
+        self.log_event("KDF_MIGRATION", details="Hash de login y vault key migrados a Argon2id")
+        return True
+
+    @staticmethod
+    def _only_cloud_left(job: Dict[str, Any]) -> bool:
+        return all(s == "cloud" for s in job["steps"])
+
+    def _release_migration_secret(self, secret: Any) -> None:
+        if secret: secret.clear()
+        if self.session.migration_secret is secret: self.session.migration_secret = None
+
+    def _kdf_migrate_password_hash(self, username: str, password: str) -> bool:
+        from src.infrastructure.crypto_engine import ARGON2_PREFIX
+        from src.infrastructure.sync_manager import _vault_lock
+        profile = self.get_local_user_profile(username) or {}
+        if profile.get("kdf_version") == 2 and (profile.get("password_hash") or "").startswith(ARGON2_PREFIX):
+            return False
+        new_hash = CryptoEngine.hash_user_password_argon2(password)
+        with _vault_lock.write():
+            if not self.users.update_password_hash(username, new_hash, b'', kdf_version=2):
+                raise RuntimeError("No se pudo guardar el hash Argon2id")
+        return True
+
+    def _kdf_migrate_vault_key(self, username: str, password: str) -> bool:
+        from src.infrastructure.sync_manager import _vault_lock
+        profile = self.get_local_user_profile(username) or {}
+        old_blob = self.security.ensure_bytes(profile.get("wrapped_vault_key"))
+        if not old_blob or not CryptoEngine.needs_rewrap(old_blob): return False
+        v_salt = profile.get("vault_salt")
+        try:
+            dec_v_key, _ = self.security.unwrap_key(old_blob, password, v_salt)
+        except Exception as e:
+            # La sesión se abrió por un camino de recuperación: este blob no es de esta password
+            logger.warning(f"[Security Upgrade] Stored vault key for {username} does not open with the login password: {e}")
+            return False
+        new_blob = self.security.wrap_key(dec_v_key, password, v_salt)
+        with _vault_lock.write():
+            current = self.get_local_user_profile(username) or {}
+            # Una rotación o un sync reemplazó el blob mientras derivábamos: ya no es nuestro trabajo
+            if self.security.ensure_bytes(current.get("wrapped_vault_key")) != old_blob: return False
+            if not self.users.update_wrapped_vault_key(username, new_blob):
+                raise RuntimeError("No se pudo guardar el vault key re-envuelto")
+            vault_id = profile.get("vault_id")
+            va = self.users.get_vault_access(vault_id) if vault_id else None
+            if va and self.security.ensure_bytes(va.get("wrapped_master_key")) == old_blob:
+                self.users.save_vault_access(vault_id, new_blob, va.get("access_level") or "member", synced=0)
+        return True
+
+    def _kdf_migrate_cloud(self, username: str, password: Optional[str]) -> bool:
+        """Sube a Supabase el hash y el vault key ya migrados localmente."""
+        from src.infrastructure.crypto_engine import ARGON2_PREFIX
+        from src.infrastructure.user_manager import UserManager
+        profile = self.get_local_user_profile(username) or {}
+        um = UserManager(self)
+        if (profile.get("password_hash") or "").startswith(ARGON2_PREFIX):
+            um.supabase.table("users").update({
+                "password_hash": profile["password_hash"], "salt": "", "kdf_version": 2
+            }).eq("username", username.upper()).execute()
+        blob = self.security.ensure_bytes(profile.get("wrapped_vault_key"))
+        user_id = profile.get("user_id") or self.session.current_user_id
+        if blob and profile.get("vault_id") and user_id and CryptoEngine.parse_envelope(blob):
+            um.supabase.table("vault_access").update({
+                "wrapped_master_key": blob.hex()
+            }).eq("user_id", user_id).eq("vault_id", profile["vault_id"]).execute()
+        logger.info(f"[Security Upgrade] Cloud security context for {username} upgraded to Argon2id.")
+        return True
 
     def _setup_user_session(self, username: str, profile: Dict[str, Any]) -> None:
         """Initializes the session service with user metadata."""
@@ -309,7 +452,7 @@ class SecretsManager:
         return raw_kek
 
     def _acquire_vault_key(self, username: str, password: str, v_salt: bytes, profile: Dict[str, Any]) -> None:
-        """Attempts to unwrap the vault key with automatic security migration (PBKDF2 -> Argon2id)."""
+        """Attempts to unwrap the vault key (the PBKDF2 -> Argon2id re-wrap is deferred to the migration queue)."""
         v_key_blob = self.security.ensure_bytes(profile.get("wrapped_vault_key"))
         
         # Fallback to vault_access table if primary blob is missing
@@ -326,12 +469,9 @@ class SecretsManager:
             # unwrap_key now returns (key, algorithm)
             dec_v_key, algo = self.security.unwrap_key(v_key_blob, password, v_salt)
             self.session.vault_key = bytearray(dec_v_key)
-            
-            # Silent Security Upgrade (Healing)
-            if algo == "pbkdf2" and CryptoEngine.ARGON2_AVAILABLE:
-                logger.info(f"[Security Upgrade] Silently migrating {username} to Argon2id...")
-                new_v_blob = self.security.wrap_key(dec_v_key, password, v_salt)
-                self.users.update_wrapped_vault_key(username, new_v_blob)
+            # Blobs legacy o con KDF antiguo: el re-wrap a envelope v1 lo encola _enqueue_kdf_migration
+            if CryptoEngine.needs_rewrap(v_key_blob):
+                logger.debug(f"[Security Upgrade] Vault key for {username} opened via {algo}; re-wrap deferred")
                 
         except Exception as e:
             logger.info(f"[Forensic] Primary unwrap failed for {username}: {e}")
@@ -366,7 +506,7 @@ class SecretsManager:
             w_va_raw = va.get("wrapped_master_key")
             if w_va_raw and w_va_raw != w_v_raw:
                 try:
-                    dec_v_key = self.security.unwrap_key(w_va_raw, password, v_salt)
+                    dec_v_key, _ = self.security.unwrap_key(w_va_raw, password, v_salt)
                     self.session.vault_key = bytearray(dec_v_key)
                     logger.info("[Forensic] Vault access found in fallback table!")
                     # Heal primary table
@@ -421,6 +561,22 @@ class SecretsManager:
             if b_s is not None and len(b_s) > 0 and b_s not in processed_salts:
                 processed_salts.append(b_s)
 
+        # Envelope v1: algoritmo y costes van en el header; solo cuentan los salts con el mismo salt_id
+        try:
+            envelope = CryptoEngine.parse_envelope(wrapped_key)
+        except ValueError as e:
+            logger.error(f"[Forensic] Refusing to derive for {username}: {e}")
+            return None
+        if envelope:
+            for salt in (s for s in processed_salts if CryptoEngine.salt_id(s) == envelope["salt_id"]):
+                for p_cand in dict.fromkeys([password, password.strip()]):
+                    try:
+                        dec_key, _ = self.security.unwrap_key(wrapped_key, p_cand, salt)
+                        logger.info(f"[Forensic] SUCCESS! Envelope recovered | Salt: {salt.hex()[:6]}")
+                        return self._heal_and_return(username, p_cand, dec_key, salt)
+                    except Exception: continue
+            return None
+
         total_trials = len(processed_salts) * len(iteration_candidates)
         logger.info(f"[Forensic] Starting Ultra Recovery V5.0: {total_trials} combinations for {username}...")
 
@@ -505,7 +661,7 @@ class SecretsManager:
         
         if w_v_raw and kek:
             try:
-                dec_v_key = AESGCM(kek).decrypt(self.security.ensure_bytes(w_v_raw)[:12], self.security.ensure_bytes(w_v_raw)[12:], None)
+                dec_v_key = CryptoEngine.open_with_kek(self.security.ensure_bytes(w_v_raw), kek)
                 self.session.vault_key = bytearray(dec_v_key)
                 if not self.session.master_key: self.session.master_key = self.session.vault_key
                 self._sync_legacy_attributes()
@@ -531,25 +687,111 @@ class SecretsManager:
             raise
 
     # --- SECRETS OPERATIONS ---
+    def _session_keyring(self) -> List[Tuple[str, Any]]:
+        """Candidate keys labelled by key class (the value stored in secrets.key_type)."""
+        keyring = []
+        if self.session.vault_key: keyring.append(("vault", self.session.vault_key))
+        if self.session.personal_key: keyring.append(("personal", self.session.personal_key))
+        if self.session.master_key: keyring.append(("master", self.session.master_key))
+        for name, k in self.session.kek_candidates.items():
+            raw = k.get_raw() if hasattr(k, "get_raw") else k
+            if raw: keyring.append((f"kek:{name}", raw))
+        return keyring
+
+    @staticmethod
+    def _vault_write():
+        """Lock de escritura compartido con SyncManager: las escrituras de secretos de la UI no se intercalan con un sync."""
+        from src.infrastructure.sync_manager import _vault_lock
+        return _vault_lock.write()
+
+    def _select_write_key(self, is_private: int) -> Tuple[str, Any]:
+        """Key used to encrypt a new/updated row, plus its key_type label."""
+        if int(is_private) == 1 and self.session.personal_key: return "personal", self.session.personal_key
+        if int(is_private) != 1 and self.session.vault_key: return "vault", self.session.vault_key
+        return "master", self.session.master_key
+
+    def _decrypt_row(self, r: Dict[str, Any], keyring: List[Tuple[str, Any]], backfill: list,
+                     use_cache: bool = True) -> None:
+        """
+        Replaces r["secret"] with its plaintext (or a lock/corrupt marker) in place.
+        use_cache=False: barridos completos (heurística) que no deben dejar el texto plano en record_cache.
+        """
+        cache = self.session.record_cache
+        cached = cache.get(r.get("id"), r.get("integrity_hash"), r.get("version")) if use_cache else None
+        if cached is not None:
+            r["secret"] = cached
+            return
+        enc_data = self.security.ensure_bytes(r.get("secret"))
+        nonce = self.security.ensure_bytes(r.get("nonce"))
+        if not nonce or not enc_data or len(nonce) != 12:
+            r["secret"] = "[Dato Corrupto]"
+            return
+        plain, used = self.security.decrypt_with_hint(enc_data, nonce, keyring, r.get("key_type"))
+        r["secret"] = plain
+        # Solo cacheamos descifrados exitosos: un registro bloqueado puede abrirse tras cambiar de bóveda
+        if used:
+            if use_cache: cache.put(r.get("id"), r.get("integrity_hash"), r.get("version"), plain)
+            if used != r.get("key_type"):
+                backfill.append((used, r.get("id")))
+                r["key_type"] = used
+
     def get_all(self, include_deleted: bool = False) -> List[Dict[str, Any]]:
         records = self.secrets.get_all(self.session.current_user, include_deleted)
-        keys = []
-        if self.session.vault_key: keys.append(self.session.vault_key)
-        if self.session.personal_key: keys.append(self.session.personal_key)
-        if self.session.master_key: keys.append(self.session.master_key)
-        keys.extend(self.session.kek_candidates.values())
-        
+        keyring = self._session_keyring()
+        backfill = []
         for r in records:
-            enc_data = self.security.ensure_bytes(r.get("secret"))
-            nonce = self.security.ensure_bytes(r.get("nonce"))
-            if not nonce or not enc_data or len(nonce) != 12:
-                r["secret"] = "[Dato Corrupto]"
-                continue
-            r["secret"] = self.security.decrypt_data(enc_data, nonce, keys)
+            self._decrypt_row(r, keyring, backfill)
+        if backfill: self.secrets.set_key_hints(backfill)
         return records
 
+    # Marcadores de _decrypt_row para filas que no se pudieron abrir
+    UNREADABLE_SECRETS = ("[Bloqueado 🔑]", "[Dato Corrupto]")
+
+    def iter_decrypted(self, batch: int = 500, use_cache: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Registros visibles (no borrados) descifrados uno a uno sobre la paginación keyset:
+        solo una página de ciphertext en memoria, para exportar bóvedas de cualquier tamaño.
+        use_cache=False no consulta ni rellena record_cache (análisis de toda la bóveda).
+        """
+        keyring = self._session_keyring()
+        for page in self.secrets.iter_encrypted(self.session.current_user, batch=batch):
+            backfill = []
+            for r in page:
+                if r.get("deleted"): continue
+                self._decrypt_row(r, keyring, backfill, use_cache)
+                yield r
+            if backfill: self.secrets.set_key_hints(backfill)
+
+    def list_metadata(self, include_deleted: bool = False, ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Listado para tablas: servicio, usuario, dueño, antigüedad y flags de sync.
+        No lee ni descifra el ciphertext; usar reveal(sid) bajo demanda.
+        """
+        return self.secrets.get_metadata(self.session.current_user, include_deleted, ids)
+
+    def add_change_listener(self, callback: Any) -> None:
+        """callback(kind, ids) on secret writes: 'upsert' | 'delete' | 'reset'."""
+        self.secrets.add_change_listener(callback)
+
+    def remove_change_listener(self, callback: Any) -> None:
+        self.secrets.remove_change_listener(callback)
+
+    def reveal(self, sid: int) -> Optional[str]:
+        """Decrypts a single visible row on demand. None if the row does not exist."""
+        r = self.get_record_by_id(sid)
+        return r["secret"] if r else None
+
+    def get_record_by_id(self, sid: int) -> Optional[Dict[str, Any]]:
+        """Un registro visible (también borrado lógico) descifrado, sin tocar el resto de la bóveda."""
+        r = self.secrets.get_by_id(self.session.current_user, sid)
+        if not r: return None
+        backfill = []
+        self._decrypt_row(r, self._session_keyring(), backfill)
+        if backfill: self.secrets.set_key_hints(backfill)
+        return r
+
     def get_record(self, service: str, username: str) -> Optional[Dict[str, Any]]:
-        """Busca un registro específico por servicio y usuario."""
+        """Busca un registro específico por servicio y usuario (descifra toda la bóveda: usar get_record_by_id)."""
         records = self.get_all(include_deleted=True)
         for r in records:
             if r["service"].strip().lower() == service.strip().lower() and \
@@ -558,119 +800,266 @@ class SecretsManager:
         return None
 
     def add_secret(self, service: str, username: str, secret_plain: str, notes: Optional[str] = None, is_private: int = 0) -> Optional[int]:
-        key = self.session.personal_key if int(is_private) == 1 else self.session.vault_key
-        if not key: key = self.session.master_key
+        key_type, key = self._select_write_key(is_private)
         
         if not key or len(key) != 32:
             raise ValueError("Falla de seguridad: No hay llave disponible para cifrar.")
             
         enc, nonce, integrity = self.security.encrypt_data(secret_plain, key)
-        sid = self.secrets.add_secret(service, username, enc, nonce, integrity, notes, is_private, 
-                                     self.session.current_user, self.session.current_user_id, self.session.current_vault_id)
+        with self._vault_write():
+            sid = self.secrets.add_secret(service, username, enc, nonce, integrity, notes, is_private, 
+                                         self.session.current_user, self.session.current_user_id, self.session.current_vault_id,
+                                         key_type=key_type)
+            if sid: self.session.record_cache.put(sid, integrity, 1, secret_plain)
         
         self.log_event("CREATE SECRET", service=service, details=f"New secret created")
         return sid
 
-    def bulk_add_secrets(self, records: List[Dict[str, Any]]) -> Dict[str, int]:
+    # Filas por bloque/transacción en importaciones masivas
+    IMPORT_CHUNK_SIZE = 2000
+
+    def bulk_add_secrets(self, records: Iterable[Dict[str, Any]], chunk_size: Optional[int] = None,
+                         progress_callback: Optional[Callable[[int, Dict[str, int]], None]] = None,
+                         max_workers: Optional[int] = None,
+                         cancel_event: Optional[threading.Event] = None) -> Dict[str, int]:
         """
-        Versión Senior Pro: Procesa y cifra múltiples registros con validación robusa,
-        detección de duplicados ultra-rápida y transacciones atómicas.
+        Versión Senior Pro: Procesa y cifra múltiples registros con validación robusta,
+        detección de duplicados ultra-rápida y transacciones acotadas.
+        records puede ser cualquier iterable (lista, csv.DictReader, ImportReader) y se consume por
+        bloques de chunk_size filas: cada bloque se cifra en un pool de hilos mientras este hilo
+        confirma el anterior en su propia transacción. progress_callback(filas, stats) tras cada bloque.
+        cancel_event: se comprueba entre bloques; lo ya cifrado se confirma antes de salir.
         """
         stats = {"added": 0, "skipped": 0, "errors": 0}
-        
-        # 1. Mapeo inteligente de cabeceras (Case Insensitive & Multi-idioma)
-        def _find(row, variants):
-            for k in row.keys():
-                if str(k).strip().lower() in variants:
-                    return str(row[k])
-            return None
-
-        # 2. Cargar llaves existentes (Optimizado: solo service y user en minúsculas)
+        mapper = ColumnMapper()  # Mapeo de cabeceras resuelto una vez por conjunto de columnas
         existing_map = self.secrets.get_existing_keys(self.session.current_user)
-            
-        to_insert = []
-        batch_time = int(time.time())
+        ctx = (int(time.time()), self.session.current_user, self.session.current_user_id, self.session.current_vault_id)
+
+        # Llave de escritura por privacidad, resuelta una vez por importación
+        write_keys: Dict[int, Optional[Tuple[str, bytes]]] = {}
+        for priv in (0, 1):
+            key_type, key = self._select_write_key(priv)
+            write_keys[priv] = (key_type, bytes(key)) if key and len(key) == 32 else None
+
+        workers = max_workers or min(4, os.cpu_count() or 1)
+        progress = {"rows": 0, "inserted": False}
+        in_flight = None
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import") as pool:
+            try:
+                for chunk in chunked(records, chunk_size or self.IMPORT_CHUNK_SIZE):
+                    if cancel_event is not None and cancel_event.is_set():
+                        logger.info("[Import] Bulk import cancelled by user")
+                        break
+                    prepared = self._prepare_import_chunk(chunk, mapper, existing_map, write_keys)
+                    futures = self._encrypt_import_chunk(pool, prepared["rows"], write_keys, workers)
+                    if in_flight: self._commit_import_chunk(*in_flight, ctx, stats, progress, progress_callback)
+                    in_flight = (prepared, futures)
+            finally:
+                if in_flight: self._commit_import_chunk(*in_flight, ctx, stats, progress, progress_callback)
+
+        if progress["inserted"]: self.secrets.notify_change("reset")
+        self.log_event("IMPORT_BULK", details=f"Bulk import: {stats['added']} added, {stats['skipped']} skipped")
+        return stats
+
+    def _prepare_import_chunk(self, chunk: List[Dict[str, Any]], mapper: ColumnMapper, existing_map: set,
+                              write_keys: Dict[int, Any]) -> Dict[str, Any]:
+        """Normaliza y descarta duplicados en orden (secuencial: existing_map crece fila a fila)."""
+        prepared = {"rows": [], "skipped": 0, "errors": 0, "count": len(chunk)}
         current_user = self.session.current_user
-        current_uid = self.session.current_user_id
-        current_vid = self.session.current_vault_id
-        
-        # 3. Preparar candidatos (Cifrado eficiente)
-        for r in records:
+        for r in chunk:
             try:
-                # Normalización de cabeceras
-                svc = (_find(r, ["service", "servicio", "app", "sitio"]) or "").strip()
-                usr = (_find(r, ["username", "user", "usuario", "login", "email"]) or current_user).strip()
-                sec = _find(r, ["secret", "password", "contraseña", "clave", "pwd"])
-                notes = (_find(r, ["notes", "notas", "comentario", "desc"]) or "").strip()
-                priv_val = _find(r, ["is_private", "privado", "personal"])
-                priv = 1 if priv_val and str(priv_val).strip() in ["1", "True", "true", "S", "Si"] else 0
-                
-                if not svc or not sec:
-                    stats["errors"] += 1
+                row = mapper.normalize(r, current_user)
+                if not row:
+                    prepared["errors"] += 1
                     continue
-                    
+                svc, usr, sec, notes, priv = row
                 # Detección de duplicados (Service + Username)
                 dupe_key = (svc.lower(), usr.lower())
                 if dupe_key in existing_map:
-                    stats["skipped"] += 1
+                    prepared["skipped"] += 1
                     continue
-                
-                # Selección de llave según privacidad
-                key = self.session.personal_key if priv == 1 else self.session.vault_key
-                if not key: key = self.session.master_key
-                if not key or len(key) != 32: raise ValueError("No key")
-                
-                enc, nonce, integrity = self.security.encrypt_data(sec, key)
-                
-                to_insert.append((
-                    svc, usr, sqlite3.Binary(enc), sqlite3.Binary(nonce), batch_time,
-                    current_user, current_uid, integrity, notes, priv, current_vid, None
-                ))
-                
-                existing_map.add(dupe_key) # Evitar duplicados dentro del lote
-                stats["added"] += 1
-                
+                if not write_keys[priv]: raise ValueError("No key")
+                prepared["rows"].append(row + (write_keys[priv][0],))
+                existing_map.add(dupe_key)  # Evitar duplicados dentro del lote
             except Exception as e:
                 logger.error(f"Error preparing record for bulk import: {e}")
-                stats["errors"] += 1
-                
-        # 4. Transacción única en BD
+                prepared["errors"] += 1
+        return prepared
+
+    def _encrypt_import_chunk(self, pool: ThreadPoolExecutor, rows: List[tuple], write_keys: Dict[int, Any],
+                              workers: int) -> List[Tuple[List[int], Any]]:
+        """Reparte el bloque por llave en porciones para el pool: un contexto AES-GCM por porción."""
+        futures = []
+        for priv in (0, 1):
+            idx = [i for i, row in enumerate(rows) if row[4] == priv]
+            if not idx: continue
+            step = -(-len(idx) // workers)
+            for i in range(0, len(idx), step):
+                part = idx[i:i + step]
+                futures.append((part, pool.submit(self.security.encrypt_many, [rows[j][2] for j in part], write_keys[priv][1])))
+        return futures
+
+    def _commit_import_chunk(self, prepared: Dict[str, Any], futures: List[Tuple[List[int], Any]], ctx: tuple,
+                             stats: Dict[str, int], progress: Dict[str, Any],
+                             progress_callback: Optional[Callable[[int, Dict[str, int]], None]]) -> None:
+        """Una transacción por bloque; pre-calienta la caché con los textos recién cifrados."""
+        batch_time, current_user, current_uid, current_vid = ctx
+        rows = prepared["rows"]
+        stats["skipped"] += prepared["skipped"]
+        stats["errors"] += prepared["errors"]
+        to_insert, plain_by_integrity = [], {}
+        try:
+            for part, future in futures:
+                for j, (enc, nonce, integrity) in zip(part, future.result()):
+                    svc, usr, sec, notes, priv, key_type = rows[j]
+                    to_insert.append((
+                        svc, usr, sqlite3.Binary(enc), sqlite3.Binary(nonce), batch_time,
+                        current_user, current_uid, integrity, notes, priv, current_vid, None, key_type
+                    ))
+                    plain_by_integrity[integrity] = sec
+        except Exception as e:
+            logger.error(f"Error encrypting bulk import chunk: {e}")
+            to_insert = []
+            stats["errors"] += len(rows)
+
         if to_insert:
-            if not self.secrets.batch_add_secrets(to_insert):
-                stats["errors"] += stats["added"]
-                stats["added"] = 0
-                
-        self.log_event("IMPORT_BULK", details=f"Bulk import: {stats['added']} added, {stats['skipped']} skipped")
+            # Bajo el lock de escritura del sync: el bloque no se intercala con un pull/push sobre la conexión
+            # compartida (el cifrado del bloque siguiente sigue en el pool mientras tanto)
+            with self._vault_write():
+                if not self.secrets.batch_add_secrets(to_insert, notify=False):
+                    stats["errors"] += len(to_insert)
+                else:
+                    stats["added"] += len(to_insert)
+                    progress["inserted"] = True
+                    # Pre-calentar la caché: acabamos de cifrar estos textos, no hace falta descifrarlos de nuevo
+                    inserted = self.secrets.get_ids_by_integrity(list(plain_by_integrity.keys()))
+                    for integrity, (sid, version) in inserted.items():
+                        self.session.record_cache.put(sid, integrity, version, plain_by_integrity[integrity])
+
+        progress["rows"] += prepared["count"]
+        if progress_callback:
+            try: progress_callback(progress["rows"], dict(stats))
+            except Exception as e: logger.debug(f"Import progress callback failed: {e}")
+
+    # --- ENCRYPTED EXPORT (.vxa) ---
+    ARCHIVE_IMPORT_META = "archive_import:{archive_id}"
+
+    def export_archive(self, path: Any, passphrase: str, chunk_rows: Optional[int] = None,
+                       progress_callback: Optional[Callable[[int, int], None]] = None,
+                       cancel_event: Optional[threading.Event] = None,
+                       params: Optional[Tuple[int, int, int, int]] = None) -> Dict[str, Any]:
+        """
+        Exporta la bóveda a un archivo cifrado por bloques (export_archive): descifra fila a
+        fila desde iter_decrypted y sella cada bloque al llenarse, sin texto plano en disco.
+        Las filas bloqueadas/corruptas se omiten. progress_callback(filas, total) por bloque;
+        cancel_event descarta el archivo a medio escribir.
+        """
+        stats = {"exported": 0, "skipped": 0, "chunks": 0, "cancelled": False}
+        total = self.count_encrypted()
+        writer = ArchiveWriter(path, passphrase, chunk_rows or DEFAULT_CHUNK_ROWS, params)
+        try:
+            seen = 0
+            for r in self.iter_decrypted(use_cache=False):
+                seen += 1
+                if r.get("secret") in self.UNREADABLE_SECRETS:
+                    stats["skipped"] += 1
+                else:
+                    writer.write({"service": r.get("service") or "", "username": r.get("username") or "",
+                                  "password": r["secret"], "notes": r.get("notes") or "",
+                                  "is_private": int(r.get("is_private") or 0)})
+                if seen % writer.chunk_rows == 0:
+                    if progress_callback: progress_callback(seen, total)
+                    if cancel_event is not None and cancel_event.is_set():
+                        stats["cancelled"] = True
+                        break
+        except Exception:
+            writer.abort()
+            raise
+        if stats["cancelled"]:
+            writer.abort()
+            return stats
+        writer.close()
+        stats["exported"], stats["chunks"] = writer.rows, writer.chunk_count
+        self.log_event("EXPORT_ARCHIVE", details=f"Encrypted export: {writer.rows} records in {writer.chunk_count} chunks")
         return stats
 
+    def import_archive(self, path: Any, passphrase: str,
+                       progress_callback: Optional[Callable[[int, Optional[int], Dict[str, int]], None]] = None,
+                       cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Importa un .vxa por bloques sobre bulk_add_secrets. Tras confirmar cada bloque guarda en
+        meta el siguiente bloque a leer, así que una importación cancelada, interrumpida o que
+        topa con un bloque dañado se reanuda desde el último bloque bueno al repetirla.
+        progress_callback(bloques_hechos, bloques_totales | None, stats).
+        ValueError si la passphrase no corresponde; ArchiveError si el archivo no se puede abrir.
+        """
+        with ArchiveReader(path, passphrase) as reader:
+            meta_key = self.ARCHIVE_IMPORT_META.format(archive_id=reader.archive_id.hex())
+            start = int((self._read_json_meta(meta_key) or {}).get("next_chunk", 0))
+            state = {"ends": [], "done": start, "finished": False, "error": None}
+
+            def rows():
+                try:
+                    for _, records in reader.iter_chunks(start):
+                        state["ends"].append((state["ends"][-1] if state["ends"] else 0) + len(records))
+                        yield from records
+                    state["finished"] = True
+                except ArchiveError as e:
+                    logger.warning(f"[Archive] Import stopped at a bad chunk of {reader.path.name}: {e}")
+                    state["error"] = str(e)
+
+            def on_commit(n, stats):
+                # Bloques del archivo cuyas filas ya están todas confirmadas
+                state["done"] = start + sum(1 for end in state["ends"] if end <= n)
+                self._write_json_meta(meta_key, {"next_chunk": state["done"], "file": reader.path.name,
+                                                 "updated_at": int(time.time())})
+                if progress_callback: progress_callback(state["done"], reader.chunk_count, stats)
+
+            stats: Dict[str, Any] = self.bulk_add_secrets(rows(), chunk_size=reader.chunk_rows,
+                                                          progress_callback=on_commit, cancel_event=cancel_event)
+            complete = state["finished"] and not (cancel_event is not None and cancel_event.is_set())
+            if complete: self._write_json_meta(meta_key, None)
+            stats.update({"resumed_from": start, "chunks_done": state["done"], "chunks_total": reader.chunk_count,
+                          "complete": complete, "error": state["error"]})
+            return stats
+
     def update_secret(self, sid: int, service: str, username: str, secret_plain: str, notes: Optional[str] = None, is_private: int = 0) -> None:
-        key = self.session.personal_key if int(is_private) == 1 else self.session.vault_key
-        if not key: key = self.session.master_key
+        key_type, key = self._select_write_key(is_private)
 
         if not key or len(key) != 32:
             raise ValueError("Falla de seguridad: No hay llave disponible para re-cifrar.")
 
         enc, nonce, integrity = self.security.encrypt_data(secret_plain, key)
-        self.secrets.update_secret(sid, service, username, enc, nonce, integrity, notes, is_private)
+        with self._vault_write():
+            self.secrets.update_secret(sid, service, username, enc, nonce, integrity, notes, is_private, key_type=key_type)
+            self.session.record_cache.put(sid, integrity, self.secrets.get_version(sid), secret_plain)
         self.log_event("UPDATE SECRET", service=service, details=f"Secret updated")
 
     def delete_secret(self, sid: int) -> None:
         svc_name = self.secrets.get_service_name_by_id(sid)
-        self.secrets.delete_secret(sid)
+        with self._vault_write():
+            self.secrets.delete_secret(sid)
+            self.session.record_cache.evict(sid)
         self.log_event("DELETE SECRET", service=svc_name, details=f"Secret {sid} deleted")
 
     def hard_delete_secret(self, sid: int) -> None:
         svc = self.secrets.get_service_name_by_id(sid)
-        self.secrets.hard_delete(sid)
+        with self._vault_write():
+            self.secrets.hard_delete(sid)
+            self.session.record_cache.evict(sid)
         self.log_event("DELETE SECRET", service=svc, details=f"Permanently deleted {sid}")
 
-    def restore_secret(self, sid: int) -> None: self.secrets.restore_secret(sid)
+    def restore_secret(self, sid: int) -> None:
+        with self._vault_write(): self.secrets.restore_secret(sid)
     
     def physical_purge_private(self) -> bool:
         """Eliminación física permanente de todos los registros privados del usuario."""
         try:
-            self.db.execute("DELETE FROM secrets WHERE is_private = 1 AND UPPER(owner_name) = ?", (self.session.current_user.upper(),))
-            self.db.commit()
+            with self._vault_write():
+                self.db.execute("DELETE FROM secrets WHERE is_private = 1 AND UPPER(owner_name) = ?", (self.session.current_user.upper(),))
+                self.db.commit()
+                self.session.record_cache.clear()
+            self.secrets.notify_change("reset")
             self.db.vacuum()
             self.log_event("PURGE_PRIVATE", details="User purged all private secrets physically")
             return True
@@ -697,6 +1086,29 @@ class SecretsManager:
             r["nonce_blob"] = self.security.ensure_bytes(r["nonce"])
         return raw
 
+    def count_encrypted(self, only_mine: bool = False, unsynced_only: bool = False) -> int:
+        return self.secrets.count_encrypted(self.session.current_user, only_mine, unsynced_only)
+
+    def iter_encrypted(self, only_mine: bool = False, after_id: int = 0, batch: int = 500,
+                       unsynced_only: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        """Streams encrypted records page by page (keyset pagination); only one page is held at a time."""
+        for page in self.secrets.iter_encrypted(self.session.current_user, only_mine, after_id, batch, unsynced_only):
+            for r in page:
+                r["secret_blob"] = self.security.ensure_bytes(r["secret"])
+                r["nonce_blob"] = self.security.ensure_bytes(r["nonce"])
+            yield page
+
+    def get_sync_state(self, cloud_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        return self.secrets.get_sync_state(cloud_ids)
+
+    def get_pending_cloud_ids(self) -> set: return self.secrets.get_pending_cloud_ids()
+
+    def assign_cloud_ids(self, pairs: List[Tuple[str, int]]) -> None: self.secrets.assign_cloud_ids(pairs)
+
+    def apply_push_results(self, synced: List[Tuple[int, Any]], deleted_ids: List[int]) -> None:
+        for sid in deleted_ids: self.session.record_cache.evict(sid)
+        self.secrets.apply_push_results(synced, deleted_ids)
+
     def add_secret_encrypted(self, service: str, username: str, secret_blob: bytes, nonce_blob: bytes, 
                              integrity: str, notes: Optional[str] = None, deleted: int = 0, 
                              synced: int = 1, sid: Optional[int] = None, is_private: int = 0, 
@@ -709,12 +1121,15 @@ class SecretsManager:
             "vault_id": vault_id or self.session.current_vault_id, "cloud_id": cloud_id, 
             "version": version, "updated_at": int(time.time())
         }
-        if sid: data["id"] = sid
+        if sid:
+            data["id"] = sid
+            self.session.record_cache.evict(sid)
         self.secrets.add_encrypted_direct(data)
 
     def mark_as_synced(self, sid: int, status: int = 1) -> None: 
         self.db.execute("UPDATE secrets SET synced = ? WHERE id = ?", (int(status), sid))
         self.db.commit()
+        self.secrets.notify_change("upsert", [sid])
 
     # --- AUDIT ---
     def log_event(self, action: str, service: str = "-", status: str = "SUCCESS", details: str = "-", 
@@ -728,11 +1143,55 @@ class SecretsManager:
 
     def get_audit_log_count(self) -> int: return self.audit.get_count()
 
-    def get_pending_audit_logs(self) -> List[tuple]:
-        return self.audit.get_pending_logs()
+    def get_audit_page(self, category: Optional[str] = None, search: Optional[str] = None,
+                       cursor: Optional[tuple] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        return self.audit.get_page(self.session.current_user, self.session.user_role, category, search, cursor, limit)
+
+    def get_audit_stats(self, category: Optional[str] = None, search: Optional[str] = None) -> Dict[str, int]:
+        return self.audit.get_stats(self.session.current_user, self.session.user_role, category, search)
+
+    def get_pending_audit_logs(self, limit: Optional[int] = None) -> List[tuple]:
+        return self.audit.get_pending_logs(limit)
+
+    def mark_audit_logs_as_synced(self, up_to_id: Optional[int] = None, from_id: Optional[int] = None) -> None:
+        self.audit.mark_as_synced(up_to_id, from_id)
+
+    # Retención de auditoría: como mucho una pasada al día (tras subir los logs pendientes)
+    AUDIT_RETENTION_INTERVAL = 86400
+
+    def audit_archive(self) -> AuditArchive:
+        return AuditArchive(self.db.db_path.parent / "audit_archive" / self.db.db_path.stem)
+
+    def apply_audit_retention(self, force: bool = False, policy: Optional[RetentionPolicy] = None) -> Optional[Dict[str, int]]:
+        """
+        Archiva los eventos sincronizados fuera de la ventana caliente según la política
+        de la bóveda (meta audit_hot_days / audit_noise_days / audit_archive_days) o la indicada.
+        None si aún no tocaba otra pasada.
+        """
+        now = int(time.time())
+        last = self.get_meta("audit_retention_at")
+        if not force and last and now - int(last) < self.AUDIT_RETENTION_INTERVAL: return None
+        archive = self.audit_archive()
+        head = self.get_meta("audit_archive_head")
+        check = archive.verify(head)
+        if not check["ok"]:
+            # No se encadenan segmentos nuevos sobre un archivo manipulado o incompleto
+            logger.error(f"[Audit] Archive chain broken ({check['reason']}, {check['broken']}); retention skipped")
+            return None
+        stats = self.audit.apply_retention(policy or RetentionPolicy.from_meta(self.get_meta), archive, now)
+        self.set_meta("audit_archive_head", archive.head())
+        self.set_meta("audit_retention_at", str(now))
+        if stats["archived"]:
+            logger.info(f"[Audit] Archived {stats['archived']} events in {stats['segments']} segments")
+        return stats
 
-    def mark_audit_logs_as_synced(self) -> None:
-        self.audit.mark_as_synced()
+    def verify_audit_archive(self) -> Dict[str, Any]:
+        return self.audit_archive().verify(self.get_meta("audit_archive_head"))
+
+    def flush_audit_log(self, close: bool = False) -> None:
+        """Escribe los eventos en buffer; close=True además detiene el hilo escritor (cierre de la app)."""
+        if close: self.audit.close()
+        else: self.audit.flush()
 
     # --- UTILS & LEGACY ---
     def cleanup_vault_cache(self) -> None:
@@ -740,6 +1199,8 @@ class SecretsManager:
         Cleanup vault cache and vacuum database.
         CRITICAL: Does NOT clear session keys if user is logged in OR if vault_key exists.
         """
+        # Bloqueo de la app: nada del registro de auditoría queda solo en memoria
+        self.audit.flush()
         # SECURITY FIX: Only clear session if BOTH conditions are met:
         # 1. No active user logged in
         # 2. No vault_key in memory (prevents loss during secondary user creation)
@@ -759,49 +1220,83 @@ class SecretsManager:
         return self.security.ensure_bytes(data)
 
     # --- BACKUP & RESTORE (LOCAL) ---
+    # Snapshots incrementales que se conservan por usuario (prune tras cada backup)
+    LOCAL_BACKUP_KEEP = 30
+
+    def _backup_store(self) -> IncrementalBackupStore:
+        root = self.db.db_path.parent / "backups" / self.session.current_user.lower()
+        keys = [k for label, k in self._session_keyring() if label in ("vault", "personal", "master")]
+        return IncrementalBackupStore(root, keys)
+
+    def local_backup_dir(self) -> Path:
+        """Carpeta de los manifests de snapshot (lo que el usuario elige al restaurar)."""
+        return self.db.db_path.parent / "backups" / self.session.current_user.lower() / "snapshots"
+
     def create_local_backup(self) -> str:
-        """Create a timestamped backup of the current database."""
+        """
+        Snapshot incremental de la base actual: solo se escriben las páginas que no
+        estaban ya en el almacén (comprimidas y cifradas). Devuelve la ruta del manifest.
+        """
         if not self.db.conn or not self.db.db_path:
             raise RuntimeError("Database not initialized")
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_dir = self.db.db_path.parent / "backups" / self.session.current_user.lower()
-        backup_dir.mkdir(parents=True, exist_ok=True)
-        
-        backup_filename = f"backup_{timestamp}.enc"
-        backup_path = backup_dir / backup_filename
-        
+        from src.infrastructure.sync_manager import _vault_lock
+
         # Flush pending changes
         self.db.commit()
-        
-        # Create backup (copy file)
-        shutil.copy2(self.db.db_path, backup_path)
-        return str(backup_path)
+        with self._backup_lock:
+            store = self._backup_store()
+            with _vault_lock.read():
+                snap = store.snapshot(self.db.conn)
+            try: store.prune(self.LOCAL_BACKUP_KEEP)
+            except Exception as e: logger.warning(f"[Backup] Prune failed: {e}")
+        self.log_event("LOCAL_BACKUP", details=f"Snapshot {snap['id']}: {snap['new_pages']}/{snap['pages']} new pages")
+        return snap["path"]
+
+    def list_local_backups(self) -> List[Dict[str, Any]]:
+        return self._backup_store().list_snapshots()
 
     def local_restore(self, backup_path: str) -> None:
-        """Restore database from a local backup file."""
-        if not Path(backup_path).exists():
+        """
+        Restore database from a local backup: a snapshot manifest (incremental store)
+        or a legacy full-file copy.
+        """
+        path = Path(backup_path)
+        if not path.exists():
             raise FileNotFoundError(f"Backup file not found: {backup_path}")
-            
+
+        db_path = self.db.db_path
+        with open(path, "rb") as f:
+            legacy = f.read(16) == b"SQLite format 3\x00"
+        staged = db_path.with_name(db_path.name + ".restore")
+        if legacy:
+            shutil.copy2(path, staged)
+        else:
+            # Se reensambla y verifica con la base aún abierta: un snapshot dañado no toca nada
+            with self._backup_lock:
+                self._backup_store().restore(path.stem, staged)
+
         # Close current connection
+        self.audit.flush()
         self.db.close()
-        
         try:
-            # Restore file
-            shutil.copy2(backup_path, self.db.db_path)
-        except Exception as e:
-            # Re-open connection even if restore failed
-            self.reconnect(self.session.current_user)
-            raise e
-            
-        # Re-connect to restored DB
-        self.reconnect(self.session.current_user)
+            # WAL/SHM de la base anterior no deben reaplicarse sobre la restaurada
+            for suffix in ("-wal", "-shm"):
+                side = db_path.with_name(db_path.name + suffix)
+                if side.exists(): side.unlink()
+            os.replace(staged, db_path)
+        finally:
+            if staged.exists(): staged.unlink()
+            # reconnect() se salta la misma base; reabrir explícitamente
+            self._initialize_db(self.session.current_user)
+        self.log_event("LOCAL_RESTORE", details=f"Restored {path.name}")
 
     def clear_local_secrets(self) -> bool:
         try:
             self.db.execute("DELETE FROM secrets")
             self.db.execute("DELETE FROM security_audit")
             self.db.commit()
+            self.session.record_cache.clear()
+            self.secrets.notify_change("reset")
             self.db.vacuum()
             return True
         except Exception as e:
@@ -816,6 +1311,7 @@ class SecretsManager:
             return False
         return self.users.update_vault_access(self.session.current_user, vault_id, wrapped_key, synced=synced, force=force, vault_salt=vault_salt)
 
+    @KekMemo.scoped
     def change_login_password(self, old_password: str, new_password: str, user_manager: Optional[Any] = None, progress_callback: Optional[Any] = None) -> None:
         """
         Updates the user's master password and re-encrypts all associated keys.
@@ -842,7 +1338,7 @@ class SecretsManager:
         new_protected_key = self.security.wrap_key(self.session.personal_key, new_password, new_v_salt)
         
         # 5. Rotate All Vault Accesses
-        rehashed_vaults = self._rotate_vault_keys(old_password, new_password, new_v_salt, cloud_p, user_manager)
+        rehashed_vaults = self._rotate_vault_keys(old_password, new_password, new_v_salt, cloud_p, user_manager, progress_callback)
 
         # 6. Synchronization (Cloud then Local)
         self._perform_password_change_sync(
@@ -911,10 +1407,10 @@ class SecretsManager:
             raise ValueError("No se puede recuperar la identidad personal para la rotación.")
 
     def _rotate_vault_keys(self, old_password: str, new_password: str, new_v_salt: bytes, 
-                          cloud_p: Optional[Dict[str, Any]], user_manager: Optional[Any]) -> List[Tuple]:
-        """Iterates and re-encrypts all accessible vault keys with the new password."""
+                          cloud_p: Optional[Dict[str, Any]], user_manager: Optional[Any],
+                          progress_callback: Optional[Any] = None) -> List[Tuple]:
+        """Re-encrypts all accessible vault keys with the new password (planned, parallel KDF)."""
         all_accesses = self.users.get_all_vault_accesses()
-        rehashed_vaults = []
         
         # Prepare decryption environment
         local_v_salt = self.security.ensure_bytes(self.get_local_user_profile(self.session.current_user).get("vault_salt"))
@@ -925,49 +1421,29 @@ class SecretsManager:
         if user_manager and self.session.current_user_id:
              try: cloud_accesses = user_manager.get_cloud_vault_accesses(self.session.current_user_id)
              except Exception: pass
+        cloud_by_vault = {str(c['vault_id']).lower(): c for c in cloud_accesses}
 
+        # Plan: blob local primero, copia de la nube como rescate
+        plan_input = []
         for acc in all_accesses:
-            v_id = acc['vault_id']
-            try:
-                m_key = self._acquire_master_key_for_rotation(v_id, old_password, salt_candidates, cloud_accesses, user_manager, acc)
-                if m_key:
-                    new_wrap = self.security.wrap_key(m_key, new_password, new_v_salt)
-                    rehashed_vaults.append((v_id, new_wrap, acc.get('access_level', 'member')))
-            except Exception as e:
-                logger.error(f"Failed to re-wrap vault {v_id}: {e}")
+            match = cloud_by_vault.get(str(acc['vault_id']).lower())
+            blobs = [self.security.ensure_bytes(acc.get('wrapped_master_key'))]
+            if match: blobs.append(self.security.ensure_bytes(match.get('wrapped_master_key') or match.get('wrapped_vault_key')))
+            plan_input.append({"vault_id": acc['vault_id'], "access_level": acc.get('access_level', 'member'), "blobs": blobs})
+
+        # Active Session Key: la bóveda abierta no necesita derivación
+        known = {}
+        if self.session.current_vault_id and self.session.vault_key:
+            known[str(self.session.current_vault_id).lower()] = bytes(self.session.vault_key)
+
+        engine = KeyRotationEngine(old_password, new_password, new_v_salt, progress_callback=progress_callback)
+        rehashed_vaults = engine.rotate(engine.plan(plan_input, salt_candidates, known))
+        logger.info(f"[Auth] Rotated {len(rehashed_vaults)}/{len(plan_input)} vault keys ({engine.derivations} KDF derivations).")
 
         # Ensure active vault is secure
         self._ensure_active_vault_rotation(rehashed_vaults, new_password, new_v_salt)
         return rehashed_vaults
 
-    def _acquire_master_key_for_rotation(self, vault_id: str, password: str, salts: list, 
-                                        cloud_acc: list, user_manager: Optional[Any], acc: dict) -> Optional[bytes]:
-        """Tries all available paths to get the raw master key for re-encryption."""
-        # 1. Active Session Key
-        if vault_id and self.session.current_vault_id and str(vault_id).lower() == str(self.session.current_vault_id).lower():
-            if self.session.vault_key: return bytes(self.session.vault_key)
-
-        # 2. Local Decryption
-        wrapped_blob = self.security.ensure_bytes(acc.get('wrapped_master_key'))
-        for s in salts:
-            try:
-                # unwrap_vault_key returns (key, algorithm)
-                k, algo = self.security.unwrap_key(wrapped_blob, password, s)
-                if k: return k
-            except: continue
-
-        # 3. Cloud Rescue
-        if user_manager:
-            match = next((c for c in cloud_acc if str(c['vault_id']).lower() == str(vault_id).lower()), None)
-            if match:
-                c_blob = self.security.ensure_bytes(match.get('wrapped_master_key') or match.get('wrapped_vault_key'))
-                for s in salts:
-                    try:
-                        k, algo = self.security.unwrap_key(c_blob, password, s)
-                        if k: return k
-                    except: continue
-        return None
-
     def _ensure_active_vault_rotation(self, rehashed_vaults: list, password: str, salt: bytes) -> None:
         """Guarantees that at least the active vault key is rotated successfully."""
         target_v_id = str(self.session.current_vault_id).lower() if self.session.current_vault_id else None
@@ -996,27 +1472,20 @@ class SecretsManager:
             cloud_map = [(v_id, w_key.hex()) for v_id, w_key, lvl in rehashed_vaults]
             user_manager.update_bulk_vault_access(self.session.current_user_id, cloud_map)
         
-        # 2. Local Update
-        for v_id, new_wrap, lvl in rehashed_vaults:
-             self.users.save_vault_access(v_id, new_wrap, lvl, synced=1)
-        
+        # 2. Local Update (vault accesses + profile in one transaction)
         # Determine active vault key for profile redundancy
         active_w_key = next((w for i, w, l in rehashed_vaults if str(i).lower() == str(self.session.current_vault_id).lower()), None)
 
-        self.save_local_user_profile(
-            self.session.current_user, new_hash, new_salt, new_v_salt,
-            role=self.session.user_role,
-            vault_id=self.session.current_vault_id,
-            protected_key=new_protected_key,
-            wrapped_vault_key=active_w_key,
-            user_id=self.session.current_user_id
-        )
+        self.users.apply_key_rotation(self.session.current_user, {
+            "password_hash": new_hash, "salt": new_salt, "vault_salt": new_v_salt,
+            "protected_key": new_protected_key, "wrapped_vault_key": active_w_key, "kdf_version": 1,
+        }, rehashed_vaults, synced=1)
 
     def _finalize_password_change(self, password, salt, rehashed_vaults):
         """Updates the active session with the new credentials."""
         # [GOD-LEVEL] Argon2id KEK derivation for session
         if CryptoEngine.ARGON2_AVAILABLE:
-            self.session.master_key = CryptoEngine.derive_kek_argon2id(password, salt)
+            self.session.master_key = CryptoEngine._derive_for_params(CryptoEngine.argon2_params(), password, salt)
         else:
             self.session.master_key = self.security.derive_keke(password, salt)
         
@@ -1033,6 +1502,7 @@ class SecretsManager:
 
         self.log_event("CHANGE PASSWORD", details="User password and vault keys rotated")
 
+    @KekMemo.scoped
     def admin_reset_user_identity(self, target_username: str, new_password: str, user_manager: Optional[Any] = None, progress_callback: Optional[Any] = None) -> None:
         """
         [ADMIN PROTOCOL - SMART UNIFIED RESET] 
@@ -1059,32 +1529,24 @@ class SecretsManager:
         
         # 3. ROBUST VAULT RE-WRAPPING
         all_accesses = self.users.get_all_vault_accesses()
-        rehashed_vaults = []
         
-        for acc in all_accesses:
-            v_id = acc['vault_id']
-            try:
-                m_key = None
-                # Path 1: Session Memory (Strongest)
-                if v_id and self.session.current_vault_id and str(v_id).lower() == str(self.session.current_vault_id).lower():
-                    if self.session.vault_key: 
-                        m_key = bytes(self.session.vault_key)
-                
-                # Path 2: Local DB Fallback (Si el admin no tiene la llave en RAM pero sí en su DB local)
-                if not m_key:
-                    va_local = self.users.get_vault_access(v_id)
-                    if va_local and va_local.get("wrapped_master_key"):
-                        # NOTA: Esto solo funcionará si el admin tiene acceso a esta bóveda también
-                        # y su llave está activa. 
-                        if self.session.vault_key:
-                            m_key = bytes(self.session.vault_key)
-
-                if m_key:
-                    new_wrap = self.security.wrap_key(m_key, new_password, new_v_salt)
-                    rehashed_vaults.append((v_id, new_wrap, acc.get('access_level', 'member')))
-                    logger.info(f"Vault {v_id} re-wrapped for {target_username}")
-            except Exception as e:
-                logger.error(f"Admin reset failed to re-wrap vault {v_id}: {e}")
+        # Path 1: Session Memory (Strongest) / Path 2: Local DB Fallback
+        # NOTA: Path 2 solo funciona si el admin tiene acceso a esta bóveda también y su llave está activa.
+        known = {}
+        if self.session.vault_key:
+            for acc in all_accesses:
+                v_id = acc['vault_id']
+                is_active = v_id and self.session.current_vault_id and str(v_id).lower() == str(self.session.current_vault_id).lower()
+                if is_active or acc.get("wrapped_master_key"):
+                    known[str(v_id).lower()] = bytes(self.session.vault_key)
+
+        # El re-wrap ocupa el tramo 0-20% de la barra; la sincronización cloud reporta el resto
+        vault_progress = (lambda done, total, ok, err: progress_callback(int(done * 20 / total), 100, ok, err)) if progress_callback else None
+        engine = KeyRotationEngine(None, new_password, new_v_salt, progress_callback=vault_progress)
+        plan = engine.plan([{"vault_id": a['vault_id'], "access_level": a.get('access_level', 'member')} for a in all_accesses], [], known)
+        rehashed_vaults = engine.rotate(plan)
+        for v_id, _, _ in rehashed_vaults:
+            logger.info(f"Vault {v_id} re-wrapped for {target_username}")
 
         # 4. Atomic Sync to Cloud
         if user_manager:
@@ -1116,12 +1578,11 @@ class SecretsManager:
         if is_self_reset:
              self.session.master_key = self.security.derive_keke(new_password, new_v_salt)
              self.session.personal_key = target_personal_key
-             self.users.db.execute("UPDATE users SET password_hash = ?, salt = ?, vault_salt = ?, protected_key = ? WHERE UPPER(username) = ?",
-                                  (new_hash, new_salt, sqlite3.Binary(new_v_salt), sqlite3.Binary(new_protected_key), target_username.upper()))
-             # También actualizar acceso local
-             for v_id, w_key, lvl in rehashed_vaults:
-                  self.users.save_vault_access(v_id, w_key, access_level=lvl, synced=1, force=True)
-             self.users.db.commit()
+             # Perfil + accesos locales en una sola transacción
+             self.users.apply_key_rotation(target_username, {
+                 "password_hash": new_hash, "salt": new_salt,
+                 "vault_salt": new_v_salt, "protected_key": new_protected_key,
+             }, rehashed_vaults, synced=1)
 
         self.log_event("ADMIN_RESET_PASSWORD", details=f"Identity and vaults for {target_username} rotated via Admin Console.")
 
@@ -1221,12 +1682,10 @@ class SecretsManager:
             p_key_blob = self.security.ensure_bytes(profile.get("protected_key"))
             
             if p_key_blob and len(p_key_blob) >= 28:
-                nonce = p_key_blob[:12]
-                ciphertext = p_key_blob[12:]
                 for salt in salts_to_try:
                     try:
                         old_kek = CryptoEngine.derive_kek_from_password(old_password, salt, iterations=100_000)
-                        rescued_personal = AESGCM(old_kek).decrypt(nonce, ciphertext, None)
+                        rescued_personal = CryptoEngine.open_with_kek(p_key_blob, old_kek)
                         logger.info("[Forensic] Personal key rescued!")
                         break
                     except: continue
@@ -0,0 +1,36 @@
+import os
+import logging
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def atomic_writer(file_path: Any, prefix: str = ".tmp_", suffix: str = "") -> Iterator[BinaryIO]:
+    """
+    [ANTI-CORRUPTION] Atomic Rename: se escribe en un temporal del mismo directorio,
+    fsync, y os.replace sobre el destino solo si el bloque termina sin excepción.
+    El destino nunca queda a medio escribir.
+    """
+    path = Path(file_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(dir=path.parent, prefix=prefix, suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+            f.flush()
+            # Ensure it's physically written to disk
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.unlink(tmp_file)
+        raise
+
+
+def write_atomic(file_path: Any, data: bytes, prefix: str = ".tmp_", suffix: str = "") -> None:
+    with atomic_writer(file_path, prefix, suffix) as f:
+        f.write(data)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Archivo de auditoría por segmentos encadenados
+==============================================
+
+La tabla security_audit solo conserva el tramo "caliente". Los eventos ya subidos
+a la nube y más antiguos que la política de retención se mueven aquí en segmentos
+comprimidos e inmutables:
+
+    <root>/segments/<first_id>-<last_id>.seg   zlib(JSON): cabecera + filas
+    <root>/chain.json                          índice: hash, rango de ids y fechas
+
+Cada segmento guarda en su cabecera el SHA-256 del segmento anterior ("prev"), así
+que modificar, borrar o reordenar cualquiera rompe la cadena (verify()). El hash de
+la cabeza se guarda además en la base (meta) para detectar que se reescribió el
+archivo entero. prune() elimina segmentos antiguos y ancla la cadena en el "prev"
+del primero que queda.
+"""
+
+import json
+import zlib
+import hashlib
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.infrastructure.storage.atomic_file import write_atomic
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_VERSION = 1
+GENESIS = "0" * 64
+SEGMENT_SUFFIX = ".seg"
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    hot_days: días que un evento ya sincronizado permanece en security_audit.
+    noise_days: ídem para las acciones de alto volumen (latidos), que se compactan antes.
+    archive_days: días que se conservan los segmentos archivados (0 = siempre).
+    """
+    hot_days: int = 90
+    noise_days: int = 7
+    archive_days: int = 0
+    segment_rows: int = 5000
+    noise_actions: Tuple[str, ...] = ("HEARTBEAT",)
+
+    # Claves de meta (por bóveda) que sobrescriben los valores por defecto
+    META_KEYS = {"hot_days": "audit_hot_days", "noise_days": "audit_noise_days", "archive_days": "audit_archive_days"}
+
+    @classmethod
+    def from_meta(cls, get_meta: Callable[[str], Optional[str]]) -> "RetentionPolicy":
+        policy = cls()
+        for field, key in cls.META_KEYS.items():
+            try:
+                value = get_meta(key)
+                if value not in (None, ""): setattr(policy, field, max(0, int(value)))
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Ignoring invalid retention setting {key}: {e}")
+        # Un latido nunca vive más que un evento normal
+        policy.noise_days = min(policy.noise_days, policy.hot_days)
+        return policy
+
+
+class AuditArchive:
+    def __init__(self, root: Any) -> None:
+        self.root = Path(root)
+        self.segments_dir = self.root / "segments"   # se crea con el primer segmento
+        self.chain_path = self.root / "chain.json"
+
+    # --- ÍNDICE ---
+    def _load_chain(self) -> Dict[str, Any]:
+        if not self.chain_path.exists():
+            return {"version": ARCHIVE_VERSION, "anchor": GENESIS, "segments": []}
+        return json.loads(self.chain_path.read_text(encoding="utf-8"))
+
+    def _save_chain(self, chain: Dict[str, Any]) -> None:
+        write_atomic(self.chain_path, json.dumps(chain, indent=1).encode("utf-8"))
+
+    def segments(self) -> List[Dict[str, Any]]:
+        return self._load_chain()["segments"]
+
+    def head(self) -> str:
+        """Hash del último segmento (GENESIS si el archivo está vacío)."""
+        chain = self._load_chain()
+        return chain["segments"][-1]["hash"] if chain["segments"] else chain["anchor"]
+
+    # --- ESCRITURA ---
+    def append(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Sella las filas (ordenadas por id) en un segmento nuevo enlazado al último."""
+        if not rows: raise ValueError("Empty audit segment")
+        chain = self._load_chain()
+        prev = chain["segments"][-1]["hash"] if chain["segments"] else chain["anchor"]
+        header = {
+            "version": ARCHIVE_VERSION, "prev": prev, "count": len(rows),
+            "first_id": rows[0]["id"], "last_id": rows[-1]["id"],
+            "from_ts": min(r["timestamp"] or 0 for r in rows), "to_ts": max(r["timestamp"] or 0 for r in rows),
+        }
+        blob = zlib.compress(json.dumps({**header, "rows": rows}, ensure_ascii=False).encode("utf-8"), 9)
+        name = f"{header['first_id']:012d}-{header['last_id']:012d}{SEGMENT_SUFFIX}"
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        # El segmento se publica antes que el índice: un corte deja a lo sumo un archivo huérfano
+        write_atomic(self.segments_dir / name, blob)
+        entry = {"name": name, "hash": hashlib.sha256(blob).hexdigest(), "bytes": len(blob),
+                 **{k: header[k] for k in ("prev", "count", "first_id", "last_id", "from_ts", "to_ts")}}
+        chain["segments"].append(entry)
+        self._save_chain(chain)
+        return entry
+
+    # --- LECTURA ---
+    def _read_segment(self, entry: Dict[str, Any]) -> Tuple[bytes, Dict[str, Any]]:
+        blob = (self.segments_dir / entry["name"]).read_bytes()
+        return blob, json.loads(zlib.decompress(blob))
+
+    def read(self, name: str) -> List[Dict[str, Any]]:
+        entry = next((s for s in self.segments() if s["name"] == name), None)
+        if entry is None: raise FileNotFoundError(name)
+        blob, payload = self._read_segment(entry)
+        if hashlib.sha256(blob).hexdigest() != entry["hash"]:
+            raise ValueError(f"Audit segment {name} does not match its chained hash")
+        return payload["rows"]
+
+    def last_segment_ids(self) -> List[int]:
+        """Ids del último segmento (recuperación de un archivado interrumpido antes del DELETE)."""
+        segments = self.segments()
+        if not segments: return []
+        try:
+            return [r["id"] for r in self._read_segment(segments[-1])[1]["rows"]]
+        except Exception as e:
+            logger.warning(f"Could not read last audit segment: {e}")
+            return []
+
+    def verify(self, expected_head: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Recorre la cadena: cada archivo debe coincidir con su hash y enlazar con el anterior.
+        expected_head: cabeza registrada en la base. Debe seguir en la cadena (detecta un archivo
+        reescrito o truncado); puede no ser la última si una pasada se cortó antes de registrarla.
+        """
+        chain = self._load_chain()
+        prev = chain["anchor"]
+        for entry in chain["segments"]:
+            try:
+                blob, payload = self._read_segment(entry)
+            except Exception as e:
+                return {"ok": False, "segments": len(chain["segments"]), "broken": entry["name"], "reason": f"unreadable: {e}"}
+            if hashlib.sha256(blob).hexdigest() != entry["hash"]:
+                reason = "hash mismatch"
+            elif payload.get("prev") != prev or entry["prev"] != prev:
+                reason = "chain link mismatch"
+            elif payload.get("count") != len(payload.get("rows", [])):
+                reason = "row count mismatch"
+            else:
+                prev = entry["hash"]
+                continue
+            return {"ok": False, "segments": len(chain["segments"]), "broken": entry["name"], "reason": reason}
+        if expected_head and expected_head not in {chain["anchor"], *(e["hash"] for e in chain["segments"])}:
+            return {"ok": False, "segments": len(chain["segments"]), "broken": None, "reason": "head mismatch"}
+        return {"ok": True, "segments": len(chain["segments"]), "broken": None, "reason": None}
+
+    # --- CADUCIDAD ---
+    def prune(self, before_ts: int) -> int:
+        """Borra los segmentos cuyo evento más reciente es anterior a before_ts (siempre desde el inicio)."""
+        chain = self._load_chain()
+        removed = []
+        while chain["segments"] and chain["segments"][0]["to_ts"] < before_ts:
+            removed.append(chain["segments"].pop(0))
+        if not removed: return 0
+        chain["anchor"] = removed[-1]["hash"]
+        self._save_chain(chain)
+        for entry in removed:
+            path = self.segments_dir / entry["name"]
+            if path.exists(): path.unlink()
+        return len(removed)
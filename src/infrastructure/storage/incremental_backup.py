@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Backups locales incrementales por páginas
+=========================================
+
+Cada snapshot copia la base con la API de backup online de SQLite (consistente
+sin cerrar la conexión) y la recorre página a página. Cada página se identifica
+por un HMAC de su contenido: las que ya están en el almacén no se vuelven a
+escribir. Las nuevas se comprimen, se cifran con AES-GCM y se añaden a un único
+pack por snapshot.
+
+    <root>/keyring.json               llave de datos envuelta con cada llave de sesión
+    <root>/packs/<snapshot>.pack      páginas nuevas del snapshot (nonce | ct+tag)
+    <root>/packs/<snapshot>.idx       id -> (offset, longitud) de ese pack, cifrado
+    <root>/snapshots/<snapshot>.enc   manifest cifrado: metadatos + id de cada página
+
+Restaurar reensambla cualquier snapshot, verifica el SHA-256 del archivo completo
+y lo publica con un rename atómico. prune() borra snapshots antiguos y los packs
+que ya no referencia ninguno de los que quedan.
+"""
+
+import os
+import hmac
+import json
+import zlib
+import time
+import sqlite3
+import struct
+import hashlib
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from src.infrastructure.storage.atomic_file import atomic_writer, write_atomic
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+ID_SIZE = 16
+NONCE_SIZE = 12
+MANIFEST_SUFFIX = ".enc"
+_IDX_ENTRY = struct.Struct(f">{ID_SIZE}sQI")
+_RAW, _ZLIB = b"r", b"z"
+
+
+def _hkdf(key: bytes, info: bytes) -> bytes:
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=info).derive(bytes(key))
+
+
+class IncrementalBackupStore:
+    """
+    Almacén de snapshots de un archivo SQLite. keys: llaves de sesión candidatas
+    (vault/personal/master); cualquiera que ya envolvió la llave de datos abre el
+    almacén, y las que aún no la envuelven se añaden al keyring.
+    """
+
+    def __init__(self, root: Any, keys: List[Any]) -> None:
+        self.root = Path(root)
+        self.packs_dir = self.root / "packs"
+        self.snapshots_dir = self.root / "snapshots"
+        self.packs_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+        dek = self._load_data_key([bytes(k) for k in keys if k and len(k) == 32])
+        self._aead = AESGCM(dek)
+        self._mac_key = _hkdf(dek, b"vultrax-backup-page-id")
+
+    # --- KEYRING ---
+    def _load_data_key(self, keys: List[bytes]) -> bytes:
+        if not keys: raise ValueError("No hay llaves de sesión para abrir los backups")
+        path = self.root / "keyring.json"
+        ring = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {"version": STORE_VERSION, "wraps": {}}
+        keks = {hashlib.sha256(kek).hexdigest()[:16]: kek for kek in (_hkdf(k, b"vultrax-backup-kek") for k in keys)}
+
+        dek = None
+        for fp, blob in ring["wraps"].items():
+            if fp not in keks: continue
+            raw = bytes.fromhex(blob)
+            try:
+                dek = AESGCM(keks[fp]).decrypt(raw[:NONCE_SIZE], raw[NONCE_SIZE:], b"vultrax-backup-dek")
+                break
+            except InvalidTag:
+                logger.warning(f"[Backup] Keyring entry {fp} does not open with its key")
+        if dek is None:
+            if ring["wraps"]: raise ValueError("Ninguna llave de la sesión abre este almacén de backups")
+            dek = os.urandom(32)
+
+        # Envolver con las llaves nuevas (p. ej. tras rotar el vault key) mantiene abiertos los snapshots antiguos
+        missing = [fp for fp in keks if fp not in ring["wraps"]]
+        if missing:
+            for fp in missing:
+                nonce = os.urandom(NONCE_SIZE)
+                ring["wraps"][fp] = (nonce + AESGCM(keks[fp]).encrypt(nonce, dek, b"vultrax-backup-dek")).hex()
+            write_atomic(path, json.dumps(ring, indent=2).encode("utf-8"), prefix=".keyring_")
+        return dek
+
+    # --- SELLADO ---
+    def _page_id(self, page: bytes) -> bytes:
+        return hmac.new(self._mac_key, page, hashlib.sha256).digest()[:ID_SIZE]
+
+    def _seal(self, data: bytes, aad: bytes) -> bytes:
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + self._aead.encrypt(nonce, data, aad)
+
+    def _open(self, blob: bytes, aad: bytes) -> bytes:
+        try: return self._aead.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], aad)
+        except InvalidTag: raise ValueError("Backup dañado o manipulado")
+
+    def _seal_page(self, pid: bytes, page: bytes) -> bytes:
+        packed = zlib.compress(page, 6)
+        payload = _ZLIB + packed if len(packed) < len(page) else _RAW + page
+        return self._seal(payload, pid)
+
+    def _open_page(self, pid: bytes, blob: bytes) -> bytes:
+        payload = self._open(blob, pid)
+        page = zlib.decompress(payload[1:]) if payload[:1] == _ZLIB else payload[1:]
+        if not hmac.compare_digest(self._page_id(page), pid): raise ValueError("Página de backup alterada")
+        return page
+
+    # --- ÍNDICE DE PÁGINAS ---
+    def _page_locations(self, unreadable: Optional[Set[str]] = None) -> Dict[bytes, Tuple[str, int, int]]:
+        """
+        id de página -> (pack, offset, longitud) para todos los packs del almacén.
+        unreadable: recibe los packs cuyo índice no se pudo abrir (sus páginas no aparecen).
+        """
+        locations: Dict[bytes, Tuple[str, int, int]] = {}
+        for idx in sorted(self.packs_dir.glob("*.idx")):
+            pack = idx.stem
+            try: raw = self._open(idx.read_bytes(), b"idx:" + pack.encode())
+            except (OSError, ValueError) as e:
+                logger.error(f"[Backup] Unreadable pack index {idx.name}: {e}")
+                if unreadable is not None: unreadable.add(pack)
+                continue
+            for pid, off, length in _IDX_ENTRY.iter_unpack(raw):
+                locations.setdefault(pid, (pack, off, length))
+        return locations
+
+    # --- SNAPSHOTS ---
+    def snapshot(self, conn: sqlite3.Connection, label: str = "") -> Dict[str, Any]:
+        """Copia conn con la API de backup y guarda solo las páginas que el almacén no tiene."""
+        snap_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        tmp_db = self.root / f".snapshot_{snap_id}.db"
+        dst = sqlite3.connect(str(tmp_db))
+        try:
+            conn.backup(dst)
+            page_size = dst.execute("PRAGMA page_size").fetchone()[0]
+        finally:
+            dst.close()
+
+        known = self._page_locations()
+        new: Dict[bytes, Tuple[int, int]] = {}
+        ids = bytearray()
+        digest = hashlib.sha256()
+        size, written = 0, 0
+        pack_path = self.packs_dir / f"{snap_id}.pack"
+        try:
+            with open(tmp_db, "rb") as src, atomic_writer(pack_path, prefix=".pack_") as pack:
+                while True:
+                    page = src.read(page_size)
+                    if not page: break
+                    digest.update(page)
+                    size += len(page)
+                    pid = self._page_id(page)
+                    ids += pid
+                    if pid in known or pid in new: continue
+                    blob = self._seal_page(pid, page)
+                    new[pid] = (pack.tell(), len(blob))
+                    pack.write(blob)
+                    written += len(blob)
+        finally:
+            os.remove(tmp_db)
+
+        if new:
+            entries = b"".join(_IDX_ENTRY.pack(pid, off, length) for pid, (off, length) in new.items())
+            write_atomic(self.packs_dir / f"{snap_id}.idx", self._seal(entries, b"idx:" + snap_id.encode()), prefix=".idx_")
+        else:
+            pack_path.unlink()
+
+        manifest = {"version": STORE_VERSION, "id": snap_id, "created_at": int(time.time()), "label": label,
+                    "page_size": page_size, "pages": len(ids) // ID_SIZE, "size": size, "sha256": digest.hexdigest(),
+                    "new_pages": len(new), "bytes_written": written}
+        header = json.dumps(manifest).encode("utf-8")
+        path = self.snapshots_dir / f"{snap_id}{MANIFEST_SUFFIX}"
+        # El manifest se publica el último: un snapshot interrumpido deja a lo sumo un pack huérfano (prune lo limpia)
+        write_atomic(path, self._seal(struct.pack(">I", len(header)) + header + bytes(ids), b"manifest:" + snap_id.encode()),
+                     prefix=".manifest_")
+        manifest["path"] = str(path)
+        logger.info(f"[Backup] Snapshot {snap_id}: {manifest['pages']} pages, {len(new)} new ({written} bytes)")
+        return manifest
+
+    def _read_manifest(self, snap_id: str) -> Tuple[Dict[str, Any], bytes]:
+        path = self.snapshots_dir / f"{snap_id}{MANIFEST_SUFFIX}"
+        if not path.exists(): raise FileNotFoundError(f"Snapshot not found: {snap_id}")
+        raw = self._open(path.read_bytes(), b"manifest:" + snap_id.encode())
+        (hlen,) = struct.unpack_from(">I", raw)
+        return json.loads(raw[4:4 + hlen]), raw[4 + hlen:]
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """Metadatos de cada snapshot legible, del más antiguo al más reciente."""
+        out = []
+        for path in sorted(self.snapshots_dir.glob(f"*{MANIFEST_SUFFIX}")):
+            try:
+                manifest, _ = self._read_manifest(path.stem)
+                out.append(dict(manifest, path=str(path)))
+            except ValueError as e:
+                logger.error(f"[Backup] Skipping unreadable snapshot {path.name}: {e}")
+        return out
+
+    def restore(self, snap_id: str, target: Any) -> Dict[str, Any]:
+        """Reensambla el snapshot en target (escritura atómica). ValueError si algo no cuadra."""
+        manifest, ids = self._read_manifest(snap_id)
+        locations = self._page_locations()
+        digest = hashlib.sha256()
+        handles: Dict[str, Any] = {}
+        try:
+            with atomic_writer(target, prefix=".restore_") as out:
+                last: Tuple[Optional[bytes], bytes] = (None, b"")
+                for i in range(0, len(ids), ID_SIZE):
+                    pid = ids[i:i + ID_SIZE]
+                    if pid != last[0]:
+                        if pid not in locations: raise ValueError(f"Falta la página {i // ID_SIZE} del snapshot {snap_id}")
+                        pack, off, length = locations[pid]
+                        f = handles.get(pack) or handles.setdefault(pack, open(self.packs_dir / f"{pack}.pack", "rb"))
+                        f.seek(off)
+                        last = (pid, self._open_page(pid, f.read(length)))
+                    out.write(last[1])
+                    digest.update(last[1])
+                if digest.hexdigest() != manifest["sha256"]:
+                    raise ValueError(f"El snapshot {snap_id} no reproduce el archivo original")
+        finally:
+            for f in handles.values(): f.close()
+        return manifest
+
+    def prune(self, keep: int) -> Dict[str, int]:
+        """
+        Conserva los keep snapshots más recientes y borra los packs que ninguno referencia.
+        Un pack cuyo índice no se puede leer se conserva: no hay forma de saber qué contiene.
+        """
+        snapshots = sorted(self.snapshots_dir.glob(f"*{MANIFEST_SUFFIX}"))
+        removed = 0
+        for path in snapshots[:max(0, len(snapshots) - keep)]:
+            path.unlink()
+            removed += 1
+
+        referenced = set()
+        for path in self.snapshots_dir.glob(f"*{MANIFEST_SUFFIX}"):
+            _, ids = self._read_manifest(path.stem)
+            referenced.update(ids[i:i + ID_SIZE] for i in range(0, len(ids), ID_SIZE))
+        unreadable: Set[str] = set()
+        live_packs = {pack for pid, (pack, _, _) in self._page_locations(unreadable).items() if pid in referenced}
+        if unreadable:
+            logger.warning(f"[Backup] Keeping {len(unreadable)} pack(s) with unreadable index: {sorted(unreadable)}")
+        live_packs |= unreadable
+
+        packs = 0
+        for pack in self.packs_dir.glob("*.pack"):
+            if pack.stem in live_packs: continue
+            pack.unlink()
+            idx = pack.with_suffix(".idx")
+            if idx.exists(): idx.unlink()
+            packs += 1
+        return {"snapshots": removed, "packs": packs}
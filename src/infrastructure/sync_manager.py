@@ -1,14 +1,19 @@
 import time
 import json
+import random
 import base64
 import logging
 import threading
-import os
-import tempfile
-from pathlib import Path
-from contextlib import contextmanager
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextlib import contextmanager, nullcontext
 from typing import List, Dict, Any, Optional
+from urllib.parse import quote
 from src.infrastructure.remote_storage_client import RemoteStorageClient
+from src.infrastructure.connectivity_monitor import get_connectivity_monitor
+from src.infrastructure.storage.atomic_file import write_atomic
+from src.domain.services.audit_timeline_service import classify_action
 
 logger = logging.getLogger(__name__)
 
@@ -42,13 +47,55 @@ class VaultRWLock:
             yield
 
 # Global lock for sync operations
+# Escritores que lo toman: las fases locales del sync, el CRUD de secretos de SecretsManager
+# (add/update/delete/hard_delete/restore/purga de privados), cada bloque de bulk_add_secrets
+# (importaciones), la migración KDF y la retención de auditoría. Escriben SIN él y pueden
+# intercalarse con un sync sobre la conexión compartida: UserManager (altas, bajas y roles),
+# la cola pending_deletes y el borrado del visor de auditoría desde la UI, y set_meta.
+# La auditoría (log_event) tiene su propio búfer y no lo necesita.
 _vault_lock = VaultRWLock()
 
 class SyncManager:
-    def __init__(self, secrets_manager, supabase_url, supabase_key):
+    # Workers HTTP concurrentes por sync (1 = modo secuencial). Los workers solo hacen HTTP:
+    # las escrituras SQLite del propio sync quedan en este hilo bajo _vault_lock (ver arriba
+    # qué otros escritores lo respetan); solo se solapan las esperas de red.
+    MAX_WORKERS = 4
+
+    # Heartbeat combinado (presencia + revocación en un solo POST, ver scripts/migration_session_heartbeat.sql)
+    HEARTBEAT_RPC = "session_heartbeat"
+    HEARTBEAT_INTERVAL = 30          # s, usuario activo
+    HEARTBEAT_IDLE_AFTER = 300       # s sin actividad para considerar la sesión ociosa
+    HEARTBEAT_IDLE_INTERVAL = 120
+    HEARTBEAT_LOCKED_INTERVAL = 300
+    KICK_WINDOW = 900                # Solo cuentan expulsiones recientes, para permitir re-ingreso
+    PUBLIC_IP_TTL = 1800
+    PUBLIC_IP_RETRY = 300            # TTL de un fallo de descubrimiento (evita 3 s de timeout por latido)
+
+    # Presencia (una fila por usuario@dispositivo, ver scripts/migration_session_presence.sql)
+    PRESENCE_TABLE = "session_presence"
+    SESSIONS_PAGE_SIZE = 50
+    SESSION_WINDOW = 900             # El latido de una sesión bloqueada llega cada ~300 s
+    ACTIVE_WINDOW = 300
+
+    # Línea de tiempo de auditoría (keyset por timestamp, id; ver scripts/migration_audit_timeline.sql)
+    AUDIT_PAGE_SIZE = 100
+    AUDIT_SCAN_PAGES = 5             # Sin columna category: páginas crudas como máximo por página filtrada
+    AUDIT_SEARCH_FIELDS = ("user_name", "action", "service", "details", "status", "device_info")
+
+    def __init__(self, secrets_manager, supabase_url, supabase_key, max_workers=None):
         self.sm = secrets_manager
-        self.client = RemoteStorageClient(supabase_url, supabase_key)
+        self.max_workers = max(1, int(max_workers or self.MAX_WORKERS))
+        # Estado de red compartido: las peticiones reales de este cliente alimentan el monitor (salud pasiva)
+        self.connectivity = get_connectivity_monitor(supabase_url)
+        self.client = RemoteStorageClient(supabase_url, supabase_key, pool_size=self.max_workers * 2, monitor=self.connectivity)
         self.table = "secrets"
+        self.connectivity.attach_probes(self.client.check_internet, lambda: self.client.check_supabase(self.table))
+        self._heartbeat_rpc = True   # False si el backend aún no tiene la función: protocolo antiguo
+        self._presence_table = True  # Ídem para session_presence: se agrupa security_audit en el cliente
+        self._audit_category = True  # Ídem para security_audit.category: se clasifica en el cliente
+        self._audit_critical = True  # Ídem para security_audit.critical: se cuentan las filas cargadas
+        self._server_cursor = True   # Ídem para secrets.server_updated_at: el cursor delta usa updated_at
+        self._public_ip = None       # (ip, expira_en)
         self.audit_table = "security_audit"
         self._refresh_identity_headers()
 
@@ -60,7 +107,8 @@ class SyncManager:
         self.client._refresh_identity_headers(user, u_id, v_id, role)
 
     def check_internet(self):
-        return self.client.check_internet()
+        """Estado cacheado del monitor compartido; solo sondea si la última evidencia caducó."""
+        return self.connectivity.is_online()
 
     def sync_pending_users(self):
         """Sincroniza usuarios creados offline (synced=0) a Supabase."""
@@ -167,39 +215,35 @@ class SyncManager:
         
         try:
             # Get pending deletes
-            cursor = self.sm.conn.execute("SELECT id, cloud_id FROM pending_deletes")
-            pending = cursor.fetchall()
+            with _vault_lock.read():
+                pending = self.sm.conn.execute("SELECT id, cloud_id FROM pending_deletes").fetchall()
             
             if not pending:
                 return 0
             
-            synced_count = 0
-            for row in pending:
-                delete_id, cloud_id = row
-                try:
-                    # Delete from Supabase
-                    self.client.delete_record(self.table, cloud_id)
-                    logger.info(f"[Delete Sync] Deleted cloud record {cloud_id}")
-                    
-                    # Remove from pending_deletes
-                    self.sm.conn.execute("DELETE FROM pending_deletes WHERE id=?", (delete_id,))
-                    self.sm.conn.commit()
-                    synced_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"[Delete Sync] Failed to delete {cloud_id}: {e}")
+            # Lotes DELETE ?id=in.(...); un lote rechazado se reintenta fila a fila para aislar el fallido
+            done, failures = [], []
+            for i in range(0, len(pending), self.PUSH_PAGE_SIZE):
+                done += self._push_batch(pending[i:i + self.PUSH_PAGE_SIZE],
+                                         lambda rows: self.client.delete_records(self.table, [c for _, c in rows]), failures)
+            for (_, cloud_id), e in failures:
+                logger.error(f"[Delete Sync] Failed to delete {cloud_id}: {e}")
             
-            if synced_count > 0:
-                logger.info(f"[Delete Sync] Synced {synced_count} offline deletions to cloud")
+            # Remove from pending_deletes (una transacción para todo lo borrado)
+            if done:
+                with _vault_lock.write():
+                    self.sm.conn.executemany("DELETE FROM pending_deletes WHERE id=?", [(d,) for d, _ in done])
+                    self.sm.conn.commit()
+                logger.info(f"[Delete Sync] Synced {len(done)} offline deletions to cloud")
             
-            return synced_count
+            return len(done)
             
         except Exception as e:
             logger.error(f"[Delete Sync] Error in sync_pending_deletes: {e}")
             return 0
 
     def check_supabase(self):
-        return self.client.check_supabase(self.table)
+        return self.connectivity.backend_online()
 
     def _encode_secret(self, nonce_bytes, secret_bytes):
         combined = nonce_bytes + secret_bytes
@@ -220,26 +264,25 @@ class SyncManager:
             if not self.check_internet():
                 raise ConnectionError("No internet connection.")
 
-            local = self.sm.get_all_encrypted()
-            if not local: raise Exception("No local data to backup.")
+            total = self.sm.count_encrypted()
+            if not total: raise Exception("No local data to backup.")
 
             if progress_callback: progress_callback(0, "Initializing backup...")
-            total = len(local)
-            # [GOD-LEVEL OPTIMIZATION] Paginated Backup
+            # [GOD-LEVEL OPTIMIZATION] Streaming Backup: keyset pages, one page in memory at a time
             PAGE_SIZE = 100
-            offset = 0
             uploaded_total = 0
             
-            while True:
-                local_page = self.sm.get_all_encrypted(limit=PAGE_SIZE, offset=offset)
-                if not local_page: break
-                
+            for page_no, local_page in enumerate(self.sm.iter_encrypted(batch=PAGE_SIZE), start=1):
                 if progress_callback:
-                    progress_callback(10 + int((uploaded_total / total) * 80), f"Backing up: Page {offset//PAGE_SIZE + 1}")
+                    progress_callback(10 + int((min(uploaded_total, total) / total) * 80), f"Backing up: Page {page_no}")
                 
                 payload = []
+                new_ids = []
                 for s in local_page:
-                    c_id = s.get("cloud_id") or self._ensure_cloud_id(s)
+                    if not s.get("cloud_id"):
+                        s["cloud_id"] = str(uuid.uuid4())
+                        new_ids.append((s["cloud_id"], s["id"]))
+                    c_id = s["cloud_id"]
                     item = {
                         "id": c_id,
                         "service": s["service"],
@@ -258,12 +301,11 @@ class SyncManager:
                     }
                     payload.append(item)
                 
+                # cloud_ids nuevos de la página en una sola transacción local
+                self.sm.assign_cloud_ids(new_ids)
                 if payload:
                     self.client.post_records(self.table, payload)
                     uploaded_total += len(payload)
-                
-                offset += PAGE_SIZE
-                if len(local_page) < PAGE_SIZE: break
             
             if progress_callback: progress_callback(100, "Backup complete.")
             self.sync_audit_logs()
@@ -277,11 +319,15 @@ class SyncManager:
         self.sm.conn.commit()
         return c_id
 
-    def delete_from_supabase(self, sid):
-        row = self.sm.conn.execute("SELECT cloud_id, owner_name FROM secrets WHERE id = ?", (sid,)).fetchone()
-        if not row: return
-        c_id = row[0] or f"{row[1]}_{sid}"
-        self.client.delete_record(self.table, c_id)
+    def delete_from_supabase(self, sids):
+        """Borra en la nube uno o varios registros locales (ids) con DELETE ?id=in.(...) por lotes."""
+        sids = [sids] if isinstance(sids, int) else list(sids)
+        if not sids: return
+        marks = ",".join("?" * len(sids))
+        rows = self.sm.conn.execute(f"SELECT id, cloud_id, owner_name FROM secrets WHERE id IN ({marks})", sids).fetchall()
+        c_ids = [c_id or f"{owner}_{sid}" for sid, c_id, owner in rows]
+        for i in range(0, len(c_ids), self.PUSH_PAGE_SIZE):
+            self.client.delete_records(self.table, c_ids[i:i + self.PUSH_PAGE_SIZE])
 
     def restore_from_supabase(self, progress_callback=None):
         if hasattr(self.sm, 'session'): self.sm.session.start_operation()
@@ -334,6 +380,12 @@ class SyncManager:
                     self.sm.conn.execute("DELETE FROM secrets")
                     self.sm.conn.execute("INSERT INTO secrets SELECT * FROM secrets_staging")
                     self.sm.conn.execute("COMMIT")
+                    if hasattr(self.sm, 'session'): self.sm.session.record_cache.clear()
+                    if hasattr(self.sm, 'secrets'): self.sm.secrets.notify_change("reset")
+                    # Un restore es una reconciliación completa: el cursor delta parte de aquí
+                    column = self.CURSOR_COLUMN if self._server_cursor and self.CURSOR_COLUMN in remote[0] else "updated_at"
+                    self._write_cursor(self._hwm_name(column), max([0] + [int(s.get(column) or 0) for s in remote]))
+                    self._write_cursor("full_at", int(time.time()))
                     logger.info(f"Atomic restore complete. {total} records swapped.")
                 except Exception as e:
                     self.sm.conn.execute("ROLLBACK")
@@ -356,48 +408,68 @@ class SyncManager:
         try:
             if not self.check_internet(): raise ConnectionError("No internet.")
             self._refresh_identity_headers()
-            # Fetch user profile to get the cloud_user_id and username for _sync_shared_keys
-            username = self.sm.current_user
-            user_profile = {}
-            if username:
-                res = self.client.get_records("users", f"select=id&username=ilike.{username}")
-                if res:
-                    user_profile = res[0]
-
-            if user_profile.get('id'):
-                self._sync_shared_keys(cloud_user_id=user_profile['id'], username=username)
-            else:
-                # Fallback to existing behavior if user profile not found or no ID
-                self._sync_shared_keys(cloud_user_id=cloud_user_id)
-            
-            self.sm.refresh_vault_context()
-            
-            # CRITICAL: Sync pending deletes FIRST (from offline deletions)
-            self.sync_pending_deletes()
+            with self._io_pool() as pool:
+                # Fetches independientes en paralelo: perfil, secretos remotos cambiados y subida de auditoría.
+                # El pull se planifica ANTES del push, así que excluye los cloud_id con cambios locales
+                # pendientes (el push los impone en la nube) y los borrados offline.
+                username = self.sm.current_user
+                f_profile = self._submit(pool, self.client.get_records, "users", f"select=id&username=ilike.{username}") if username else None
+                plan = self._plan_pull()
+                f_remote = self._submit(pool, self._fetch_pull, plan) if plan else None
+                f_audit = self._submit(pool, self.sync_audit_logs)
 
-            if progress_callback: progress_callback(5, "Checking for changes...")
-            
-            # CRITICAL: Push local changes FIRST (including deletes) before pulling from cloud
-            # This prevents deleted records from being re-downloaded
-            local_mine = self.sm.get_all_encrypted(only_mine=True)
-            has_local_changes = any(not r.get("synced") or r.get("deleted") for r in local_mine)
-
-            uploaded = {"success": 0, "failed": 0}
-            if has_local_changes:
-                if progress_callback: progress_callback(30, "Uploading local changes...")
-                uploaded = self._push_local_to_cloud()
-            
-            # THEN pull from cloud (after local deletes are synced)
-            if progress_callback: progress_callback(60, "Downloading cloud changes...")
-            downloaded = self._pull_cloud_to_local()
-            
-            self.sync_audit_logs()
+                user_profile = {}
+                if f_profile:
+                    res = f_profile.result()
+                    if res:
+                        user_profile = res[0]
+
+                if user_profile.get('id'):
+                    self._sync_shared_keys(cloud_user_id=user_profile['id'], username=username, pool=pool)
+                else:
+                    # Fallback to existing behavior if user profile not found or no ID
+                    self._sync_shared_keys(cloud_user_id=cloud_user_id, pool=pool)
+                
+                self.sm.refresh_vault_context()
+                
+                # CRITICAL: Sync pending deletes FIRST (from offline deletions)
+                self.sync_pending_deletes()
+
+                if progress_callback: progress_callback(5, "Checking for changes...")
+                
+                # CRITICAL: Push local changes (including deletes) before applying cloud changes
+                with _vault_lock.read():
+                    has_local_changes = self.sm.count_encrypted(only_mine=True, unsynced_only=True) > 0
+
+                uploaded = {"success": 0, "failed": 0}
+                if has_local_changes:
+                    if progress_callback: progress_callback(30, "Uploading local changes...")
+                    uploaded = self._push_local_to_cloud(pool=pool)
+                
+                # THEN apply cloud changes (fetched concurrently, filtered against local pending work)
+                if progress_callback: progress_callback(60, "Downloading cloud changes...")
+                downloaded = self._apply_pull(plan, f_remote.result()) if plan else 0
+                
+                f_audit.result()
             if progress_callback: progress_callback(100, f"Sync finished. ↑{uploaded['success']} ↓{downloaded}")
             return {"uploaded": uploaded["success"], "downloaded": downloaded, "errors": uploaded["failed"]}
         finally:
             if hasattr(self.sm, 'session'): self.sm.session.end_operation()
 
-    def _sync_shared_keys(self, cloud_user_id=None, username=None):
+    def _io_pool(self):
+        """Pool acotado de workers HTTP; con max_workers=1 todo corre en el hilo de sync (modo secuencial)."""
+        if self.max_workers <= 1: return nullcontext()
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="vault-sync")
+
+    @staticmethod
+    def _submit(pool, fn, *args):
+        if pool is not None: return pool.submit(fn, *args)
+        future = Future()
+        try: future.set_result(fn(*args))
+        except Exception as e: future.set_exception(e)
+        return future
+
+    def _sync_shared_keys(self, cloud_user_id=None, username=None, pool=None):
         try:
             u_id = cloud_user_id
             active_user = username or self.sm.current_user
@@ -412,13 +484,20 @@ class SyncManager:
             # This prevents "Phantom Salt" mismatches during vault access updates.
             from src.infrastructure.user_manager import UserManager
             um = UserManager(self.sm)
-            cloud_profile = self.client.get_records("users", f"select=*&id=eq.{u_id}")
+            # Perfil y vault_access solo dependen de u_id: se piden a la vez si hay pool
+            if pool is not None:
+                f_access = pool.submit(self.client.get_records, "vault_access", f"select=*&user_id=eq.{u_id}")
+                cloud_profile = self.client.get_records("users", f"select=*&id=eq.{u_id}")
+            else:
+                f_access = None
+                cloud_profile = self.client.get_records("users", f"select=*&id=eq.{u_id}")
             cloud_salt = None
             if cloud_profile:
                 # Capture the normalized salt from user manager
-                cloud_salt = um.sync_user_to_local(active_user, cloud_profile[0])
+                with _vault_lock.write():
+                    cloud_salt = um.sync_user_to_local(active_user, cloud_profile[0])
 
-            accesses = self.client.get_records("vault_access", f"select=*&user_id=eq.{u_id}")
+            accesses = f_access.result() if f_access else self.client.get_records("vault_access", f"select=*&user_id=eq.{u_id}")
             for acc in accesses:
                 v_id = acc.get("vault_id")
                 w_key = acc.get("wrapped_master_key")
@@ -430,73 +509,126 @@ class SyncManager:
                     if force_update:
                         logger.info(f"[Sync] Local vault key missing or broken. Forcing cloud key overwrite for {v_id}.")
                     
-                    self.sm.save_vault_access_local(
-                        v_id, 
-                        bytes.fromhex(w_key) if isinstance(w_key, str) else w_key, 
-                        synced=1,
-                        force=force_update,
-                        vault_salt=cloud_salt if force_update else None
-                    )
+                    with _vault_lock.write():
+                        self.sm.save_vault_access_local(
+                            v_id, 
+                            bytes.fromhex(w_key) if isinstance(w_key, str) else w_key, 
+                            synced=1,
+                            force=force_update,
+                            vault_salt=cloud_salt if force_update else None
+                        )
         except Exception as e: logger.error(f"Error syncing keys: {e}")
 
-    def _push_local_to_cloud(self):
-        """[GOD-MODE] Optimized batch upload for local changes."""
-        stats = {"success": 0, "failed": 0}
+    PUSH_PAGE_SIZE = 200
+
+    def _push_local_to_cloud(self, batch_size=None, pool=None):
+        """
+        [GOD-MODE] Optimized batch upload for local changes.
+        Por página: un POST merge-duplicates (upsert por cloud_id), un DELETE id=in.(...)
+        y la contabilidad local en transacciones por lote. stats["failures"] detalla cada registro fallido.
+        Con pool, las páginas se suben en pipeline (hasta max_workers en vuelo) mientras se prepara la siguiente.
+        """
+        stats = {"success": 0, "failed": 0, "failures": []}
+        batch = int(batch_size or self.PUSH_PAGE_SIZE)
+        pages = self.sm.iter_encrypted(only_mine=True, batch=batch, unsynced_only=True)
+        in_flight = deque()
         
-        # 1. Collect all local changes (no limit since changes are usually few)
-        pending = [r for r in self.sm.get_all_encrypted(only_mine=True) if not r.get("synced")]
-        if not pending: return stats
+        # Streaming por páginas (keyset): leer una página no depende de que la anterior esté marcada
+        while True:
+            with _vault_lock.read():
+                pending = next(pages, None)
+            if pending is None: break
+            job = self._prepare_push_page(pending, stats)
+            if pool is None:
+                self._finish_push_page(self._send_push_page(job), stats)
+                continue
+            in_flight.append(pool.submit(self._send_push_page, job))
+            if len(in_flight) >= self.max_workers:
+                self._finish_push_page(in_flight.popleft().result(), stats)
+        while in_flight:
+            self._finish_push_page(in_flight.popleft().result(), stats)
+        return stats
 
-        to_update = []
-        to_insert = []
-        to_delete_local = []
+    def _push_page(self, pending: List[Dict[str, Any]], stats: Dict[str, Any]) -> None:
+        """Sube una página de cambios locales de forma síncrona."""
+        self._finish_push_page(self._send_push_page(self._prepare_push_page(pending, stats)), stats)
+
+    def _record_failure(self, stats, rec, error):
+        stats["failed"] += 1
+        stats["failures"].append({"id": rec.get("id"), "service": rec.get("service"), "error": str(error)})
+        logger.error(f"[Sync] Push failed for record {rec.get('id')}: {error}")
+
+    def _push_batch(self, recs, send, failures):
+        """Envía el lote completo; si el servidor lo rechaza, reintenta registro a registro para aislar los fallidos."""
+        try:
+            send(recs)
+            return list(recs)
+        except Exception as e:
+            if len(recs) == 1:
+                failures.append((recs[0], e))
+                return []
+            logger.warning(f"[Sync] Batch of {len(recs)} rejected ({e}); retrying per record")
+        ok = []
+        for rec in recs:
+            try:
+                send([rec])
+                ok.append(rec)
+            except Exception as e:
+                failures.append((rec, e))
+        return ok
+
+    def _prepare_push_page(self, pending: List[Dict[str, Any]], stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Fase local (hilo de sync): clasifica la página y persiste los cloud_id nuevos en una transacción."""
+        to_upsert = []
+        to_delete_remote = []
+        deleted_ids = []
+        new_ids = []
         
         for rec in pending:
             try:
                 if rec.get("deleted"):
-                    if rec.get("cloud_id"):
-                        self.delete_from_supabase(rec["id"])
-                    to_delete_local.append(rec["id"])
-                    stats["success"] += 1
+                    if rec.get("cloud_id"): to_delete_remote.append(rec)
+                    else: deleted_ids.append(rec["id"])  # nunca llegó a la nube
                 else:
-                    payload = self._build_record_payload(rec)
-                    if rec.get("cloud_id"):
-                        to_update.append(payload)
-                    else:
-                        # For new records, we need to ensure cloud_id locally first
-                        rec["cloud_id"] = self._ensure_cloud_id(rec)
-                        payload["id"] = rec["cloud_id"]
-                        to_insert.append(payload)
+                    if not rec.get("cloud_id"):
+                        # cloud_id fijado localmente ANTES del POST: un reintento reusa el mismo id (idempotente)
+                        rec["cloud_id"] = str(uuid.uuid4())
+                        new_ids.append((rec["cloud_id"], rec["id"]))
+                    rec["_payload"] = dict(self._build_record_payload(rec), id=rec["cloud_id"])
+                    to_upsert.append(rec)
             except Exception as e:
-                logger.error(f"Error preparing record {rec.get('id')}: {e}")
-                stats["failed"] += 1
+                self._record_failure(stats, rec, e)
 
-        # 2. Batch Operations
-        if to_insert:
-            try:
-                self.client.post_records(self.table, to_insert)
-                for r in to_insert: self.sm.mark_as_synced(r["id"], 1, is_cloud_id=True)
-                stats["success"] += len(to_insert)
-            except Exception as e:
-                logger.error(f"Batch insert failed: {e}")
-                stats["failed"] += len(to_insert)
-
-        if to_update:
-            # Note: Patch records individually or via bulk update if SDK supports it
-            # For now, batching inserts is the primary win.
-            for p in to_update:
-                if self._upload_record_payload(p, p["id"]):
-                    self.sm.mark_as_synced(p["id"], 1, is_cloud_id=True)
-                    stats["success"] += 1
-                else:
-                    stats["failed"] += 1
+        try:
+            with _vault_lock.write():
+                self.sm.assign_cloud_ids(new_ids)
+        except Exception as e:
+            # Sin cloud_id persistido no se sube nada nuevo: evita duplicados en la nube
+            new_set = {sid for _, sid in new_ids}
+            for rec in [r for r in to_upsert if r["id"] in new_set]: self._record_failure(stats, rec, e)
+            to_upsert = [r for r in to_upsert if r["id"] not in new_set]
+        return {"to_upsert": to_upsert, "to_delete_remote": to_delete_remote, "deleted_ids": deleted_ids}
 
-        if to_delete_local:
-            for rid in to_delete_local:
-                self.sm.conn.execute("DELETE FROM secrets WHERE id=?", (rid,))
-            self.sm.conn.commit()
+    def _send_push_page(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Fase de red (puede correr en un worker): sin SQLite, solo HTTP."""
+        failures = []
+        job["uploaded"] = self._push_batch(job["to_upsert"], lambda recs: self.client.post_records(self.table, [r["_payload"] for r in recs]), failures) if job["to_upsert"] else []
+        job["removed"] = self._push_batch(job["to_delete_remote"], lambda recs: self.client.delete_records(self.table, [r["cloud_id"] for r in recs]), failures) if job["to_delete_remote"] else []
+        job["failures"] = failures
+        return job
 
-        return stats
+    def _finish_push_page(self, job: Dict[str, Any], stats: Dict[str, Any]) -> None:
+        """Fase local: contabilidad del lote en una transacción bajo el lock de escritura."""
+        for rec, err in job["failures"]: self._record_failure(stats, rec, err)
+        # Se confirma la versión subida: una edición local hecha con la página en vuelo sigue pendiente
+        synced = [(r["id"], r.get("version")) for r in job["uploaded"]]
+        deleted_ids = job["deleted_ids"] + [r["id"] for r in job["removed"]]
+        try:
+            with _vault_lock.write():
+                self.sm.apply_push_results(synced, deleted_ids)
+            stats["success"] += len(synced) + len(deleted_ids)
+        except Exception as e:
+            for rec in job["uploaded"] + job["removed"]: self._record_failure(stats, rec, e)
 
     def _build_record_payload(self, rec: Dict[str, Any]) -> Dict[str, Any]:
         """Helper to build Supabase payload."""
@@ -514,104 +646,162 @@ class SyncManager:
             "version": rec.get("version")
         }
 
-    def _upload_record_payload(self, payload: Dict[str, Any], cloud_id: str) -> bool:
-        """Helper for individual payload upload."""
+    # --- DELTA SYNC CURSOR ---
+    # High-water mark persistido en `meta` por bóveda/usuario sobre server_updated_at, que fija el
+    # trigger de migration_sync_cursor.sql con el reloj del servidor: un par con el reloj desfasado
+    # no queda fuera del delta. Sin la columna en el backend se usa updated_at (lo fija el cliente
+    # que sube) y a los desfasados solo los recoge la reconciliación completa periódica. La ventana
+    # de solape cubre transacciones que confirman tras otras más nuevas; la fusión es idempotente
+    # (version/ts) y descarta repetidos.
+    DELTA_OVERLAP_SECONDS = 300
+    FULL_RECONCILE_INTERVAL = 24 * 3600
+    CURSOR_COLUMN = "server_updated_at"
+
+    def _hwm_name(self, column):
+        # Un cursor por columna: un hwm de relojes de cliente no es comparable con el del servidor
+        return "srv_hwm" if column == self.CURSOR_COLUMN else "hwm"
+
+    def _cursor_key(self, name):
+        return f"sync_{name}:{self.sm.current_vault_id or '-'}:{(self.sm.current_user or '').upper()}"
+
+    def _read_cursor(self, name):
         try:
-            url = f"{self.client.supabase_url}/rest/v1/{self.table}?id=eq.{cloud_id}"
-            r = self.client.session.patch(url, headers=self.client.headers, json=payload)
-            return r.status_code in (200, 204)
-        except Exception as e:
-            logger.error(f"Upload error: {e}")
-            return False
+            return int(self.sm.get_meta(self._cursor_key(name)) or 0)
+        except (TypeError, ValueError):
+            return 0
 
-    def _pull_cloud_to_local(self):
-        user = (self.sm.current_user or "").upper()
-        if not user:
+    def _write_cursor(self, name, value):
+        self.sm.set_meta(self._cursor_key(name), str(int(value)))
+
+    def reset_sync_cursor(self):
+        """Fuerza que el próximo pull sea una reconciliación completa."""
+        self._write_cursor("hwm", 0)
+        self._write_cursor("srv_hwm", 0)
+        self._write_cursor("full_at", 0)
+
+    def _pull_cloud_to_local(self, force_full=False):
+        plan = self._plan_pull(force_full)
+        if not plan:
             logger.warning("[Sync] Skip pull: No active user context.")
             return 0
-            
-        # 1. Fetch cloud records
-        remote = self.client.get_records(self.table, f"select=*&or=(is_private.eq.0,owner_name.eq.{user})")
-        
-        # 2. Map local records by cloud_id for easy comparison
-        local_raw = self.sm.get_all_encrypted()
-        local_map = {s.get("cloud_id"): s for s in local_raw if s.get("cloud_id")}
+        return self._apply_pull(plan, self._fetch_pull(plan))
+
+    def _plan_pull(self, force_full=False):
+        """
+        Fase local del pull: decide delta/completo y fija las claves del cursor y los cloud_id a
+        ignorar (trabajo local pendiente), de modo que el fetch pueda solaparse con el push.
+        """
+        user = (self.sm.current_user or "").upper()
+        if not user: return None
+        column = self.CURSOR_COLUMN if self._server_cursor else "updated_at"
+        with _vault_lock.read():
+            now = int(time.time())
+            hwm = self._read_cursor(self._hwm_name(column))
+            full = (force_full or not hwm or now - self._read_cursor("full_at") >= self.FULL_RECONCILE_INTERVAL
+                    or self.sm.count_encrypted() == 0)
+            skip = self.sm.get_pending_cloud_ids()
+        base = f"select=*&or=(is_private.eq.0,owner_name.eq.{user})"
+        params = base if full else base + f"&{column}=gte.{max(0, hwm - self.DELTA_OVERLAP_SECONDS)}"
+        return {"now": now, "hwm": hwm, "full": full, "base": base, "params": params, "skip": skip, "column": column,
+                "hwm_keys": {c: self._cursor_key(self._hwm_name(c)) for c in (self.CURSOR_COLUMN, "updated_at")},
+                "full_key": self._cursor_key("full_at")}
+
+    def _client_cursor_fallback(self, plan):
+        logger.warning(f"{self.table}.{self.CURSOR_COLUMN} not deployed on the backend; delta cursor uses updated_at")
+        self._server_cursor = False
+        plan["column"] = "updated_at"
+
+    def _fetch_pull(self, plan):
+        # 1. Fetch cloud records: solo los cambiados desde el high-water mark, salvo reconciliación completa
+        try:
+            remote = self.client.get_records(self.table, plan["params"])
+        except Exception as e:
+            if plan["full"] or not self._is_missing_column(e, self.CURSOR_COLUMN): raise
+            # Backend sin la columna: esta vez reconciliación completa, el cursor pasa a updated_at
+            self._client_cursor_fallback(plan)
+            plan.update(full=True, hwm=0, params=plan["base"])
+            remote = self.client.get_records(self.table, plan["params"])
+        logger.debug(f"[Sync] {'Full' if plan['full'] else 'Delta'} pull: {len(remote)} cloud rows")
+        return remote
+
+    def _apply_pull(self, plan, remote):
+        # Los cambios locales pendientes ganan: el push los impone en la nube en este mismo sync
+        changed = [rr for rr in remote if rr.get("id") and rr["id"] not in plan["skip"]]
+        if remote and plan["column"] == self.CURSOR_COLUMN and self.CURSOR_COLUMN not in remote[0]:
+            self._client_cursor_fallback(plan)   # pull completo contra un backend sin la columna
+        column = plan["column"]
+        with _vault_lock.write():
+            # 2. Estado local solo de los cloud_id recibidos (id/version/ts, sin blobs)
+            local_map = self.sm.get_sync_state([rr["id"] for rr in changed])
+            count = 0
+            for rr in changed:
+                if self._apply_remote_row(rr, local_map.get(rr["id"])): count += 1
+
+            # 3. Avanzar el cursor solo tras aplicar todo el lote y solo sobre filas aplicadas: una fila
+            #    ignorada por trabajo local pendiente debe volver en el próximo delta si el push falla
+            hwm = max([plan["hwm"]] + [int(rr.get(column) or 0) for rr in changed])
+            skipped = [int(rr.get(column) or 0) for rr in remote if rr.get("id") in plan["skip"]]
+            if skipped: hwm = min(hwm, min(skipped) - 1)
+            self.sm.set_meta(plan["hwm_keys"][column], str(max(0, hwm)))
+            if plan["full"]: self.sm.set_meta(plan["full_key"], str(plan["now"]))
+        return count
+
+    def _apply_remote_row(self, rr, local_rec):
+        cloud_id = rr["id"]
+        remote_version = int(rr.get("version") or 0)
+        remote_ts = int(rr.get("updated_at") or 0)
         
-        count = 0
-        for rr in remote:
-            cloud_id = rr["id"]
-            remote_version = int(rr.get("version") or 0)
-            remote_ts = int(rr.get("updated_at") or 0)
-            
-            # Check for conflict resolution
-            if cloud_id in local_map:
-                local_rec = local_map[cloud_id]
-                local_version = int(local_rec.get("version") or 0)
-                local_ts = int(local_rec.get("updated_at") or 0)
-                
-                # [DETERMINISTIC MERGE] 
-                # Policy: Version is primary, Timestamp is tie-breaker.
-                # If local version > remote, skip.
-                # If local version == remote AND local ts >= remote_ts, skip.
-                if local_version > remote_version:
-                    continue
-                if local_version == remote_version and local_ts >= remote_ts:
-                    continue
-                
-                logger.info(f"[Sync] Resolution: Cloud is newer (V:{remote_version}, TS:{remote_ts}) > Local (V:{local_version}, TS:{local_ts}) for '{rr['service']}'")
-            
-            nonce, cipher = self._decode_secret(rr["secret"])
-            
-            # Calculate integrity_hash if missing
-            integrity_hash = rr.get("integrity_hash")
-            if not integrity_hash:
-                import hashlib
-                integrity_hash = hashlib.sha256(cipher).hexdigest()
+        # Check for conflict resolution
+        if local_rec:
+            local_version = int(local_rec.get("version") or 0)
+            local_ts = int(local_rec.get("updated_at") or 0)
             
-            # Update or Add (add_secret_encrypted uses INSERT OR REPLACE if sid/cloud_id matches)
-            current_sid = local_map.get(cloud_id, {}).get("id")
+            # [DETERMINISTIC MERGE] 
+            # Policy: Version is primary, Timestamp is tie-breaker.
+            # If local version > remote, skip.
+            # If local version == remote AND local ts >= remote_ts, skip.
+            if local_version > remote_version:
+                return False
+            if local_version == remote_version and local_ts >= remote_ts:
+                return False
             
-            self.sm.add_secret_encrypted(
-                service=rr["service"],
-                username=rr["username"],
-                secret_blob=cipher,
-                nonce_blob=nonce,
-                integrity=integrity_hash,
-                notes=rr.get("notes"),
-                is_private=1 if str(rr.get("is_private")).lower() in ("1", "true", "t") else 0,
-                owner_name=rr.get("owner_name"),
-                vault_id=rr.get("vault_id"),
-                deleted=rr.get("deleted", 0),
-                synced=1,
-                cloud_id=cloud_id,
-                version=remote_version,
-                sid=current_sid
-            )
-            count += 1
-        return count
+            logger.info(f"[Sync] Resolution: Cloud is newer (V:{remote_version}, TS:{remote_ts}) > Local (V:{local_version}, TS:{local_ts}) for '{rr['service']}'")
+        
+        nonce, cipher = self._decode_secret(rr["secret"])
+        
+        # Calculate integrity_hash if missing
+        integrity_hash = rr.get("integrity_hash")
+        if not integrity_hash:
+            import hashlib
+            integrity_hash = hashlib.sha256(cipher).hexdigest()
+        
+        # Update or Add (add_secret_encrypted uses INSERT OR REPLACE if sid/cloud_id matches)
+        self.sm.add_secret_encrypted(
+            service=rr["service"],
+            username=rr["username"],
+            secret_blob=cipher,
+            nonce_blob=nonce,
+            integrity=integrity_hash,
+            notes=rr.get("notes"),
+            is_private=1 if str(rr.get("is_private")).lower() in ("1", "true", "t") else 0,
+            owner_name=rr.get("owner_name"),
+            vault_id=rr.get("vault_id"),
+            deleted=rr.get("deleted", 0),
+            synced=1,
+            cloud_id=cloud_id,
+            version=remote_version,
+            sid=local_rec.get("id") if local_rec else None
+        )
+        return True
 
     def write_vault_backup_atomic(self, file_path: str, data: bytes):
         """
         [ANTI-CORRUPTION] Writes vault data to disk using the Atomic Rename pattern.
         """
-        path = Path(file_path)
-        directory = path.parent
-        if not directory.exists():
-            directory.mkdir(parents=True, exist_ok=True)
-
-        fd, tmp_file = tempfile.mkstemp(dir=directory, prefix=".vault_tmp_", suffix=".enc")
         try:
-            with os.fdopen(fd, 'wb') as f:
-                f.write(data)
-                f.flush()
-                # Ensure it's physically written to disk
-                os.fsync(f.fileno())
-            # Atomic swap
-            os.replace(tmp_file, file_path)
+            write_atomic(file_path, data, prefix=".vault_tmp_", suffix=".enc")
             logger.debug(f"[IO] Atomic write successful: {file_path}")
         except Exception as e:
-            if os.path.exists(tmp_file):
-                os.unlink(tmp_file)
             logger.error(f"[IO] Atomic write failed: {e}")
             raise
 
@@ -687,6 +877,7 @@ class SyncManager:
             self._upload_record(rec)
             self.sm.conn.execute("UPDATE secrets SET synced=1 WHERE id=?", (record_id,))
             self.sm.conn.commit()
+            if hasattr(self.sm, 'secrets'): self.sm.secrets.notify_change("upsert", [record_id])
         finally:
             if hasattr(self.sm, 'session'): self.sm.session.end_operation()
 
@@ -716,11 +907,15 @@ class SyncManager:
             "version": row[16] if len(row) > 16 else None
         }
 
+    # Subida de auditoría por lotes: los primeros pendientes por id, marcados por su rango de ids
+    AUDIT_SYNC_BATCH = 500
+
     def sync_audit_logs(self):
         if hasattr(self.sm, 'session'): self.sm.session.start_operation()
         try:
             if not self.check_internet(): return
-            logs = self.sm.get_pending_audit_logs()
+            with _vault_lock.read():
+                logs = self.sm.get_pending_audit_logs(self.AUDIT_SYNC_BATCH)
             if not logs: return
             
             # Get valid user_ids from Supabase to avoid foreign key violations
@@ -731,50 +926,70 @@ class SyncManager:
                     valid_user_ids = {u["id"] for u in users_response}
             except Exception as e:
                 logger.warning(f"Could not fetch valid user_ids, syncing without validation: {e}")
-            
-            # FIX: Mapping correcto según AuditRepository (l[6]=details, l[7]=device_info)
-            payload = []
-            skipped_count = 0
-            for l in logs:
-                user_id = l[9]
-                
-                # Skip audit logs with invalid/orphaned user_id
-                if user_id and valid_user_ids and user_id not in valid_user_ids:
-                    logger.warning(f"Skipping audit log with orphaned user_id: {user_id}")
-                    skipped_count += 1
-                    continue
-                
-                payload.append({
-                    "timestamp": l[1],
-                    "user_name": l[2],
-                    "action": l[3],
-                    "service": l[4],      # Antes 'target_user' (confuso)
-                    "status": l[5],
-                    "details": l[6],      # l[6] es el campo Details en SQLite
-                    "device_info": l[7],  # l[7] es el campo Device Info en SQLite
-                    "user_id": user_id
-                })
-            
-            if not payload:
-                logger.info(f"No valid audit logs to sync (skipped {skipped_count} orphaned)")
-                return
-            
+
+            while logs:
+                self._upload_audit_batch(logs, valid_user_ids)
+                if len(logs) < self.AUDIT_SYNC_BATCH: break
+                with _vault_lock.read():
+                    logs = self.sm.get_pending_audit_logs(self.AUDIT_SYNC_BATCH)
+
+            # Con lo pendiente ya subido, lo antiguo puede pasar al archivo local
             try:
-                self.client.post_records(self.audit_table, payload)
-                self.sm.mark_audit_logs_as_synced()
-                if skipped_count > 0:
-                    logger.info(f"Synced {len(payload)} audit logs, skipped {skipped_count} orphaned")
+                with _vault_lock.write():
+                    self.sm.apply_audit_retention()
             except Exception as e:
-                err_str = str(e).lower()
-                if "23503" in err_str or "foreign key" in err_str:
-                    logger.error(f"Foreign key violation in audit sync (orphaned user_id): {e}")
-                    # Mark as synced anyway to avoid infinite retry loop
-                    self.sm.mark_audit_logs_as_synced()
-                else:
-                    raise
+                logger.warning(f"Audit retention failed: {e}")
         finally:
             if hasattr(self.sm, 'session'): self.sm.session.end_operation()
 
+    def _upload_audit_batch(self, logs, valid_user_ids):
+        # FIX: Mapping correcto según AuditRepository (l[6]=details, l[7]=device_info)
+        payload = []
+        skipped_count = 0
+        for l in logs:
+            user_id = l[9]
+            
+            # Skip audit logs with invalid/orphaned user_id
+            if user_id and valid_user_ids and user_id not in valid_user_ids:
+                logger.warning(f"Skipping audit log with orphaned user_id: {user_id}")
+                skipped_count += 1
+                continue
+            
+            payload.append({
+                "timestamp": l[1],
+                "user_name": l[2],
+                "action": l[3],
+                "service": l[4],      # Antes 'target_user' (confuso)
+                "status": l[5],
+                "details": l[6],      # l[6] es el campo Details en SQLite
+                "device_info": l[7],  # l[7] es el campo Device Info en SQLite
+                "user_id": user_id
+            })
+
+        # El lote son los primeros pendientes por id: su rango no alcanza lo escrito durante la subida
+        id_range = (logs[-1][0], logs[0][0])
+        if not payload:
+            logger.info(f"No valid audit logs to sync (skipped {skipped_count} orphaned)")
+            with _vault_lock.write():
+                self.sm.mark_audit_logs_as_synced(*id_range)
+            return
+        
+        try:
+            self.client.post_records(self.audit_table, payload)
+            with _vault_lock.write():
+                self.sm.mark_audit_logs_as_synced(*id_range)
+            if skipped_count > 0:
+                logger.info(f"Synced {len(payload)} audit logs, skipped {skipped_count} orphaned")
+        except Exception as e:
+            err_str = str(e).lower()
+            if "23503" in err_str or "foreign key" in err_str:
+                logger.error(f"Foreign key violation in audit sync (orphaned user_id): {e}")
+                # Mark as synced anyway to avoid infinite retry loop
+                with _vault_lock.write():
+                    self.sm.mark_audit_logs_as_synced(*id_range)
+            else:
+                raise
+
     def get_global_audit_logs(self, limit=500):
         """Obtiene los logs de auditoría globales del nodo central (ADMIN ONLY)."""
         if not self.check_internet(): return []
@@ -785,18 +1000,152 @@ class SyncManager:
             logger.error(f"Error fetching global audit logs: {e}")
             return []
 
-    def get_active_sessions(self):
-        """Obtiene y agrupa los latidos recientes por dispositivo para mostrar sesiones únicas."""
-        # Fast-fail if offline
+    @staticmethod
+    def _is_missing_relation(error):
+        return str(error).startswith("HTTP 404")
+
+    @staticmethod
+    def _is_missing_column(error, column):
+        # PostgREST: 400 con el error 42703 de Postgres ("column security_audit.category does not exist")
+        return str(error).startswith("HTTP 400") and column in str(error)
+
+    def _audit_filter(self, category=None, search=None, user_name=None, cursor=None):
+        """Filtro PostgREST de la línea de tiempo; los grupos OR van dentro de un único and=(...)."""
+        params, groups = [], []
+        if user_name: params.append(f"user_name=ilike.{quote(str(user_name), safe='')}")
+        if category and self._audit_category: params.append(f"category=eq.{category}")
+        if search:
+            term = quote(str(search).replace('"', '\\"'), safe="")
+            groups.append("or(" + ",".join(f'{f}.ilike."*{term}*"' for f in self.AUDIT_SEARCH_FIELDS) + ")")
+        if cursor:
+            ts, rid = int(cursor[0]), int(cursor[1])
+            groups.append(f"or(timestamp.lt.{ts},and(timestamp.eq.{ts},id.lt.{rid}))")
+        if groups: params.append(f"and=({','.join(groups)})")
+        return "&".join(params)
+
+    def get_audit_page(self, cursor=None, category=None, search=None, user_name=None, limit=None):
+        """
+        Una página de security_audit en la nube (más recientes primero), keyset por (timestamp, id).
+        user_name=None: todos los usuarios (ADMIN). Devuelve {"logs": [...], "next": cursor o None}.
+        """
+        page = {"logs": [], "next": None}
+        if not self.check_internet(): return page
+        limit = limit or self.AUDIT_PAGE_SIZE
+        for _ in range(self.AUDIT_SCAN_PAGES):
+            params = f"select=*&order=timestamp.desc,id.desc&limit={limit}"
+            flt = self._audit_filter(category, search, user_name, cursor)
+            try:
+                rows = self.client.get_records(self.audit_table, f"{params}&{flt}" if flt else params)
+            except Exception as e:
+                if category and self._audit_category and self._is_missing_column(e, "category"):
+                    logger.warning("security_audit.category not deployed on the backend; classifying on the client")
+                    self._audit_category = False
+                    continue
+                logger.error(f"Error fetching global audit page: {e}")
+                return page
+            if category and not self._audit_category:
+                page["logs"].extend(r for r in rows if classify_action(r.get("action")) == category)
+            else:
+                page["logs"].extend(rows)
+            cursor = (rows[-1]["timestamp"], rows[-1]["id"]) if len(rows) == limit else None
+            page["next"] = cursor
+            # Solo sin la columna category puede quedar vacía una página con más historial detrás
+            if page["logs"] or not cursor: break
+        return page
+
+    def get_audit_stats(self, category=None, search=None, user_name=None):
+        """
+        Totales del visor global contados en el servidor con count=estimated: sobre un histórico
+        grande es la estimación del planificador, no un COUNT exacto. Los críticos filtran la
+        columna critical (fijada al insertar). None si no se pueden contar allí (backend sin
+        category/critical, o usuarios distintos, que PostgREST no agrega).
+        """
+        stats = {"total": None, "critical": None, "users": None}
+        if not self.check_internet() or (category and not self._audit_category): return stats
+        flt = self._audit_filter(category, search, user_name)
+        try:
+            stats["total"] = self.client.count_records(self.audit_table, flt, count="estimated")
+            if self._audit_critical:
+                stats["critical"] = self.client.count_records(
+                    self.audit_table, "&".join(p for p in (flt, "critical=is.true") if p), count="estimated")
+        except Exception as e:
+            if self._is_missing_column(e, "critical"):
+                logger.warning("security_audit.critical not deployed on the backend; counting loaded rows")
+                self._audit_critical = False
+            else:
+                logger.debug(f"Error counting global audit logs: {e}")
+        return stats
+
+    def get_session_page(self, cursor=None, limit=None, window=None):
+        """
+        Una página de sesiones (más recientes primero) desde session_presence, agregada en
+        el servidor. cursor: el "next" de la página anterior (keyset por last_seen, session_key).
+        Devuelve {"sessions": [...], "next": cursor o None}.
+        """
+        page = {"sessions": [], "next": None}
         if not self.check_internet():
             logger.debug("Skipping active sessions check - offline mode")
-            return []
-        
+            return page
+        limit = limit or self.SESSIONS_PAGE_SIZE
+        cutoff = int(time.time()) - (window or self.SESSION_WINDOW)
+
+        if self._presence_table:
+            params = (f"select=session_key,user_name,device_info,ip_address,status,last_seen"
+                      f"&last_seen=gt.{cutoff}&order=last_seen.desc,session_key.asc&limit={limit}")
+            if cursor:
+                seen, key = cursor
+                key = quote(str(key).replace('"', '\\"'), safe="")
+                params += f'&or=(last_seen.lt.{int(seen)},and(last_seen.eq.{int(seen)},session_key.gt."{key}"))'
+            try:
+                rows = self.client.get_records(self.PRESENCE_TABLE, params)
+            except Exception as e:
+                if not self._is_missing_relation(e):
+                    logger.debug(f"Error fetching session presence (offline): {e}")
+                    return page
+                logger.warning("session_presence not deployed on the backend; aggregating security_audit")
+                self._presence_table = False
+            else:
+                page["sessions"] = [{
+                    "username": str(r.get("user_name") or "???").upper(),
+                    "device_name": r.get("device_info") or "Unknown Device",
+                    "ip_address": r.get("ip_address") or "---",
+                    "last_seen": r.get("last_seen", 0),
+                    "status": r.get("status") or "OFFLINE",
+                    "is_revoked": r.get("status") == "REVOKED",
+                } for r in rows]
+                if len(rows) == limit: page["next"] = (rows[-1]["last_seen"], rows[-1]["session_key"])
+                return page
+
+        page["sessions"] = self._aggregate_audit_sessions(cutoff)
+        return page
+
+    def get_active_sessions(self, window=None):
+        """Todas las sesiones vistas en la ventana, recorriendo las páginas de get_session_page."""
+        sessions, cursor = [], None
+        while True:
+            page = self.get_session_page(cursor, window=window)
+            sessions.extend(page["sessions"])
+            if not page["next"] or page["next"] == cursor: return sessions
+            cursor = page["next"]
+
+    def count_active_sessions(self, window=None):
+        """Sesiones no revocadas con actividad en los últimos ACTIVE_WINDOW segundos (COUNT en el servidor)."""
+        if not self.check_internet(): return 0
+        cutoff = int(time.time()) - (window or self.ACTIVE_WINDOW)
+        if self._presence_table:
+            try:
+                return self.client.count_records(self.PRESENCE_TABLE,
+                                                 f"last_seen=gt.{cutoff}&or=(status.is.null,status.neq.REVOKED)")
+            except Exception as e:
+                if not self._is_missing_relation(e):
+                    logger.debug(f"Error counting active sessions: {e}")
+                    return 0
+                self._presence_table = False
+        return sum(1 for s in self._aggregate_audit_sessions(cutoff) if not s["is_revoked"])
+
+    def _aggregate_audit_sessions(self, cutoff):
+        """[LEGACY] Backend sin session_presence: agrupa los últimos eventos de auditoría por dispositivo."""
         try:
-            # 1. Filtro Agresivo: Solo eventos de los últimos 5 minutos (300s)
-            now = int(time.time())
-            cutoff = now - 300 
-            
             # Obtener registros recientes (limitamos para no saturar, pero el filtro de tiempo es la clave)
             raw_logs = self.client.get_records(self.audit_table, f"timestamp=gt.{cutoff}&order=timestamp.desc&limit=100")
             
@@ -825,7 +1174,7 @@ class SyncManager:
                         "is_revoked": is_revoked
                     }
             
-            return list(sessions.values())
+            return sorted(sessions.values(), key=lambda x: x["last_seen"], reverse=True)
         except Exception as e:
             logger.debug(f"Error aggregating active sessions (offline): {e}")
             return []
@@ -866,7 +1215,7 @@ class SyncManager:
             if not curr_user: return False
             
             # Solo buscar expulsiones en los últimos 15 minutos para permitir re-ingreso
-            recent_cutoff = int(time.time()) - 900
+            recent_cutoff = int(time.time()) - self.KICK_WINDOW
             kicks = self.client.get_records(
                 self.audit_table, 
                 f"select=id&action=eq.KICK&user_name=eq.{curr_user}&device_info=eq.{hostname}&timestamp=gt.{recent_cutoff}&limit=1"
@@ -878,43 +1227,85 @@ class SyncManager:
             return False
 
     def _get_public_ip(self):
-        """Obtiene la IP pública del cliente con fallback a IP local."""
+        """IP pública del cliente (fallback: IP local), cacheada PUBLIC_IP_TTL segundos."""
+        now = time.monotonic()
+        if self._public_ip and self._public_ip[1] > now:
+            return self._public_ip[0]
+        ttl = self.PUBLIC_IP_TTL
         try:
             import requests
             response = requests.get('https://api.ipify.org?format=json', timeout=3)
-            return response.json().get('ip', 'Unknown')
+            ip = response.json().get('ip', 'Unknown')
         except Exception as e:
             logger.debug(f"Public IP discovery failed (iPify): {e}")
+            ttl = self.PUBLIC_IP_RETRY
             try:
                 import socket
                 s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
                 s.connect(("8.8.8.8", 80))
                 ip = s.getsockname()[0]
                 s.close()
-                return ip
             except Exception as e:
                 logger.debug(f"Local IP discovery failed: {e}")
-                return "Unknown"
-    
-    def send_heartbeat(self, action="HEARTBEAT", status="ONLINE"):
-        """Registra la actividad de la sesión en el nodo central para telemetría de seguridad."""
-        if not self.check_internet(): return
+                ip = "Unknown"
+        self._public_ip = (ip, now + ttl)
+        return ip
+
+    def next_heartbeat_interval(self, idle_seconds=0, locked=False):
+        """Segundos hasta el próximo latido: se espacia con la sesión ociosa o bloqueada (±10% de jitter)."""
+        if locked: base = self.HEARTBEAT_LOCKED_INTERVAL
+        elif idle_seconds >= self.HEARTBEAT_IDLE_AFTER: base = self.HEARTBEAT_IDLE_INTERVAL
+        else: base = self.HEARTBEAT_INTERVAL
+        return base * random.uniform(0.9, 1.1)
+
+    def send_heartbeat(self, action="HEARTBEAT", status="ONLINE", check_revocation=False):
+        """
+        Registra la actividad de la sesión en el nodo central para telemetría de seguridad.
+        Con la RPC session_heartbeat es un único POST que además devuelve si la sesión fue
+        revocada; si el backend aún no la tiene, se usa el protocolo antiguo (POST + GETs).
+        Devuelve {"sent", "revoked", "reason"}.
+        """
+        result = {"sent": False, "revoked": False, "reason": None}
+        if not self.check_internet(): return result
+        import socket
+        user = str(self.sm.current_user or "").upper()
+        device = socket.gethostname()
+        details = f"Session Activity Tracker | Role: {getattr(self.sm, 'user_role', 'user')}"
+
+        if self._heartbeat_rpc:
+            try:
+                res = self.client.call_rpc(self.HEARTBEAT_RPC, {
+                    "p_user_name": user, "p_device": device, "p_action": action, "p_status": status,
+                    "p_details": details, "p_ip_address": self._get_public_ip(),
+                    "p_user_id": str(self.sm.current_user_id) if self.sm.current_user_id else None,
+                    "p_vault_id": str(self.sm.current_vault_id) if self.sm.current_vault_id else None,
+                    "p_kick_window": self.KICK_WINDOW,
+                }) or {}
+                return {"sent": True, "revoked": bool(res.get("revoked")), "reason": res.get("reason")}
+            except Exception as e:
+                # 404: función sin desplegar. 401/403: sin EXECUTE para este rol o identidad rechazada
+                if not str(e).startswith(("HTTP 404", "HTTP 401", "HTTP 403")):
+                    logger.error(f"Heartbeat Error: {e}")
+                    return result
+                logger.warning(f"Heartbeat RPC unavailable ({str(e)[:8]}); using legacy heartbeat")
+                self._heartbeat_rpc = False
+
         try:
-            import socket
-            
-            # Capturar IP address
-            ip_address = self._get_public_ip()
-            
             payload = {
                 "timestamp": int(time.time()),
-                "user_name": str(self.sm.current_user or "").upper(),
+                "user_name": user,
                 "action": action,
                 "status": status,
-                "device_info": socket.gethostname(),
-                # "ip_address": ip_address,  # [PENDING MIGRATION] Enable after running migration_ip_address.sql
-                "details": f"Session Activity Tracker | Role: {getattr(self.sm, 'user_role', 'user')}"
+                "device_info": device,
+                # ip_address solo vía session_heartbeat: migration_session_heartbeat.sql añade la columna
+                "details": details
             }
             self.client.post_records(self.audit_table, [payload])
+            result["sent"] = True
         except Exception as e:
             logger.error(f"Heartbeat Error: {e}")
+            return result
+        if check_revocation and self.check_revocation_status():
+            result.update(revoked=True, reason="REVOKED")
+        return result
     
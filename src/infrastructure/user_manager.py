@@ -1034,15 +1034,19 @@ class UserManager:
         Inyecta o actualiza múltiples accesos a bóvedas en Supabase (MODO RESILIENTE).
         vault_key_map: Lista de tuplas [(vault_id, wrapped_key_hex), ...]
         """
+        rows = [{"user_id": user_id, "vault_id": v_id, "wrapped_master_key": w_key_hex} for v_id, w_key_hex in vault_key_map]
+        if not rows: return True
         try:
-            for v_id, w_key_hex in vault_key_map:
-                # [SMART UPSERT] Si no existe el registro, SE CREA. Si existe, se actualiza la llave.
-                # Esto garantiza que el Kill Switch no expulse a usuarios recién reseteados.
-                self.supabase.table("vault_access").upsert({
-                    "user_id": user_id,
-                    "vault_id": v_id,
-                    "wrapped_master_key": w_key_hex
-                }, on_conflict="user_id,vault_id").execute()
+            # [SMART UPSERT] Si no existe el registro, SE CREA. Si existe, se actualiza la llave.
+            # Esto garantiza que el Kill Switch no expulse a usuarios recién reseteados.
+            # Una sola petición para todas las bóvedas.
+            self.supabase.table("vault_access").upsert(rows, on_conflict="user_id,vault_id").execute()
+            return True
+        except Exception as e:
+            self.logger.warning(f"Bulk vault_access upsert failed, retrying per vault: {e}")
+        try:
+            for row in rows:
+                self.supabase.table("vault_access").upsert(row, on_conflict="user_id,vault_id").execute()
             return True
         except Exception as e:
             self.logger.error(f"Error in update_bulk_vault_access: {e}")
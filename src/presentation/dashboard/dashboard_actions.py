@@ -37,65 +37,35 @@ class DashboardActions(DashboardVaultActions, DashboardSyncActions, DashboardIOA
         dlg.exec_()
 
     def _copy_password(self, record):
-        QApplication.clipboard().setText(record["secret"])
+        secret = self.sm.reveal(record["id"]) if "secret" not in record else record["secret"]
+        if not secret: return
+        QApplication.clipboard().setText(secret)
         self.sm.log_event("COPIAR", record["service"], target_user=record["username"])
         PremiumMessage.success(self, MESSAGES.DASHBOARD.TITLE_COPY, MESSAGES.DASHBOARD.TEXT_COPY_SUCCESS)
 
-    def _show_password_in_table(self, btn):
-        if not btn: return
-        target_table = self._find_target_table(btn)
-        if target_table:
-            row = self._find_row_by_pos(target_table, btn)
-            if row >= 0:
-                item = target_table.item(row, 7)
-                pwd_widget = target_table.cellWidget(row, 7)
-                if item and pwd_widget: 
-                    lbl_pwd = pwd_widget.findChild(QLabel)
-                    record = item.data(Qt.UserRole + 1)
-                    if record and lbl_pwd:
-                        lbl_pwd.setText(record.get("secret", ""))
-                        lbl_pwd.setProperty("visible_state", "true")
-                        lbl_pwd.style().unpolish(lbl_pwd); lbl_pwd.style().polish(lbl_pwd)
-                    from PyQt5.QtCore import QTimer
-                    QTimer.singleShot(100, lambda: self._audit_view(target_table, row))
-
-    def _hide_password_in_table(self, btn):
-        if not btn: return
-        target_table = self._find_target_table(btn)
-        if target_table:
-            row = self._find_row_by_pos(target_table, btn)
-            if row >= 0:
-                pwd_widget = target_table.cellWidget(row, 7)
-                if pwd_widget:
-                    lbl_pwd = pwd_widget.findChild(QLabel)
-                    if lbl_pwd:
-                        lbl_pwd.setText("••••••••")
-                        lbl_pwd.setProperty("visible_state", "false")
-                        lbl_pwd.style().unpolish(lbl_pwd); lbl_pwd.style().polish(lbl_pwd)
-
-    def _find_target_table(self, widget):
-        p = widget.parentWidget()
-        from PyQt5.QtWidgets import QTableWidget
-        while p:
-            if isinstance(p, QTableWidget): return p
-            p = p.parentWidget()
-        return getattr(self, 'table', None)
-
-    def _find_row_by_pos(self, table, widget):
-        viewport = table.viewport()
-        global_pos = widget.mapToGlobal(widget.rect().center())
-        local_pos = viewport.mapFromGlobal(global_pos)
-        return table.rowAt(local_pos.y())
-
-    def _audit_view(self, table, row):
+    def _toggle_reveal_row(self, rid):
+        """Ojo de la columna PASSWORD: descifra solo esta fila y la oculta sola a los 2.5s."""
+        model = getattr(self, "vault_model", None)
+        if model is None or rid is None: return
+        if model.is_revealed(rid):
+            model.set_revealed(rid, None)
+            return
+        # Descifrado bajo demanda: la tabla solo guarda metadatos
+        model.set_revealed(rid, self.sm.reveal(rid) or "")
+        from PyQt5.QtCore import QTimer
+        QTimer.singleShot(2500, lambda: model.set_revealed(rid, None))
+        QTimer.singleShot(100, lambda: self._audit_view(rid))
+
+    def _copy_row_password(self, rid):
+        """Botón PASS de la fila: copia sin mantener el texto plano en la tabla."""
+        self._copy_to_clipboard(self.sm.reveal(rid), "COPIAR PASSWORD")
+
+    def _audit_view(self, rid):
         try:
-            svc_widget = table.cellWidget(row, 3)
-            svc_name = "Servicio Desconocido"
-            if svc_widget:
-                layout = svc_widget.layout()
-                if layout and layout.count() > 1:
-                    lbl = layout.itemAt(1).widget()
-                    if lbl: svc_name = lbl.text()
+            model = getattr(self, "vault_model", None)
+            row = model.row_for_id(rid) if model is not None else -1
+            record = model.record_at(row) if row >= 0 else None
+            svc_name = record.get("service") if record else "Servicio Desconocido"
             self.sm.log_event("VER", svc_name, details="👁️ Visualización en Dashboard")
             if hasattr(self, '_load_table_audit'): self._load_table_audit()
         except Exception as e:
@@ -303,7 +273,7 @@ class DashboardActions(DashboardVaultActions, DashboardSyncActions, DashboardIOA
         dlg.exec_()
 
     def _on_local_backup(self):
-        if not self.sm.get_all():
+        if not self.sm.count_encrypted():
             PremiumMessage.info(self, MESSAGES.DASHBOARD.TITLE_BACKUP_OK, "No hay nada que respaldar localmente.")
             return
         try:
@@ -313,8 +283,7 @@ class DashboardActions(DashboardVaultActions, DashboardSyncActions, DashboardIOA
 
     def _on_local_restore(self):
         try:
-            from pathlib import Path
-            backups_dir = Path(r"C:\PassGuardian_v2\data\backups") / self.current_username.lower()
+            backups_dir = self.sm.local_backup_dir()
             backups_dir.mkdir(parents=True, exist_ok=True)
             path, _ = QFileDialog.getOpenFileName(self, "Seleccionar Backup Local", str(backups_dir), "Backup Encriptado (*.enc)")
             if not path: return
@@ -523,12 +492,10 @@ class DashboardActions(DashboardVaultActions, DashboardSyncActions, DashboardIOA
         self.table = self.table_vault
         
         try:
-            # Buscar la fila y seleccionarla para que currentRow() funcione
-            for row in range(self.table.rowCount()):
-                item = self.table.item(row, 0)
-                if item and item.data(Qt.UserRole) == record.get("id"):
-                    self.table.setCurrentCell(row, 0)
-                    break
+            # Buscar la fila y seleccionarla para que currentIndex() apunte al registro
+            row = self.vault_proxy.row_for_id(record.get("id"))
+            if row >= 0:
+                self.table.setCurrentIndex(self.vault_proxy.index(row, 0))
             
             self._on_delete()
         finally:
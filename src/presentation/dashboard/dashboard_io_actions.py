@@ -1,7 +1,6 @@
 import logging
 import os
 import csv
-import json
 from PyQt5.QtWidgets import QFileDialog, QInputDialog, QLineEdit, QApplication
 from src.domain.messages import MESSAGES
 from src.presentation.ui_utils import PremiumMessage
@@ -11,10 +10,12 @@ logger = logging.getLogger(__name__)
 class DashboardIOActions:
     """Acciones relacionadas con la importación y exportación de datos (CSV, JSON, Excel)."""
 
+    # Longitud mínima de la passphrase de un archivo cifrado .vxa
+    ARCHIVE_MIN_PASSPHRASE = 12
+
     def _on_export(self):
-        """Versión Senior Pro: Exportación asíncrona y robusta con reporte detallado."""
-        records = self.sm.get_all()
-        if not records:
+        """Versión Senior Pro: Exportación en streaming fuera del hilo de UI, cifrada (.vxa) o en texto plano."""
+        if not self.sm.count_encrypted():
             PremiumMessage.info(self, "Exportar", "No hay registros disponibles para extraer.")
             return
 
@@ -22,46 +23,78 @@ class DashboardIOActions:
         
         path, filter_ = QFileDialog.getSaveFileName(
             self, "Exportar Bóveda", "vultrax_backup", 
-            "CSV Files (*.csv);;JSON Files (*.json)"
+            "Archivo Cifrado Vultrax (*.vxa);;CSV Files (*.csv);;JSON Files (*.json)"
         )
         if not path: return
         
-        ext = ".csv" if "csv" in filter_.lower() else ".json"
+        ext = ".vxa" if "vxa" in filter_.lower() else ".csv" if "csv" in filter_.lower() else ".json"
         if not path.lower().endswith(ext):
             path += ext
 
-        try:
-            export_data = []
-            for r in records:
-                clean_record = {
-                    "service": str(r.get("service", "")),
-                    "username": str(r.get("username", "")),
-                    "password": str(r.get("secret", r.get("password", ""))),
-                    "notes": str(r.get("notes", "")),
-                    "is_private": int(r.get("is_private", 0))
-                }
-                export_data.append(clean_record)
-
-            if ext == ".csv":
-                with open(path, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(["service", "username", "password", "notes", "is_private"])
-                    for r in export_data:
-                        writer.writerow([
-                            r["service"], r["username"], r["password"], r["notes"], r["is_private"]
-                        ])
-            else:
-                with open(path, 'w', encoding='utf-8') as f:
-                    json.dump(export_data, f, indent=4, ensure_ascii=False)
-            
+        passphrase = None
+        if ext == ".vxa":
+            passphrase = self._ask_archive_passphrase(confirm=True)
+            if passphrase is None: return
+
+        self._start_export_worker(path, passphrase)
+
+    def _ask_archive_passphrase(self, confirm=False):
+        """Pide la passphrase del archivo .vxa (dos veces al exportar). None si se cancela."""
+        pwd, ok = QInputDialog.getText(self, "Archivo Cifrado", "Passphrase del archivo:", QLineEdit.Password)
+        if not ok or not pwd: return None
+        if confirm:
+            if len(pwd) < self.ARCHIVE_MIN_PASSPHRASE:
+                PremiumMessage.warning(self, "Passphrase Débil", f"Usa al menos {self.ARCHIVE_MIN_PASSPHRASE} caracteres.")
+                return None
+            again, ok = QInputDialog.getText(self, "Archivo Cifrado", "Repite la passphrase:", QLineEdit.Password)
+            if not ok: return None
+            if again != pwd:
+                PremiumMessage.warning(self, "Passphrase", "Las passphrases no coinciden.")
+                return None
+        return pwd
+
+    def _start_export_worker(self, path, passphrase):
+        from PyQt5.QtWidgets import QProgressDialog
+        from PyQt5.QtCore import Qt
+        from src.presentation.dashboard.dashboard_workers import ExportWorker
+
+        progress = QProgressDialog("Preparando exportación...", "Cancelar", 0, 100, self)
+        progress.setWindowTitle("Exportar Bóveda")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+        progress.setValue(0)
+
+        worker = ExportWorker(self.sm, path, passphrase)
+        self._export_worker = worker  # mantener referencia viva mientras corre el hilo
+
+        def on_progress(pct, msg):
+            if not progress.wasCanceled():
+                progress.setValue(pct)
+                progress.setLabelText(msg)
+
+        def on_completed(stats, cancelled):
+            progress.close()
+            if cancelled:
+                PremiumMessage.info(self, "Exportar", "Exportación cancelada: no se ha generado ningún archivo.")
+                return
+            extra = f"<br>🔒 Omitidos (sin llave): <b>{stats['skipped']}</b>" if stats.get("skipped") else ""
             PremiumMessage.success(self, "Exportación Exitosa", 
-                f"✅ Se han extraído <b>{len(records)}</b> registros.<br>📂 Destino: <code>{os.path.basename(path)}</code>",
+                f"✅ Se han extraído <b>{stats['exported']}</b> registros.{extra}<br>📂 Destino: <code>{os.path.basename(path)}</code>",
                 duration=10000)
-                
-        except Exception as e:
-            logger.error(f"Critical Export Failure: {e}", exc_info=True)
+
+        def on_failed(msg):
+            progress.close()
             PremiumMessage.error(self, "Error de Extracción", "No se pudo generar el archivo de exportación.")
 
+        worker.progress.connect(on_progress)
+        worker.completed.connect(on_completed)
+        worker.failed.connect(on_failed)
+        worker.finished.connect(lambda: setattr(self, "_export_worker", None))
+        progress.canceled.connect(worker.cancel)
+        progress.show()
+        worker.start()
+
     def _on_download_template(self):
         """Genera un archivo CSV de ejemplo."""
         path, _ = QFileDialog.getSaveFileName(self, "Descargar Plantilla de Importación", "plantilla_vultrax.csv", "CSV (*.csv)")
@@ -78,58 +111,104 @@ class DashboardIOActions:
             PremiumMessage.error(self, "Fallo al Forjar Plantilla", str(e))
 
     def _on_import(self):
-        """Versión Senior Pro: Importación masiva con reporte detallado."""
+        """Versión Senior Pro: Importación masiva en segundo plano con progreso, cancelación y reporte detallado."""
         path, _ = QFileDialog.getOpenFileName(
             self, "Seleccionar Fuente de Datos", "",
-            "Formatos Soportados (*.csv *.json *.xlsx *.db);;CSV (*.csv);;JSON (*.json);;Excel (*.xlsx);;SQLite (*.db)"
+            "Formatos Soportados (*.vxa *.csv *.json *.xlsx *.db);;Archivo Cifrado Vultrax (*.vxa);;CSV (*.csv);;JSON (*.json);;Excel (*.xlsx);;SQLite (*.db)"
         )
         if not path: return
 
         try:
-            records = []
+            records, passphrase = None, None
             ext = os.path.splitext(path)[1].lower()
             
-            if ext == ".db" or path.endswith(".db"):
+            if ext == ".vxa":
+                passphrase = self._ask_archive_passphrase()
+                if passphrase is None: return
+
+            elif ext == ".db":
                 ext_pwd, ok = QInputDialog.getText(self, "Recuperación", "Password Maestro de la bóveda externa:", QLineEdit.Password)
                 if not ok or not ext_pwd: return
                 records = self.sm.import_from_external_vault(path, ext_pwd)
+                if not records:
+                    PremiumMessage.warning(self, "Datos Insuficientes", "El archivo no contiene registros procesables.")
+                    return
             
             elif ext == ".xlsx":
                 try:
-                    import pandas as pd
-                    records = pd.read_excel(path).fillna("").to_dict('records')
+                    import openpyxl  # noqa: F401  (lectura en streaming, modo read_only)
                 except ImportError:
-                    PremiumMessage.error(self, "Dependencia Faltante", "Para importar archivos Excel (.xlsx) se requiere instalar: pandas y openpyxl")
+                    PremiumMessage.error(self, "Dependencia Faltante", "Para importar archivos Excel (.xlsx) se requiere instalar: openpyxl")
                     return
 
-            elif ext == ".csv":
-                with open(path, 'r', encoding='utf-8-sig') as f:
-                    records = list(csv.DictReader(f))
-            
-            elif ext == ".json":
-                with open(path, 'r', encoding='utf-8') as f:
-                    records = json.load(f)
-
-            if not records:
-                PremiumMessage.warning(self, "Datos Insuficientes", "El archivo no contiene registros procesables.")
-                return
-
-            stats = self.sm.bulk_add_secrets(records)
-            
-            if hasattr(self, '_load_table'):
-                self._load_table()
-                
-            if stats["added"] > 0 and getattr(self, 'internet_online', False):
-                from PyQt5.QtCore import QTimer
-                QTimer.singleShot(1000, self._on_sync)
-
-            resumen = (f"<b>Misión de Integración Finalizada</b><br><br>"
-                       f"✅ Registros Forjados: <b>{stats['added']}</b><br>"
-                       f"👯 Duplicados Neutralizados: <b>{stats['skipped']}</b><br>"
-                       f"❌ Elementos Corruptos: <b>{stats['errors']}</b>")
-            
-            PremiumMessage.success(self, "Importación Finalizada", resumen, duration=15000)
+            # CSV / JSON / XLSX se leen en streaming dentro del worker
+            self._start_import_worker(path if records is None else None, records, passphrase)
 
         except Exception as e:
             logger.error(f"Professional Import Failure: {e}", exc_info=True)
             PremiumMessage.error(self, "Fallo de Importación", f"No se pudo completar la operación: {e}")
+
+    def _start_import_worker(self, path, records, passphrase=None):
+        from PyQt5.QtWidgets import QProgressDialog
+        from PyQt5.QtCore import Qt
+        from src.presentation.dashboard.dashboard_workers import ImportWorker
+
+        progress = QProgressDialog("Preparando importación...", "Cancelar", 0, 100, self)
+        progress.setWindowTitle("Importación Masiva")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+        progress.setValue(0)
+
+        worker = ImportWorker(self.sm, path=path, records=records, passphrase=passphrase)
+        self._import_worker = worker  # mantener referencia viva mientras corre el hilo
+
+        def on_progress(pct, msg):
+            if not progress.wasCanceled():
+                progress.setValue(pct)
+                progress.setLabelText(msg)
+
+        def on_cancel():
+            progress.setLabelText("Cancelando: confirmando el bloque en curso...")
+            worker.cancel()
+
+        def on_completed(stats, cancelled):
+            progress.close()
+            self._on_import_finished(stats, cancelled)
+
+        def on_failed(msg):
+            progress.close()
+            PremiumMessage.error(self, "Fallo de Importación", f"No se pudo completar la operación: {msg}")
+
+        worker.progress.connect(on_progress)
+        worker.completed.connect(on_completed)
+        worker.failed.connect(on_failed)
+        worker.finished.connect(lambda: setattr(self, "_import_worker", None))
+        progress.canceled.connect(on_cancel)
+        progress.show()
+        worker.start()
+
+    def _on_import_finished(self, stats, cancelled=False):
+        if not any(stats.values()):
+            PremiumMessage.warning(self, "Datos Insuficientes", "El archivo no contiene registros procesables.")
+            return
+
+        if hasattr(self, '_load_table'):
+            self._load_table()
+            
+        if stats["added"] > 0 and getattr(self, 'internet_online', False):
+            from PyQt5.QtCore import QTimer
+            QTimer.singleShot(1000, self._on_sync)
+
+        resumen = (f"<b>Misión de Integración {'Interrumpida' if cancelled else 'Finalizada'}</b><br><br>"
+                   f"✅ Registros Forjados: <b>{stats['added']}</b><br>"
+                   f"👯 Duplicados Neutralizados: <b>{stats['skipped']}</b><br>"
+                   f"❌ Elementos Corruptos: <b>{stats['errors']}</b>")
+        if cancelled:
+            resumen += "<br><br>⏹️ Cancelada por el usuario: los bloques ya confirmados se conservan."
+        if stats.get("error") or (cancelled and "chunks_done" in stats):
+            resumen += (f"<br><br>⚠️ Archivo importado hasta el bloque <b>{stats['chunks_done']}</b>"
+                        f"{' (' + stats['error'] + ')' if stats.get('error') else ''}. "
+                        "Vuelve a importarlo para reanudar desde ahí.")
+        
+        PremiumMessage.success(self, "Importación Finalizada", resumen, duration=15000)
@@ -55,25 +55,38 @@ class DashboardSyncActions:
                     
                     # Luego sincronizar registros
                     self.sync_manager.sync(cloud_user_id=self.user_profile.get("id"))
+                # Reintenta pasos de migración KDF que quedaron pendientes de la nube
+                self.sm.drain_kdf_migrations()
                 logger.info("Silent Startup Sync Completed.")
             except Exception as e:
                 logger.error(f"Silent Startup Sync Error: {e}")
 
         Thread(target=run, daemon=True).start()
 
+    def _drain_kdf_migrations_async(self):
+        """Ejecuta en segundo plano la migración Argon2id encolada en el login (funciona también offline)."""
+        from threading import Thread
+        def run():
+            try:
+                self.sm.drain_kdf_migrations()
+            except Exception as e:
+                logger.error(f"KDF Migration Worker Error: {e}")
+
+        Thread(target=run, daemon=True).start()
+
     def _auto_sync_on_login(self):
         """Manejador para el timer de auto-sincronización periódica."""
         logger.info("Auto-Sync: Ejecutando ciclo de sincronización en segundo plano.")
         self._full_sync_async()
 
-    def _delete_async(self, record_id):
-        """Borrado en la nube en segundo plano."""
+    def _delete_async(self, record_ids):
+        """Borrado en la nube en segundo plano (uno o varios ids, en lotes)."""
         if not getattr(self, 'internet_online', False): return
         from threading import Thread
         def run_del():
             try:
                 if hasattr(self, 'sync_manager'):
-                    self.sync_manager.delete_from_supabase(record_id)
+                    self.sync_manager.delete_from_supabase(record_ids)
             except Exception as e:
                 logger.error(f"Async Delete Error: {e}")
         Thread(target=run_del, daemon=True).start()
@@ -166,4 +179,4 @@ class DashboardSyncActions:
                 progress.close()
             self.syncing_active = False
             if hasattr(self, 'status_sync') and hasattr(self, 'table'):
-                self.status_sync.setText("⬆️⬇️ Cantidad de Secretos: " + str(self.table.rowCount()))
+                self.status_sync.setText("⬆️⬇️ Cantidad de Secretos: " + str(self.vault_model.rowCount()))
@@ -1,10 +1,11 @@
 from PyQt5.QtWidgets import QTableWidgetItem, QPushButton, QWidget, QHBoxLayout, QVBoxLayout, QApplication, QLabel
 from PyQt5.QtCore import Qt, pyqtSignal, QSize
-from PyQt5.QtGui import QColor, QFont, QIcon, QBrush
+from PyQt5.QtGui import QColor, QFont, QIcon
 from src.presentation.theme_manager import ThemeManager
 from src.presentation.ui_utils import PremiumMessage
 from src.presentation.notifications.notification_manager import Notifications
-from src.presentation.widgets.table_eye_button import TableEyeButton
+from src.domain.services.search_index_service import SearchIndexService
+from src.domain.services.audit_timeline_service import is_critical
 from src.domain.messages import MESSAGES
 import logging
 
@@ -49,218 +50,38 @@ class DashboardTableManager:
 
         try:
             colors = self.theme.get_theme_colors()
-            # 1. Obtención de datos únicos
-            records = self.sm.get_all()
+            # 1. Obtención de datos únicos (solo metadatos: el descifrado es bajo demanda vía sm.reveal)
+            records = self.sm.list_metadata()
             if records is None: records = []
 
+            # Fuerza/bloqueo por registro calculados fuera del hilo de UI (HeuristicWorker)
+            strength_scores = getattr(self, "_strength_scores", {})
+            locked_ids = getattr(self, "_locked_ids", set())
+
             # Inicializar memoria de descartes si no existe
             if not hasattr(self, "_ignored_recs"): self._ignored_recs = set()
             
-            # 2. Identificar tablas a poblar (Vault y Dashboard)
-            target_tables = []
-            if hasattr(self, 'table_vault') and self.table_vault: 
-                target_tables.append(self.table_vault)
-            if hasattr(self, 'table') and self.table: 
-                target_tables.append(self.table)
-
-            # 3. LIMPIEZA Y PREPARACIÓN ATÓMICA
-            sel_count = len(getattr(self, "_selected_records", {}))
-            
-            for t in target_tables:
-                t.setRowCount(0)
-                t.setRowCount(len(records))
-                t.verticalHeader().setDefaultSectionSize(55)
-                
-                # [FIX] Always ensure column count and basic labels are set
-                icon = "  ✖  " if sel_count > 0 else "  ○  "
-                labels = [icon, "LVL", "SYNC", "SERVICE", "PROPIETARIO", "ANTIGÜEDAD", "NOTAS", "PASSWORD", "ACCIONES", "STATUS"]
-                t.setColumnCount(10)
-                t.setHorizontalHeaderLabels(labels)
-                
-                if hasattr(self, "_update_header_style"):
-                    self._update_header_style(t, sel_count)
+            # 2. MODELO VIRTUALIZADO: una sola lista de metadatos compartida por table_vault y table.
+            # Las vistas solo pintan las filas visibles; no hay widgets por celda.
+            model = self.vault_model
+            model.set_colors(colors)
+            model.strength_scores = strength_scores
+            model.locked_ids = locked_ids
+            model.set_records(records)
+            # Índice de búsqueda: solo se re-indexan los registros cuyo texto cambió
+            self.vault_search_index.sync({r["id"]: self._search_doc(r) for r in records})
 
             total_score = 0
             valid_records = 0
             weak_count = 0
 
-            # 4. INSERCIÓN ÚNICA
-            for row, r in enumerate(records):
-                is_deleted = r.get("deleted", 0) == 1
-                secret_raw = r.get("secret", "[⚠️ Error]")
-                score = self._score_password(secret_raw)
-
-                if not is_deleted:
-                    valid_records += 1
+            for r in records:
+                if r.get("deleted", 0) == 1: continue
+                valid_records += 1
+                score = strength_scores.get(r.get("id"))
+                if score is not None:
                     total_score += score
                     if score < 70: weak_count += 1
-                
-                # [VISUAL HIGHLIGHT] Resalte dinámico para registros seleccionados
-                rid = r.get("id")
-                is_sel = hasattr(self, "_selected_records") and rid in self._selected_records
-                
-                if is_sel:
-                    # Azul Cyan Ghost para registros seleccionados (Usar @primary con alpha)
-                    row_bg = QColor(colors["primary"])
-                    row_bg.setAlpha(75) 
-                else:
-                    # No background for normal rows to let QSS / Theme handle it
-                    row_bg = QColor(0, 0, 0, 0)
-
-                for t in target_tables:
-                    def clean_item(text):
-                        it = QTableWidgetItem(str(text))
-                        it.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-                        it.setTextAlignment(Qt.AlignCenter)
-                        
-                        # [FIX] NO aplicar background hardcoded a menos que sea selección
-                        if is_sel:
-                             row_bg = QColor(colors.get("primary", "#0891b2"))
-                             row_bg.setAlpha(75)
-                             it.setBackground(row_bg) # Solo resaltar selección
-                        else:
-                             it.setForeground(QColor(colors.get("text", "#ffffff")))
-
-                        it.setData(Qt.UserRole + 1, r)
-                        return it
-
-                    # Col 0: SELECCIÓN
-                    # FIX: Usar UserRole para el ID para que _on_delete_selected funcione siempre
-                    it_sel = clean_item("●" if is_sel else "○")
-                    it_sel.setData(Qt.UserRole, rid) 
-                    it_sel.setTextAlignment(Qt.AlignCenter)
-                    it_sel.setData(Qt.UserRole + 1, r)
-                    t.setItem(row, 0, it_sel)
-
-                    # Badge visual sobre el widget para click fácil
-                    sel_lbl = QLabel("●" if is_sel else "○")
-                    sel_lbl.setAlignment(Qt.AlignCenter); sel_lbl.setCursor(Qt.PointingHandCursor)
-                    sel_lbl.setObjectName("table_selection_lbl")
-                    sel_lbl.setProperty("selected", "true" if is_sel else "false")
-                    sel_lbl.mousePressEvent = lambda e, t=t, r=row, rec=r: self._toggle_selection(t, r, rec)
-                    self._set_cell_widget_in_table(t, row, 0, sel_lbl)
-
-                    # Col 1: LVL (Tactical Health)
-                    if is_deleted: 
-                        icon_secure = "💀"
-                    else:
-                        icon_secure = "🛡️" if score >= 70 else "⚠️"
-                    
-                    it_lvl = clean_item(icon_secure)
-                    it_lvl.setTextAlignment(Qt.AlignCenter)
-                    if score < 70 and not is_deleted:
-                        it_lvl.setForeground(QColor(colors.get("warning", "#f59e0b")))
-                    elif not is_deleted:
-                        it_lvl.setForeground(QColor(colors.get("primary", "#06b6d4")))
-                    t.setItem(row, 1, it_lvl)
-
-                    # Col 2: SYNC (Cloud Link)
-                    is_synced = r.get("synced", 0) == 1
-                    sync_icon = "☁️" if is_synced else "⏳"
-                    it_sync = clean_item(sync_icon)
-                    it_sync.setTextAlignment(Qt.AlignCenter)
-                    it_sync.setForeground(QColor(colors.get("primary" if is_synced else "warning")))
-                    t.setItem(row, 2, it_sync)
-
-                    # Col 3: SERVICIO
-                    svc_raw = r["service"]
-                    is_private = r.get("is_private", 0) == 1
-                    if is_deleted: svc_icon = "🗑️"
-                    elif is_private: svc_icon = "🔒"
-                    else: svc_icon = "🔑"
-                    
-                    if not is_deleted and not is_private:
-                        if "google" in svc_raw.lower(): svc_icon = "🌐"
-                    
-                    # CRITICAL: Widget con FORZADO de transparencia total
-                    svc_widget = QWidget()
-                    svc_widget.setObjectName("table_service_container")
-                    svc_layout = QHBoxLayout(svc_widget)
-                    svc_layout.setContentsMargins(10, 0, 10, 0)
-                    
-                    lbl_icon = QLabel(svc_icon)
-                    lbl_icon.setObjectName("table_service_icon")
-                    lbl_icon.setProperty("is_private", "true" if is_private else "false")
-                    
-                    lbl_name = QLabel(svc_raw)
-                    lbl_name.setObjectName("table_service_name")
-                    lbl_name.setProperty("is_deleted", "true" if is_deleted else "false")
-                    
-                    svc_layout.addWidget(lbl_icon)
-                    svc_layout.addWidget(lbl_name)
-                    svc_layout.addStretch()
-                    t.setCellWidget(row, 3, svc_widget)
-
-                    # Col 4: PROPIETARIO
-                    owner_val = r.get("owner_name", "Desconocido")
-                    t.setItem(row, 4, clean_item(owner_val))
-
-                    # Col 5: AGE (Antigüedad)
-                    import time
-                    now = int(time.time())
-                    upd = r.get("updated_at") or r.get("timestamp") or now
-                    age_days = (now - upd) // 86400
-                    age_text = f"{age_days}d"
-                    it_age = clean_item(age_text)
-                    it_age.setTextAlignment(Qt.AlignCenter)
-                    if age_days > 90: it_age.setForeground(QColor(colors.get("warning", "#f59e0b")))
-                    if age_days > 180: it_age.setForeground(QColor(colors.get("danger", "#ef4444")))
-                    t.setItem(row, 5, it_age)
-
-                    # Col 6: NOTES (Preview)
-                    notes_raw = r.get("notes", "") or ""
-                    notes_preview = (notes_raw[:20] + "...") if len(notes_raw) > 20 else notes_raw
-                    it_notes = clean_item(notes_preview)
-                    it_notes.setForeground(QColor(colors.get("text_dim", "#94a3b8")))
-                    t.setItem(row, 6, it_notes)
-
-                    # Col 7: PASSWORD
-                    if secret_raw in ["ERROR 🔑", "[⚠️ Error de Llave]", "[Bloqueado 🔑]", "[NODO_PROTEGIDO]"]:
-                        pwd_text = "NODO_PROTEGIDO"; pwd_color = colors.get("danger", "#f87171")
-                    else:
-                        pwd_text = "••••••••"; pwd_color = colors.get("text_dim", "#94a3b8")
-                    
-                    pwd_widget = QWidget()
-                    pwd_widget.setAttribute(Qt.WA_TranslucentBackground)
-                    pwd_widget.setStyleSheet("background: transparent;")
-                    pwd_layout = QHBoxLayout(pwd_widget); pwd_layout.setContentsMargins(10, 0, 10, 0); pwd_layout.setSpacing(10)
-                    
-                    lbl_pwd = QLabel(pwd_text)
-                    lbl_pwd.setObjectName("vault_pwd_label")
-                    lbl_pwd.setProperty("protected_state", "true" if pwd_text == "NODO_PROTEGIDO" else "false")
-                    
-                    eye_btn = TableEyeButton(row, self._show_password_in_table, self._hide_password_in_table)
-                    pwd_layout.addStretch(); pwd_layout.addWidget(lbl_pwd); pwd_layout.addSpacing(15); pwd_layout.addWidget(eye_btn); pwd_layout.addStretch()
-                    t.setCellWidget(row, 7, pwd_widget)
-                    item_pwd = clean_item("")
-                    item_pwd.setData(Qt.UserRole + 1, r)
-                    t.setItem(row, 7, item_pwd)
-
-                    # Col 8: ACTIONS (Copy User/Pass)
-                    act_widget = QWidget(); act_widget.setStyleSheet("background: transparent;")
-                    act_layout = QHBoxLayout(act_widget); act_layout.setContentsMargins(5, 0, 5, 0); act_layout.setSpacing(10)
-                    
-                    def mk_copy_btn(text, tooltip, val):
-                        btn = QPushButton(text)
-                        btn.setFixedSize(65, 28)
-                        btn.setToolTip(tooltip)
-                        btn.setCursor(Qt.PointingHandCursor)
-                        btn.setObjectName("table_copy_btn")
-                        btn.clicked.connect(lambda _, v=val, t=tooltip: self._copy_to_clipboard(v, t))
-                        return btn
-
-                    btn_copy_pass = mk_copy_btn("PASS", "COPIAR PASSWORD", secret_raw)
-                    
-                    act_layout.addStretch(); act_layout.addWidget(btn_copy_pass); act_layout.addStretch()
-                    t.setCellWidget(row, 8, act_widget)
-
-                    # Col 9: ESTADO (Integrity)
-                    is_ok = secret_raw not in ["[⚠️ Error de Llave]", "[Bloqueado 🔑]", "ERROR 🔑"]
-                    status_lbl = QLabel("ONLINE" if is_ok else "LOCKED")
-                    status_lbl.setObjectName("table_status_lbl")
-                    status_lbl.setProperty("state", "ok" if is_ok else "locked")
-                    status_lbl.setAlignment(Qt.AlignCenter)
-                    self._set_cell_widget_in_table(t, row, 9, status_lbl)
 
 
             # --- ESTADISTICAS AVANZADAS (Cyber-SaaS Logic) ---
@@ -323,7 +144,7 @@ class DashboardTableManager:
 
             # --- VAULT ANALYTICS (Data Injection) ---
             if hasattr(self, 'lbl_va_risk'):
-                 high_risk = sum(1 for r in records if self._score_password(r.get("secret","")) < 40 and r.get("deleted")!=1)
+                 high_risk = sum(1 for r in records if strength_scores.get(r.get("id"), 100) < 40 and r.get("deleted")!=1)
                  self.lbl_va_risk.setText(f"High-risk vaults: {'🔴 ' + str(high_risk) if high_risk > 0 else '🟢 0'}")
             
             if hasattr(self, 'lbl_va_unused'):
@@ -372,7 +193,7 @@ class DashboardTableManager:
                     })
                 
                 # Regla B: Bóvedas de Alto Riesgo
-                risky_vaults = [r for r in records if self._score_password(r.get("secret", "")) < 40 and r.get("deleted")!=1]
+                risky_vaults = [r for r in records if strength_scores.get(r.get("id"), 100) < 40 and r.get("deleted")!=1]
                 if risky_vaults and "REVIEW_RISK" not in self._ignored_recs:
                     recommendations.append({
                         "severity": "critical", 
@@ -468,11 +289,8 @@ class DashboardTableManager:
                 # 2. Active Sessions (Real-time Presence)
                 if hasattr(self, 'stat_sessions_val') and hasattr(self, 'sync_manager'):
                     try:
-                        import time
-                        sessions = self.sync_manager.get_active_sessions() or []
-                        now = time.time()
-                        # Definimos "Activo" como visto en los últimos 5 minutos
-                        active_count = sum(1 for s in sessions if (now - s.get("last_seen", 0)) < 300 and not s.get("is_revoked"))
+                        # "Activo" = visto en los últimos 5 minutos y no revocado (COUNT en el servidor)
+                        active_count = self.sync_manager.count_active_sessions()
                         self.stat_sessions_val.setText(str(max(1, active_count))) # Al menos el usuario actual
                     except Exception as e:
                         logger.error(f"Error updating sessions: {e}")
@@ -506,167 +324,104 @@ class DashboardTableManager:
         self._load_table_audit()
         
         # Inicializar contadores de búsqueda con el estado actual
-        search_text = ""
-        if hasattr(self, 'search_vault') and self.search_vault.text():
-            search_text = self.search_vault.text()
-        elif hasattr(self, 'dash_search') and self.dash_search.text():
-            search_text = self.dash_search.text()
-        
-        self._on_search_changed(search_text)
+        self._on_search_changed(self._current_search_text())
         
         # Sincronizar contador de selección al final de la carga
         sel_count = len(getattr(self, "_selected_records", {}))
         if hasattr(self, 'table_vault'):
             self._update_header_style(self.table_vault, sel_count)
 
-    def _toggle_selection(self, t, row, record):
-        """Maneja la selección múltiple de registros de forma INSTANTÁNEA sin lag."""
-        if not hasattr(self, "_selected_records"):
-            self._selected_records = {}
-            
-        rid = record.get("id")
-        is_sel = rid not in self._selected_records
-        
-        if not is_sel:
-            del self._selected_records[rid]
-        else:
-            self._selected_records[rid] = record
-            
-        # 1. ACTUALIZACIÓN PARCIAL (Rápida)
-        # Cambiar el icono visual
-        container = t.cellWidget(row, 0)
-        if container:
-            lbl = container.findChild(QLabel)
-            if lbl:
-                lbl.setText("●" if is_sel else "○")
-                lbl.setProperty("selected", "true" if is_sel else "false")
-                lbl.style().unpolish(lbl)
-                lbl.style().polish(lbl)
-            
-        # Actualizar el item invisible de la columna 0 (para búsqueda y borrado)
-        it_sel = t.item(row, 0)
-        if it_sel:
-            it_sel.setText("●" if is_sel else "○")
+    @property
+    def _selected_records(self):
+        """Selección múltiple (id -> metadatos), mantenida por el modelo de la bóveda."""
+        model = getattr(self, "vault_model", None)
+        return model.selected if model is not None else {}
 
-        # Refrescar el estilo de la fila completa
-        colors = self.theme.get_theme_colors()
-        row_bg = QColor(colors["primary"])
-        row_bg.setAlpha(75)
-        if not is_sel: row_bg = QColor(0, 0, 0, 0)
-        
-        for col in range(t.columnCount()):
-            it = t.item(row, col)
-            if it:
-                it.setBackground(QBrush(row_bg))
-        
-        # 2. ACTUALIZAR CABECERA (Contador de selección)
-        sel_count = len(self._selected_records)
-        self._update_header_style(t, sel_count)
+    def _toggle_selection(self, rid):
+        """Maneja la selección múltiple de registros de forma INSTANTÁNEA sin lag."""
+        model = getattr(self, "vault_model", None)
+        if model is None: return
+        model.toggle_selected(rid)
+        self._update_header_style(getattr(self, 'table_vault', None), len(model.selected))
         
     def _deselect_all_vault(self):
         """Limpia toda la selección de la bóveda de forma global e INSTANTÁNEA."""
-        if not hasattr(self, "_selected_records") or not self._selected_records:
-            return
-            
-        self._selected_records = {}
-        t = getattr(self, 'table_vault', None)
-        if not t:
-            self._update_header_style(None, 0)
+        model = getattr(self, "vault_model", None)
+        if model is None or not model.selected:
             return
-
-        t.setUpdatesEnabled(False)
-        try:
-            transparent_brush = QBrush(QColor(0, 0, 0, 0))
-            for row in range(t.rowCount()):
-                # 1. Resetear Icono
-                container = t.cellWidget(row, 0)
-                if container:
-                    lbl = container.findChild(QLabel)
-                    if lbl:
-                        lbl.setText("○")
-                        lbl.setProperty("selected", "false")
-                        lbl.style().unpolish(lbl)
-                        lbl.style().polish(lbl)
-                
-                # 2. Resetear Item (Búsqueda/Borrado)
-                it_sel = t.item(row, 0)
-                if it_sel: it_sel.setText("○")
-
-                # 3. Limpiar Fondo de Fila
-                for col in range(t.columnCount()):
-                    it = t.item(row, col)
-                    if it:
-                        it.setBackground(transparent_brush)
-        finally:
-            t.setUpdatesEnabled(True)
-        
-        self._update_header_style(t, 0)
+        model.clear_selection()
+        self._update_header_style(getattr(self, 'table_vault', None), 0)
 
     def _on_selection_updated(self, count):
         """Actualiza la barra flotante externamente."""
         if hasattr(self, 'table_vault'):
             self._update_header_style(self.table_vault, count)
 
+    def _on_vault_records_changed(self, kind, ids):
+        """
+        Aplica eventos de cambio del repositorio (SecretsManager.add_change_listener)
+        sobre el modelo: upserts/deletes puntuales sin reconstruir la tabla.
+        """
+        model = getattr(self, "vault_model", None)
+        if model is None or not hasattr(self, 'sm'): return
+        if kind == "reset":
+            self._load_table()
+            return
+        index = self.vault_search_index
+        if kind == "delete":
+            for rid in ids:
+                model.remove_record(rid)
+                index.remove(rid)
+        elif kind == "upsert":
+            fresh = {r["id"]: r for r in self.sm.list_metadata(ids=ids)}
+            for rid in ids:
+                # Borrado lógico o fuera de visibilidad: desaparece del listado
+                if rid in fresh:
+                    model.upsert_record(fresh[rid])
+                    index.upsert(rid, self._search_doc(fresh[rid]))
+                else:
+                    model.remove_record(rid)
+                    index.remove(rid)
+        self._update_header_style(getattr(self, 'table_vault', None), len(model.selected))
+        self._on_search_changed(self._current_search_text())
+
+    def _on_vault_health_changed(self, records):
+        """El icono LVL forma parte del documento indexado: re-indexar las filas cuyo nivel cambió."""
+        for r in records:
+            self.vault_search_index.upsert(r["id"], self._search_doc(r))
+        self._on_search_changed(self._current_search_text())
+
+    def _current_search_text(self):
+        if hasattr(self, 'search_vault') and self.search_vault.text():
+            return self.search_vault.text()
+        if hasattr(self, 'dash_search') and self.dash_search.text():
+            return self.dash_search.text()
+        return ""
+
+    def _search_doc(self, record):
+        """Documento indexable (Deep Search Protocol): LVL, servicio, username, dueño, notas y antigüedad."""
+        return SearchIndexService.normalize(self.vault_model.search_fields(record))
+
     def _on_search_changed(self, text):
         text = text.strip().lower()
         if text and hasattr(self, 'main_stack') and self.main_stack.currentIndex() == 0:
             if hasattr(self, 'view_vault'): self.main_stack.setCurrentWidget(self.view_vault)
         
-        targets = []
-        if hasattr(self, 'table'): targets.append(self.table)
-        if hasattr(self, 'table_vault'): targets.append(self.table_vault)
+        model = getattr(self, "vault_model", None)
+        if model is None: return
         
-        for t in targets:
-            visible_count = 0
-            for row in range(t.rowCount()):
-                # CONSTRUCCIÓN DE BUFFER DE BÚSQUEDA (Deep Search Protocol)
-                search_buffer = []
-                
-                # 1. LVL / Estado (Col 1)
-                lvl_item = t.item(row, 1)
-                if lvl_item: search_buffer.append(lvl_item.text())
-                
-                # 2. SERVICIO (Col 3 - Widget)
-                service_widget = t.cellWidget(row, 3) 
-                if service_widget:
-                    for lbl in service_widget.findChildren(QLabel):
-                        search_buffer.append(lbl.text())
-                
-                # 3. PROPIETARIO (Col 4)
-                owner_item = t.item(row, 4)
-                if owner_item: search_buffer.append(owner_item.text())
-                
-                # 4. ANTIGÜEDAD (Col 5)
-                age_item = t.item(row, 5)
-                if age_item: search_buffer.append(age_item.text())
-                
-                # 5. NOTAS (Col 6)
-                notes_item = t.item(row, 6)
-                if notes_item: search_buffer.append(notes_item.text())
-                
-                # 6. METADATA OCULTA (Username de la credencial en Col 7)
-                pwd_item = t.item(row, 7)
-                if pwd_item:
-                    r = pwd_item.data(Qt.UserRole + 1) or {}
-                    if r.get("username"): search_buffer.append(str(r["username"]))
-
-                # Match Final: Case-insensitive y robusto
-                row_content = " ".join(search_buffer).lower()
-                match = (not text) or (text in row_content)
-                
-                t.setRowHidden(row, not match)
-                if match:
-                    visible_count += 1
-            
-            # Actualizar contadores (Solo para Vault, Dashboard removido por petición)
-            total_count = t.rowCount()
-            if t == getattr(self, 'table_vault', None) and hasattr(self, 'lbl_vault_search_count'):
-                count_text = ""
-                if text:
-                    count_text = f"RESULTS: {visible_count} / {total_count} VECTORS"
-                else:
-                    count_text = f"INTEL: {total_count} VECTORS ACTIVE"
-                self.lbl_vault_search_count.setText(count_text)
+        # Consulta al índice de trigramas y filtrado por proxy: sin recorrer filas ni setRowHidden
+        visible_ids = self.vault_search_index.search(text)
+        self.vault_proxy.set_visible_ids(visible_ids)
+        
+        # Actualizar contadores (Solo para Vault, Dashboard removido por petición)
+        total_count = model.rowCount()
+        if hasattr(self, 'table_vault') and hasattr(self, 'lbl_vault_search_count'):
+            if visible_ids is not None:
+                count_text = f"RESULTS: {len(visible_ids)} / {total_count} VECTORS"
+            else:
+                count_text = f"INTEL: {total_count} VECTORS ACTIVE"
+            self.lbl_vault_search_count.setText(count_text)
 
     def _copy_to_clipboard(self, text, message):
         if not text: return
@@ -696,8 +451,11 @@ class DashboardTableManager:
     def _on_table_audit(self): self._load_table_audit()
 
     def _load_table_audit(self, filter_text=None):
-        from PyQt5.QtCore import QDateTime
-        colors = self.theme.get_theme_colors()
+        """
+        Primera página de la línea de tiempo para el filtro activo. Las siguientes se
+        añaden al llegar al final del scroll (_on_audit_scroll): abrir el visor cuesta
+        lo mismo con 1.000 eventos que con 1.000.000.
+        """
         try:
             # 1. Detectar Filtro y Modo (Dashboard vs Módulo)
             if filter_text is None and hasattr(self, 'search_audit'):
@@ -720,129 +478,33 @@ class DashboardTableManager:
             elif hasattr(self, 'btn_mod_global') and self.btn_mod_global.isChecked(): 
                 filter_mode = "GLOBAL"; is_global = True
 
-            # 2. Cargar datos base
-            if is_global and hasattr(self, 'sync_manager'):
-                # FETCH CLOUD (ADMIN ONLY bypass local DB)
-                all_logs = self.sync_manager.get_global_audit_logs(limit=500) or []
+            # 2. Consulta de la línea de tiempo: categoría fijada al escribir + búsqueda en SQL
+            category = None if filter_mode in ("ALL", "GLOBAL") else filter_mode
+            self._audit_query = (is_global and hasattr(self, 'sync_manager'), category, filter_text or None)
+            self._audit_next = None
+            page = self._fetch_audit_page()
+            logs = page["logs"]
+
+            # 3. Estadísticas agregadas en origen (COUNT), no sobre las filas descargadas
+            remote, category, search = self._audit_query
+            if remote:
+                user = None if str(getattr(self, 'user_role', '')).lower() == "admin" else self.sm.current_user
+                stats = self.sync_manager.get_audit_stats(category, search, user_name=user)
             else:
-                # FETCH LOCAL 
-                all_logs = self.sm.get_audit_logs(limit=1000)
-            
-            # 3. Aplicar Filtro de Categoría (Oro Puro Logic)
-            filtered_logs = []
-            for l in all_logs:
-                act = str(l.get("action", "")).upper()
-                msg = str(l).upper()
-                svc = str(l.get("service", "")).upper()
-                det = str(l.get("details", "")).upper()
-                
-                # Search across action, service, details and the whole log string
-                full_context = f"{act} {svc} {det} {msg}"
-                
-                if filter_mode == "ALL" or filter_mode == "GLOBAL": 
-                    filtered_logs.append(l)
-                elif filter_mode == "AUTH" and any(x in full_context for x in ["LOGIN", "LOGOUT", "SESSION", "2FA", "ACCESS", "AUTH", "HEARTBEAT", "CONEXION"]): 
-                    filtered_logs.append(l)
-                elif filter_mode == "SECRETS" and any(x in full_context for x in ["CREATE", "UPDATE", "READ", "DELETE", "EXPORT", "SECRET", "VAULT", "AGREGAR", "EDITAR", "BORRAR", "VER", "ELIMINACION", "PASSWORD", "CONTRASENA", "LLAVE", "KEY"]): 
-                    filtered_logs.append(l)
-                elif filter_mode == "ADMIN" and any(x in full_context for x in ["ADMIN", "USER", "ROLE", "POLICY", "SETTINGS", "PURGE", "REVOKE", "KICK", "BLOCK", "PERM", "GRANT", "USER_MANAGEMENT"]): 
-                    filtered_logs.append(l)
-            
-            all_logs = filtered_logs
-
-            # 4. Aplicar filtro de búsqueda manual si se solicita
-            if filter_text:
-                filter_text = filter_text.lower()
-                filtered = []
-                for log in all_logs:
-                    # Search specifically in relevant values to avoid matching dict keys
-                    searchable_vals = [
-                        str(log.get("user_name", "")),
-                        str(log.get("action", "")),
-                        str(log.get("service", "")),
-                        str(log.get("details", "")),
-                        str(log.get("status", "")),
-                        str(log.get("device_info", ""))
-                    ]
-                    # Also include formatted timestamp
-                    dt_str = QDateTime.fromSecsSinceEpoch(log.get("timestamp", 0)).toString("yyyy-MM-dd HH:mm:ss")
-                    searchable_vals.append(dt_str)
-                    
-                    if any(filter_text in val.lower() for val in searchable_vals):
-                        filtered.append(log)
-                all_logs = filtered
-            
-            total_recs = len(all_logs); unique_users = set(); critical_count = 0
-            critical_actions = ["DELETE", "PURGE", "ADMIN_REVOKE", "PHYSICAL_DELETE", "ELIMINACION"]
-            critical_statuses = ["DENIED", "FAIL", "ERROR"]
-            for log in all_logs:
-                uname = log.get("user_name")
-                action = str(log.get("action", "")).upper()
-                status = str(log.get("status", "")).upper()
-                if uname: unique_users.add(uname)
-                if (any(x in action for x in critical_actions)) or (status in critical_statuses): critical_count += 1
-            if hasattr(self, 'lbl_log_total'): self.lbl_log_total.setText(str(total_recs))
-            if hasattr(self, 'lbl_log_critical'): self.lbl_log_critical.setText(str(critical_count))
-            if hasattr(self, 'lbl_log_users'): self.lbl_log_users.setText(str(len(unique_users)))
+                stats = self.sm.get_audit_stats(category, search)
+            if stats["total"] is None: stats["total"] = len(logs)
+            if stats["critical"] is None: stats["critical"] = sum(1 for l in logs if is_critical(l))
+            if stats["users"] is None: stats["users"] = len({l.get("user_name") for l in logs if l.get("user_name")})
+            if hasattr(self, 'lbl_log_total'): self.lbl_log_total.setText(str(stats["total"]))
+            if hasattr(self, 'lbl_log_critical'): self.lbl_log_critical.setText(str(stats["critical"]))
+            if hasattr(self, 'lbl_log_users'): self.lbl_log_users.setText(str(stats["users"]))
+
             if hasattr(self, 'table_audit'):
-                self.table_audit.setRowCount(len(all_logs))
-                for row_idx, log in enumerate(all_logs):
-                    ts = log.get("timestamp", 0)
-                    uname = log.get("user_name", "-")
-                    act = log.get("action", "-")
-                    svc = log.get("service", "-")
-                    det = log.get("details", "")
-                    st = log.get("status", "-")
-                    dev = log.get("device_info", "-")
-                    
-                    dt_str = QDateTime.fromSecsSinceEpoch(ts).toString("yyyy-MM-dd HH:mm:ss")
-                    it_ts = QTableWidgetItem(f"[{dt_str}]")
-                    it_ts.setFont(QFont("Consolas", 9))
-                    it_ts.setForeground(QColor(colors.get("text_dim", "#64748b")))
-                    self.table_audit.setItem(row_idx, 0, it_ts)
-
-                    it_user = QTableWidgetItem(str(uname))
-                    it_user.setFont(QFont("Consolas", 9))
-                    it_user.setForeground(QColor(colors.get("text_dim", "#64748b")))
-                    self.table_audit.setItem(row_idx, 1, it_user)
-                    
-                    it_act = QTableWidgetItem(str(act))
-                    it_act.setFont(QFont("Consolas", 9))
-                    it_act.setForeground(QColor(colors.get("text_dim", "#64748b")))
-                    self.table_audit.setItem(row_idx, 2, it_act)
-
-                    it_target = QTableWidgetItem(str(svc) if svc else "-")
-                    it_target.setFont(QFont("Consolas", 9))
-                    it_target.setForeground(QColor(colors.get("text_dim", "#64748b")))
-                    self.table_audit.setItem(row_idx, 3, it_target)
-
-                    it_dev = QTableWidgetItem(str(dev) if dev else "-")
-                    it_dev.setFont(QFont("Consolas", 9))
-                    it_dev.setForeground(QColor(colors.get("text_dim", "#64748b")))
-                    self.table_audit.setItem(row_idx, 4, it_dev)
-                    
-                    it_det = QTableWidgetItem(str(det) if det else "")
-                    it_det.setFont(QFont("Consolas", 9))
-                    it_det.setForeground(QColor(colors.get("text_dim", "#64748b")))
-                    self.table_audit.setItem(row_idx, 5, it_det)
-                    
-                    # STATUS PILL (Ultra Visibility Fix)
-                    lbl_st = QLabel(str(st).upper())
-                    lbl_st.setFont(QFont("Consolas", 9, QFont.Bold))
-                    lbl_st.setAlignment(Qt.AlignCenter)
-                    lbl_st.setContentsMargins(10, 4, 10, 4)
-                    lbl_st.setFixedHeight(24) # Más alto para evitar recortes
-                    
-                    if st in ["DENIED", "FAIL", "ERROR"]:
-                        st_key = "critical"
-                    elif st == "SUCCESS":
-                        st_key = "success"
-                    else:
-                        st_key = "default"
-                    
-                    lbl_st.setObjectName("audit_status_pill")
-                    lbl_st.setProperty("state", st_key)
-                    self._set_cell_widget_in_table(self.table_audit, row_idx, 6, lbl_st)
+                self.table_audit.setRowCount(0)
+                self._append_audit_rows(logs)
+                if not getattr(self, '_audit_scroll_hooked', False):
+                    self.table_audit.verticalScrollBar().valueChanged.connect(self._on_audit_scroll)
+                    self._audit_scroll_hooked = True
             if hasattr(self, 'activity_layout'):
                 # 1. Limpiar layout actual evitando leaks
                 while self.activity_layout.count():
@@ -850,13 +512,69 @@ class DashboardTableManager:
                     if child.widget(): child.widget().deleteLater()
                 
                 # 2. Llenar feed (Solo los 15 más recientes para performance)
-                for log in all_logs[:15]:
+                for log in logs[:15]:
                     self._add_activity_card(log)
                 
                 self.activity_layout.addStretch() # Empujar todo hacia arriba
         except Exception as e: 
             logger.error(f"Dashboard: Error loading forensic audit: {e}")
 
+    def _fetch_audit_page(self, cursor=None):
+        remote, category, search = self._audit_query
+        if remote:
+            user = None if str(getattr(self, 'user_role', '')).lower() == "admin" else self.sm.current_user
+            return self.sync_manager.get_audit_page(cursor, category, search, user_name=user)
+        return self.sm.get_audit_page(category, search, cursor)
+
+    def _on_audit_scroll(self, value):
+        bar = self.table_audit.verticalScrollBar()
+        if value < bar.maximum() - 5 or not getattr(self, '_audit_next', None): return
+        cursor, self._audit_next = self._audit_next, None   # evita pedir la misma página dos veces
+        try:
+            page = self._fetch_audit_page(cursor)
+            self._audit_next = page["next"]
+            self._append_audit_rows(page["logs"])
+        except Exception as e:
+            logger.error(f"Dashboard: Error loading audit page: {e}")
+
+    def _append_audit_rows(self, logs):
+        from PyQt5.QtCore import QDateTime
+        colors = self.theme.get_theme_colors()
+        dim = QColor(colors.get("text_dim", "#64748b"))
+        font = QFont("Consolas", 9)
+        start = self.table_audit.rowCount()
+        self.table_audit.setRowCount(start + len(logs))
+        for row_idx, log in enumerate(logs, start):
+            ts = log.get("timestamp", 0)
+            dt_str = QDateTime.fromSecsSinceEpoch(ts).toString("yyyy-MM-dd HH:mm:ss")
+            svc, dev, det = log.get("service", "-"), log.get("device_info", "-"), log.get("details", "")
+            cells = (f"[{dt_str}]", log.get("user_name", "-"), log.get("action", "-"),
+                     svc if svc else "-", dev if dev else "-", det if det else "")
+            for col, text in enumerate(cells):
+                it = QTableWidgetItem(str(text))
+                it.setFont(font)
+                it.setForeground(dim)
+                self.table_audit.setItem(row_idx, col, it)
+
+            # STATUS PILL (Ultra Visibility Fix)
+            st = log.get("status", "-")
+            lbl_st = QLabel(str(st).upper())
+            lbl_st.setFont(QFont("Consolas", 9, QFont.Bold))
+            lbl_st.setAlignment(Qt.AlignCenter)
+            lbl_st.setContentsMargins(10, 4, 10, 4)
+            lbl_st.setFixedHeight(24) # Más alto para evitar recortes
+            
+            if st in ["DENIED", "FAIL", "ERROR"]:
+                st_key = "critical"
+            elif st == "SUCCESS":
+                st_key = "success"
+            else:
+                st_key = "default"
+            
+            lbl_st.setObjectName("audit_status_pill")
+            lbl_st.setProperty("state", st_key)
+            self._set_cell_widget_in_table(self.table_audit, row_idx, 6, lbl_st)
+
     # --- AI ACTION HANDLERS ---
     def _add_activity_card(self, log):
         """Transforma un log técnico en una narrativa humana de seguridad."""
@@ -1,6 +1,6 @@
 from PyQt5.QtWidgets import (
     QVBoxLayout, QHBoxLayout, QLabel, QFrame, QComboBox, 
-    QPushButton, QLineEdit, QTableWidget, QWidget, QSlider, 
+    QPushButton, QLineEdit, QTableWidget, QTableView, QWidget, QSlider, 
     QCheckBox, QRadioButton, QButtonGroup, QScrollArea, QGridLayout, 
     QLayout, QStackedWidget, QGraphicsDropShadowEffect, QHeaderView,
     QProgressBar
@@ -22,7 +22,8 @@ from src.presentation.widgets.status_badge import StatusBadgeWidget
 from src.presentation.widgets.threat_radar import ThreatRadarWidget
 from src.presentation.widgets.tactical_pulse_bars import TacticalPulseBars
 from src.presentation.widgets.health_reactor import HealthReactorWidget
-from src.presentation.widgets.table_eye_button import TableEyeButton
+from src.presentation.dashboard.vault_table_model import VaultTableModel, VaultFilterProxyModel, VaultRowDelegate
+from src.domain.services.search_index_service import SearchIndexService
 from src.presentation.components.admin_panel import AdminPanel
 from src.presentation.widgets.tactical_metric import TacticalMetricUnit
 from src.presentation.dialogs.ghost_explanation_dialog import GhostExplanationDialog
@@ -392,6 +393,28 @@ class DashboardUI:
         self.btn_nav_dashboard.setChecked(True); self.main_stack.setCurrentIndex(0)
         self.status_sync = QLabel(); self.status_datetime = QLabel()
 
+    def _create_vault_view(self, parent=None):
+        """QTableView sobre el modelo compartido de la bóveda (un solo modelo + filtro para todas las vistas)."""
+        if not hasattr(self, 'vault_model'):
+            self.vault_model = VaultTableModel(self)
+            self.vault_proxy = VaultFilterProxyModel(self)
+            self.vault_proxy.setSourceModel(self.vault_model)
+            self.vault_search_index = SearchIndexService()
+            self.vault_model.health_changed.connect(self._on_vault_health_changed)
+            self.vault_delegate = VaultRowDelegate(self)
+            self.vault_delegate.selection_toggled.connect(self._toggle_selection)
+            self.vault_delegate.reveal_toggled.connect(self._toggle_reveal_row)
+            self.vault_delegate.copy_requested.connect(self._copy_row_password)
+
+        view = QTableView(parent)
+        view.setModel(self.vault_proxy)
+        view.setItemDelegate(self.vault_delegate)
+        view.setSelectionBehavior(QTableView.SelectRows)
+        view.setSelectionMode(QTableView.SingleSelection)
+        view.setMouseTracking(True)
+        view.verticalHeader().setDefaultSectionSize(55)
+        return view
+
     def _module_dashboard(self):
         page = QWidget()
         scroll = QScrollArea(page); scroll.setWidgetResizable(True); scroll.setFrameShape(QFrame.NoFrame); scroll.setObjectName("dashboard_scroll")
@@ -678,7 +701,7 @@ class DashboardUI:
         page_layout.addWidget(self.float_bar_dashboard, 0)
         
         # Objetos técnicos necesarios para compatibilidad
-        self.table = QTableWidget(self); self.table.hide()
+        self.table = self._create_vault_view(self); self.table.hide()
         self.btn_add = QPushButton(self); self.btn_add.hide()
         self.btn_sync = QPushButton(self); self.btn_sync.hide()
         self.btn_delete = QPushButton(self); self.btn_delete.hide()
@@ -981,12 +1004,10 @@ class DashboardUI:
         header.addWidget(self.btn_add_vault); l.addLayout(header)
         
         t_card = GlassCard(); tl = QVBoxLayout(t_card); tl.setContentsMargins(1,1,1,1)
-        self.table_vault = QTableWidget(0, 10)
+        self.table_vault = self._create_vault_view()
         self.table_vault.setAlternatingRowColors(False)  # CRITICAL: Disable OS colors!
         self.table_vault.verticalHeader().setVisible(False)
         self.table_vault.setShowGrid(False)
-        self.table_vault.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table_vault.setHorizontalHeaderLabels(["○", "LVL", "SYNC", "SERVICE", "PROPIETARIO", "ANTIGÜEDAD", "NOTAS", "PASSWORD", "ACCIONES", "STATUS"])
         
         # DARK MODE SAAS - ULTRA DARK (PREMIUM SLATE)
         # TABLE STYLING DELEGATED TO QSS (dashboard.qss)
@@ -3,6 +3,7 @@ from PyQt5.QtWidgets import QDialog
 from src.domain.messages import MESSAGES
 from src.presentation.ui_utils import PremiumMessage
 from src.presentation.dialogs.service_dialog import ServiceDialog
+from src.presentation.dashboard.vault_table_model import RecordRole
 
 logger = logging.getLogger(__name__)
 
@@ -35,36 +36,27 @@ class DashboardVaultActions:
             except Exception as e:
                 PremiumMessage.error(self, MESSAGES.COMMON.TITLE_ERROR, str(e))
 
+    def _get_record_from_row(self, row):
+        """Metadatos del registro en la fila (visible, tras el filtro de búsqueda) de la vista activa."""
+        if row < 0: return None
+        return self.table.model().index(row, 0).data(RecordRole)
+
     def _get_service_name_from_row(self, row):
-        """Método auxiliar para extraer el nombre del servicio desde el widget compuesto (Card-Row)."""
-        try:
-            # En el modelo Card-Row, la celda 3 es un Widget con layout [Icono, Nombre]
-            svc_widget = self.table.cellWidget(row, 3)
-            if svc_widget:
-                layout = svc_widget.layout()
-                if layout and layout.count() > 1:
-                    lbl = layout.itemAt(1).widget() # El índice 1 es el nombre
-                    if lbl: return lbl.text().strip()
-            
-            # Fallback para el modelo antiguo (si existe)
-            item = self.table.item(row, 3)
-            if item: return item.text().replace("🔐 ", "").replace("🔑 ", "").replace("🏢 ", "").replace(" (MARCADO PARA BORRAR)", "").strip()
-        except Exception as e:
-            logger.debug(f"Failed to extract service name from table row: {e}")
-        return None
+        """Método auxiliar para extraer el nombre del servicio de la fila."""
+        record = self._get_record_from_row(row)
+        return str(record.get("service", "")).strip() if record else None
 
     def _on_edit(self):
-        row = self.table.currentRow()
+        row = self.table.currentIndex().row()
         if row < 0:
             PremiumMessage.info(self, MESSAGES.DASHBOARD.TITLE_EDIT_REQ, MESSAGES.DASHBOARD.TEXT_EDIT_REQ)
             return
         
-        service = self._get_service_name_from_row(row)
-        if not service: return
+        meta = self._get_record_from_row(row)
+        if not meta or not str(meta.get("service", "")).strip(): return
 
-        username = self.table.item(row, 4).text().strip()
-        
-        record = self.sm.get_record(service, username)
+        # Solo se descifra la fila que se edita
+        record = self.sm.get_record_by_id(meta["id"])
         if record:
             # BLOQUEO DE SEGURIDAD PARA EXPERTO SENIOR
             if "[Bloqueado 🔑]" in record["secret"]:
@@ -94,6 +86,10 @@ class DashboardVaultActions:
                 "Solo el propietario puede editarlos.")
             return
         
+        if "secret" not in record:
+            # Registros de la tabla son solo metadatos: descifrar únicamente el que se edita
+            record = dict(record, secret=self.sm.reveal(record["id"]) or "")
+        
         dlg = ServiceDialog(self, "Editar servicio", record, secrets_manager=self.sm, app_user=self.current_username, user_role=self.user_role, settings=self.settings, guardian_ai=self.ai)
         if dlg.exec_() == QDialog.Accepted:
             data = dlg.get_data()
@@ -117,7 +113,7 @@ class DashboardVaultActions:
                 PremiumMessage.error(self, MESSAGES.COMMON.TITLE_ERROR, str(e))
 
     def _on_delete(self):
-        row = self.table.currentRow()
+        row = self.table.currentIndex().row()
         if row < 0:
             PremiumMessage.info(self, MESSAGES.DASHBOARD.TITLE_DELETE_REQ, MESSAGES.DASHBOARD.TEXT_DELETE_REQ)
             return
@@ -126,12 +122,13 @@ class DashboardVaultActions:
         
         try:
             service = self._get_service_name_from_row(row)
-            user_item = self.table.item(row, 4)
+            meta = self._get_record_from_row(row)
             
-            if not service or not user_item: return
+            if not service or not meta: return
 
-            username = user_item.text().strip()
-            record = self.sm.get_record(service, username)
+            username = str(meta.get("username", "")).strip()
+            # Borrar no necesita el secreto: metadatos frescos de la fila, sin descifrar nada
+            record = next(iter(self.sm.list_metadata(include_deleted=True, ids=[meta["id"]])), None)
             if not record: return
 
             # [PRIVACY FIX] Validar propiedad - Solo el dueño puede eliminar (excepto admin)
@@ -15,6 +15,7 @@ from src.presentation.ui_utils import PremiumMessage
 from src.presentation.dialogs.ghost_fix_dialog import GhostFixDialog
 from src.presentation.notifications.notification_manager import Notifications
 from src.presentation.dashboard.dashboard_workers import ConnectivityWorker, HeuristicWorker
+from src.presentation.dashboard.vault_table_model import VaultChangeBridge
 from src.presentation.dashboard.voice_search_worker import VoiceSearchWorker
 
 INACTIVITY_LIMIT_MS = 10 * 60 * 1000
@@ -91,6 +92,10 @@ class DashboardView(QWidget, DashboardUI, DashboardActions, DashboardTableManage
         self.audit_search_timer = QTimer(self)
         self.audit_search_timer.setSingleShot(True)
         self.audit_search_timer.timeout.connect(lambda: self._load_table_audit())
+        self.vault_search_timer = QTimer(self)
+        self.vault_search_timer.setSingleShot(True)
+        self.vault_search_timer.timeout.connect(lambda: self._on_search_changed(self._pending_vault_search))
+        self._pending_vault_search = ""
         self.setWindowFlags(Qt.Window)
         self.setAttribute(Qt.WA_TranslucentBackground, False)
         self._is_showing_maximized = False
@@ -142,9 +147,15 @@ class DashboardView(QWidget, DashboardUI, DashboardActions, DashboardTableManage
         self.conn_worker.start()
 
         # --- Hilo de Heurística (Senior Security) ---
-        self.heuristic_worker = HeuristicWorker(self.sm, self.user_manager)
+        self.heuristic_worker = HeuristicWorker(self.sm, self.user_manager, row_scorer=self._score_password)
         self.heuristic_worker.stats_updated.connect(self._on_heuristic_update)
         self.heuristic_worker.start()
+
+        # --- Eventos de cambio del repositorio -> actualizaciones incrementales del modelo ---
+        self.vault_change_bridge = VaultChangeBridge(self)
+        self.vault_change_bridge.changed.connect(self._on_vault_records_changed)
+        self._vault_change_listener = self.vault_change_bridge.changed.emit
+        self.sm.add_change_listener(self._vault_change_listener)
         
         # [NEW] Activate Vultrax Widget Bar
         self._setup_vultrax_widget_bar()
@@ -166,6 +177,8 @@ class DashboardView(QWidget, DashboardUI, DashboardActions, DashboardTableManage
         # [STARTUP OPTIMIZATION] Sincronización silenciosa en segundo plano post-arranque
         # Esperamos 1.5 segundos para que la UI se estabilice antes de la ráfaga de red
         QTimer.singleShot(1500, self._full_sync_async)
+        # [SECURITY UPGRADE] Migración Argon2id diferida desde el login: se drena con la UI ya visible
+        QTimer.singleShot(3000, self._drain_kdf_migrations_async)
 
         # [NET CODE] Enforce removal of global filters if they persisted
         try: QApplication.instance().removeEventFilter(self)
@@ -292,6 +305,14 @@ class DashboardView(QWidget, DashboardUI, DashboardActions, DashboardTableManage
         if hasattr(self, 'audit_search_timer'):
             self.audit_search_timer.start(350) # Espera 350ms de calma antes de procesar
 
+    def _trigger_vault_search(self, text):
+        """Debounce de la búsqueda de bóveda: el índice solo se consulta tras una pausa al teclear."""
+        self._pending_vault_search = text
+        if hasattr(self, 'vault_search_timer'):
+            self.vault_search_timer.start(120)
+        else:
+            self._on_search_changed(text)
+
     def _connect_ui_signals(self):
         """Conecta cada botón de la nueva interfaz modular con su lógica en DashboardActions."""
         if hasattr(self, 'nav_group'):
@@ -303,10 +324,10 @@ class DashboardView(QWidget, DashboardUI, DashboardActions, DashboardTableManage
             
         # Search HUD Integration
         if hasattr(self, 'dash_search'):
-            self.dash_search.textChanged.connect(self._on_search_changed)
+            self.dash_search.textChanged.connect(self._trigger_vault_search)
             
         if hasattr(self, 'search_vault'):
-            self.search_vault.textChanged.connect(self._on_search_changed)
+            self.search_vault.textChanged.connect(self._trigger_vault_search)
         
         # Action Buttons Integration
         if hasattr(self, 'btn_add_dash'):
@@ -432,10 +453,10 @@ class DashboardView(QWidget, DashboardUI, DashboardActions, DashboardTableManage
         # if hasattr(self, 'ai_radar'): self.ai_radar.installEventFilter(self)
         
         # --- CONEXIONES DE TABLA (Premium Context Logic) ---
-        self.table.cellClicked.connect(self._on_table_cell_clicked)
+        self.table.clicked.connect(lambda idx: self._on_table_cell_clicked(idx.row(), idx.column()))
         self.table.horizontalHeader().sectionClicked.connect(self._on_header_clicked)
         if hasattr(self, 'table_vault'):
-            self.table_vault.cellClicked.connect(self._on_table_cell_clicked)
+            self.table_vault.clicked.connect(lambda idx: self._on_table_cell_clicked(idx.row(), idx.column()))
             self.table_vault.horizontalHeader().sectionClicked.connect(self._on_header_clicked)
         
         if hasattr(self, 'btn_backup'): self.btn_backup.clicked.connect(self._on_backup)
@@ -502,6 +523,15 @@ class DashboardView(QWidget, DashboardUI, DashboardActions, DashboardTableManage
         """Aplica los resultados del análisis heurístico a la UI sin lag."""
         if not stats: return
         
+        # 0. Fuerza/bloqueo por fila para la tabla (solo metadatos): repintar si cambiaron
+        row_scores = stats.get("row_scores", {})
+        locked_ids = stats.get("locked_ids", set())
+        if row_scores != getattr(self, "_strength_scores", {}) or locked_ids != getattr(self, "_locked_ids", set()):
+            self._strength_scores = row_scores
+            self._locked_ids = locked_ids
+            # Base sin re-disparar el análisis (evita ciclo worker -> tabla -> worker)
+            DashboardTableManager._load_table(self)
+        
         try:
             # 1. Gauge Principal
             self.gauge.value = stats["score"]
@@ -671,9 +701,7 @@ class DashboardView(QWidget, DashboardUI, DashboardActions, DashboardTableManage
             # 2e. New Auth Metrics (Filling Grid)
             if hasattr(self, 'unit_auth_sessions'):
                 try:
-                    import time
-                    sessions = self.sync_manager.get_active_sessions() or []
-                    active_count = sum(1 for s in sessions if (time.time() - (s.get("last_seen", 0))) < 300 and not s.get("is_revoked"))
+                    active_count = self.sync_manager.count_active_sessions()
                     self.unit_auth_sessions.set_value(f"{max(1, active_count)} ACTIVE ⚡", color_name="success")
                 except Exception as e:
                     logger.debug(f"Failed to fetch active sessions for dashboard: {e}")
@@ -1198,13 +1226,21 @@ class DashboardView(QWidget, DashboardUI, DashboardActions, DashboardTableManage
         self.btn_nav_settings.setChecked(True)
 
     def _send_heartbeat(self):
+        # Cadencia adaptativa: el siguiente latido se espacia si la sesión está ociosa o bloqueada
+        locked = not self.isVisible()
+        idle_s = 0
+        if hasattr(self, "watcher") and self.watcher.timer.isActive():
+            idle_s = max(0, self.watcher.timeout_ms - self.watcher.timer.remainingTime()) // 1000
+        self.heartbeat_timer.start(int(self.sync_manager.next_heartbeat_interval(idle_s, locked) * 1000))
+
         if self.internet_online:
             try: 
-                self.sync_manager.send_heartbeat()
+                # Un solo intercambio: presencia + estado de revocación
+                beat = self.sync_manager.send_heartbeat(check_revocation=True)
                 
                 # REVISIÓN DE SEGURIDAD (KILL SWITCH LISTENER)
-                if self.sync_manager.check_revocation_status():
-                    logger.critical(">>> [⚠️ SEGURIDAD] ¡Esta sesión ha sido revocada remotamente!")
+                if beat["revoked"]:
+                    logger.critical(f">>> [⚠️ SEGURIDAD] ¡Esta sesión ha sido revocada remotamente! ({beat['reason']})")
                     self.hide()
                     
                     # PROTOCOLO DE LIMPIEZA DE RAM (SCRAMBLE)
@@ -1437,8 +1473,11 @@ class DashboardView(QWidget, DashboardUI, DashboardActions, DashboardTableManage
 
     def _on_voice_search_result(self, text):
         if hasattr(self, 'search_vault'):
+            self.search_vault.blockSignals(True)
             self.search_vault.setText(text)
-            # El evento textChanged ya disparará el filtrado
+            self.search_vault.blockSignals(False)
+            # Resultado completo de voz: filtrado inmediato sin esperar al debounce
+            self._on_search_changed(text)
             logger.info(f"Voice Search success: {text}")
 
     def _on_voice_search_error(self, error_msg):
@@ -1462,6 +1501,7 @@ class DashboardView(QWidget, DashboardUI, DashboardActions, DashboardTableManage
             if hasattr(self, "conn_worker"): self.conn_worker.stop()
             if hasattr(self, "heuristic_worker"): self.heuristic_worker.running = False
             if hasattr(self, "voice_worker"): self.voice_worker.terminate() # Force stop audio
+            if hasattr(self, "_vault_change_listener"): self.sm.remove_change_listener(self._vault_change_listener)
         except Exception as e:
             logger.debug(f"Worker termination during close failed: {e}")
 
@@ -1473,6 +1513,12 @@ class DashboardView(QWidget, DashboardUI, DashboardActions, DashboardTableManage
             logger.debug(f"Final logout heartbeat failed: {e}")
         
         
+        # Vaciar el buffer de auditoría antes de cerrar
+        try:
+            if hasattr(self, 'sm'): self.sm.flush_audit_log(close=True)
+        except Exception as e:
+            logger.debug(f"Audit flush on close failed: {e}")
+
         # [SECURITY] PHYSICAL ZEROING OF ALL SENSITIVE KEYS
         if hasattr(self, 'sm') and hasattr(self.sm, 'session'):
             self.sm.session.clear()
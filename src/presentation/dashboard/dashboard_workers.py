@@ -1,50 +1,65 @@
 import logging
 from PyQt5.QtCore import QThread, pyqtSignal, QDateTime
 import hashlib
+import threading
 import time
 import string
 
 logger = logging.getLogger(__name__)
 
 class ConnectivityWorker(QThread):
-    """Trabajador asíncrono para verificar estados sin congelar la interfaz."""
+    """
+    Trabajador asíncrono para verificar estados sin congelar la interfaz.
+    No sondea la red: se suscribe al monitor compartido de SyncManager y despierta
+    cuando cambia. Cada LOCAL_REFRESH_MS relee solo el estado local (SQLite, errores
+    y actividad de sync) y emite únicamente si algo cambió.
+    """
     status_updated = pyqtSignal(bool, str, str, object, object, bool) # internet, supabase, sqlite, sync_err, audit_err, is_syncing
+    LOCAL_REFRESH_MS = 1000
 
     def __init__(self, sync_manager, secrets_manager):
         super().__init__()
         self.sync_manager = sync_manager
         self.sm = secrets_manager
+        self.monitor = sync_manager.connectivity
         self.running = True
+        self._changed = threading.Event()
+
+    def _on_status(self, status):
+        self._changed.set()
 
     def run(self):
-        while self.running:
-            # 1. Internet Check (Ultra rápido)
-            internet = self.sync_manager.check_internet()
-            
-            # 2. Supabase Check (Usa sesión persistente)
-            supabase = "🔴 Offline"
-            if internet:
-                state = "🟢 Online" if self.sync_manager.check_supabase() else "🔴 Offline"
-                supabase = f"Supabase: {state}"
-            else:
-                supabase = "Supabase: 🔴 Offline"
-            
-            # 3. SQLite Check
-            sqlite = "SQLite: 🟢 Online"
-            try:
-                self.sm.conn.execute("SELECT 1")
-            except Exception as e:
-                logger.debug(f"SQLite check failed: {e}")
-                sqlite = "SQLite: 🔴 Error"
+        self.monitor.subscribe(self._on_status)
+        last = None
+        try:
+            while self.running:
+                net = self.monitor.status()
+                if net.internet is not None:
+                    supabase = f"Supabase: {'🟢 Online' if net.internet and net.backend else '🔴 Offline'}"
 
-            sync_err = getattr(self.sync_manager, "last_sync_error", None)
-            audit_err = getattr(self.sync_manager, "last_audit_error", None)
-            is_syncing = getattr(self.sync_manager, "is_busy", False)
-            self.status_updated.emit(internet, supabase, sqlite, sync_err, audit_err, is_syncing)
-            self.msleep(1000)
+                    # SQLite Check (local, sin red)
+                    sqlite = "SQLite: 🟢 Online"
+                    try:
+                        self.sm.conn.execute("SELECT 1")
+                    except Exception as e:
+                        logger.debug(f"SQLite check failed: {e}")
+                        sqlite = "SQLite: 🔴 Error"
+
+                    sync_err = getattr(self.sync_manager, "last_sync_error", None)
+                    audit_err = getattr(self.sync_manager, "last_audit_error", None)
+                    is_syncing = getattr(self.sync_manager, "is_busy", False)
+                    state = (bool(net.internet), supabase, sqlite, sync_err, audit_err, is_syncing)
+                    if state != last:
+                        self.status_updated.emit(*state)
+                        last = state
+                self._changed.wait(self.LOCAL_REFRESH_MS / 1000)
+                self._changed.clear()
+        finally:
+            self.monitor.unsubscribe(self._on_status)
 
     def stop(self):
         self.running = False
+        self._changed.set()
 
 class HeuristicWorker(QThread):
     """
@@ -53,10 +68,12 @@ class HeuristicWorker(QThread):
     """
     stats_updated = pyqtSignal(dict)
 
-    def __init__(self, sm, um):
+    def __init__(self, sm, um, row_scorer=None):
         super().__init__()
         self.sm = sm
         self.um = um
+        # Escala de la tabla (DashboardUI._score_password) para el icono LVL por fila
+        self.row_scorer = row_scorer or self._internal_score
         self.running = True
 
     def run(self):
@@ -79,25 +96,43 @@ class HeuristicWorker(QThread):
 
     def _calculate_real_risk(self):
         try:
-            records = self.sm.get_all() or []
-            valid_recs = [r for r in records if r.get("deleted", 0) == 0]
-            total_count = len(valid_recs)
-            
             score_base = 100
             
             # 1. Password Strength Check
             weak_count = 0
             old_count = 0
-            secret_hashes = {}
+            secret_hashes = {}   # md5 -> [metadatos de los registros que lo comparten]
             reused_count = 0
+            total_count = 0
             now = int(time.time())
             
-            for r in valid_recs:
-                raw = r.get("secret", "")
+            # --- DATA FOR GHOST FIX DIALOG --- (solo metadatos: el diálogo descifra al editar)
+            problematic_records = {
+                'reused': {}, # hash -> [records]
+                'weak': []    # [records + score]
+            }
+            
+            # La tabla lista solo metadatos: fuerza y bloqueo por fila se calculan aquí, fuera del hilo de UI.
+            # Un único barrido en streaming que no pasa por record_cache: cada texto plano se
+            # descarta en cuanto se puntúa, en lugar de dejar la bóveda entera descifrada en memoria.
+            row_scores = {}
+            locked_ids = set()
+            for r in self.sm.iter_decrypted(use_cache=False):
+                raw = r.pop("secret", "") or ""
+                if raw in self.sm.UNREADABLE_SECRETS:
+                    locked_ids.add(r.get("id"))
+                    row_scores[r.get("id")] = 0
+                else:
+                    row_scores[r.get("id")] = self.row_scorer(raw)
+                total_count += 1
                 if not raw or "[" in raw: continue # Ignorar errores o bloqueados
+                meta = {k: v for k, v in r.items() if k != "nonce"}
                 
                 # Check Weak (< 70 en escala interna)
-                if self._internal_score(raw) < 70: weak_count += 1
+                score = self._internal_score(raw)
+                if score < 70:
+                    weak_count += 1
+                    problematic_records['weak'].append(dict(meta, score=score))
                 
                 # Check Stale (> 180 días)
                 ts = r.get("updated_at") or r.get("timestamp") or now
@@ -105,10 +140,12 @@ class HeuristicWorker(QThread):
                 
                 # Check Reused
                 h = hashlib.md5(raw.encode()).hexdigest()
-                secret_hashes[h] = secret_hashes.get(h, 0) + 1
+                secret_hashes.setdefault(h, []).append(meta)
+                raw = None
             
             # Count excess records
-            reused_count = sum(v - 1 for v in secret_hashes.values() if v > 1)
+            reused_count = sum(len(v) - 1 for v in secret_hashes.values() if len(v) > 1)
+            problematic_records['reused'] = {h: recs for h, recs in secret_hashes.items() if len(recs) > 1}
             
             # -- CÁLCULO DE PENALIZACIONES --
             penalty_weak = 15 if weak_count > 0 else 0
@@ -149,27 +186,6 @@ class HeuristicWorker(QThread):
             final_score = score_base - (penalty_weak + penalty_reused + penalty_old + penalty_mfa + penalty_spike)
             final_score = max(0, final_score)
             
-            # --- DATA FOR GHOST FIX DIALOG ---
-            problematic_records = {
-                'reused': {}, # hash -> [records]
-                'weak': []    # [records + score]
-            }
-            for r in valid_recs:
-                raw = r.get("secret", "")
-                if not raw or "[" in raw: continue
-                
-                score = self._internal_score(raw)
-                if score < 70:
-                    r_copy = r.copy()
-                    r_copy['score'] = score
-                    problematic_records['weak'].append(r_copy)
-                
-                h = hashlib.md5(raw.encode()).hexdigest()
-                if h in secret_hashes and secret_hashes[h] > 1:
-                    if h not in problematic_records['reused']:
-                        problematic_records['reused'][h] = []
-                    problematic_records['reused'][h].append(r)
-            
             # Formatear Métricas
             hygiene = 100 - (weak_count / total_count * 100) if total_count > 0 else 100
             mfa_coverage = 100 if admin_no_mfa == 0 else 66 # Simplificado
@@ -194,7 +210,9 @@ class HeuristicWorker(QThread):
                 "failed_logins_24h": recent_fails,
                 "last_suspicious": last_suspicious,
                 "is_critical": final_score < 70,
-                "problematic_records": problematic_records
+                "problematic_records": problematic_records,
+                "row_scores": row_scores,
+                "locked_ids": locked_ids
             }
         except Exception as e:
             logger.error(f"Heuristic Analysis Error: {e}")
@@ -209,3 +227,132 @@ class HeuristicWorker(QThread):
         if any(c.isdigit() for c in pwd): s += 15
         if any(c in string.punctuation for c in pwd): s += 25
         return s
+
+class ImportWorker(QThread):
+    """
+    Importación masiva fuera del hilo de UI: lee el archivo en streaming (import_readers),
+    cifra y confirma por bloques (bulk_add_secrets) y se puede cancelar entre bloques.
+    """
+    progress = pyqtSignal(int, str)        # porcentaje, texto
+    completed = pyqtSignal(dict, bool)     # stats, cancelado
+    failed = pyqtSignal(str)
+
+    def __init__(self, sm, path=None, records=None, passphrase=None):
+        super().__init__()
+        self.sm = sm
+        self.path = path
+        self.records = records  # filas ya cargadas (bóveda .db externa)
+        self.passphrase = passphrase  # archivo cifrado .vxa
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        if self.passphrase is not None: return self._run_archive()
+        reader = None
+        try:
+            if self.records is None:
+                from src.infrastructure.import_readers import open_reader
+                reader = open_reader(self.path)
+            total = len(self.records) if self.records is not None else 0
+
+            def on_progress(rows, stats):
+                pct = reader.progress() * 100 if reader else rows * 100 / max(1, total)
+                self.progress.emit(min(99, int(pct)), f"{rows} registros procesados · {stats['added']} nuevos")
+
+            stats = self.sm.bulk_add_secrets(reader if reader else self.records,
+                                             progress_callback=on_progress, cancel_event=self._cancel)
+            self.completed.emit(stats, self._cancel.is_set())
+        except Exception as e:
+            logger.error(f"Import Worker Error: {e}", exc_info=True)
+            self.failed.emit(str(e))
+        finally:
+            if reader: reader.close()
+
+    def _run_archive(self):
+        """Archivo .vxa: bloque a bloque, reanudable desde el último bloque confirmado."""
+        try:
+            def on_progress(done, total, stats):
+                pct = done * 100 / total if total else 0
+                self.progress.emit(min(99, int(pct)), f"Bloque {done}/{total or '?'} · {stats['added']} nuevos")
+
+            stats = self.sm.import_archive(self.path, self.passphrase, progress_callback=on_progress,
+                                           cancel_event=self._cancel)
+            self.completed.emit(stats, self._cancel.is_set())
+        except Exception as e:
+            logger.error(f"Archive Import Worker Error: {e}", exc_info=True)
+            self.failed.emit(str(e))
+
+
+class ExportWorker(QThread):
+    """
+    Exportación en streaming fuera del hilo de UI: los registros se descifran fila a fila
+    (iter_decrypted) y se escriben al vuelo. Con passphrase genera el archivo cifrado .vxa;
+    sin ella, CSV/JSON en texto plano como hasta ahora.
+    """
+    progress = pyqtSignal(int, str)
+    completed = pyqtSignal(dict, bool)     # stats, cancelado
+    failed = pyqtSignal(str)
+
+    FIELDS = ("service", "username", "password", "notes", "is_private")
+
+    def __init__(self, sm, path, passphrase=None):
+        super().__init__()
+        self.sm = sm
+        self.path = path
+        self.passphrase = passphrase
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _emit(self, rows, total):
+        self.progress.emit(min(99, int(rows * 100 / max(1, total))), f"{rows}/{total} registros exportados")
+
+    def run(self):
+        try:
+            if self.passphrase is not None:
+                stats = self.sm.export_archive(self.path, self.passphrase, progress_callback=self._emit,
+                                               cancel_event=self._cancel)
+            else:
+                stats = self._export_plain()
+            self.completed.emit(stats, stats.get("cancelled", False))
+        except Exception as e:
+            logger.error(f"Export Worker Error: {e}", exc_info=True)
+            self.failed.emit(str(e))
+
+    def _export_plain(self):
+        import os
+        import csv
+        import json
+        import textwrap
+        stats = {"exported": 0, "skipped": 0, "cancelled": False}
+        total = self.sm.count_encrypted()
+        tmp = self.path + ".part"
+        is_csv = self.path.lower().endswith(".csv")
+        with open(tmp, "w", newline="" if is_csv else None, encoding="utf-8") as f:
+            writer = csv.writer(f) if is_csv else None
+            if writer: writer.writerow(self.FIELDS)
+            else: f.write("[")
+            for i, r in enumerate(self.sm.iter_decrypted(use_cache=False), 1):
+                if r.get("secret") in self.sm.UNREADABLE_SECRETS:
+                    stats["skipped"] += 1
+                else:
+                    rec = {"service": str(r.get("service") or ""), "username": str(r.get("username") or ""),
+                           "password": str(r["secret"]), "notes": str(r.get("notes") or ""),
+                           "is_private": int(r.get("is_private") or 0)}
+                    if writer: writer.writerow([rec[k] for k in self.FIELDS])
+                    else:
+                        # Mismo formato que json.dump(lista, indent=4), un objeto cada vez
+                        f.write(("," if stats["exported"] else "") + "\n" + textwrap.indent(json.dumps(rec, indent=4, ensure_ascii=False), "    "))
+                    stats["exported"] += 1
+                if i % 500 == 0:
+                    self._emit(i, total)
+                    if self._cancel.is_set():
+                        stats["cancelled"] = True
+                        break
+            if not writer: f.write("\n]" if stats["exported"] else "]")
+        if stats["cancelled"]: os.remove(tmp)
+        else: os.replace(tmp, self.path)
+        return stats
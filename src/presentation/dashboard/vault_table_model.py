@@ -0,0 +1,345 @@
+import time
+import logging
+from typing import Any, Dict, List, Optional
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyle, QStyleOptionViewItem
+from PyQt5.QtCore import Qt, QAbstractTableModel, QSortFilterProxyModel, QModelIndex, QRect, QEvent, QObject, pyqtSignal
+from PyQt5.QtGui import QColor, QPen, QPainter
+
+logger = logging.getLogger(__name__)
+
+# Columnas de la tabla de bóveda (compartidas por table_vault y la tabla técnica del dashboard)
+COL_SEL, COL_LVL, COL_SYNC, COL_SERVICE, COL_OWNER, COL_AGE, COL_NOTES, COL_PASSWORD, COL_ACTIONS, COL_STATUS = range(10)
+HEADERS = ["○", "LVL", "SYNC", "SERVICE", "PROPIETARIO", "ANTIGÜEDAD", "NOTAS", "PASSWORD", "ACCIONES", "STATUS"]
+
+# Rol con el dict de metadatos del registro (mismo rol que usaban los QTableWidgetItem)
+RecordRole = Qt.UserRole + 1
+
+
+class VaultTableModel(QAbstractTableModel):
+    """
+    Modelo virtualizado de la bóveda: guarda solo la lista de metadatos.
+    Todo el contenido (iconos, colores, badges) se calcula en data() para las filas visibles.
+    """
+    # Filas cuyo texto indexable (icono LVL) cambió en set_health: el índice de búsqueda las re-indexa
+    health_changed = pyqtSignal(list)
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._records: List[Dict[str, Any]] = []
+        self._row_by_id: Dict[Any, int] = {}
+        self.colors: Dict[str, str] = {}
+        self.strength_scores: Dict[Any, int] = {}
+        self.locked_ids: set = set()
+        self.selected: Dict[Any, Dict[str, Any]] = {}
+        self._revealed: Dict[Any, str] = {}
+        self._now = int(time.time())
+
+    # --- QAbstractTableModel ---
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._records)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section: int, orientation: int, role: int = Qt.DisplayRole) -> Any:
+        if orientation != Qt.Horizontal or role != Qt.DisplayRole: return None
+        if section == COL_SEL:
+            return "  ✖  " if self.selected else "  ○  "
+        return HEADERS[section]
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid() or index.row() >= len(self._records): return None
+        r = self._records[index.row()]
+        col = index.column()
+        rid = r.get("id")
+
+        if role == RecordRole: return r
+        if role == Qt.UserRole and col == COL_SEL: return rid
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignLeft | Qt.AlignVCenter) if col == COL_SERVICE else int(Qt.AlignCenter)
+        if role == Qt.DisplayRole: return self._display(r, col)
+        if role == Qt.ForegroundRole: return self._foreground(r, col)
+        if role == Qt.BackgroundRole and rid in self.selected:
+            bg = QColor(self.colors.get("primary", "#0891b2"))
+            bg.setAlpha(75)
+            return bg
+        return None
+
+    # --- Presentación por columna ---
+    def _score(self, r: Dict[str, Any]) -> Optional[int]:
+        return self.strength_scores.get(r.get("id"))
+
+    def _age_days(self, r: Dict[str, Any]) -> int:
+        upd = r.get("updated_at") or r.get("timestamp") or self._now
+        return (self._now - upd) // 86400
+
+    def service_icon(self, r: Dict[str, Any]) -> str:
+        is_private = r.get("is_private", 0) == 1
+        if r.get("deleted", 0) == 1: return "🗑️"
+        if is_private: return "🔒"
+        if "google" in str(r.get("service", "")).lower(): return "🌐"
+        return "🔑"
+
+    def search_fields(self, r: Dict[str, Any]) -> List[str]:
+        """Texto indexable de la fila: LVL, servicio, usuario, dueño, notas y antigüedad."""
+        return [self._display(r, COL_LVL), r.get("service", ""), r.get("username", ""),
+                r.get("owner_name", ""), r.get("notes", "") or "", self._display(r, COL_AGE)]
+
+    def _display(self, r: Dict[str, Any], col: int) -> str:
+        rid = r.get("id")
+        if col == COL_SEL: return "●" if rid in self.selected else "○"
+        if col == COL_LVL:
+            score = self._score(r)
+            if r.get("deleted", 0) == 1: return "💀"
+            if score is None: return "◌" # Análisis heurístico pendiente
+            return "🛡️" if score >= 70 else "⚠️"
+        if col == COL_SYNC: return "☁️" if r.get("synced", 0) == 1 else "⏳"
+        if col == COL_SERVICE: return f"{self.service_icon(r)}  {r.get('service', '')}"
+        if col == COL_OWNER: return str(r.get("owner_name", "Desconocido"))
+        if col == COL_AGE: return f"{self._age_days(r)}d"
+        if col == COL_NOTES:
+            notes = r.get("notes", "") or ""
+            return (notes[:20] + "...") if len(notes) > 20 else notes
+        if col == COL_PASSWORD:
+            if rid in self.locked_ids: return "NODO_PROTEGIDO"
+            return self._revealed.get(rid, "••••••••")
+        if col == COL_ACTIONS: return "PASS"
+        if col == COL_STATUS: return "LOCKED" if rid in self.locked_ids else "ONLINE"
+        return ""
+
+    def _foreground(self, r: Dict[str, Any], col: int) -> QColor:
+        c = self.colors
+        is_deleted = r.get("deleted", 0) == 1
+        if col == COL_LVL and not is_deleted:
+            score = self._score(r)
+            if score is not None and score < 70: return QColor(c.get("warning", "#f59e0b"))
+            return QColor(c.get("primary", "#06b6d4"))
+        if col == COL_SYNC:
+            return QColor(c.get("primary" if r.get("synced", 0) == 1 else "warning", "#06b6d4"))
+        if col == COL_AGE:
+            days = self._age_days(r)
+            if days > 180: return QColor(c.get("danger", "#ef4444"))
+            if days > 90: return QColor(c.get("warning", "#f59e0b"))
+        if col == COL_NOTES: return QColor(c.get("text_dim", "#94a3b8"))
+        if col == COL_PASSWORD:
+            if r.get("id") in self.locked_ids: return QColor(c.get("danger", "#f87171"))
+            if r.get("id") in self._revealed: return QColor(c.get("text", "#ffffff"))
+            return QColor(c.get("text_dim", "#94a3b8"))
+        return QColor(c.get("text", "#ffffff"))
+
+    # --- API de datos ---
+    def set_records(self, records: List[Dict[str, Any]]) -> None:
+        self.beginResetModel()
+        self._records = list(records)
+        self._now = int(time.time())
+        self._reindex()
+        self._revealed = {}
+        # Conservar la selección solo de registros que siguen existiendo
+        self.selected = {rid: self._records[row] for rid, row in self._row_by_id.items() if rid in self.selected}
+        self.endResetModel()
+
+    def records(self) -> List[Dict[str, Any]]:
+        return self._records
+
+    def record_at(self, row: int) -> Optional[Dict[str, Any]]:
+        return self._records[row] if 0 <= row < len(self._records) else None
+
+    def row_for_id(self, rid: Any) -> int:
+        return self._row_by_id.get(rid, -1)
+
+    def upsert_record(self, record: Dict[str, Any]) -> None:
+        """Inserta o actualiza una sola fila sin reiniciar el modelo."""
+        rid = record.get("id")
+        row = self.row_for_id(rid)
+        self._revealed.pop(rid, None)
+        if row >= 0:
+            self._records[row] = record
+            if rid in self.selected: self.selected[rid] = record
+            self._emit_row_changed(row)
+            return
+        row = len(self._records)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._records.append(record)
+        self._row_by_id[rid] = row
+        self.endInsertRows()
+
+    def remove_record(self, rid: Any) -> None:
+        row = self.row_for_id(rid)
+        if row < 0: return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._records[row]
+        self._reindex()
+        self.selected.pop(rid, None)
+        self._revealed.pop(rid, None)
+        self.endRemoveRows()
+
+    def _reindex(self) -> None:
+        self._row_by_id = {r.get("id"): i for i, r in enumerate(self._records)}
+
+    def _emit_row_changed(self, row: int) -> None:
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(HEADERS) - 1))
+
+    # --- Estado de presentación ---
+    def set_colors(self, colors: Dict[str, str]) -> None:
+        self.colors = colors or {}
+
+    def set_health(self, strength_scores: Dict[Any, int], locked_ids: set) -> None:
+        before = [self._display(r, COL_LVL) for r in self._records]
+        self.strength_scores = strength_scores or {}
+        self.locked_ids = locked_ids or set()
+        if self._records:
+            self.dataChanged.emit(self.index(0, COL_LVL), self.index(len(self._records) - 1, COL_STATUS))
+        changed = [r for r, lvl in zip(self._records, before) if self._display(r, COL_LVL) != lvl]
+        if changed: self.health_changed.emit(changed)
+
+    def toggle_selected(self, rid: Any) -> bool:
+        row = self.row_for_id(rid)
+        if row < 0: return False
+        if rid in self.selected:
+            del self.selected[rid]
+        else:
+            self.selected[rid] = self._records[row]
+        self._emit_row_changed(row)
+        self.headerDataChanged.emit(Qt.Horizontal, COL_SEL, COL_SEL)
+        return rid in self.selected
+
+    def clear_selection(self) -> None:
+        rows = [self.row_for_id(rid) for rid in self.selected]
+        self.selected = {}
+        for row in rows:
+            if row >= 0: self._emit_row_changed(row)
+        self.headerDataChanged.emit(Qt.Horizontal, COL_SEL, COL_SEL)
+
+    def set_revealed(self, rid: Any, plaintext: Optional[str]) -> None:
+        """Texto plano temporal para el ojo de la columna PASSWORD (None = ocultar)."""
+        if plaintext is None: self._revealed.pop(rid, None)
+        else: self._revealed[rid] = plaintext
+        row = self.row_for_id(rid)
+        if row >= 0:
+            idx = self.index(row, COL_PASSWORD)
+            self.dataChanged.emit(idx, idx)
+
+    def is_revealed(self, rid: Any) -> bool:
+        return rid in self._revealed
+
+
+class VaultFilterProxyModel(QSortFilterProxyModel):
+    """
+    Filtro de búsqueda: acepta las filas cuyo id está en el conjunto devuelto por
+    SearchIndexService.search(). None = sin filtro.
+    """
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._visible_ids: Optional[set] = None
+
+    def set_visible_ids(self, ids: Optional[set]) -> None:
+        if ids is None and self._visible_ids is None: return
+        self._visible_ids = ids
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        if self._visible_ids is None: return True
+        record = self.sourceModel().record_at(source_row)
+        return bool(record) and record.get("id") in self._visible_ids
+
+    def row_for_id(self, rid: Any) -> int:
+        """Fila visible (en coordenadas del proxy) del registro, o -1 si está filtrado."""
+        src_row = self.sourceModel().row_for_id(rid)
+        if src_row < 0: return -1
+        return self.mapFromSource(self.sourceModel().index(src_row, 0)).row()
+
+
+class VaultChangeBridge(QObject):
+    """
+    Puente hilo-seguro para eventos de cambio del repositorio de secretos.
+    Se registra con SecretsManager.add_change_listener(bridge.changed.emit); las escrituras
+    hechas desde hilos de sync llegan al hilo de UI como señal encolada.
+    """
+    changed = pyqtSignal(str, list)
+
+
+class VaultRowDelegate(QStyledItemDelegate):
+    """
+    Pinta bajo demanda los controles que antes eran setCellWidget por fila
+    (ojo de password, botón PASS, badge de estado) y traduce los clicks en señales.
+    """
+    selection_toggled = pyqtSignal(object)
+    reveal_toggled = pyqtSignal(object)
+    copy_requested = pyqtSignal(object)
+
+    EYE_WIDTH = 30
+    BUTTON_SIZE = (65, 28)
+    BADGE_SIZE = (80, 24)
+
+    def _colors(self, index: QModelIndex) -> Dict[str, str]:
+        model = index.model()
+        if hasattr(model, "sourceModel"): model = model.sourceModel()
+        return getattr(model, "colors", {}) or {}
+
+    def _centered(self, rect: QRect, w: int, h: int) -> QRect:
+        return QRect(rect.center().x() - w // 2, rect.center().y() - h // 2, w, h)
+
+    def _eye_rect(self, rect: QRect) -> QRect:
+        return QRect(rect.right() - self.EYE_WIDTH - 10, rect.top(), self.EYE_WIDTH, rect.height())
+
+    def paint(self, painter, option, index) -> None:
+        col = index.column()
+        if col not in (COL_PASSWORD, COL_ACTIONS, COL_STATUS):
+            super().paint(painter, option, index)
+            return
+
+        # Fondo/selección estándar sin texto; el contenido se dibuja a mano
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        opt.text = ""
+        style = opt.widget.style() if opt.widget else None
+        if style: style.drawControl(QStyle.CE_ItemViewItem, opt, painter, opt.widget)
+
+        colors = self._colors(index)
+        text = index.data(Qt.DisplayRole) or ""
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing, True)
+        if col == COL_PASSWORD:
+            text_rect = option.rect.adjusted(10, 0, -(self.EYE_WIDTH + 20), 0)
+            painter.setPen(QColor(index.data(Qt.ForegroundRole) or colors.get("text_dim", "#94a3b8")))
+            painter.drawText(text_rect, Qt.AlignCenter, text)
+            rid = (index.data(RecordRole) or {}).get("id")
+            model = index.model()
+            if hasattr(model, "sourceModel"): model = model.sourceModel()
+            eye = "🙈" if model.is_revealed(rid) else "👁️"
+            painter.drawText(self._eye_rect(option.rect), Qt.AlignCenter, eye)
+        elif col == COL_ACTIONS:
+            btn = self._centered(option.rect, *self.BUTTON_SIZE)
+            painter.setPen(QPen(QColor(colors.get("primary", "#06b6d4")), 1))
+            painter.drawRoundedRect(btn, 6, 6)
+            painter.drawText(btn, Qt.AlignCenter, text)
+        else:
+            ok = text == "ONLINE"
+            tone = QColor(colors.get("success" if ok else "danger", "#10b981" if ok else "#ef4444"))
+            badge = self._centered(option.rect, *self.BADGE_SIZE)
+            fill = QColor(tone); fill.setAlpha(40)
+            painter.setPen(QPen(tone, 1))
+            painter.setBrush(fill)
+            painter.drawRoundedRect(badge, 10, 10)
+            painter.drawText(badge, Qt.AlignCenter, text)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index) -> bool:
+        if event.type() != QEvent.MouseButtonRelease or event.button() != Qt.LeftButton:
+            return super().editorEvent(event, model, option, index)
+        record = index.data(RecordRole) or {}
+        rid = record.get("id")
+        col = index.column()
+        if col == COL_SEL:
+            self.selection_toggled.emit(rid)
+            return True
+        if col == COL_PASSWORD and self._eye_rect(option.rect).contains(event.pos()):
+            self.reveal_toggled.emit(rid)
+            return True
+        if col == COL_ACTIONS and self._centered(option.rect, *self.BUTTON_SIZE).contains(event.pos()):
+            self.copy_requested.emit(rid)
+            return True
+        return super().editorEvent(event, model, option, index)
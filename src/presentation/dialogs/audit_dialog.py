@@ -17,6 +17,7 @@ class AuditDialog(QDialog):
         self.user_role = user_role
         self.logger = logging.getLogger(__name__)
         self.view_mode = "local" # or "remote"
+        self._next = None        # cursor (timestamp, id) de la siguiente página
         from PyQt5.QtCore import QSettings
         self.settings = QSettings(ThemeManager.APP_ID, "VultraxCore_Global")
         self.theme = ThemeManager()
@@ -97,6 +98,7 @@ class AuditDialog(QDialog):
         self.table.setEditTriggers(QTableWidget.NoEditTriggers)
         self.table.verticalHeader().setVisible(False)
         self.table.setShowGrid(False)
+        self.table.verticalScrollBar().valueChanged.connect(self._on_scroll)
         self.setStyleSheet(self.theme.load_stylesheet("dialogs"))
  
         if str(self.user_role).lower() == "admin":
@@ -140,6 +142,14 @@ class AuditDialog(QDialog):
         self.btn_clear.setEnabled(mode == "local")
         self._load_logs()
 
+    def _fetch_page(self, cursor=None):
+        if self.view_mode == "local":
+            return self.sm.get_audit_page(cursor=cursor)
+        # [PRIVACY FIX] Solo cargar logs propios a menos que sea ADMIN en modo Global
+        is_admin_global = (str(self.user_role).lower() == "admin" and self.view_mode == "remote")
+        user = None if is_admin_global else self.sync_manager.sm.current_user
+        return self.sync_manager.get_audit_page(cursor, user_name=user)
+
     def _load_logs(self):
         self.lbl_status.setText("⏳ ACTUALIZANDO DATOS...")
         self.btn_refresh.setEnabled(False)
@@ -148,70 +158,17 @@ class AuditDialog(QDialog):
 
         try:
             self.table.setRowCount(0) # Limpiar antes de cargar
-            logs = []
-            
-            if self.view_mode == "local":
-                logs = self.sm.get_audit_logs(limit=500)
-            else:
-                # Cargar desde Supabase vía SyncManager
-                import requests
-                # [PRIVACY FIX] Solo cargar logs propios a menos que sea ADMIN en modo Global
-                is_admin_global = (str(self.user_role).lower() == "admin" and self.view_mode == "remote")
-                
-                if is_admin_global:
-                    url = f"{self.sync_manager.supabase_url}/rest/v1/security_audit?select=*&order=timestamp.desc&limit=200"
-                else:
-                    user_filter = f"user_name=ilike.{self.sync_manager.sm.current_user}"
-                    url = f"{self.sync_manager.supabase_url}/rest/v1/security_audit?{user_filter}&select=*&order=timestamp.desc&limit=100"
-                
-                r = requests.get(url, headers=self.sync_manager.headers, timeout=5)
-                if r.status_code == 200:
-                    logs = r.json()
-                else:
-                    self.logger.error(f"Error fetching remote logs: {r.text}")
-                    raise Exception(f"Error de red o permisos: {r.text}")
+            self._next = None
+            page = self._fetch_page()
+            logs = page["logs"]
 
             if not logs:
                 self.lbl_status.setText(f"📋 MODO: {self.view_mode.upper()} (Sin registros)")
                 self.btn_refresh.setEnabled(True)
                 return
 
-            self.table.setRowCount(len(logs))
-            for i, row in enumerate(logs):
-                ts = row.get("timestamp", 0)
-                uname = row.get("user_name", "SYSTEM")
-                act = row.get("action", "-")
-                svc = row.get("service", "")
-                det = row.get("details", "")
-                dev = row.get("device_info", "-")
-                st = row.get("status", "-")
-
-                dt = QDateTime.fromSecsSinceEpoch(int(ts)).toString("yyyy-MM-dd HH:mm:ss") if ts else "---"
-                self.table.setItem(i, 0, QTableWidgetItem(dt))
-                self.table.item(i, 0).setTextAlignment(Qt.AlignCenter)
-                
-                self.table.setItem(i, 1, QTableWidgetItem(str(uname)))
-                self.table.item(i, 1).setTextAlignment(Qt.AlignCenter)
-                
-                item_act = QTableWidgetItem(str(act))
-                item_act.setTextAlignment(Qt.AlignCenter)
-                colors = self.theme.get_theme_colors()
-                if any(x in str(act) for x in ["FISICA", "PURGA", "ELIMINAR"]):
-                    item_act.setForeground(QColor(colors["danger"]))
-                    item_act.setFont(QFont("Segoe UI", -1, QFont.Bold))
-                self.table.setItem(i, 2, item_act)
-                
-                self.table.setItem(i, 3, QTableWidgetItem(str(svc)))
-                self.table.item(i, 3).setTextAlignment(Qt.AlignCenter)
-                self.table.setItem(i, 4, QTableWidgetItem(str(det)))
-                self.table.setItem(i, 5, QTableWidgetItem(str(dev)))
-                self.table.item(i, 5).setTextAlignment(Qt.AlignCenter)
-                
-                item_st = QTableWidgetItem(str(st))
-                item_st.setTextAlignment(Qt.AlignCenter)
-                item_st.setForeground(QColor(colors["success"]) if st == "SUCCESS" else QColor(colors["danger"]))
-                self.table.setItem(i, 6, item_st)
-
+            self._append_rows(logs)
+            self._next = page["next"]
             self.lbl_status.setText(f"✅ VISTA: {self.view_mode.upper()}")
 
         except Exception as e:
@@ -220,6 +177,55 @@ class AuditDialog(QDialog):
         finally:
             self.btn_refresh.setEnabled(True)
 
+    def _on_scroll(self, value):
+        """Siguiente página (keyset) al llegar al final de la tabla."""
+        if value < self.table.verticalScrollBar().maximum() - 5 or not self._next: return
+        cursor, self._next = self._next, None
+        try:
+            page = self._fetch_page(cursor)
+            self._append_rows(page["logs"])
+            self._next = page["next"]
+        except Exception as e:
+            self.logger.error(f"Error loading audit page: {e}")
+
+    def _append_rows(self, logs):
+        colors = self.theme.get_theme_colors()
+        start = self.table.rowCount()
+        self.table.setRowCount(start + len(logs))
+        for i, row in enumerate(logs, start):
+            ts = row.get("timestamp", 0)
+            uname = row.get("user_name", "SYSTEM")
+            act = row.get("action", "-")
+            svc = row.get("service", "")
+            det = row.get("details", "")
+            dev = row.get("device_info", "-")
+            st = row.get("status", "-")
+
+            dt = QDateTime.fromSecsSinceEpoch(int(ts)).toString("yyyy-MM-dd HH:mm:ss") if ts else "---"
+            self.table.setItem(i, 0, QTableWidgetItem(dt))
+            self.table.item(i, 0).setTextAlignment(Qt.AlignCenter)
+            
+            self.table.setItem(i, 1, QTableWidgetItem(str(uname)))
+            self.table.item(i, 1).setTextAlignment(Qt.AlignCenter)
+            
+            item_act = QTableWidgetItem(str(act))
+            item_act.setTextAlignment(Qt.AlignCenter)
+            if any(x in str(act) for x in ["FISICA", "PURGA", "ELIMINAR"]):
+                item_act.setForeground(QColor(colors["danger"]))
+                item_act.setFont(QFont("Segoe UI", -1, QFont.Bold))
+            self.table.setItem(i, 2, item_act)
+            
+            self.table.setItem(i, 3, QTableWidgetItem(str(svc)))
+            self.table.item(i, 3).setTextAlignment(Qt.AlignCenter)
+            self.table.setItem(i, 4, QTableWidgetItem(str(det)))
+            self.table.setItem(i, 5, QTableWidgetItem(str(dev)))
+            self.table.item(i, 5).setTextAlignment(Qt.AlignCenter)
+            
+            item_st = QTableWidgetItem(str(st))
+            item_st.setTextAlignment(Qt.AlignCenter)
+            item_st.setForeground(QColor(colors["success"]) if st == "SUCCESS" else QColor(colors["danger"]))
+            self.table.setItem(i, 6, item_st)
+
     def _on_clear_logs(self):
         if PremiumMessage.question(self, "Confirmar Borrado", "¿Deseas borrar TODO el historial de auditoría LOCAL?"):
             try:
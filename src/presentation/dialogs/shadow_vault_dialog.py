@@ -183,10 +183,10 @@ class ShadowVaultDialog(QDialog):
 
         if PremiumMessage.question(self, MESSAGES.SHADOW.MSG_PURGE_WARN_TITLE, MESSAGES.SHADOW.MSG_PURGE_WARN_TEXT):
             try:
+                # [ESTRICTO] Borramos de la nube primero si hay red (un DELETE por lote, no por registro)
+                if self.sync_manager and self.sync_manager.check_internet():
+                    self.sync_manager.delete_from_supabase(list(self.selected_ids))
                 for rid in self.selected_ids:
-                    # [ESTRICTO] Borramos de la nube primero si hay red
-                    if self.sync_manager and self.sync_manager.check_internet():
-                        self.sync_manager.delete_from_supabase(rid)
                     # Borramos de la base de datos local (Hard Delete)
                     self.sm.hard_delete_secret(rid)
                 
@@ -5,7 +5,7 @@ from PyQt5.QtWidgets import (
     QProgressBar
 )
 from PyQt5.QtGui import QPixmap, QColor, QFont, QIcon, QPainter, QLinearGradient, QRadialGradient, QConicalGradient
-from PyQt5.QtCore import Qt, QPropertyAnimation, QPoint, QSettings, QTimer, QRect
+from PyQt5.QtCore import Qt, QPropertyAnimation, QPoint, QSettings, QTimer, QRect, pyqtSignal
 import pyotp
 import time
 import base64
@@ -124,6 +124,8 @@ class ConnectivityLED(QWidget):
         painter.drawEllipse(center, 2, 2)
 
 class LoginView(QMainWindow):
+    connectivity_changed = pyqtSignal(bool) # Puente al hilo de la GUI desde el monitor de conectividad
+
     def __init__(self, user_manager=None, prefill_user=None, on_success=None):
         super().__init__()
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.Window)
@@ -389,25 +391,30 @@ class LoginView(QMainWindow):
         card_layout.addWidget(self.lbl_version)
         card_layout.addSpacing(10) # Minimal padding
         
-        # Timer para el LED de conectividad
-        self.conn_timer = QTimer(self)
-        self.conn_timer.timeout.connect(self._check_connectivity)
-        self.conn_timer.start(5000) # Cada 5 seg
-        self._check_connectivity() # Primera ejecución
-
-    def _check_connectivity(self):
-        """Verifica si hay acceso a la red de forma no bloqueante."""
+        # LED de conectividad: suscrito al monitor compartido, sin sondeos propios
+        self.connectivity_changed.connect(self._apply_connectivity)
         try:
-            import socket
-            # Simple check to a reliable DNS or Supabase host
-            socket.create_connection(("8.8.8.8", 53), timeout=2)
+            from src.infrastructure.connectivity_monitor import get_connectivity_monitor
+            monitor, callback = get_connectivity_monitor(), self._on_connectivity
+            monitor.subscribe(callback)
+            self.destroyed.connect(lambda *_: monitor.unsubscribe(callback))
+        except Exception as e:
+            self.logger.warning(f"Connectivity monitor unavailable: {e}")
+            self._apply_connectivity(False)
+
+    def _on_connectivity(self, status):
+        # Llega desde el hilo del monitor: la señal lo encola en el hilo de la GUI
+        self.connectivity_changed.emit(status.online)
+
+    def _apply_connectivity(self, online):
+        if online:
             self.conn_led.set_state(True)
             if self.conn_label.text() != "SYSTEM ONLINE":
                 self.conn_label.setText("SYSTEM ONLINE")
                 self.conn_label.setProperty("status", "online")
                 self.conn_label.style().unpolish(self.conn_label)
                 self.conn_label.style().polish(self.conn_label)
-        except:
+        else:
             self.conn_led.set_state(False)
             if self.conn_label.text() != "LOCAL MODE":
                 self.conn_label.setText("LOCAL MODE")
@@ -7,6 +7,7 @@ from PyQt5.QtGui import QColor, QFont
 from src.domain.messages import MESSAGES
 from src.presentation.ui_utils import PremiumMessage
 import time
+import socket
 import logging
 from src.presentation.theme_manager import ThemeManager
 
@@ -138,6 +139,15 @@ class SessionsDialog(QDialog):
         self.btn_refresh.setCursor(Qt.PointingHandCursor)
         self.btn_refresh.clicked.connect(self.load_sessions)
         footer.addWidget(self.btn_refresh)
+
+        # Paginación keyset: la siguiente página se pide solo si el usuario la quiere ver
+        self.btn_more = QPushButton(MESSAGES.SESSIONS.BTN_MORE)
+        self.btn_more.setObjectName("btn_secondary")
+        self.btn_more.setCursor(Qt.PointingHandCursor)
+        self.btn_more.clicked.connect(self._load_next_page)
+        self.btn_more.hide()
+        footer.addWidget(self.btn_more)
+        self._cursor = None
         
         footer.addStretch()
         
@@ -178,16 +188,27 @@ class SessionsDialog(QDialog):
 
     def load_sessions(self):
         self.table.setRowCount(0)
+        self._cursor = None
+        self._load_next_page()
+
+    def _load_next_page(self):
         try:
-            sessions = self.sync_manager.get_active_sessions()
+            page = self.sync_manager.get_session_page(self._cursor)
+            sessions = page["sessions"]
+            self._cursor = page["next"]
+            self.btn_more.setVisible(bool(self._cursor))
             self.logger.info(f"Active sessions received: {len(sessions)}")
             if not sessions: return
 
-            self.table.setRowCount(len(sessions))
+            first = self.table.rowCount()
+            self.table.setRowCount(first + len(sessions))
             now = time.time()
-            sessions.sort(key=lambda x: x.get("last_seen", 0), reverse=True)
+            # Invariantes de toda la página: una sola consulta de tema y de hostname
+            colors = self.theme.get_theme_colors()
+            current_host = socket.gethostname()
+            current_user = (self.sync_manager.sm.current_user or "").upper()
 
-            for row, s in enumerate(sessions):
+            for row, s in enumerate(sessions, start=first):
                 user_item = QTableWidgetItem(f"👤 {s.get('username', '???')}")
                 user_item.setTextAlignment(Qt.AlignCenter)
                 user_item.setFont(QFont("Segoe UI", -1, QFont.Bold))
@@ -205,7 +226,6 @@ class SessionsDialog(QDialog):
                 diff = int(now - last_seen)
                 
                 is_revoked = s.get("is_revoked", False)
-                colors = self.theme.get_theme_colors()
                 
                 # TRANSLATION LOGIC FOR TIME/STATUS
                 # Assuming "HACE {}m" patterns need simple text replacement or format
@@ -251,9 +271,7 @@ class SessionsDialog(QDialog):
                 status_item.setFont(QFont("Segoe UI", -1, QFont.Black))
                 self.table.setItem(row, 4, status_item)
                 
-                import socket
-                current_host = socket.gethostname()
-                is_me = (s.get("username").upper() == self.sync_manager.sm.current_user.upper() and 
+                is_me = (s.get("username").upper() == current_user and
                          s.get("device_name") == current_host)
                 
                 if not is_me and s.get("username"):
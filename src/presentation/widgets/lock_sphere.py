@@ -52,11 +52,15 @@ class HyperRealVaultCore(QWidget):
         self.timer.setInterval(20)
         self.timer.start()
 
-        # Timer para Verificación de Conectividad (Cada 5 segundos)
-        self.conn_timer = QTimer(self)
-        self.conn_timer.timeout.connect(self._check_connectivity)
-        self.conn_timer.start(5000)
-        self._check_connectivity() 
+        # Conectividad: suscripción al monitor compartido (sin sondeo propio)
+        self._connectivity = None
+        try:
+            from src.infrastructure.connectivity_monitor import get_connectivity_monitor
+            self._connectivity = get_connectivity_monitor()
+            self._connectivity.subscribe(self._on_connectivity)
+        except Exception as e:
+            logger.debug(f"Connectivity monitor unavailable: {e}")
+            self._is_online = False
 
     def _center_on_screen(self):
         screen = QDesktopWidget().screenGeometry(QDesktopWidget().cursor().pos())
@@ -78,14 +82,13 @@ class HyperRealVaultCore(QWidget):
         except Exception as e:
             logger.debug(f"Failed to fetch real vault name: {e}")
 
-    def _check_connectivity(self):
-        try:
-            import socket
-            socket.create_connection(("8.8.8.8", 53), timeout=2)
-            self._is_online = True
-        except Exception as e:
-            logger.debug(f"Connectivity check failed: {e}")
-            self._is_online = False
+    def _on_connectivity(self, status):
+        # Un bool leído en cada frame de paintEvent: basta con asignarlo desde el hilo del monitor
+        self._is_online = status.online
+
+    def closeEvent(self, event):
+        if self._connectivity: self._connectivity.unsubscribe(self._on_connectivity)
+        super().closeEvent(event)
 
     def _generate_sphere_points(self):
         num_lat, num_long = 16, 24
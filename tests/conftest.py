@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+@pytest.fixture
+def fresh_modules():
+    """
+    Reimporta src.infrastructure y src.domain desde cero para el test que lo pide.
+    test_architecture purga src.infrastructure pero no src.domain: sin esto SecurityService
+    quedaría con el CryptoEngine anterior y los parches sobre la clase nueva no le llegarían.
+    """
+    for name in [m for m in sys.modules if m.startswith(("src.infrastructure", "src.domain"))]:
+        del sys.modules[name]
+
+
+@pytest.fixture
+def legacy_wrap():
+    """Blob de llave en el formato previo a envelope v1: nonce + AES-GCM con KEK PBKDF2, sin cabecera."""
+    def wrap(key, password, salt, iterations=None):
+        from src.infrastructure.crypto_engine import CryptoEngine, AESGCM
+        kwargs = {"iterations": iterations} if iterations else {}
+        kek = CryptoEngine.derive_kek_from_password(password, salt, **kwargs)
+        nonce = os.urandom(12)
+        return nonce + AESGCM(kek).encrypt(nonce, key, None)
+    return wrap
+
+
+@pytest.fixture
+def isolated_sm(tmp_path, monkeypatch, fresh_modules):
+    """SecretsManager sobre un DATA_DIR temporal; cierra la auditoría y la base al terminar."""
+    from src.infrastructure.config.path_manager import PathManager
+    monkeypatch.setattr(PathManager, "DATA_DIR", tmp_path)
+    from src.infrastructure.secrets_manager import SecretsManager
+    sm = SecretsManager()
+    yield sm
+    sm.audit.close()
+    sm.db.close()
+
+
+@pytest.fixture
+def open_vault(isolated_sm):
+    """Abre sesión en isolated_sm: open_vault("USER") fija usuario, base por usuario y llaves aleatorias."""
+    def login(user, vault_key=True, personal_key=False):
+        isolated_sm.session.set_user(user, "uid-1", "admin", "vault-1")
+        isolated_sm.reconnect(user)
+        if vault_key: isolated_sm.session.vault_key = os.urandom(32)
+        if personal_key: isolated_sm.session.personal_key = os.urandom(32)
+        return isolated_sm
+    return login
+
+
+class FakeRequest:
+    """Petición recibida por FakePostgREST: método, ruta, tabla, query string, cabeceras y cuerpo JSON."""
+    def __init__(self, method, path, headers, body):
+        url = urlparse(path)
+        self.method = method
+        self.path = path
+        self.route = url.path
+        self.table = url.path.rsplit("/", 1)[-1]
+        self.qs = parse_qs(url.query)
+        self.headers = headers
+        self.body = body
+
+    def arg(self, key):
+        """Operando de un filtro PostgREST (user_id=eq.X -> "X"); None si no viene."""
+        return self.qs[key][0].split(".", 1)[1] if key in self.qs else None
+
+
+class FakePostgREST:
+    """
+    Servidor HTTP local que hace de PostgREST en los tests. Cada test registra sus rutas con
+    route(method, suffix, handler); el handler recibe un FakeRequest y devuelve el cuerpo JSON,
+    (status, cuerpo) o (status, cuerpo, cabeceras). Sin ruta: HEAD 200 y el resto 200 [].
+    latency retrasa cada respuesta; peak es el máximo de peticiones simultáneas.
+    """
+    def __init__(self):
+        self.routes = []
+        self.requests = []
+        self.latency = 0.0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _dispatch(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                req = FakeRequest(self.command, self.path, self.headers, body)
+                with outer._lock:
+                    outer.requests.append(req)
+                    outer.active += 1
+                    outer.peak = max(outer.peak, outer.active)
+                try:
+                    if outer.latency: time.sleep(outer.latency)
+                    self._send(*outer._handle(req))
+                finally:
+                    with outer._lock:
+                        outer.active -= 1
+
+            def _send(self, code, payload=None, headers=()):
+                data = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in headers: self.send_header(k, v)
+                self.end_headers()
+                if self.command != "HEAD": self.wfile.write(data)
+
+            do_GET = do_HEAD = do_POST = do_PATCH = do_DELETE = _dispatch
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def route(self, method, suffix, handler):
+        """Registra handler para method (o "*") y rutas que terminan en suffix; la última registrada gana."""
+        self.routes.insert(0, (method, suffix, handler))
+
+    def _handle(self, req):
+        for method, suffix, handler in self.routes:
+            if method in ("*", req.method) and req.route.endswith(suffix):
+                result = handler(req)
+                return result if isinstance(result, tuple) else (200, result)
+        return (200, None) if req.method == "HEAD" else (200, [])
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake_postgrest():
+    """Fábrica de FakePostgREST: fake_postgrest() arranca un servidor; todos se paran al terminar el test."""
+    servers = []
+    def start():
+        servers.append(FakePostgREST())
+        return servers[-1]
+    yield start
+    for server in servers: server.close()
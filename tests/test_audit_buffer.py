@@ -0,0 +1,125 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+@pytest.fixture
+def sm(open_vault):
+    return open_vault("AUDUSER")
+
+
+def _rows(sm):
+    return [r[0] for r in sm.db.execute("SELECT action FROM security_audit ORDER BY id").fetchall()]
+
+
+def _wait(cond, timeout=3.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if cond(): return True
+        time.sleep(0.01)
+    return False
+
+
+def test_events_are_buffered_and_readers_flush_first(sm):
+    for i in range(10): sm.log_event(f"EV{i}")
+    assert sm.audit.pending_count() == 10 and _rows(sm) == []
+    logs = sm.get_audit_logs()
+    assert sm.audit.pending_count() == 0
+    assert _rows(sm) == [f"EV{i}" for i in range(10)] and len(logs) == 10
+
+
+def test_critical_events_are_synchronous_and_keep_order(sm):
+    sm.log_event("VER")
+    sm.log_event("COPIAR")
+    sm.log_event("LOGIN_FAIL", status="FAILURE")
+    assert _rows(sm) == ["VER", "COPIAR", "LOGIN_FAIL"]
+    sm.log_event("EDITAR")
+    sm.log_event("ANYTHING", sync=True)
+    assert _rows(sm)[-2:] == ["EDITAR", "ANYTHING"] and sm.audit.pending_count() == 0
+
+
+def test_flusher_thread_honours_size_and_time(sm, monkeypatch):
+    monkeypatch.setattr(type(sm.audit), "FLUSH_SIZE", 5)
+    monkeypatch.setattr(type(sm.audit), "FLUSH_INTERVAL", 30.0)
+    for i in range(5): sm.log_event(f"S{i}")
+    assert _wait(lambda: len(_rows(sm)) == 5)
+
+    monkeypatch.setattr(type(sm.audit), "FLUSH_INTERVAL", 0.1)
+    sm.flush_audit_log(close=True)  # reinicia el hilo con el nuevo intervalo
+    sm.log_event("T0")
+    assert sm.audit.pending_count() == 1
+    assert _wait(lambda: _rows(sm)[-1:] == ["T0"])
+
+
+def test_flusher_never_commits_foreign_transaction(sm, monkeypatch):
+    monkeypatch.setattr(type(sm.audit), "FLUSH_INTERVAL", 0.05)
+    sm.db.execute("INSERT INTO meta (key, value) VALUES ('half', 'open')")
+    assert sm.db.conn.in_transaction
+    sm.log_event("WAITS")
+    time.sleep(0.3)
+    # El lote espera al bloqueo de escritura de la otra conexión, sin confirmarle nada
+    assert sm.db.conn.in_transaction and _rows(sm) == []
+    sm.db.conn.rollback()
+    assert _wait(lambda: _rows(sm) == ["WAITS"])
+    assert sm.db.execute("SELECT COUNT(*) FROM meta WHERE key = 'half'").fetchone()[0] == 0
+
+
+def test_hostname_cached_and_db_switch_flushes(sm, monkeypatch):
+    import socket
+    from src.infrastructure.repositories.audit_repo import AuditRepository
+    calls = []
+    monkeypatch.setattr(AuditRepository, "_device", None)
+    monkeypatch.setattr(socket, "gethostname", lambda: calls.append(1) or "host-x")
+    for _ in range(20): sm.log_event("EV")
+    assert calls == [1]
+
+    old_db = sm.db.db_path
+    sm.reconnect("OTHERUSER")
+    import sqlite3
+    rows = sqlite3.connect(str(old_db)).execute("SELECT device_info FROM security_audit").fetchall()
+    assert rows == [("host-x",)] * 20
+
+
+def test_mark_synced_stops_at_uploaded_id(sm):
+    sm.log_event("A")
+    pending = sm.get_pending_audit_logs()
+    sm.log_event("B", sync=True)
+    sm.mark_audit_logs_as_synced(max(r[0] for r in pending))
+    assert [r[3] for r in sm.get_pending_audit_logs()] == ["B"]
+
+
+def test_buffered_audit_batches_transactions(sm, monkeypatch):
+    n = 2000
+    batches = []
+    real_flush = sm.audit.flush
+
+    def spy_flush():
+        written = real_flush()
+        if written: batches.append(written)
+        return written
+    monkeypatch.setattr(sm.audit, "flush", spy_flush)
+
+    for i in range(n): sm.log_event("SYNC", sync=True)
+    assert batches == [1] * n  # un commit por evento
+    batches.clear()
+    for i in range(n): sm.log_event("BUF")
+    sm.flush_audit_log()
+    assert sum(batches) == n and len(batches) <= n // sm.audit.FLUSH_SIZE + 2
+    assert sm.audit.get_count() == 2 * n
+
+
+def test_closing_the_database_flushes_the_buffer(sm, caplog):
+    db_path = sm.db.db_path
+    for i in range(3): sm.log_event(f"EV{i}")
+    assert sm.audit.pending_count() == 3
+    sm.db.close()
+    assert sm.audit.pending_count() == 0
+    import sqlite3
+    rows = sqlite3.connect(str(db_path)).execute("SELECT action FROM security_audit ORDER BY id").fetchall()
+    assert rows == [("EV0",), ("EV1",), ("EV2",)]
+    sm.flush_audit_log(close=True)   # atexit: nada que escribir sobre la base cerrada
+    assert "Error writing" not in caplog.text
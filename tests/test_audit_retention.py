@@ -0,0 +1,121 @@
+import sys
+import json
+import time
+import zlib
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+DAY = 86400
+
+
+@pytest.fixture
+def sm(open_vault):
+    return open_vault("ADMIN", vault_key=False)
+
+
+def _insert(sm, age_days, action, synced=1, n=1):
+    ts = int(time.time()) - int(age_days * DAY)
+    sm.db.conn.executemany(
+        "INSERT INTO security_audit (timestamp, user_name, action, service, status, details, device_info, synced) "
+        "VALUES (?, 'ADMIN', ?, '-', 'SUCCESS', ?, 'pc-1', ?)",
+        [(ts, action, f"{action} #{i}", synced) for i in range(n)])
+    sm.db.commit()
+
+
+def _actions(sm):
+    return [r[0] for r in sm.db.execute("SELECT action FROM security_audit ORDER BY id")]
+
+
+def test_batches_mark_only_their_id_range(sm):
+    for a in ("A", "B", "C"): sm.log_event(a)
+    batch = sm.get_pending_audit_logs(2)
+    assert [r[3] for r in batch] == ["A", "B"]
+    sm.log_event("D")   # escrito mientras el lote "se sube"
+    sm.mark_audit_logs_as_synced(batch[-1][0], batch[0][0])
+    assert [r[3] for r in sm.get_pending_audit_logs()] == ["C", "D"]
+
+
+def test_sync_uploads_in_batches_then_applies_retention(sm, monkeypatch):
+    from src.infrastructure.sync_manager import SyncManager
+    sync = SyncManager(sm, "http://127.0.0.1:9", "key")
+    posted = []
+    monkeypatch.setattr(sync, "check_internet", lambda: True)
+    monkeypatch.setattr(sync.client, "get_records", lambda table, params=None: [])
+    monkeypatch.setattr(sync.client, "post_records", lambda table, rows: posted.append([r["action"] for r in rows]))
+    monkeypatch.setattr(SyncManager, "AUDIT_SYNC_BATCH", 2)
+    _insert(sm, 200, "LOGIN", synced=0, n=5)
+
+    sync.sync_audit_logs()
+    assert [len(p) for p in posted] == [2, 2, 1]
+    # Subidos y fuera de la ventana caliente: pasan al archivo en la misma pasada
+    assert _actions(sm) == [] and sm.audit_archive().segments()[0]["count"] == 5
+
+
+def test_retention_archives_synced_rows_into_a_verified_chain(sm):
+    from src.infrastructure.storage.audit_archive import RetentionPolicy
+    _insert(sm, 200, "LOGIN", n=6)
+    _insert(sm, 200, "EDITAR", synced=0)       # aún no subido: nunca se archiva
+    _insert(sm, 10, "HEARTBEAT", n=3)          # latidos: ventana de compactación (7 días)
+    _insert(sm, 10, "LOGIN")                   # evento normal: ventana caliente (90 días)
+    _insert(sm, 1, "HEARTBEAT")
+
+    stats = sm.apply_audit_retention(force=True, policy=RetentionPolicy(segment_rows=4))
+    assert stats == {"archived": 9, "segments": 3, "pruned": 0}
+    assert _actions(sm) == ["EDITAR", "LOGIN", "HEARTBEAT"]
+    assert sm.apply_audit_retention() is None                      # como mucho una pasada al día
+
+    archive = sm.audit_archive()
+    segments = archive.segments()
+    rows = [r for s in segments for r in archive.read(s["name"])]
+    assert [r["action"] for r in rows] == ["LOGIN"] * 6 + ["HEARTBEAT"] * 3
+    assert [s["prev"] for s in segments[1:]] == [s["hash"] for s in segments[:-1]]
+    assert sm.verify_audit_archive()["ok"]
+    assert sm.get_meta("audit_archive_head") == archive.head()
+
+
+def test_tampered_archive_blocks_retention(sm):
+    _insert(sm, 200, "LOGIN", n=2)
+    sm.apply_audit_retention(force=True)
+    archive = sm.audit_archive()
+    seg = archive.segments_dir / archive.segments()[0]["name"]
+    payload = json.loads(zlib.decompress(seg.read_bytes()))
+    payload["rows"][0]["action"] = "NOTHING_TO_SEE"
+    seg.write_bytes(zlib.compress(json.dumps(payload).encode()))
+
+    check = sm.verify_audit_archive()
+    assert not check["ok"] and check["reason"] == "hash mismatch"
+    _insert(sm, 200, "LOGIN")
+    assert sm.apply_audit_retention(force=True) is None
+    assert _actions(sm) == ["LOGIN"]
+
+
+def test_interrupted_run_is_completed_without_duplicates(sm):
+    _insert(sm, 200, "LOGIN", n=3)
+    rows = [dict(zip([d[0] for d in c.description], r)) for c in [sm.db.execute("SELECT * FROM security_audit")] for r in c]
+    sm.audit_archive().append(rows)    # segmento escrito, DELETE nunca ejecutado
+    stats = sm.apply_audit_retention(force=True)
+    assert stats["archived"] == 0 and _actions(sm) == []
+    assert [s["count"] for s in sm.audit_archive().segments()] == [3]
+
+
+def test_policy_from_meta_and_archive_pruning(sm):
+    from src.infrastructure.storage.audit_archive import RetentionPolicy
+    sm.set_meta("audit_hot_days", "30")
+    sm.set_meta("audit_noise_days", "60")
+    sm.set_meta("audit_archive_days", "365")
+    policy = RetentionPolicy.from_meta(sm.get_meta)
+    assert (policy.hot_days, policy.noise_days, policy.archive_days) == (30, 30, 365)
+
+    _insert(sm, 500, "LOGIN")
+    _insert(sm, 400, "LOGIN")
+    assert sm.apply_audit_retention(force=True) == {"archived": 2, "segments": 1, "pruned": 1}   # >365 días: caduca ya
+    _insert(sm, 40, "LOGIN")
+    stats = sm.apply_audit_retention(force=True)
+    assert stats["archived"] == 1 and stats["pruned"] == 0
+    archive = sm.audit_archive()
+    assert [s["count"] for s in archive.segments()] == [1]
+    # La cadena queda anclada en el último segmento borrado
+    assert archive.verify(sm.get_meta("audit_archive_head"))["ok"]
@@ -0,0 +1,191 @@
+import sys
+import re
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from src.domain.services.audit_timeline_service import classify_action, is_critical_event
+
+
+class FakeAudit:
+    """
+    security_audit sobre fake_postgrest: orden timestamp.desc,id.desc, filtros
+    category=eq, critical=is.true, user_name=ilike y and=(or(búsqueda),or(keyset)).
+    Sin la columna category o critical responde 400 como Postgres (42703).
+    """
+    def __init__(self, server, with_category=True, with_critical=True):
+        self.with_category = with_category
+        self.with_critical = with_critical
+        self.rows = []
+        self.requests = server.requests
+        self.count_modes = []
+        self.url = server.url
+        server.route("GET", "/security_audit", self.get_audit)
+
+    @property
+    def queries(self):
+        return [r.qs for r in self.requests if r.method == "GET"]
+
+    def get_audit(self, req):
+        qs = req.qs
+        if "category" in qs and not self.with_category:
+            return 400, {"code": "42703", "message": "column security_audit.category does not exist"}
+        if "critical" in qs and not self.with_critical:
+            return 400, {"code": "42703", "message": "column security_audit.critical does not exist"}
+        rows = self.select(qs)
+        if str(req.headers.get("Prefer")).startswith("count="):
+            self.count_modes.append(req.headers["Prefer"])
+            return 200, rows[:1], [("Content-Range", f"0-0/{len(rows)}")]
+        return rows[:int(qs["limit"][0])]
+
+    def add(self, rid, ts, action, user="ANA", details="-", status="SUCCESS"):
+        self.rows.append({"id": rid, "timestamp": ts, "user_name": user, "action": action, "service": "-",
+                          "status": status, "details": details, "device_info": "pc-1",
+                          **({"category": classify_action(action)} if self.with_category else {}),
+                          **({"critical": is_critical_event(action, status)} if self.with_critical else {})})
+
+    def select(self, qs):
+        rows = list(self.rows)
+        if "category" in qs: rows = [r for r in rows if r["category"] == qs["category"][0].split(".", 1)[1]]
+        if "critical" in qs: rows = [r for r in rows if r["critical"]]
+        if "user_name" in qs: rows = [r for r in rows if r["user_name"].lower() == qs["user_name"][0].split(".", 1)[1].lower()]
+        for group in re.findall(r"or\((?:[^()]|\([^()]*\))*\)", qs.get("and", [""])[0]):
+            keyset = re.match(r"or\(timestamp\.lt\.(\d+),and\(timestamp\.eq\.\d+,id\.lt\.(\d+)\)\)$", group)
+            if keyset:
+                ts, rid = map(int, keyset.groups())
+                rows = [r for r in rows if (r["timestamp"], r["id"]) < (ts, rid)]
+            else:
+                term = re.search(r'ilike\."\*(.*?)\*"', group).group(1).lower()
+                rows = [r for r in rows if any(term in str(r[f]).lower() for f in ("user_name", "action", "details"))]
+        return sorted(rows, key=lambda r: (-r["timestamp"], -r["id"]))
+
+
+@pytest.fixture
+def sm(open_vault):
+    return open_vault("ADMIN", vault_key=False)
+
+
+def _cloud(sm, server, with_category, with_critical=True):
+    from src.infrastructure.sync_manager import SyncManager
+    cloud = FakeAudit(server, with_category, with_critical)
+    return SyncManager(sm, cloud.url, "key"), cloud
+
+
+def test_category_is_fixed_at_write_time_and_backfilled(sm):
+    assert classify_action("LOGIN_BLOCKED") == "AUTH"
+    assert classify_action("ADMIN_RESET_PASSWORD") == "ADMIN"
+    assert classify_action("ELIMINACION FISICA") == "SECRETS"
+    assert classify_action("SYNC_BIDIRECCIONAL") == "SYSTEM"
+
+    sm.log_event("LOGIN", details="Sesión iniciada")
+    sm.log_event("EDITAR", "github")
+    sm.flush_audit_log()
+    assert [r[0] for r in sm.db.execute("SELECT category FROM security_audit ORDER BY id")] == ["AUTH", "SECRETS"]
+
+    # Eventos escritos por una versión sin la columna: se clasifican una vez al abrir la base
+    sm.db.execute("INSERT INTO security_audit (timestamp, user_name, action) VALUES (1, 'ANA', 'KICK')")
+    sm.db.commit()
+    sm.db._backfill_audit_categories()
+    assert sm.db.execute("SELECT category FROM security_audit WHERE action = 'KICK'").fetchone()[0] == "ADMIN"
+
+
+def test_local_pages_follow_keyset_without_gaps(sm):
+    # Todos en el mismo segundo: el desempate por id es lo que evita duplicados y huecos
+    for i in range(130):
+        sm.log_event("VER" if i % 2 else "LOGIN", f"svc-{i}")
+    sm.log_event("KICK", "pc-2", user_name="LUIS")
+    sm.flush_audit_log()
+
+    pages, cursor = [], None
+    while True:
+        page = sm.get_audit_page(cursor=cursor, limit=50)
+        pages.append(page["logs"])
+        if not page["next"]: break
+        cursor = page["next"]
+    ids = [l["id"] for p in pages for l in p]
+    assert [len(p) for p in pages] == [50, 50, 31]
+    assert ids == sorted(set(ids), reverse=True)
+
+    secrets = sm.get_audit_page(category="SECRETS", limit=500)["logs"]
+    assert len(secrets) == 65 and {l["action"] for l in secrets} == {"VER"}
+    assert [l["service"] for l in sm.get_audit_page(search="svc-12", limit=500)["logs"]] == \
+        ["svc-129", "svc-128", "svc-127", "svc-126", "svc-125", "svc-124", "svc-123", "svc-122", "svc-121", "svc-120", "svc-12"]
+    assert sm.get_audit_stats() == {"total": 131, "critical": 0, "users": 2}
+    assert sm.get_audit_stats(category="ADMIN")["total"] == 1
+
+    # Un usuario normal solo ve su propio historial
+    sm.session.set_user("LUIS", "uid-2", "user", "vault-1")
+    assert [l["action"] for l in sm.get_audit_page()["logs"]] == ["KICK"]
+
+
+def test_local_page_query_uses_index(sm):
+    plan = " ".join(r[-1] for r in sm.db.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM security_audit WHERE category = 'AUTH' AND (timestamp, id) < (1, 1) "
+        "ORDER BY timestamp DESC, id DESC LIMIT 100"))
+    assert "idx_audit_category_ts" in plan and "TEMP B-TREE" not in plan
+
+
+def test_remote_pages_filter_category_on_server(sm, fake_postgrest):
+    sync, cloud = _cloud(sm, fake_postgrest(), with_category=True)
+    for i in range(250):
+        cloud.add(i + 1, 1000 + i // 10, "LOGIN" if i % 5 == 0 else "VER")
+    pages, cursor = [], None
+    while True:
+        page = sync.get_audit_page(cursor, category="AUTH", limit=20)
+        pages.append(page["logs"])
+        if not page["next"]: break
+        cursor = page["next"]
+    ids = [l["id"] for p in pages for l in p]
+    assert len(ids) == len(set(ids)) == 50 and all(l["action"] == "LOGIN" for p in pages for l in p)
+    assert all(q["category"] == ["eq.AUTH"] for q in cloud.queries if "category" in q)
+
+    cloud.requests.clear()
+    assert sync.get_audit_stats(category="AUTH") == {"total": 50, "critical": 0, "users": None}
+    assert len(cloud.queries) == 2 and cloud.count_modes == ["count=estimated"] * 2
+
+
+def test_remote_without_category_column_classifies_on_client(sm, fake_postgrest):
+    sync, cloud = _cloud(sm, fake_postgrest(), with_category=False)
+    for i in range(55):
+        cloud.add(i + 1, 1000 + i, "KICK" if i < 3 else "VER")
+    page = sync.get_audit_page(category="ADMIN", limit=20)
+    # Las 52 más recientes son VER: el cliente recorre páginas crudas hasta encontrar coincidencias
+    assert [l["id"] for l in page["logs"]] == [3, 2, 1] and page["next"] is None
+    assert not sync._audit_category
+    assert sync.get_audit_stats(category="ADMIN")["total"] is None
+    assert len(sync.get_audit_page(search="ver", limit=100)["logs"]) == 52
+
+
+def test_critical_flag_is_fixed_at_write_time_and_backfilled(sm):
+    sm.log_event("ELIMINACION FISICA", "github")
+    sm.log_event("VER", "github")
+    sm.log_event("LOGIN", status="DENIED", sync=True)
+    assert [r[0] for r in sm.db.execute("SELECT critical FROM security_audit ORDER BY id")] == [1, 0, 1]
+    assert sm.get_audit_stats()["critical"] == 2
+
+    sm.db.execute("INSERT INTO security_audit (timestamp, user_name, action, status) VALUES (1, 'ANA', 'PURGE', 'SUCCESS')")
+    sm.db.commit()
+    sm.db._backfill_audit_critical()
+    assert sm.db.execute("SELECT critical FROM security_audit WHERE action = 'PURGE'").fetchone()[0] == 1
+    assert sm.get_audit_stats() == {"total": 4, "critical": 3, "users": 2}
+
+
+def test_remote_critical_count_uses_stored_flag(sm, fake_postgrest):
+    sync, cloud = _cloud(sm, fake_postgrest(), with_category=True)
+    for i in range(40):
+        cloud.add(i + 1, 1000 + i, "DELETE" if i < 3 else "VER", status="DENIED" if i == 39 else "SUCCESS")
+    assert sync.get_audit_stats() == {"total": 40, "critical": 4, "users": None}
+    assert [q["critical"] for q in cloud.queries if "critical" in q] == [["is.true"]]
+    assert not any("ilike" in str(q) for q in cloud.queries)
+
+
+def test_remote_without_critical_column_leaves_count_to_the_page(sm, fake_postgrest):
+    sync, cloud = _cloud(sm, fake_postgrest(), with_category=True, with_critical=False)
+    for i in range(10): cloud.add(i + 1, 1000 + i, "DELETE")
+    assert sync.get_audit_stats() == {"total": 10, "critical": None, "users": None}
+    assert not sync._audit_critical
+    cloud.requests.clear()
+    sync.get_audit_stats()
+    assert len(cloud.queries) == 1
@@ -0,0 +1,101 @@
+import io
+import csv
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+@pytest.fixture
+def sm(open_vault):
+    return open_vault("IMPUSER", personal_key=True)
+
+
+def _csv(rows, headers=("Servicio", "Usuario", "Contraseña", "Notas", "Privado")):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(headers)
+    w.writerows(rows)
+    buf.seek(0)
+    return buf
+
+
+def test_streams_chunks_in_bounded_transactions(sm, monkeypatch):
+    consumed = []
+    def rows():
+        for r in csv.DictReader(_csv([(f"svc-{i}", "u", f"pw-{i}", "n", "1" if i % 10 == 0 else "0") for i in range(250)])):
+            consumed.append(r)
+            yield r
+
+    batches, progress = [], []
+    real_batch = sm.secrets.batch_add_secrets
+    def spy(records, notify=True):
+        batches.append((len(records), len(consumed)))
+        return real_batch(records, notify)
+    monkeypatch.setattr(sm.secrets, "batch_add_secrets", spy)
+    resets = []
+    sm.secrets.add_change_listener(lambda kind, ids: resets.append(kind))
+
+    stats = sm.bulk_add_secrets(rows(), chunk_size=100, progress_callback=lambda n, s: progress.append((n, s["added"])), max_workers=2)
+    assert stats == {"added": 250, "skipped": 0, "errors": 0}
+    # Un bloque por transacción y nunca más de dos bloques leídos por delante de lo confirmado
+    assert [b[0] for b in batches] == [100, 100, 50]
+    assert all(read <= (i + 2) * 100 for i, (_, read) in enumerate(batches))
+    assert progress == [(100, 100), (200, 200), (250, 250)]
+    assert resets == ["reset"]  # un único refresco de la UI al final, no uno por bloque
+
+    meta = {r["service"]: r for r in sm.list_metadata()}
+    assert meta["svc-10"]["is_private"] == 1 and meta["svc-11"]["is_private"] == 0
+    key_types = dict(sm.db.execute("SELECT service, key_type FROM secrets WHERE service IN ('svc-10', 'svc-11')").fetchall())
+    assert key_types == {"svc-10": "personal", "svc-11": "vault"}
+    sm.session.record_cache.clear()
+    plain = {r["service"]: r["secret"] for r in sm.get_all()}
+    assert plain["svc-10"] == "pw-10" and plain["svc-249"] == "pw-249"
+
+
+def test_chunks_commit_under_vault_write_lock(sm, monkeypatch):
+    from src.infrastructure.sync_manager import _vault_lock
+    held = []
+    real_batch = sm.secrets.batch_add_secrets
+    monkeypatch.setattr(sm.secrets, "batch_add_secrets",
+                        lambda records, notify=True: held.append(_vault_lock._write_lock.locked()) or real_batch(records, notify))
+
+    sm.bulk_add_secrets([{"service": f"svc-{i}", "username": "u", "password": "pw"} for i in range(30)], chunk_size=10)
+    # Cada bloque se confirma con el lock tomado (un sync no puede intercalarse) y lo suelta al acabar
+    assert held == [True, True, True] and not _vault_lock._write_lock.locked()
+
+
+def test_mapping_dedupe_and_errors(sm):
+    sm.bulk_add_secrets([{"service": "dup", "username": "bob", "password": "x"}])
+    rows = [
+        {"SERVICE ": "dup", "Email": "BOB", "pwd": "y"},            # duplicado existente (case insensitive)
+        {"app": "new", "login": "ann", "clave": "z", "desc": " d "},
+        {"app": "new", "login": "ann", "clave": "z2"},              # duplicado dentro del mismo bloque
+        {"app": "", "clave": "q"},                                   # sin servicio
+        {"sitio": "nopw", "secret": None},                           # sin secreto
+        {"servicio": "nouser", "password": "p"},                     # usuario por defecto
+    ]
+    stats = sm.bulk_add_secrets(rows, chunk_size=2)
+    assert stats == {"added": 2, "skipped": 2, "errors": 2}
+    meta = {r["service"]: r for r in sm.list_metadata()}
+    assert meta["new"]["username"] == "ann" and meta["new"]["notes"] == "d"
+    assert meta["nouser"]["username"] == "IMPUSER"
+
+
+def test_cipher_context_reused_per_slice(sm, monkeypatch):
+    from src.domain.services import security_service
+    created = []
+    real = security_service.AESGCM
+    monkeypatch.setattr(security_service, "AESGCM", lambda key: created.append(1) or real(key))
+    stats = sm.bulk_add_secrets(({"service": f"s{i}", "password": "p"} for i in range(1000)), chunk_size=500, max_workers=2)
+    assert stats["added"] == 1000
+    assert len(created) == 4  # 2 bloques x 2 porciones, no una por fila
+
+
+def test_bulk_import_large_stream(sm):
+    n = 20_000
+    rows = ({"Service": f"svc-{i}", "Username": "u", "Password": f"pw-{i}"} for i in range(n))
+    stats = sm.bulk_add_secrets(rows)
+    assert stats["added"] == n and sm.count_encrypted() == n
@@ -0,0 +1,128 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    from src.infrastructure.config.path_manager import PathManager
+    monkeypatch.setattr(PathManager, "DATA_DIR", tmp_path)
+    from src.infrastructure.secrets_manager import SecretsManager
+    from src.infrastructure.sync_manager import SyncManager
+    sm = SecretsManager()
+    sm.session.set_user("PUSHUSER", "uid-1", "admin", "vault-1")
+    sm.reconnect("PUSHUSER")
+    sm.session.vault_key = os.urandom(32)
+    sm.bulk_add_secrets([{"service": f"svc-{i}", "username": "u", "password": f"pw-{i}"} for i in range(30)])
+    sync = SyncManager(sm, "http://127.0.0.1:9", "key")
+
+    calls = {"post": [], "delete": []}
+    monkeypatch.setattr(sync.client, "post_records", lambda table, payload: calls["post"].append([p["id"] for p in payload]))
+    monkeypatch.setattr(sync.client, "delete_records", lambda table, ids: calls["delete"].append(list(ids)))
+    yield sm, sync, calls
+    sm.audit.close()
+    sm.db.close()
+
+
+def test_push_batches_upserts_and_deletes(env):
+    sm, sync, calls = env
+    stats = sync._push_local_to_cloud(batch_size=10)
+    assert stats["success"] == 30 and stats["failed"] == 0
+    assert [len(b) for b in calls["post"]] == [10, 10, 10]
+    assert sm.count_encrypted(unsynced_only=True) == 0
+
+    # Edición + borrado: un upsert (mismo cloud_id) y un DELETE id=in.(...) por lote
+    rows = {r["service"]: r for p in sm.iter_encrypted() for r in p}
+    cloud_ids = {r["id"]: r["cloud_id"] for r in rows.values()}
+    sm.update_secret(rows["svc-1"]["id"], "svc-1", "u", "new")
+    for name in ("svc-2", "svc-3"): sm.delete_secret(rows[name]["id"])
+
+    stats = sync._push_local_to_cloud(batch_size=10)
+    assert stats["success"] == 3
+    assert calls["post"][-1] == [cloud_ids[rows["svc-1"]["id"]]]
+    assert sorted(calls["delete"][-1]) == sorted(cloud_ids[rows[n]["id"]] for n in ("svc-2", "svc-3"))
+    assert sm.count_encrypted() == 28
+
+
+def test_push_reports_partial_failures(env, monkeypatch):
+    sm, sync, calls = env
+    bad = {r["id"] for p in sm.iter_encrypted() for r in p if r["service"] in ("svc-4", "svc-7")}
+    by_cloud = {}
+
+    def flaky_post(table, payload):
+        if any(by_cloud.get(p["id"]) in bad for p in payload):
+            raise Exception("HTTP 400: bad row")
+        calls["post"].append([p["id"] for p in payload])
+
+    original_assign = sm.assign_cloud_ids
+    def spy_assign(pairs):
+        by_cloud.update({c: sid for c, sid in pairs})
+        original_assign(pairs)
+    monkeypatch.setattr(sm, "assign_cloud_ids", spy_assign)
+    monkeypatch.setattr(sync.client, "post_records", flaky_post)
+
+    stats = sync._push_local_to_cloud(batch_size=10)
+    assert stats["success"] == 28 and stats["failed"] == 2
+    assert {f["id"] for f in stats["failures"]} == bad
+    assert all("bad row" in f["error"] for f in stats["failures"])
+    # Los fallidos siguen pendientes y conservan su cloud_id para el reintento
+    pending = [r for p in sm.iter_encrypted(unsynced_only=True) for r in p]
+    assert {r["id"] for r in pending} == bad and all(r["cloud_id"] for r in pending)
+
+
+def test_offline_deletes_are_sent_in_batches(env, monkeypatch):
+    sm, sync, calls = env
+    monkeypatch.setattr(sync, "check_internet", lambda: True)
+    monkeypatch.setattr(type(sync), "PUSH_PAGE_SIZE", 2)
+    sm.conn.executemany("INSERT INTO pending_deletes (cloud_id, deleted_at) VALUES (?, 0)",
+                        [(f"cloud-{i}",) for i in range(5)])
+    sm.conn.commit()
+
+    def flaky_delete(table, ids):
+        if "cloud-3" in ids: raise Exception("HTTP 500: boom")
+        calls["delete"].append(list(ids))
+    monkeypatch.setattr(sync.client, "delete_records", flaky_delete)
+
+    assert sync.sync_pending_deletes() == 4
+    # Lotes de 2; el rechazado se reintenta fila a fila y solo el fallido queda en cola
+    assert calls["delete"] == [["cloud-0", "cloud-1"], ["cloud-2"], ["cloud-4"]]
+    assert [r[0] for r in sm.conn.execute("SELECT cloud_id FROM pending_deletes")] == ["cloud-3"]
+
+
+def test_delete_from_supabase_batches_ids(env):
+    sm, sync, calls = env
+    sync._push_local_to_cloud(batch_size=10)
+    rows = [r for p in sm.iter_encrypted() for r in p]
+    sync.delete_from_supabase([r["id"] for r in rows[:5]])
+    assert sorted(calls["delete"][-1]) == sorted(r["cloud_id"] for r in rows[:5])
+    sync.delete_from_supabase(rows[5]["id"])
+    assert calls["delete"][-1] == [rows[5]["cloud_id"]]
+
+
+def test_edit_while_page_in_flight_stays_pending(env, monkeypatch):
+    sm, sync, calls = env
+    rows = {r["service"]: r for p in sm.iter_encrypted() for r in p}
+    edited, removed = rows["svc-1"]["id"], rows["svc-2"]["id"]
+
+    def post_then_edit(table, payload):
+        # El usuario edita y borra mientras el lote está en la red
+        calls["post"].append([p["id"] for p in payload])
+        if len(calls["post"]) == 1:
+            sm.update_secret(edited, "svc-1", "u", "edited")
+            sm.delete_secret(removed)
+    monkeypatch.setattr(sync.client, "post_records", post_then_edit)
+
+    stats = sync._push_local_to_cloud(batch_size=10)
+    assert stats["failed"] == 0
+    pending = {r["id"] for p in sm.iter_encrypted(unsynced_only=True) for r in p}
+    assert pending == {edited, removed}
+
+    # La siguiente pasada sube la edición y el borrado
+    stats = sync._push_local_to_cloud(batch_size=10)
+    assert sm.count_encrypted(unsynced_only=True) == 0
+    assert sm.get_record_by_id(edited)["secret"] == "edited"
+    assert calls["delete"]
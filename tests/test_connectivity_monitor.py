@@ -0,0 +1,146 @@
+import sys
+import time
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from src.infrastructure.connectivity_monitor import ConnectivityMonitor
+
+
+class FakeBackend:
+    """Backend sobre fake_postgrest que responde a todo con self.code y cuenta las peticiones."""
+    def __init__(self, server):
+        self.code = 200
+        self.server = server
+        self.url = server.url
+        server.route("*", "", lambda req: (self.code, []))
+
+    @property
+    def hits(self):
+        return [(r.method, r.path) for r in self.server.requests]
+
+
+@pytest.fixture
+def backend(fake_postgrest):
+    return FakeBackend(fake_postgrest())
+
+
+def _wait(cond, timeout=3.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if cond(): return True
+        time.sleep(0.01)
+    return False
+
+
+def test_passive_evidence_replaces_probes():
+    probes = []
+    mon = ConnectivityMonitor("http://x", internet_probe=lambda: probes.append(1) or True)
+    mon.report_response(200)
+    assert all(mon.is_online() for _ in range(100)) and probes == []
+
+    mon.report_failure(ConnectionError("refused"))
+    assert not mon.status().online
+    # El fallo de una petición real adelanta el siguiente sondeo, no lo lanza en línea
+    assert not mon.is_online() and probes == []
+    mon._next_probe = 0
+    assert mon.is_online() and probes == [1]
+
+
+def test_offline_backoff_is_exponential_and_capped(monkeypatch):
+    monkeypatch.setattr(ConnectivityMonitor, "JITTER", 0)
+    monkeypatch.setattr(ConnectivityMonitor, "BACKOFF_MAX", 16.0)
+    mon = ConnectivityMonitor("http://x", internet_probe=lambda: False)
+    delays = []
+    for _ in range(6):
+        mon.probe()
+        delays.append(round(mon._next_probe - time.monotonic()))
+    assert delays == [2, 4, 8, 16, 16, 16] and mon.status().failures == 6
+
+    mon.attach_probes(lambda: True)
+    mon.probe()
+    assert mon.status().failures == 0
+    assert round(mon._next_probe - time.monotonic()) == ConnectivityMonitor.HEALTHY_INTERVAL
+
+
+def test_backend_probe_answers_for_internet_when_healthy():
+    calls = []
+    mon = ConnectivityMonitor("http://x", internet_probe=lambda: calls.append("net") or True,
+                              backend_probe=lambda: calls.append("api") or True)
+    assert mon.probe().backend and calls == ["api"]
+    mon.attach_probes(lambda: calls.append("net") or True, lambda: calls.append("api") or False)
+    st = mon.probe()
+    assert (st.internet, st.backend) == (True, False) and calls[1:] == ["api", "net"]
+
+
+def test_concurrent_callers_share_one_probe():
+    gate = threading.Event()
+    probes = []
+    mon = ConnectivityMonitor("http://x", internet_probe=lambda: probes.append(1) or gate.wait(2) or True)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(mon.is_online())) for _ in range(8)]
+    for t in threads: t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads: t.join()
+    assert results == [True] * 8 and probes == [1]
+
+
+def test_subscribers_see_changes_only_and_thread_stops(monkeypatch):
+    monkeypatch.setattr(ConnectivityMonitor, "BACKOFF_BASE", 0.02)
+    monkeypatch.setattr(ConnectivityMonitor, "JITTER", 0)
+    state = {"up": False}
+    mon = ConnectivityMonitor("http://x", internet_probe=lambda: state["up"])
+    seen = []
+    cb = lambda st: seen.append(st.online)
+    mon.subscribe(cb)
+    assert _wait(lambda: mon.status().failures >= 3)
+    assert seen == [False]  # varios sondeos fallidos, una sola notificación
+
+    state["up"] = True
+    assert _wait(lambda: seen == [False, True])
+    mon.report_response(204)
+    assert seen == [False, True]
+
+    broken = lambda st: 1 / 0
+    mon.subscribe(broken)
+    assert broken not in mon._subscribers
+    mon.unsubscribe(cb)
+    assert _wait(lambda: mon._thread is None)
+
+
+def test_client_requests_feed_the_monitor(backend):
+    from src.infrastructure.remote_storage_client import RemoteStorageClient
+    mon = ConnectivityMonitor(backend.url, internet_probe=lambda: pytest.fail("no probe expected"))
+    client = RemoteStorageClient(backend.url, "key", monitor=mon)
+    client.get_records("secrets")
+    assert (mon.status().internet, mon.status().backend) == (True, True)
+
+    backend.code = 503
+    with pytest.raises(Exception):
+        client.get_records("secrets")
+    assert (mon.status().internet, mon.status().backend) == (True, False)
+
+    backend.code = 403  # permisos: hay red, pero no dice nada nuevo del backend
+    with pytest.raises(Exception):
+        client.get_records("secrets")
+    assert mon.status().backend is False
+
+    backend.server.close()
+    with pytest.raises(Exception):
+        client.get_records("secrets")
+    assert mon.status().internet is False
+
+
+def test_sync_manager_checks_hit_the_network_once(backend, open_vault):
+    from src.infrastructure.sync_manager import SyncManager
+    sm = open_vault("NETUSER", vault_key=False)
+    sync = SyncManager(sm, backend.url, "key")
+    for _ in range(50):
+        assert sync.check_internet() and sync.check_supabase()
+    assert backend.hits == [("GET", "/rest/v1/secrets?select=id&limit=1")]
+    # Otro SyncManager (o widget) contra el mismo backend comparte el estado
+    assert SyncManager(sm, backend.url + "/", "key").connectivity is sync.connectivity
@@ -71,7 +71,7 @@ def test_vault_key_wrapping_roundtrip():
     
     # Wrap (Cifrar llave de bóveda con clave de usuario)
     wrapped = CryptoEngine.wrap_vault_key(vault_key, user_pwd, user_salt)
-    assert len(wrapped) == 12 + 32 + 16  # Nonce(12) + Key(32) + Tag(16) = 60 bytes
+    assert len(wrapped) == CryptoEngine.ENVELOPE_HEADER_SIZE + 12 + 32 + 16  # Header + Nonce(12) + Key(32) + Tag(16)
     
     # Unwrap (Recuperar original)
     unwrapped, algo = CryptoEngine.unwrap_vault_key(wrapped, user_pwd, user_salt)
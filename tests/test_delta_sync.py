@@ -0,0 +1,156 @@
+import os
+import sys
+import base64
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+class FakeSupabase:
+    """
+    Tabla secrets sobre fake_postgrest: GET /rest/v1/secrets con filtro <columna>=gte.N.
+    Sin server_updated_at responde 400 al filtrarla, como Postgres (42703).
+    """
+    def __init__(self, server, with_server_cursor=True):
+        self.with_server_cursor = with_server_cursor
+        self.rows = []
+        self.server = server
+        self.url = server.url
+        server.route("GET", "/secrets", self.get_secrets)
+
+    @property
+    def queries(self):
+        return [r.qs for r in self.server.requests if r.method == "GET"]
+
+    def get_secrets(self, req):
+        rows = list(self.rows)
+        for column in ("updated_at", "server_updated_at"):
+            if column not in req.qs: continue
+            if column == "server_updated_at" and not self.with_server_cursor:
+                return 400, {"code": "42703", "message": f"column secrets.{column} does not exist"}
+            rows = [r for r in rows if r[column] >= int(req.arg(column))]
+        return rows
+
+    def add(self, cloud_id, service, updated_at, version=1, server_at=None):
+        """updated_at: reloj del cliente que sube; server_at: el que asignaría el trigger (por defecto el mismo)."""
+        self.rows = [r for r in self.rows if r["id"] != cloud_id]
+        self.rows.append({
+            **({"server_updated_at": server_at or updated_at} if self.with_server_cursor else {}),
+            "id": cloud_id, "service": service, "username": "u", "notes": None,
+            "secret": base64.b64encode(os.urandom(12) + os.urandom(20)).decode(),
+            "owner_name": "DELTAUSER", "is_private": 0, "deleted": 0, "vault_id": "vault-1",
+            "integrity_hash": cloud_id + str(version), "version": version, "updated_at": updated_at,
+        })
+
+
+@pytest.fixture
+def env(open_vault, fake_postgrest):
+    from src.infrastructure.sync_manager import SyncManager
+    sm = open_vault("DELTAUSER", vault_key=False)
+
+    def connect(**kwargs):
+        cloud = FakeSupabase(fake_postgrest(), **kwargs)
+        return SyncManager(sm, cloud.url, "key"), cloud
+    return sm, connect
+
+
+def test_pull_uses_high_water_mark(env):
+    sm, connect = env
+    sync, cloud = connect()
+    for i in range(3): cloud.add(f"c{i}", f"svc{i}", updated_at=10_000)
+
+    # Primer pull: sin cursor => completo
+    assert sync._pull_cloud_to_local() == 3
+    assert "server_updated_at" not in cloud.queries[-1]
+    assert sync._read_cursor("srv_hwm") == 10_000
+
+    # Sin cambios: pide solo desde hwm - solape y no aplica nada
+    assert sync._pull_cloud_to_local() == 0
+    assert cloud.queries[-1]["server_updated_at"] == [f"gte.{10_000 - sync.DELTA_OVERLAP_SECONDS}"]
+
+    # Un cambio remoto posterior entra por el delta
+    cloud.add("c1", "svc1-renamed", updated_at=20_000, version=2)
+    cloud.add("c9", "svc9", updated_at=20_000)
+    assert sync._pull_cloud_to_local() == 2
+    assert sync._read_cursor("srv_hwm") == 20_000
+    services = {r["service"] for r in sm.list_metadata()}
+    assert services == {"svc0", "svc1-renamed", "svc2", "svc9"}
+    assert sm.count_encrypted() == 4
+
+
+def test_periodic_full_reconciliation(env):
+    sm, connect = env
+    sync, cloud = connect()
+    cloud.add("c0", "svc0", updated_at=10_000)
+    sync._pull_cloud_to_local()
+    sync._pull_cloud_to_local()
+    assert "server_updated_at" in cloud.queries[-1]
+
+    # Fila con cursor antiguo (p.ej. restaurada de una copia): el delta no la ve...
+    cloud.add("c5", "late", updated_at=1_000)
+    assert sync._pull_cloud_to_local() == 0
+    # ...pero la reconciliación completa periódica sí
+    sync._write_cursor("full_at", 0)
+    assert sync._pull_cloud_to_local() == 1
+    assert "server_updated_at" not in cloud.queries[-1]
+
+    # Bóveda local vaciada: vuelve a completo aunque haya cursor
+    sm.db.execute("DELETE FROM secrets")
+    sm.db.commit()
+    assert sync._pull_cloud_to_local() == 2
+
+
+def test_cursor_uses_server_clock_not_client_clock(env):
+    sm, connect = env
+    sync, cloud = connect()
+    cloud.add("c0", "svc0", updated_at=10_000)
+    sync._pull_cloud_to_local()
+
+    # Par con el reloj una hora atrasado: su updated_at queda por detrás del solape,
+    # pero el servidor sella la escritura con su propia hora
+    cloud.add("c1", "skewed", updated_at=10_000 - 3600, server_at=10_050)
+    assert sync._pull_cloud_to_local() == 1
+    assert sync._read_cursor("srv_hwm") == 10_050
+
+
+def test_cursor_stays_below_rows_skipped_for_pending_work(env):
+    sm, connect = env
+    sync, cloud = connect()
+    cloud.add("c0", "svc0", updated_at=10_000)
+    cloud.add("c1", "svc1", updated_at=10_000)
+    sync._pull_cloud_to_local()
+    # Edición local pendiente de c1: el pull la ignora porque el push debe imponerla
+    sm.db.execute("UPDATE secrets SET synced = 0 WHERE cloud_id = 'c1'")
+    sm.db.commit()
+
+    cloud.add("c1", "svc1-remote", updated_at=15_000, version=2)
+    cloud.add("c2", "svc2", updated_at=20_000)
+    assert sync._pull_cloud_to_local() == 1
+    # Si el push no llegase a subir c1, el siguiente delta debe volver a traer su cambio remoto
+    assert sync._read_cursor("srv_hwm") == 14_999
+
+    sm.db.execute("UPDATE secrets SET synced = 1 WHERE cloud_id = 'c1'")
+    sm.db.commit()
+    assert sync._pull_cloud_to_local() == 1   # c2 vuelve a llegar pero ya está aplicado
+    assert {r["service"] for r in sm.list_metadata()} == {"svc0", "svc1-remote", "svc2"}
+    assert sync._read_cursor("srv_hwm") == 20_000
+
+
+def test_backend_without_server_column_falls_back_to_updated_at(env):
+    sm, connect = env
+    sync, cloud = connect(with_server_cursor=False)
+    cloud.add("c0", "svc0", updated_at=10_000)
+    assert sync._pull_cloud_to_local() == 1
+    assert not sync._server_cursor and sync._read_cursor("hwm") == 10_000
+
+    cloud.add("c1", "svc1", updated_at=20_000)
+    assert sync._pull_cloud_to_local() == 1
+    assert cloud.queries[-1]["updated_at"] == [f"gte.{10_000 - sync.DELTA_OVERLAP_SECONDS}"]
+
+    # Un cliente ya inicializado descubre la ausencia en el primer delta: reintenta completo
+    sync._server_cursor = True
+    sync._write_cursor("srv_hwm", 20_000)
+    assert sync._pull_cloud_to_local() == 0
+    assert not sync._server_cursor and "updated_at" not in cloud.queries[-1]
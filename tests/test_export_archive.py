@@ -0,0 +1,183 @@
+import sys
+import json
+import struct
+import threading
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+# PBKDF2 barato: los tests miden el formato, no el coste del KDF
+FAST_KDF = (1, 1000, 0, 0)
+PASS = "correct horse battery staple"
+
+
+@pytest.fixture
+def sm(open_vault):
+    return open_vault("EXPUSER", personal_key=True)
+
+
+def _write(path, n, chunk_rows=10):
+    from src.infrastructure.crypto.export_archive import ArchiveWriter
+    with ArchiveWriter(path, PASS, chunk_rows, FAST_KDF) as w:
+        for i in range(n):
+            w.write({"service": f"s{i}", "username": "u", "password": f"p{i}", "notes": "", "is_private": i % 2})
+    return w
+
+
+def _header(path):
+    raw = Path(path).read_bytes()
+    (size,) = struct.unpack(">I", raw[16:20])
+    return raw[20:20 + size]
+
+
+def test_roundtrip_random_access_and_no_plaintext(tmp_path):
+    from src.infrastructure.crypto.export_archive import ArchiveReader
+    path = tmp_path / "a.vxa"
+    _write(path, 95)
+    assert not (tmp_path / "a.vxa.part").exists()
+    assert b"p42" not in path.read_bytes()
+
+    with ArchiveReader(path, PASS) as r:
+        assert (r.chunk_count, r.rows) == (10, 95)
+        assert r.read_chunk(4)[2]["password"] == "p42"
+        assert r.read_chunk(9)[-1]["service"] == "s94"
+        assert [n for n, _ in r.iter_chunks(7)] == [7, 8, 9]
+
+    with pytest.raises(ValueError, match="Passphrase"):
+        ArchiveReader(path, "wrong passphrase")
+
+
+def test_tampering_and_truncation_stop_at_last_good_chunk(tmp_path):
+    from src.infrastructure.crypto.export_archive import ArchiveReader, ArchiveError
+    path = tmp_path / "a.vxa"
+    _write(path, 50)
+    with ArchiveReader(path, PASS) as r:
+        offsets = [off for off, _ in r._index["chunks"]]
+
+    data = bytearray(path.read_bytes())
+    data[offsets[3] + 30] ^= 1
+    path.write_bytes(bytes(data))
+    with ArchiveReader(path, PASS) as r:
+        got = []
+        with pytest.raises(ArchiveError) as exc:
+            for n, _ in r.iter_chunks(): got.append(n)
+    assert got == [0, 1, 2] and exc.value.chunk == 3
+
+    # Exportación cortada: sin índice ni bloque final -> lectura secuencial hasta el corte
+    data[offsets[3] + 30] ^= 1
+    data[8:16] = struct.pack(">Q", 0)
+    path.write_bytes(bytes(data[:offsets[4] + 20]))
+    with ArchiveReader(path, PASS) as r:
+        assert r.chunk_count is None
+        got = []
+        with pytest.raises(ArchiveError, match="truncado"):
+            for n, records in r.iter_chunks(1): got.append((n, records[0]["service"]))
+    assert got == [(1, "s10"), (2, "s20"), (3, "s30")]
+
+
+def test_header_costs_are_authenticated_and_bounded(tmp_path):
+    from src.infrastructure.crypto.export_archive import ArchiveReader, ArchiveError
+    path = tmp_path / "a.vxa"
+    _write(path, 5)
+    raw = path.read_bytes()
+    header = _header(path)
+    evil = header.replace(b'"kdf":[1,1000,0,0]', b'"kdf":[1,9999999999,0,0]')
+    path.write_bytes(raw[:16] + struct.pack(">I", len(evil)) + evil + raw[20 + len(header):])
+    with pytest.raises(ArchiveError, match="fuera de rango"):
+        ArchiveReader(path, PASS)
+    path.write_bytes(raw.replace(b'"chunk_rows":10', b'"chunk_rows":11'))
+    with ArchiveReader(path, PASS) as r:
+        assert r.chunk_count is None  # el índice ya no autentica contra el header alterado
+        with pytest.raises(ArchiveError):
+            list(r.iter_chunks())
+
+
+def test_export_import_roundtrip_streams_from_keyset(sm, tmp_path, monkeypatch):
+    sm.bulk_add_secrets({"service": f"svc-{i}", "username": "u", "password": f"pw-{i}", "notes": "n",
+                         "is_private": "1" if i % 5 == 0 else "0"} for i in range(1200))
+    sm.delete_secret(sm.list_metadata()[0]["id"])
+    pages = []
+    real = sm.secrets.iter_encrypted
+    monkeypatch.setattr(sm.secrets, "iter_encrypted", lambda *a, **k: (pages.append(len(p)) or p for p in real(*a, **k)))
+    sm.session.record_cache.clear()
+    stats = sm.export_archive(tmp_path / "out.vxa", PASS, chunk_rows=250, params=FAST_KDF)
+    assert stats == {"exported": 1199, "skipped": 0, "chunks": 5, "cancelled": False}
+    assert max(pages) == 500 and len(sm.session.record_cache) == 0   # sin texto plano residual
+
+    sm.db.execute("DELETE FROM secrets")
+    sm.db.commit()
+    progress = []
+    res = sm.import_archive(tmp_path / "out.vxa", PASS, progress_callback=lambda d, t, s: progress.append((d, t)))
+    assert res["added"] == 1199 and res["complete"] and res["error"] is None
+    assert progress == [(1, 5), (2, 5), (3, 5), (4, 5), (5, 5)]
+    assert sm.get_meta("archive_import:" + json.loads(_header(tmp_path / "out.vxa"))["archive_id"]) is None
+    sm.session.record_cache.clear()
+    plain = {r["service"]: (r["secret"], r["is_private"]) for r in sm.get_all()}
+    assert plain["svc-10"] == ("pw-10", 1) and plain["svc-11"] == ("pw-11", 0)
+
+
+def test_import_resumes_from_last_good_chunk(sm, tmp_path):
+    from src.infrastructure.crypto.export_archive import ArchiveReader
+    path = tmp_path / "a.vxa"
+    _write(path, 100)
+
+    cancel = threading.Event()
+    res = sm.import_archive(path, PASS, cancel_event=cancel,
+                            progress_callback=lambda done, total, s: done >= 3 and cancel.set())
+    # El bloque que ya se estaba cifrando al cancelar también se confirma
+    assert not res["complete"] and res["chunks_done"] == 4 and res["added"] == 40
+
+    # Bloque 6 dañado: se confirma hasta el 5 y el checkpoint queda en el 6
+    with ArchiveReader(path, PASS) as r:
+        off = r._index["chunks"][6][0]
+    data = bytearray(path.read_bytes())
+    data[off + 40] ^= 1
+    path.write_bytes(bytes(data))
+    res = sm.import_archive(path, PASS)
+    assert (res["resumed_from"], res["chunks_done"], res["added"], res["complete"]) == (4, 6, 20, False)
+    assert "dañado" in res["error"]
+
+    data[off + 40] ^= 1
+    path.write_bytes(bytes(data))
+    res = sm.import_archive(path, PASS)
+    assert (res["resumed_from"], res["added"], res["skipped"], res["complete"]) == (6, 40, 0, True)
+    assert sm.count_encrypted() == 100
+
+
+def test_export_cancel_leaves_no_file_and_memory_is_flat(sm, tmp_path):
+    sm.bulk_add_secrets({"service": f"svc-{i}", "username": "u", "password": "p" * 64, "notes": "n" * 64}
+                        for i in range(6000))
+    cancel = threading.Event()
+    stats = sm.export_archive(tmp_path / "c.vxa", PASS, chunk_rows=500, params=FAST_KDF,
+                              cancel_event=cancel, progress_callback=lambda n, total: cancel.set())
+    assert stats["cancelled"] and not list(tmp_path.glob("c.vxa*"))
+
+    sm.session.record_cache.clear()
+    tracemalloc.start()
+    sm.get_all()
+    _, full_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    sm.session.record_cache.clear()
+    sm.export_archive(tmp_path / "m.vxa", PASS, chunk_rows=500, params=FAST_KDF)
+    _, stream_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert stream_peak * 2 < full_peak
+
+
+def test_plain_export_worker_streams_same_json(sm, tmp_path):
+    pytest.importorskip("PyQt5")
+    from src.presentation.dashboard.dashboard_workers import ExportWorker
+    sm.bulk_add_secrets({"service": f"s{i}", "username": "ü", "password": f"p{i}"} for i in range(3))
+    sm.session.record_cache.clear()
+    worker = ExportWorker(sm, str(tmp_path / "o.json"))
+    done = []
+    worker.completed.connect(lambda stats, cancelled: done.append((stats, cancelled)))
+    worker.run()
+    assert done == [({"exported": 3, "skipped": 0, "cancelled": False}, False)]
+    assert len(sm.session.record_cache) == 0
+    data = json.loads((tmp_path / "o.json").read_text(encoding="utf-8"))
+    assert (tmp_path / "o.json").read_text(encoding="utf-8") == json.dumps(data, indent=4, ensure_ascii=False)
+    assert data[0] == {"service": "s0", "username": "ü", "password": "p0", "notes": "", "is_private": 0}
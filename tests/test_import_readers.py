@@ -0,0 +1,104 @@
+import sys
+import json
+import threading
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from src.infrastructure.import_readers import open_reader, JsonArrayReader
+
+
+@pytest.fixture
+def sm(open_vault):
+    return open_vault("READUSER")
+
+
+def test_csv_reader_streams_with_progress(tmp_path):
+    path = tmp_path / "in.csv"
+    path.write_text("﻿Servicio,Usuario,Contraseña\n" + "".join(f"s{i},u,p{i}\n" for i in range(2000)), encoding="utf-8")
+    reader = open_reader(path)
+    seen = []
+    for i, row in enumerate(reader):
+        if i in (0, 1999): seen.append((row, reader.progress()))
+    assert seen[0][0] == {"Servicio": "s0", "Usuario": "u", "Contraseña": "p0"}
+    assert seen[1][0]["Servicio"] == "s1999" and seen[1][1] == 1.0
+    assert reader._file is None and reader.rows_read == 2000
+
+
+def test_json_reader_matches_json_load(tmp_path, monkeypatch):
+    data = [{"service": f"señal-{i} [x], {{y}}", "password": "ñ" * (i % 7), "n": i * 1.5, "tags": [1, {"a": None}]}
+            for i in range(300)]
+    path = tmp_path / "in.json"
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=4), encoding="utf-8")
+    # Bloques diminutos: cortes dentro de strings, números y caracteres multibyte
+    monkeypatch.setattr(JsonArrayReader, "BUFFER_SIZE", 7)
+    assert list(open_reader(path)) == data
+
+    (tmp_path / "obj.json").write_text('{"service": "x"}')
+    with pytest.raises(ValueError):
+        list(open_reader(tmp_path / "obj.json"))
+    (tmp_path / "cut.json").write_text('[{"service": "x"}, {"service": ')
+    with pytest.raises(ValueError):
+        list(open_reader(tmp_path / "cut.json"))
+    with pytest.raises(ValueError):
+        open_reader(tmp_path / "in.txt")
+
+
+def test_json_reader_memory_stays_flat(tmp_path):
+    path = tmp_path / "big.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([{"service": f"svc-{i}", "username": "u" * 20, "password": "p" * 40, "notes": "n" * 80}
+                   for i in range(30_000)], f, indent=4)
+
+    tracemalloc.start()
+    with open(path, encoding="utf-8") as f:
+        loaded = len(json.load(f))
+    _, full_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    streamed = sum(1 for _ in open_reader(path))
+    _, stream_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert loaded == streamed == 30_000
+    assert stream_peak * 10 < full_peak
+
+
+def test_xlsx_reader_read_only(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Service", "Username", "Password", "Notes"])
+    ws.append(["a", "u", "p", None])
+    ws.append([None, None, None, None])
+    ws.append(["b", "u", 123, "n"])
+    wb.save(tmp_path / "in.xlsx")
+    rows = list(open_reader(tmp_path / "in.xlsx"))
+    assert rows == [{"Service": "a", "Username": "u", "Password": "p", "Notes": ""},
+                    {"Service": "b", "Username": "u", "Password": 123, "Notes": "n"}]
+
+
+def test_reader_feeds_pipeline_and_cancels_between_chunks(sm, tmp_path):
+    path = tmp_path / "in.json"
+    path.write_text(json.dumps([{"service": f"s{i}", "password": "p"} for i in range(1000)]))
+    cancel = threading.Event()
+    stats = sm.bulk_add_secrets(open_reader(path), chunk_size=100, cancel_event=cancel,
+                                progress_callback=lambda rows, s: rows >= 300 and cancel.set())
+    # El bloque en vuelo al cancelar se confirma; ninguno más se lee
+    assert 300 <= stats["added"] < 1000 and stats["added"] % 100 == 0
+    assert sm.count_encrypted() == stats["added"]
+
+
+def test_import_worker_reports_progress(sm, tmp_path):
+    pytest.importorskip("PyQt5")
+    from src.presentation.dashboard.dashboard_workers import ImportWorker
+    path = tmp_path / "in.csv"
+    path.write_text("service,password\n" + "".join(f"s{i},p\n" for i in range(5000)))
+    worker = ImportWorker(sm, path=str(path))
+    progress, done = [], []
+    worker.progress.connect(lambda pct, msg: progress.append(pct))
+    worker.completed.connect(lambda stats, cancelled: done.append((stats, cancelled)))
+    worker.run()
+    assert done == [({"added": 5000, "skipped": 0, "errors": 0}, False)]
+    assert progress == sorted(progress) and 0 < progress[-1] <= 99
@@ -0,0 +1,120 @@
+import os
+import sys
+import sqlite3
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+@pytest.fixture
+def sm(open_vault):
+    return open_vault("BKPUSER")
+
+
+def _services(sm):
+    return {r["service"] for r in sm.list_metadata()}
+
+
+def test_snapshots_dedupe_pages_and_restore_any_point(sm):
+    sm.bulk_add_secrets({"service": f"svc-{i}", "username": "u", "password": "p" * 40, "notes": "n" * 200}
+                        for i in range(3000))
+    first = sm.create_local_backup()
+    sm.add_secret("late", "u", "pw")
+    second = sm.create_local_backup()
+
+    snaps = sm.list_local_backups()
+    assert [s["path"] for s in snaps] == [first, second]
+    full, incr = snaps
+    assert full["pages"] >= full["new_pages"] > 100
+    # Un INSERT (+ auditoría e índices) toca unas pocas páginas: el segundo snapshot no reescribe la base
+    assert incr["new_pages"] <= 20 and incr["bytes_written"] * 20 < full["bytes_written"]
+    assert b"svc-1" not in b"".join(p.read_bytes() for p in Path(first).parent.parent.rglob("*.pack"))
+
+    sm.local_restore(first)
+    assert "late" not in _services(sm) and len(_services(sm)) == 3000
+    sm.local_restore(second)
+    assert "late" in _services(sm)
+    assert sm.reveal(next(r["id"] for r in sm.list_metadata() if r["service"] == "late")) == "pw"
+
+
+def test_tampered_pack_is_rejected_before_touching_db(sm):
+    sm.add_secret("keep", "u", "pw")
+    snap = sm.create_local_backup()
+    sm.add_secret("after", "u", "pw")
+    pack = next(Path(snap).parent.parent.glob("packs/*.pack"))
+    data = bytearray(pack.read_bytes())
+    data[40] ^= 1
+    pack.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        sm.local_restore(snap)
+    assert {"keep", "after"} <= _services(sm)
+    assert not list(sm.db.db_path.parent.glob("*.restore"))
+
+
+def test_keyring_follows_key_rotation(sm, tmp_path):
+    from src.infrastructure.storage.incremental_backup import IncrementalBackupStore
+    sm.add_secret("a", "u", "pw")
+    snap = sm.create_local_backup()
+    old_key = bytes(sm.session.vault_key)  # el setter borra el buffer anterior
+    # Tras rotar, el primer acceso con ambas llaves añade la nueva al keyring
+    sm.session.vault_key = os.urandom(32)
+    IncrementalBackupStore(Path(snap).parent.parent, [old_key, sm.session.vault_key])
+    assert [s["path"] for s in sm.list_local_backups()] == [snap]
+
+    with pytest.raises(ValueError, match="Ninguna llave"):
+        IncrementalBackupStore(Path(snap).parent.parent, [os.urandom(32)])
+
+
+def test_prune_keeps_pages_still_referenced(tmp_path):
+    from src.infrastructure.storage.incremental_backup import IncrementalBackupStore
+    db = tmp_path / "v.db"
+    conn = sqlite3.connect(str(db))
+    conn.execute("CREATE TABLE t (v TEXT)")
+    store = IncrementalBackupStore(tmp_path / "store", [os.urandom(32)])
+    snaps = []
+    for i in range(4):
+        conn.executemany("INSERT INTO t VALUES (?)", [(f"row-{i}-{j}" * 20,) for j in range(200)])
+        conn.commit()
+        snaps.append(store.snapshot(conn)["id"])
+
+    res = store.prune(keep=2)
+    assert res["snapshots"] == 2
+    # Las páginas del primer pack siguen vivas: los snapshots conservados las reutilizan
+    assert (tmp_path / "store" / "packs" / f"{snaps[0]}.pack").exists()
+    store.restore(snaps[2], tmp_path / "r.db")
+    assert sqlite3.connect(str(tmp_path / "r.db")).execute("SELECT COUNT(*) FROM t").fetchone()[0] == 600
+
+    (tmp_path / "store" / "packs" / "orphan.pack").write_bytes(b"x")
+    assert store.prune(keep=2)["packs"] == 1
+
+
+def test_prune_keeps_packs_whose_index_cannot_be_read(tmp_path):
+    from src.infrastructure.storage.incremental_backup import IncrementalBackupStore
+    conn = sqlite3.connect(str(tmp_path / "v.db"))
+    conn.execute("CREATE TABLE t (v TEXT)")
+    store = IncrementalBackupStore(tmp_path / "store", [os.urandom(32)])
+    snaps = []
+    for i in range(3):
+        conn.executemany("INSERT INTO t VALUES (?)", [(f"row-{i}-{j}" * 20,) for j in range(200)])
+        conn.commit()
+        snaps.append(store.snapshot(conn)["id"])
+
+    packs = tmp_path / "store" / "packs"
+    idx = packs / f"{snaps[2]}.idx"
+    idx.write_bytes(idx.read_bytes()[:-1] + bytes([idx.read_bytes()[-1] ^ 1]))
+    assert store.prune(keep=1)["packs"] == 0
+    assert {p.stem for p in packs.glob("*.pack")} >= {snaps[0], snaps[2]}
+
+
+def test_legacy_full_copy_still_restores(sm, tmp_path):
+    import shutil
+    sm.add_secret("old", "u", "pw")
+    sm.db.commit()
+    legacy = tmp_path / "backup_legacy.enc"
+    sm.db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    shutil.copy2(sm.db.db_path, legacy)
+    sm.add_secret("new", "u", "pw")
+    sm.local_restore(str(legacy))
+    assert _services(sm) == {"old"}
@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+@pytest.fixture
+def calib(tmp_path, monkeypatch, fresh_modules):
+    from src.infrastructure.config.path_manager import PathManager
+    monkeypatch.setattr(PathManager, "DATA_DIR", tmp_path)
+    from src.infrastructure.crypto import kdf_calibration
+    from src.infrastructure.crypto_engine import CryptoEngine
+    CryptoEngine.reload_kdf_profile()
+    yield kdf_calibration
+    CryptoEngine.reload_kdf_profile()
+
+
+@pytest.fixture
+def fake_host(calib, monkeypatch):
+    """Equipo simulado: Argon2id cuesta 1 ms por MiB y pasada, PBKDF2 1 ms por 1000 iteraciones."""
+    clock = [0.0]
+
+    def derive(params, password, salt):
+        kdf, a, b, c = params
+        clock[0] += (a / 1024 * b if kdf == calib.KDF_ARGON2ID else a / 1000) / 1000
+        return b"k" * 32
+
+    monkeypatch.setattr(calib, "derive_kek", derive)
+    return lambda **kw: calib.KdfCalibrator(timer=lambda: clock[0], **kw)
+
+
+def test_picks_costliest_params_within_target(calib, fake_host):
+    report = fake_host(target_ms=500, samples=1, parallelism=2, max_memory_cost=65536).run()
+    argon, pbkdf2 = report["profile"]["argon2id"], report["profile"]["pbkdf2"]
+    # Memoria duplicada hasta el techo (64 MiB) y el resto del presupuesto en pasadas
+    assert (argon["memory_cost"], argon["time_cost"], argon["parallelism"]) == (38912, 13, 2)
+    assert argon["ms"] <= 500 and not argon["floor_bound"]
+    # 500 ms dan 500k iteraciones, por debajo del suelo OWASP: manda el suelo
+    assert pbkdf2["iterations"] == calib.PBKDF2_MIN_ITERATIONS and pbkdf2["floor_bound"]
+    assert fake_host(target_ms=1000, samples=1).calibrate_pbkdf2()["iterations"] == 1_000_000
+
+
+def test_slow_host_stays_on_security_floor(calib, fake_host):
+    argon = fake_host(target_ms=10, samples=1, parallelism=1).calibrate_argon2id()
+    assert (argon["memory_cost"], argon["time_cost"]) == (calib.ARGON2_MIN_MEMORY_COST, calib.ARGON2_MIN_TIME_COST)
+    assert argon["floor_bound"]
+
+
+def test_report_is_reproducible(calib, fake_host):
+    calibrator = fake_host(target_ms=300, samples=3, parallelism=1, max_memory_cost=1 << 20)
+    report = calibrator.run()
+    assert set(report) >= {"inputs", "environment", "trials", "profile"}
+    assert report["inputs"]["floors"]["pbkdf2_iterations"] == calib.PBKDF2_MIN_ITERATIONS
+    assert all(len(t["samples_ms"]) == 3 for t in report["trials"])
+    replay = fake_host(samples=3, parallelism=1).replay(json.loads(json.dumps(report)))
+    assert [(r["before_ms"], r["params"]) for r in replay] == [(r["after_ms"], r["params"]) for r in replay]
+    assert len(replay) == len(report["trials"])
+
+
+def test_profile_drives_wraps_and_unwrap_stays_deterministic(calib):
+    from src.infrastructure.crypto_engine import CryptoEngine
+    profile = {"version": 1, "argon2id": {"memory_cost": 19456, "time_cost": 2, "parallelism": 1},
+               "pbkdf2": {"iterations": 700_000}}
+    calib.save_profile(profile)
+    CryptoEngine.reload_kdf_profile()
+    assert CryptoEngine.current_kdf_params() == (CryptoEngine.KDF_ARGON2ID, 19456, 2, 1)
+    assert CryptoEngine.pbkdf2_params() == (CryptoEngine.KDF_PBKDF2, 700_000, 0, 0)
+
+    key, salt = os.urandom(32), os.urandom(16)
+    wrapped = CryptoEngine.wrap_vault_key(key, "pw", salt)
+    assert CryptoEngine.parse_envelope(wrapped)["params"] == (CryptoEngine.KDF_ARGON2ID, 19456, 2, 1)
+    assert CryptoEngine.verify_user_password_argon2("pw", CryptoEngine.hash_user_password_argon2("pw"))
+    assert "m=19456,t=2,p=1" in CryptoEngine.hash_user_password_argon2("pw")
+
+    # Sin perfil (otro equipo / recalibrado) el blob se abre con los costes de su header
+    calib.profile_path().unlink()
+    CryptoEngine.reload_kdf_profile()
+    assert CryptoEngine.current_kdf_params() != (CryptoEngine.KDF_ARGON2ID, 19456, 2, 1)
+    assert CryptoEngine.unwrap_vault_key(wrapped, "pw", salt)[0] == key
+    # Un perfil distinto pero por encima del suelo no provoca re-wraps de ida y vuelta
+    assert not CryptoEngine.needs_rewrap(wrapped)
+
+
+def test_only_envelopes_below_the_floor_are_rewrapped(calib):
+    from src.infrastructure.crypto_engine import CryptoEngine
+    key, kek, salt = os.urandom(32), os.urandom(32), os.urandom(16)
+    weak = CryptoEngine.wrap_with_kek(key, kek, (CryptoEngine.KDF_PBKDF2, 100_000, 0, 0), salt)
+    strong = CryptoEngine.wrap_with_kek(key, kek, (CryptoEngine.KDF_ARGON2ID, 1 << 20, 4, 4), salt)
+    assert not CryptoEngine.below_security_floor(CryptoEngine.current_kdf_params())
+    assert CryptoEngine.needs_rewrap(weak) and not CryptoEngine.needs_rewrap(strong)
+
+
+def test_profile_below_floor_is_rejected(calib):
+    weak = {"version": 1, "argon2id": {"memory_cost": 1024, "time_cost": 1, "parallelism": 1},
+            "pbkdf2": {"iterations": 1000}}
+    with pytest.raises(ValueError):
+        calib.save_profile(weak)
+    calib.profile_path().write_text(json.dumps(weak))
+    assert calib.load_profile() is None
+    calib.profile_path().write_text("{not json")
+    assert calib.load_profile() is None
+
+
+def test_cli_writes_report_and_applies_profile(calib, tmp_path, capsys):
+    report_path = tmp_path / "report.json"
+    assert calib.main(["--target-ms", "1", "--samples", "1", "--report", str(report_path), "--apply"]) == 0
+    report = json.loads(report_path.read_text())
+    assert calib.load_profile()["pbkdf2"]["iterations"] == report["profile"]["pbkdf2"]["iterations"]
+    assert "suelo de seguridad" in capsys.readouterr().out
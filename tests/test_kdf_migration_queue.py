@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+USER = "MIGUSER"
+
+
+@pytest.fixture
+def env(isolated_sm, monkeypatch, legacy_wrap):
+    from src.infrastructure.secrets_manager import SecretsManager, CryptoEngine
+    from src.infrastructure import crypto_engine
+    crypto_engine.reset_rate_limits()
+
+    hashes, cloud = [], []
+    real_hash = CryptoEngine.hash_user_password_argon2
+    monkeypatch.setattr(CryptoEngine, "hash_user_password_argon2",
+                        staticmethod(lambda pw: hashes.append(pw) or real_hash(pw)))
+    monkeypatch.setattr(SecretsManager, "_kdf_migrate_cloud", lambda self, u, pw: cloud.append(u) or True)
+
+    sm = isolated_sm
+    sm.reconnect(USER)
+    vault_key, personal, salt = os.urandom(32), os.urandom(32), os.urandom(16)
+    pwd_hash, _ = CryptoEngine.hash_user_password("pw", salt)
+    legacy_blob = legacy_wrap(vault_key, "pw", salt)
+    sm.save_local_user_profile(USER, pwd_hash, salt.hex(), salt, "admin",
+                               legacy_wrap(personal, "pw", salt), None, "vault-1", legacy_blob)
+    sm.users.save_vault_access("vault-1", legacy_blob, "admin", synced=1)
+    yield sm, vault_key, hashes, cloud
+    crypto_engine.reset_rate_limits()
+
+
+def _job(sm):
+    raw = sm.get_meta(f"kdf_migration:{USER}")
+    return json.loads(raw) if raw else None
+
+
+def _audit(sm):
+    return sm.db.execute("SELECT status, details FROM security_audit WHERE action = 'KDF_MIGRATION' ORDER BY id").fetchall()
+
+
+def test_login_only_enqueues_migration(env):
+    from src.infrastructure.crypto_engine import CryptoEngine
+    sm, vault_key, hashes, cloud = env
+    sm.set_active_user(USER, "pw")
+    assert bytes(sm.session.vault_key) == vault_key
+    # Ningún hash Argon2id ni re-wrap durante el login: solo queda la cola en meta
+    assert hashes == [] and cloud == []
+    profile = sm.get_local_user_profile(USER)
+    assert profile["kdf_version"] == 1
+    assert CryptoEngine.needs_rewrap(sm.security.ensure_bytes(profile["wrapped_vault_key"]))
+    job = _job(sm)
+    assert job["steps"] == ["password_hash", "vault_key"] and job["attempts"] == 0
+    assert sm.session.migration_secret.get_copy() == b"pw"
+    sm.session.clear()
+    assert sm.session.migration_secret is None
+
+
+def test_drain_migrates_once_and_audits(env):
+    from src.infrastructure.crypto_engine import CryptoEngine, ARGON2_PREFIX
+    sm, vault_key, hashes, cloud = env
+    sm.set_active_user(USER, "pw")
+    secret = sm.session.migration_secret
+
+    assert sm.drain_kdf_migrations()
+    profile = sm.get_local_user_profile(USER)
+    blob = sm.security.ensure_bytes(profile["wrapped_vault_key"])
+    assert profile["password_hash"].startswith(ARGON2_PREFIX) and profile["kdf_version"] == 2
+    assert CryptoEngine.parse_envelope(blob) and not CryptoEngine.needs_rewrap(blob)
+    assert sm.unwrap_key(blob, "pw", profile["vault_salt"])[0] == vault_key
+    va = sm.users.get_vault_access("vault-1")
+    assert sm.security.ensure_bytes(va["wrapped_master_key"]) == blob and va["synced"] == 0
+    assert hashes == ["pw"] and cloud == [USER]
+    assert _job(sm) is None and sm.session.migration_secret is None and secret.get_copy() is None
+    assert [r[0] for r in _audit(sm)] == ["SUCCESS"]
+
+    # Re-ejecutar no repite trabajo ni vuelve a auditar
+    assert sm.drain_kdf_migrations()
+    assert hashes == ["pw"] and cloud == [USER] and len(_audit(sm)) == 1
+
+
+def test_failed_step_stays_queued_and_resumes(env, monkeypatch):
+    from src.infrastructure.secrets_manager import SecretsManager
+    sm, vault_key, hashes, cloud = env
+    sm.set_active_user(USER, "pw")
+
+    def offline(self, username, password):
+        raise ConnectionError("offline")
+    monkeypatch.setattr(SecretsManager, "_kdf_migrate_cloud", offline)
+    assert not sm.drain_kdf_migrations()
+    job = _job(sm)
+    assert job["steps"] == ["cloud"] and job["attempts"] == 1 and "offline" in job["last_error"]
+    assert _audit(sm)[-1][0] == "FAILED"
+    # Solo queda la subida, que no usa la password: no se retiene mientras la nube falle
+    assert sm.session.migration_secret is None
+
+    # Un nuevo login no re-encola los pasos locales ya hechos y el reintento solo sube a la nube
+    sm.session.clear()
+    sm.set_active_user(USER, "pw")
+    assert _job(sm)["steps"] == ["cloud"] and sm.session.migration_secret is None
+    monkeypatch.setattr(SecretsManager, "_kdf_migrate_cloud", lambda self, u, pw: cloud.append(u) or True)
+    assert sm.drain_kdf_migrations()
+    assert hashes == ["pw"] and cloud == [USER] and _job(sm) is None
+    assert [r[0] for r in _audit(sm)] == ["FAILED", "SUCCESS"]
@@ -0,0 +1,92 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+@pytest.fixture
+def kdf_calls(monkeypatch, fresh_modules):
+    """Cuenta las derivaciones reales (PBKDF2HMAC.derive y Argon2 hash_secret_raw)."""
+    import argon2.low_level
+    from src.infrastructure import crypto_engine
+    crypto_engine.reset_rate_limits()
+    calls = []
+    real_pbkdf2, real_argon2 = crypto_engine.PBKDF2HMAC, argon2.low_level.hash_secret_raw
+
+    class CountingPBKDF2:
+        def __init__(self, **kwargs):
+            self._kdf = real_pbkdf2(**kwargs)
+        def derive(self, data):
+            calls.append("pbkdf2")
+            return self._kdf.derive(data)
+
+    def counting_argon2(*args, **kwargs):
+        calls.append("argon2id")
+        return real_argon2(*args, **kwargs)
+
+    monkeypatch.setattr(crypto_engine, "PBKDF2HMAC", CountingPBKDF2)
+    monkeypatch.setattr(argon2.low_level, "hash_secret_raw", counting_argon2)
+    yield calls
+    crypto_engine.reset_rate_limits()
+
+
+def test_memo_derives_each_kek_once_and_wipes(kdf_calls):
+    from src.infrastructure.crypto_engine import CryptoEngine, KekMemo
+    salt = os.urandom(16)
+    with KekMemo() as memo:
+        first = CryptoEngine.derive_kek_from_password("pw", salt)
+        assert CryptoEngine.derive_kek_from_password("pw", salt) == first
+        assert CryptoEngine.derive_kek_from_password("other", salt) != first
+        assert CryptoEngine.derive_kek_from_password("pw", os.urandom(16)) != first
+        assert CryptoEngine.derive_kek_from_password("pw", salt, iterations=1000) != first
+        assert (memo.hits, memo.misses) == (1, 4)
+        entries = list(memo._entries.values())
+    assert kdf_calls == ["pbkdf2"] * 4
+    assert all(e.get_raw() is None for e in entries) and KekMemo.current() is None
+
+    # Fuera de una operación no se memoriza nada
+    CryptoEngine.derive_kek_from_password("pw", salt)
+    CryptoEngine.derive_kek_from_password("pw", salt)
+    assert len(kdf_calls) == 6
+
+
+def test_login_derives_each_kek_once(isolated_sm, kdf_calls, legacy_wrap):
+    from src.infrastructure.secrets_manager import CryptoEngine
+    sm = isolated_sm
+    sm.reconnect("MEMOUSER")
+    vault_key, personal, salt = os.urandom(32), os.urandom(32), os.urandom(16)
+    pwd_hash, _ = CryptoEngine.hash_user_password("pw", salt)
+    sm.save_local_user_profile("MEMOUSER", pwd_hash, salt.hex(), salt, "admin",
+                               legacy_wrap(personal, "pw", salt), None, "vault-1",
+                               legacy_wrap(vault_key, "pw", salt))
+    kdf_calls.clear()
+
+    # PBKDF2 de sesión + cascada legacy (la migración Argon2id queda encolada): sin memo serían 2 PBKDF2 y 1 Argon2id
+    sm.set_active_user("MEMOUSER", "pw")
+    assert bytes(sm.session.vault_key) == vault_key and bytes(sm.session.personal_key) == personal
+    assert sorted(kdf_calls) == ["argon2id", "pbkdf2"]
+    assert {"profile", "session_kek", "vault_key", "kdf_migration", "total"} <= set(sm.last_login_timings)
+    assert sm.last_login_timings["total"] >= sm.last_login_timings["vault_key"]
+
+
+def test_password_change_reuses_new_kek(isolated_sm, kdf_calls):
+    from src.infrastructure.secrets_manager import CryptoEngine
+    sm = isolated_sm
+    sm.reconnect("MEMOUSER")
+    vault_key, salt = os.urandom(32), os.urandom(16)
+    pwd_hash, _ = CryptoEngine.hash_user_password("pw", salt)
+    sm.save_local_user_profile("MEMOUSER", pwd_hash, salt.hex(), salt, "admin", None, None, "vault-1", None)
+    sm.session.set_user("MEMOUSER", None, "admin", "vault-1")
+    sm.session.personal_key = bytearray(os.urandom(32))
+    sm.session.vault_key = bytearray(vault_key)
+    kdf_calls.clear()
+
+    sm.change_login_password("pw", "new-pw")
+    # wrap de identidad, re-wrap de bóveda, KEK de sesión y unwrap final comparten una derivación
+    assert kdf_calls.count("argon2id") == 1
+    assert bytes(sm.session.vault_key) == vault_key
+    profile = sm.get_local_user_profile("MEMOUSER")
+    assert sm.unwrap_key(profile["wrapped_vault_key"], "new-pw", profile["vault_salt"])[0] == vault_key
@@ -0,0 +1,127 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+@pytest.fixture
+def derivations(monkeypatch, fresh_modules):
+    """Cuenta las derivaciones KDF (Argon2id y PBKDF2) realizadas."""
+    from src.infrastructure.crypto_engine import CryptoEngine, reset_rate_limits
+    reset_rate_limits()
+    calls = []
+    for name in ("derive_kek_argon2id", "derive_kek_from_password"):
+        original = getattr(CryptoEngine, name)
+        def counting(*args, _original=original, _name=name, **kwargs):
+            calls.append(_name)
+            return _original(*args, **kwargs)
+        monkeypatch.setattr(CryptoEngine, name, staticmethod(counting))
+    yield calls
+    reset_rate_limits()
+
+
+def test_envelope_unwrap_does_one_derivation(derivations):
+    from src.infrastructure.crypto_engine import CryptoEngine
+    key, salt = os.urandom(32), os.urandom(16)
+    wrapped = CryptoEngine.wrap_vault_key(key, "pw", salt)
+    env = CryptoEngine.parse_envelope(wrapped)
+    assert env["params"] == CryptoEngine.current_kdf_params()
+    assert env["salt_id"] == CryptoEngine.salt_id(salt)
+    assert not CryptoEngine.needs_rewrap(wrapped)
+
+    derivations.clear()
+    assert CryptoEngine.unwrap_vault_key(wrapped, "pw", salt) == (key, env["algorithm"])
+    assert len(derivations) == 1
+
+    # Password incorrecta: también una sola derivación, no la cascada legacy
+    derivations.clear()
+    with pytest.raises(ValueError, match="Error de autenticación"):
+        CryptoEngine.unwrap_vault_key(wrapped, "wrong", salt)
+    assert len(derivations) == 1
+
+    # Salt equivocado: se descarta por salt_id sin derivar
+    derivations.clear()
+    with pytest.raises(ValueError, match="Error de autenticación"):
+        CryptoEngine.unwrap_vault_key(wrapped, "pw", os.urandom(16))
+    assert derivations == []
+
+
+def test_envelope_header_is_authenticated():
+    from src.infrastructure.crypto_engine import CryptoEngine, AESGCM
+    key, salt = os.urandom(32), os.urandom(16)
+    kek = CryptoEngine.derive_kek_from_password("pw", salt)
+    header = CryptoEngine._ENVELOPE_HEADER.pack(
+        CryptoEngine.ENVELOPE_MAGIC, CryptoEngine.ENVELOPE_VERSION,
+        CryptoEngine.KDF_PBKDF2, CryptoEngine.DEFAULT_ITERATIONS, 0, 0, CryptoEngine.salt_id(salt))
+    nonce = os.urandom(12)
+    wrapped = header + nonce + AESGCM(kek).encrypt(nonce, key, header)
+    assert CryptoEngine.open_with_kek(wrapped, kek) == key
+
+    # Cambiar las iteraciones en el header invalida el tag aunque la KEK sea correcta
+    tampered = bytearray(wrapped)
+    tampered[6:10] = (200_000).to_bytes(4, "big")
+    assert CryptoEngine.parse_envelope(bytes(tampered))["params"][1] == 200_000
+    with pytest.raises(Exception):
+        CryptoEngine.open_with_kek(bytes(tampered), kek)
+
+
+@pytest.mark.parametrize("params", [
+    (2, 2 ** 32 - 1, 3, 4),        # Argon2id: 4 TiB de memoria
+    (2, 65536, 65535, 4),          # Argon2id: time_cost máximo del struct
+    (2, 1024, 1, 1),               # Argon2id: por debajo del suelo
+    (1, 2 ** 32 - 1, 0, 0),        # PBKDF2: 4 mil millones de iteraciones
+    (1, 1000, 0, 0),               # PBKDF2: por debajo del suelo
+])
+def test_out_of_range_header_is_rejected_before_deriving(derivations, params):
+    from src.infrastructure.crypto_engine import CryptoEngine
+    salt = os.urandom(16)
+    header = CryptoEngine._ENVELOPE_HEADER.pack(
+        CryptoEngine.ENVELOPE_MAGIC, CryptoEngine.ENVELOPE_VERSION, *params, CryptoEngine.salt_id(salt))
+    blob = header + os.urandom(12 + 48)
+    with pytest.raises(ValueError, match="fuera de rango"):
+        CryptoEngine.parse_envelope(blob)
+    with pytest.raises(ValueError):
+        CryptoEngine.unwrap_vault_key(blob, "pw", salt)
+    assert derivations == [] and not CryptoEngine.needs_rewrap(blob)
+
+
+def test_legacy_blob_still_opens_and_needs_rewrap(derivations, legacy_wrap):
+    from src.infrastructure.crypto_engine import CryptoEngine
+    key, salt = os.urandom(32), os.urandom(16)
+    legacy = legacy_wrap(key, "pw", salt, 10_000)
+    assert CryptoEngine.parse_envelope(legacy) is None and CryptoEngine.needs_rewrap(legacy)
+
+    derivations.clear()
+    assert CryptoEngine.unwrap_vault_key(legacy, "pw", salt) == (key, "pbkdf2")
+    assert len(derivations) > 1  # cascada Argon2id -> PBKDF2 100k/600k/10k
+    assert CryptoEngine.open_with_kek(legacy_wrap(key, "pw", salt, 100_000), CryptoEngine.derive_kek_from_password("pw", salt)) == key
+
+
+def test_legacy_blob_upgraded_in_place_after_login(isolated_sm, derivations, legacy_wrap):
+    from src.infrastructure.secrets_manager import CryptoEngine
+    sm = isolated_sm
+    sm.reconnect("ENVUSER")
+    vault_key, personal, salt = os.urandom(32), os.urandom(32), os.urandom(16)
+    pwd_hash, _ = CryptoEngine.hash_user_password("pw", salt)
+    sm.save_local_user_profile("ENVUSER", pwd_hash, salt.hex(), salt, "admin",
+                               legacy_wrap(personal, "pw", salt, 100_000), None, "vault-1",
+                               legacy_wrap(vault_key, "pw", salt, 600_000))
+
+    sm.set_active_user("ENVUSER", "pw")
+    assert bytes(sm.session.vault_key) == vault_key and bytes(sm.session.personal_key) == personal
+    sm.drain_kdf_migrations()  # re-wrap local en el worker post-login (sin red, el paso de nube queda encolado)
+    stored = sm.security.ensure_bytes(sm.get_local_user_profile("ENVUSER")["wrapped_vault_key"])
+    assert CryptoEngine.parse_envelope(stored) and not CryptoEngine.needs_rewrap(stored)
+
+    # Segundo login sobre el blob migrado: una única derivación para la llave de bóveda
+    derivations.clear()
+    dec, _ = sm.security.unwrap_key(stored, "pw", salt)
+    assert dec == vault_key and len(derivations) == 1
+
+    # El blob antiguo prueba varios candidatos de iteraciones antes de acertar
+    derivations.clear()
+    CryptoEngine.unwrap_vault_key(legacy_wrap(vault_key, "pw", salt, 600_000), "pw", salt)
+    assert len(derivations) > 1
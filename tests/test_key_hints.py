@@ -0,0 +1,57 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.domain.services.security_service import SecurityService
+
+
+def test_decrypt_with_hint_counters():
+    sec = SecurityService()
+    k_vault, k_personal = os.urandom(32), os.urandom(32)
+    enc, nonce, _ = sec.encrypt_data("hola", k_personal)
+    keyring = [("vault", k_vault), ("personal", k_personal)]
+
+    assert sec.decrypt_with_hint(enc, nonce, keyring, "personal") == ("hola", "personal")
+    assert sec.decrypt_with_hint(enc, nonce, keyring, "vault") == ("hola", "personal")
+    assert sec.decrypt_with_hint(enc, nonce, keyring, None) == ("hola", "personal")
+    assert sec.decrypt_with_hint(enc, nonce, [("vault", k_vault)], None) == ("[Bloqueado 🔑]", None)
+
+    stats = sec.key_hint_stats()
+    assert (stats["hits"], stats["misses"], stats["legacy"]) == (1, 1, 2)
+    assert stats["hit_rate"] == 0.25
+
+
+def test_get_all_backfills_key_type(tmp_path, monkeypatch):
+    from src.infrastructure.config.path_manager import PathManager
+    monkeypatch.setattr(PathManager, "DATA_DIR", tmp_path)
+
+    from src.infrastructure.secrets_manager import SecretsManager
+    sm = SecretsManager()
+    sm.session.set_user("HINTUSER", "uid-1", "admin", "vault-1")
+    sm.reconnect("HINTUSER")
+    sm.session.vault_key = os.urandom(32)
+    sm.session.personal_key = os.urandom(32)
+
+    shared = sm.add_secret("svc-shared", "alice", "pw-1")
+    private = sm.add_secret("svc-private", "alice", "pw-2", is_private=1)
+    hints = dict(sm.db.execute("SELECT id, key_type FROM secrets").fetchall())
+    assert hints == {shared: "vault", private: "personal"}
+
+    # Simular filas legacy (sin pista) y descartar la cache de texto plano
+    sm.db.execute("UPDATE secrets SET key_type = NULL")
+    sm.db.commit()
+    sm.session.record_cache.clear()
+
+    assert {r["service"]: r["secret"] for r in sm.get_all()} == {"svc-shared": "pw-1", "svc-private": "pw-2"}
+    assert sm.security.key_hint_stats()["legacy"] == 2
+    hints = dict(sm.db.execute("SELECT id, key_type FROM secrets").fetchall())
+    assert hints == {shared: "vault", private: "personal"}
+
+    sm.session.record_cache.clear()
+    sm.security.reset_key_hint_stats()
+    sm.get_all()
+    assert sm.security.key_hint_stats()["hits"] == 2
+    sm.audit.close()
+    sm.db.close()
@@ -0,0 +1,98 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+@pytest.fixture
+def engine_mod(fresh_modules):
+    from src.infrastructure import key_rotation
+    return key_rotation
+
+
+def test_plan_uses_envelope_header(engine_mod, legacy_wrap):
+    from src.infrastructure.crypto_engine import CryptoEngine
+    salt_a, salt_b = os.urandom(16), os.urandom(16)
+    env_blob = CryptoEngine.wrap_vault_key(os.urandom(32), "old", salt_b)
+    legacy = legacy_wrap(os.urandom(32), "old", salt_a)
+
+    engine = engine_mod.KeyRotationEngine("old", "new", os.urandom(16), max_workers=1)
+    tasks = engine.plan([{"vault_id": "v-env", "blobs": [env_blob]}, {"vault_id": "v-legacy", "blobs": [legacy]},
+                         {"vault_id": "v-open", "blobs": [legacy]}], [salt_a, salt_b, b"public_salt"], {"v-open": b"k" * 32})
+    assert [(p, s) for _, p, s in tasks[0]["attempts"]] == [(CryptoEngine.current_kdf_params(), salt_b)]
+    assert len(tasks[1]["attempts"]) == 2 * len(CryptoEngine.legacy_kdf_cascade()) + 1  # public_salt (<16B) solo Argon2id
+    assert tasks[2]["attempts"] == [] and tasks[2]["key"] == b"k" * 32
+
+
+def test_rotation_rewraps_every_vault_in_parallel(engine_mod, legacy_wrap):
+    from src.infrastructure.crypto_engine import CryptoEngine
+    local_salt, cloud_salt, new_salt = os.urandom(16), os.urandom(16), os.urandom(16)
+    keys = {f"v{i}": os.urandom(32) for i in range(6)}
+    accesses = []
+    for i, (v_id, key) in enumerate(keys.items()):
+        salt = local_salt if i % 2 else cloud_salt
+        blob = CryptoEngine.wrap_vault_key(key, "old", salt) if i < 4 else legacy_wrap(key, "old", salt)
+        accesses.append({"vault_id": v_id, "access_level": "admin", "blobs": [blob]})
+    accesses.append({"vault_id": "broken", "blobs": [os.urandom(60)]})
+
+    progress = []
+    engine = engine_mod.KeyRotationEngine("old", "new", new_salt, progress_callback=lambda *a: progress.append(a), max_workers=2)
+    rotated = engine.rotate(engine.plan(accesses, [cloud_salt, local_salt]))
+
+    assert {v for v, _, _ in rotated} == set(keys)
+    for v_id, wrap, lvl in rotated:
+        assert lvl == "admin" and not CryptoEngine.needs_rewrap(wrap)
+        assert CryptoEngine.unwrap_vault_key(wrap, "new", new_salt)[0] == keys[v_id]
+    # Una derivación por (algoritmo, costes, salt) distinto, no por bóveda
+    assert engine.derivations < len(keys) + len(CryptoEngine.legacy_kdf_cascade()) * 2
+    assert progress[-1] == (7, 7, 6, 1)
+    assert [p[0] for p in progress] == sorted(p[0] for p in progress)
+    assert engine._pool is None and engine._keks == {}
+
+
+def test_workers_bounded_by_memory(engine_mod, monkeypatch):
+    per_job = engine_mod.CryptoEngine.argon2_params()[1] * 1024
+    monkeypatch.setattr(engine_mod, "available_memory", lambda: per_job * 2)
+    assert engine_mod.KeyRotationEngine.memory_bound_workers() == 1
+    monkeypatch.setattr(engine_mod, "available_memory", lambda: per_job * 1000)
+    assert 1 <= engine_mod.KeyRotationEngine.memory_bound_workers() <= engine_mod.KeyRotationEngine.MAX_WORKERS
+
+
+def test_change_password_commits_in_bulk(isolated_sm, engine_mod, legacy_wrap):
+    from src.infrastructure.secrets_manager import CryptoEngine
+    sm = isolated_sm
+    sm.reconnect("ROTUSER")
+    salt = os.urandom(16)
+    pwd_hash, _ = CryptoEngine.hash_user_password("old", salt)
+    keys = {f"vault-{i}": os.urandom(32) for i in range(4)}
+    sm.save_local_user_profile("ROTUSER", pwd_hash, salt.hex(), salt, "admin", None, "TOTPSECRET", "vault-0",
+                               CryptoEngine.wrap_vault_key(keys["vault-0"], "old", salt), "uid-1")
+    for v_id, key in keys.items():
+        sm.users.save_vault_access(v_id, legacy_wrap(key, "old", salt), "member", synced=1)
+    sm.session.set_user("ROTUSER", "uid-1", "admin", "vault-0")
+    sm.session.personal_key = bytearray(os.urandom(32))
+    sm.session.vault_key = bytearray(keys["vault-0"])
+
+    class FakeUserManager:
+        bulk_calls = []
+        def validate_user_access(self, user): return {"exists": True, "vault_salt": None}
+        def get_cloud_vault_accesses(self, uid): return []
+        def update_user_password(self, *a, **k): return True, "ok"
+        def update_bulk_vault_access(self, uid, vault_map): self.bulk_calls.append((uid, vault_map)); return True
+
+    um = FakeUserManager()
+    progress = []
+    sm.change_login_password("old", "new", um, progress_callback=lambda *a: progress.append(a))
+
+    assert len(um.bulk_calls) == 1 and {v for v, _ in um.bulk_calls[0][1]} == set(keys)
+    assert progress[-1] == (4, 4, 4, 0)
+    profile = sm.get_local_user_profile("ROTUSER")
+    new_salt = sm.security.ensure_bytes(profile["vault_salt"])
+    assert profile["totp_secret"] == "TOTPSECRET" and new_salt != salt
+    for v_id, key in keys.items():
+        blob = sm.security.ensure_bytes(sm.users.get_vault_access(v_id)["wrapped_master_key"])
+        assert sm.unwrap_key(blob, "new", new_salt)[0] == key
+    assert sm.unwrap_key(profile["wrapped_vault_key"], "new", new_salt)[0] == keys["vault-0"]
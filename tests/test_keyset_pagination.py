@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+@pytest.fixture
+def sm(open_vault):
+    manager = open_vault("PAGEUSER")
+    manager.bulk_add_secrets([{"service": f"svc-{i}", "username": "u", "password": f"pw-{i}"} for i in range(25)])
+    return manager
+
+
+def test_iter_encrypted_pages_by_id(sm):
+    assert sm.count_encrypted() == 25
+    pages = list(sm.iter_encrypted(batch=10))
+    assert [len(p) for p in pages] == [10, 10, 5]
+    ids = [r["id"] for p in pages for r in p]
+    assert ids == sorted(ids) and len(set(ids)) == 25
+    assert all(isinstance(r["secret_blob"], bytes) for r in pages[0])
+
+    resumed = [r["id"] for p in sm.iter_encrypted(after_id=ids[9], batch=100) for r in p]
+    assert resumed == ids[10:]
+
+
+def test_iter_encrypted_stable_under_mutation(sm):
+    seen = []
+    for page in sm.iter_encrypted(batch=7, unsynced_only=True):
+        for r in page:
+            seen.append(r["id"])
+            # Marcar/borrar filas ya leídas no desplaza la página siguiente (a diferencia de OFFSET)
+            if r["id"] % 2: sm.mark_as_synced(r["id"])
+            else: sm.db.execute("DELETE FROM secrets WHERE id = ?", (r["id"],))
+        sm.db.commit()
+    assert len(seen) == 25 == len(set(seen))
+    assert sm.count_encrypted(unsynced_only=True) == 0
+
+
+def test_backup_streams_pages(sm, monkeypatch):
+    from src.infrastructure.sync_manager import SyncManager
+    sync = SyncManager(sm, "http://127.0.0.1:9", "key")
+    monkeypatch.setattr(sync, "check_internet", lambda: True)
+    monkeypatch.setattr(sync, "sync_audit_logs", lambda: None)
+    monkeypatch.setattr(sm, "get_all_encrypted", lambda *a, **k: pytest.fail("backup must not load the full table"))
+    posted = []
+    monkeypatch.setattr(sync.client, "post_records", lambda table, payload: posted.append(len(payload)))
+
+    sync.backup_to_supabase()
+    assert sum(posted) == 25 and max(posted) <= 100
@@ -0,0 +1,53 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+
+def test_list_metadata_and_reveal(tmp_path, monkeypatch):
+    from src.infrastructure.config.path_manager import PathManager
+    monkeypatch.setattr(PathManager, "DATA_DIR", tmp_path)
+
+    from src.infrastructure.secrets_manager import SecretsManager
+    sm = SecretsManager()
+    sm.session.set_user("LAZYUSER", "uid-1", "admin", "vault-1")
+    sm.reconnect("LAZYUSER")
+    sm.session.vault_key = os.urandom(32)
+
+    sid = sm.add_secret("svc-a", "alice", "pw-a", notes="n")
+    sm.session.record_cache.clear()
+
+    calls = []
+    original = sm.security.decrypt_with_hint
+    monkeypatch.setattr(sm.security, "decrypt_with_hint", lambda *a: calls.append(1) or original(*a))
+
+    rows = sm.list_metadata()
+    assert [r["service"] for r in rows] == ["svc-a"]
+    assert "secret" not in rows[0] and "nonce" not in rows[0]
+    assert rows[0]["synced"] == 0 and rows[0]["owner_name"] == "LAZYUSER"
+    assert calls == []
+
+    assert sm.reveal(sid) == "pw-a"
+    assert len(calls) == 1
+    assert sm.reveal(sid + 100) is None
+
+    # Editar/borrar una fila: un solo descifrado aunque la bóveda tenga más registros
+    sm.add_secret("svc-c", "carol", "pw-c")
+    sm.session.record_cache.clear()
+    calls.clear()
+    record = sm.get_record_by_id(sid)
+    assert (record["service"], record["secret"], record["owner_name"]) == ("svc-a", "pw-a", "LAZYUSER")
+    assert len(calls) == 1 and len(sm.session.record_cache) == 1
+
+    # Los privados de otro usuario no se listan ni se revelan
+    other = sm.secrets.add_secret("svc-b", "bob", b"x" * 20, b"n" * 12, "h", None, 1, "OTHER", None, "vault-1")
+    assert other not in [r["id"] for r in sm.list_metadata()]
+    assert sm.reveal(other) is None
+
+    # Con otra llave de bóveda el registro queda bloqueado
+    sm.session.record_cache.clear()
+    sm.session.vault_key = os.urandom(32)
+    assert sm.reveal(sid) == "[Bloqueado 🔑]"
+    sm.audit.close()
+    sm.db.close()
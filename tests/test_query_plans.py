@@ -0,0 +1,85 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    from src.infrastructure.config.path_manager import PathManager
+    monkeypatch.setattr(PathManager, "DATA_DIR", tmp_path)
+    from src.infrastructure.database.db_manager import DBManager
+    manager = DBManager("planuser")
+    yield manager
+    manager.close()
+
+
+def _traced_selects(db, call):
+    """SQL real (parámetros ya expandidos) que ejecuta call() sobre la conexión."""
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        db.conn.set_trace_callback(None)
+    selects = [q for q in statements if q.lstrip().upper().startswith("SELECT")]
+    assert selects, statements
+    return selects
+
+
+def _assert_indexed(db, query):
+    plan = " | ".join(r[-1] for r in db.execute("EXPLAIN QUERY PLAN " + query).fetchall())
+    assert "INDEX" in plan, plan
+    for step in plan.split(" | "):
+        # Un SCAN solo es aceptable si recorre un índice (ORDER BY timestamp)
+        if step.startswith("SCAN"): assert "INDEX" in step, plan
+
+
+def test_hot_indexes_exist(db):
+    names = {r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    for name, _ in db.HOT_INDEXES:
+        assert name in names
+
+
+@pytest.mark.parametrize("call", [
+    lambda repo: repo.get_all("alice"),
+    lambda repo: repo.get_all("alice", include_deleted=True),
+    lambda repo: repo.get_metadata("alice"),
+    lambda repo: repo.get_all_encrypted("ALICE", only_mine=True),
+    lambda repo: repo.get_existing_keys("alice"),
+    lambda repo: repo.check_exists("GitHub"),
+], ids=["get_all", "get_all_deleted", "get_metadata", "get_all_encrypted_mine", "get_existing_keys", "check_exists"])
+def test_secret_visibility_queries_use_indexes(db, call):
+    from src.infrastructure.repositories.secret_repo import SecretRepository
+    repo = SecretRepository(db)
+    for query in _traced_selects(db, lambda: call(repo)):
+        _assert_indexed(db, query)
+
+
+@pytest.mark.parametrize("call", [
+    lambda repo: repo.get_logs("alice", "admin", limit=10),
+    lambda repo: repo.get_logs("alice", "user", limit=10),
+    lambda repo: repo.get_pending_logs(50),
+    lambda repo: repo.get_page("alice", "admin", category="AUTH", cursor=(100, 5)),
+    lambda repo: repo.get_page("alice", "user", category="AUTH"),
+], ids=["logs_admin", "logs_user", "pending", "page_category", "page_user_category"])
+def test_audit_queries_use_indexes(db, call):
+    from src.infrastructure.repositories.audit_repo import AuditRepository
+    repo = AuditRepository(db)
+    for query in _traced_selects(db, lambda: call(repo)):
+        _assert_indexed(db, query)
+
+
+def test_repository_results_unchanged(db):
+    from src.infrastructure.repositories.secret_repo import SecretRepository
+    repo = SecretRepository(db)
+    repo.add_secret(" GitHub ", "a", b"x", b"n", "h1", None, 0, "alice", None, None)
+    repo.add_secret("Mail", "b", b"x", b"n", "h2", None, 1, "Bob", None, None)
+
+    assert repo.check_exists("github")
+    assert {r["service"] for r in repo.get_all("alice")} == {" GitHub "}
+    assert {r["service"] for r in repo.get_all("bob")} == {" GitHub ", "Mail"}
+    assert len(repo.get_all_encrypted("BOB", only_mine=True)) == 1
+    assert repo.get_existing_keys("bob") == {("github", "a"), ("mail", "b")}
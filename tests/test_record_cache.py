@@ -0,0 +1,96 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.domain.services.record_cache_service import RecordCacheService
+from src.domain.services.session_service import SessionService
+
+
+def test_record_cache_fingerprint_invalidation():
+    cache = RecordCacheService()
+    cache.put(1, "hash-a", 1, "s3cret")
+
+    assert cache.get(1, "hash-a", "1") == "s3cret"
+    # Cambio de version o de integridad => miss
+    assert cache.get(1, "hash-a", 2) is None
+    assert cache.get(1, "hash-b", 1) is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2}
+
+    cache.evict(1)
+    assert cache.get(1, "hash-a", 1) is None
+    assert len(cache) == 0
+
+
+def test_record_cache_zeroed_on_session_clear():
+    session = SessionService()
+    session.record_cache.put(7, "h", 1, "plain")
+    entry = session.record_cache._entries[7][2]
+
+    session.clear()
+    assert entry.get_copy() is None
+    assert len(session.record_cache) == 0
+
+
+def test_get_all_uses_cache(tmp_path, monkeypatch):
+    from src.infrastructure.config.path_manager import PathManager
+    monkeypatch.setattr(PathManager, "DATA_DIR", tmp_path)
+
+    from src.infrastructure.secrets_manager import SecretsManager
+    sm = SecretsManager()
+    sm.session.set_user("CACHEUSER", "uid-1", "admin", "vault-1")
+    sm.reconnect("CACHEUSER")
+    sm.session.vault_key = os.urandom(32)
+
+    sid = sm.add_secret("svc-a", "alice", "pw-a")
+    sm.bulk_add_secrets([{"service": "svc-b", "username": "bob", "password": "pw-b"}])
+
+    calls = []
+    original = sm.security.decrypt_with_hint
+    monkeypatch.setattr(sm.security, "decrypt_with_hint", lambda *a: calls.append(1) or original(*a))
+
+    # Registros recien escritos ya estan en cache: cero descifrados
+    first = {r["service"]: r["secret"] for r in sm.get_all()}
+    assert first == {"svc-a": "pw-a", "svc-b": "pw-b"}
+    assert calls == []
+
+    sm.update_secret(sid, "svc-a", "alice", "pw-a2")
+    assert {r["service"]: r["secret"] for r in sm.get_all()}["svc-a"] == "pw-a2"
+    assert calls == []
+
+    # Una escritura externa (p.ej. sync) cambia la huella y fuerza el descifrado
+    sm.db.execute("UPDATE secrets SET version = '99' WHERE id = ?", (sid,))
+    sm.db.commit()
+    assert {r["service"]: r["secret"] for r in sm.get_all()}["svc-a"] == "pw-a2"
+    assert len(calls) == 1
+
+    sm.delete_secret(sid)
+    assert sid not in sm.session.record_cache._entries
+    sm.audit.close()
+    sm.db.close()
+
+
+def test_heuristic_scan_does_not_fill_cache(tmp_path, monkeypatch):
+    from src.infrastructure.config.path_manager import PathManager
+    monkeypatch.setattr(PathManager, "DATA_DIR", tmp_path)
+
+    from src.infrastructure.secrets_manager import SecretsManager
+    from src.presentation.dashboard.dashboard_workers import HeuristicWorker
+    sm = SecretsManager()
+    sm.session.set_user("CACHEUSER", "uid-1", "admin", "vault-1")
+    sm.reconnect("CACHEUSER")
+    sm.session.vault_key = os.urandom(32)
+    sm.bulk_add_secrets([{"service": f"svc-{i}", "username": "u", "password": "short"} for i in range(3)]
+                        + [{"service": "svc-ok", "username": "u", "password": "Str0ng!Passw0rd"}])
+    sm.session.record_cache.clear()
+
+    stats = HeuristicWorker(sm, um=None)._calculate_real_risk()
+    assert len(sm.session.record_cache) == 0
+    assert (stats["weak_count"], stats["reused_count"], len(stats["row_scores"])) == (3, 2, 4)
+    # El diálogo de corrección recibe solo metadatos: descifra al editar
+    issues = stats["problematic_records"]
+    assert len(issues["weak"]) == 3 and all("secret" not in r for r in issues["weak"])
+    assert [len(v) for v in issues["reused"].values()] == [3]
+    sm.audit.close()
+    sm.db.close()
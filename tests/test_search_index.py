@@ -0,0 +1,108 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+from src.domain.services.search_index_service import SearchIndexService
+from src.presentation.dashboard.vault_table_model import VaultTableModel, VaultFilterProxyModel
+
+app = QApplication.instance() or QApplication([])
+
+
+def test_index_upsert_remove_and_sync():
+    idx = SearchIndexService()
+    idx.upsert(1, SearchIndexService.normalize(["GitHub", "alice", None, "Work account"]))
+    idx.upsert(2, SearchIndexService.normalize(["Gmail", "bob", "", "personal"]))
+
+    assert idx.search("") is None
+    assert idx.search("github") == {1}
+    assert idx.search("ALICE WORK") == {1}  # substring across adjacent fields
+    assert idx.search("acc") == {1}
+    assert idx.search("zzz") == set()
+
+    # Short queries fall back to a linear scan
+    assert idx.search("g") == {1, 2}
+    assert idx.search("bo") == {2}
+
+    # Trigrams present but not contiguous: confirmed by substring check
+    idx.upsert(3, "abc xbcd")
+    assert idx.search("abcd") == set()
+
+    idx.upsert(1, "gitlab carol")
+    assert idx.search("github") == set() and idx.search("carol") == {1}
+
+    idx.remove(2)
+    assert idx.search("gmail") == set() and len(idx) == 2
+
+    changed = idx.sync({1: "gitlab carol", 4: "new entry"})
+    assert changed == 2  # 3 removed, 4 added; 1 untouched
+    assert idx.search("entry") == {4} and idx.search("xbcd") == set()
+
+
+def test_filter_proxy_uses_visible_ids():
+    model = VaultTableModel()
+    model.set_records([{"id": i, "service": f"svc{i}", "username": "u", "deleted": 0} for i in range(5)])
+    proxy = VaultFilterProxyModel()
+    proxy.setSourceModel(model)
+
+    assert proxy.rowCount() == 5
+    proxy.set_visible_ids({1, 3})
+    assert proxy.rowCount() == 2
+    assert proxy.row_for_id(3) == 1 and proxy.row_for_id(0) == -1
+    proxy.set_visible_ids(None)
+    assert proxy.rowCount() == 5
+
+
+class _CountingDocs(dict):
+    """Documentos del índice que cuentan accesos: un barrido lineal recorre items()."""
+    lookups = 0
+    scans = 0
+
+    def __getitem__(self, key):
+        self.lookups += 1
+        return super().__getitem__(key)
+
+    def items(self):
+        self.scans += 1
+        return super().items()
+
+
+def test_large_index_query_checks_only_candidates():
+    idx = SearchIndexService()
+    idx.sync({i: SearchIndexService.normalize([f"service-{i}", f"user{i}@mail.com", "notes"]) for i in range(50000)})
+    idx._docs = docs = _CountingDocs(idx._docs)
+
+    hits = idx.search("service-4242")
+
+    assert hits == {4242} | {i for i in range(42420, 42430)}
+    # Sin barrido lineal: solo se verifican los candidatos que dejan los trigramas
+    assert docs.scans == 0
+    assert docs.lookups < 100
+
+    assert idx.search("se") is not None and docs.scans == 1  # consultas cortas: barrido esperado
+
+
+def test_health_change_reindexes_lvl_glyph():
+    model = VaultTableModel()
+    model.set_records([{"id": i, "service": f"svc{i}", "username": "u", "deleted": 0} for i in range(3)])
+    idx = SearchIndexService()
+    idx.sync({r["id"]: SearchIndexService.normalize(model.search_fields(r)) for r in model.records()})
+    changed = []
+
+    def on_health_changed(records):
+        for r in records:
+            changed.append(r["id"])
+            idx.upsert(r["id"], SearchIndexService.normalize(model.search_fields(r)))
+    model.health_changed.connect(on_health_changed)
+
+    assert idx.search("⚠️") == set()
+    model.set_health({0: 90, 1: 20, 2: 30}, set())
+    assert sorted(changed) == [0, 1, 2]
+    assert idx.search("⚠️") == {1, 2}
+
+    changed.clear()
+    model.set_health({0: 90, 1: 95, 2: 30}, set())
+    assert changed == [1] and idx.search("⚠️") == {2}
@@ -0,0 +1,155 @@
+import sys
+import time
+import socket
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+class FakeSupabase:
+    """
+    Presencia sobre fake_postgrest: security_audit, vault_access y la RPC
+    session_heartbeat (misma lógica que scripts/migration_session_heartbeat.sql).
+    rpc_status: 404 sin la función, 401/403 sin EXECUTE para el rol.
+    """
+    def __init__(self, server, rpc_status=200):
+        self.rpc_status = rpc_status
+        self.audit = []
+        self.access = {("uid-1", "vault-1")}
+        self.users = {"uid-1": "BEATUSER"}
+        self.requests = server.requests
+        self.url = server.url
+        server.route("GET", "/vault_access", self.get_access)
+        server.route("GET", "/security_audit", self.get_audit)
+        server.route("POST", "/security_audit", self.post_audit)
+        server.route("POST", "/rpc/session_heartbeat", self.post_heartbeat)
+
+    def calls(self):
+        return [(r.method, r.path) for r in self.requests]
+
+    def get_access(self, req):
+        return [{"id": 1}] if (req.arg("user_id"), req.arg("vault_id")) in self.access else []
+
+    def get_audit(self, req):
+        return [r for r in self.audit
+                if r["action"] == req.arg("action") and r["user_name"] == req.arg("user_name")
+                and r["device_info"] == req.arg("device_info") and r["timestamp"] > int(req.arg("timestamp"))]
+
+    def post_audit(self, req):
+        self.audit.extend(req.body)
+        return 201, None
+
+    def post_heartbeat(self, req):
+        if self.rpc_status == 404:
+            return 404, {"code": "PGRST202", "message": "function not found"}
+        if self.rpc_status != 200:
+            return self.rpc_status, {"code": "42501", "message": "permission denied for function"}
+        body = req.body
+        user = self.users.get(body["p_user_id"])
+        if user is None or user != body["p_user_name"].upper() \
+                or req.headers.get("x-guardian-user-id") != body["p_user_id"]:
+            return 403, {"code": "42501", "message": "caller identity mismatch"}
+        return self.rpc(body)
+
+    def rpc(self, p):
+        now = int(time.time())
+        self.audit.append({"timestamp": now, "user_name": p["p_user_name"].upper(), "action": p["p_action"],
+                           "status": p["p_status"], "device_info": p["p_device"], "ip_address": p["p_ip_address"]})
+        reason = None
+        if p["p_user_id"] and p["p_vault_id"] and (p["p_user_id"], p["p_vault_id"]) not in self.access:
+            reason = "ACCESS"
+        elif any(r["action"] == "KICK" and r["user_name"] == p["p_user_name"].upper()
+                 and r["device_info"] == p["p_device"] and r["timestamp"] > now - p["p_kick_window"]
+                 for r in self.audit):
+            reason = "KICK"
+        return {"revoked": reason is not None, "reason": reason, "server_time": now}
+
+
+def _env(open_vault, fake_postgrest, monkeypatch, rpc_status):
+    from src.infrastructure.sync_manager import SyncManager
+    import requests
+    ip_calls = []
+
+    class _IP:
+        def json(self): return {"ip": "203.0.113.7"}
+
+    monkeypatch.setattr(requests, "get", lambda url, timeout=None: ip_calls.append(url) or _IP())
+    sm = open_vault("BEATUSER", vault_key=False)
+    cloud = FakeSupabase(fake_postgrest(), rpc_status)
+    sync = SyncManager(sm, cloud.url, "key")
+    assert sync.check_internet()
+    cloud.requests.clear()
+    return sm, sync, cloud, ip_calls
+
+
+@pytest.fixture
+def env(open_vault, fake_postgrest, monkeypatch):
+    return _env(open_vault, fake_postgrest, monkeypatch, rpc_status=200)
+
+
+@pytest.fixture(params=[404, 401, 403])
+def legacy_env(request, open_vault, fake_postgrest, monkeypatch):
+    return _env(open_vault, fake_postgrest, monkeypatch, rpc_status=request.param)
+
+
+def test_heartbeat_is_one_round_trip_with_cached_ip(env, monkeypatch):
+    sm, sync, cloud, ip_calls = env
+    for _ in range(5):
+        assert sync.send_heartbeat(check_revocation=True) == {"sent": True, "revoked": False, "reason": None}
+    assert cloud.calls() == [("POST", "/rest/v1/rpc/session_heartbeat")] * 5
+    assert len(ip_calls) == 1 and cloud.audit[-1]["ip_address"] == "203.0.113.7"
+
+    monkeypatch.setattr(sync, "_public_ip", (sync._public_ip[0], time.monotonic() - 1))
+    sync.send_heartbeat()
+    assert len(ip_calls) == 2
+
+
+def test_heartbeat_reports_access_loss_and_kicks(env):
+    sm, sync, cloud, _ = env
+    cloud.access.clear()
+    assert sync.send_heartbeat(check_revocation=True)["reason"] == "ACCESS"
+
+    cloud.access.add(("uid-1", "vault-1"))
+    assert sync.revoke_session("BEATUSER", socket.gethostname())
+    beat = sync.send_heartbeat(check_revocation=True)
+    assert beat["revoked"] and beat["reason"] == "KICK"
+    # Una expulsión a otro dispositivo no afecta a esta sesión
+    cloud.audit = [r for r in cloud.audit if r["action"] != "KICK"]
+    sync.revoke_session("BEATUSER", "other-host")
+    assert not sync.send_heartbeat(check_revocation=True)["revoked"]
+
+
+def test_legacy_backend_falls_back_once(legacy_env):
+    sm, sync, cloud, _ = legacy_env
+    assert sync.send_heartbeat(check_revocation=True) == {"sent": True, "revoked": False, "reason": None}
+    assert not sync._heartbeat_rpc
+    cloud.requests.clear()
+    sync.revoke_session("BEATUSER", socket.gethostname())
+    assert sync.send_heartbeat(check_revocation=True)["revoked"]
+    # Sin RPC no se reintenta la función: POST del kick + POST del latido + 2 GETs de revocación
+    assert [m for m, _ in cloud.calls()] == ["POST", "POST", "GET", "GET"]
+
+
+def test_heartbeat_for_another_user_is_rejected(env):
+    sm, sync, cloud, _ = env
+    sm.session.set_user("MALLORY", "uid-1", "admin", "vault-1")
+    assert sync.send_heartbeat()["sent"] is True        # 403 -> protocolo antiguo
+    assert not sync._heartbeat_rpc and not any(r.get("ip_address") for r in cloud.audit)
+
+
+def test_offline_heartbeat_does_not_touch_network(env, monkeypatch):
+    sm, sync, cloud, ip_calls = env
+    sync.connectivity.report_failure()
+    monkeypatch.setattr(sync.connectivity, "_next_probe", time.monotonic() + 60)
+    assert sync.send_heartbeat(check_revocation=True) == {"sent": False, "revoked": False, "reason": None}
+    assert cloud.calls() == [] and ip_calls == []
+
+
+def test_interval_backs_off_when_idle_or_locked(env):
+    _, sync, _, _ = env
+    active = sync.next_heartbeat_interval(idle_seconds=10)
+    idle = sync.next_heartbeat_interval(idle_seconds=sync.HEARTBEAT_IDLE_AFTER)
+    locked = sync.next_heartbeat_interval(locked=True)
+    assert 27 <= active <= 33 and 108 <= idle <= 132 and 270 <= locked <= 330
@@ -0,0 +1,146 @@
+import sys
+import re
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+class FakePresence:
+    """
+    session_presence sobre fake_postgrest: orden last_seen.desc,session_key.asc,
+    filtro keyset or=(...), COUNT con Prefer: count=exact. Sin la tabla responde 404.
+    """
+    def __init__(self, server, with_table=True):
+        self.with_table = with_table
+        self.presence = {}
+        self.audit = []
+        self.requests = server.requests
+        self.url = server.url
+        server.route("GET", "/security_audit", self.get_audit)
+        server.route("GET", "/session_presence", self.get_presence)
+
+    def get_audit(self, req):
+        since = int(req.arg("timestamp"))
+        rows = sorted((r for r in self.audit if r["timestamp"] > since), key=lambda r: -r["timestamp"])
+        return rows[:int(req.qs["limit"][0])]
+
+    def get_presence(self, req):
+        if not self.with_table:
+            return 404, {"code": "PGRST205", "message": "relation not found"}
+        rows = self.select(req.qs)
+        if req.headers.get("Prefer") == "count=exact":
+            return 200, rows[:1], [("Content-Range", f"0-0/{len(rows)}")]
+        return rows[:int(req.qs["limit"][0])]
+
+    def beat(self, user, device, ts, status="ONLINE"):
+        """Lo que hace el trigger upsert_session_presence por cada INSERT en security_audit."""
+        self.audit.append({"timestamp": ts, "user_name": user, "device_info": device, "status": status})
+        key = f"{user}@{device}"
+        if key not in self.presence or ts >= self.presence[key]["last_seen"]:
+            self.presence[key] = {"session_key": key, "user_name": user, "device_info": device,
+                                  "ip_address": "10.0.0.1", "status": status, "last_seen": ts}
+
+    def select(self, qs):
+        cutoff = int(qs["last_seen"][0].split(".", 1)[1])
+        rows = [r for r in self.presence.values() if r["last_seen"] > cutoff]
+        if "or" in qs and qs["or"][0].startswith("(status"):
+            rows = [r for r in rows if r["status"] != "REVOKED"]
+        elif "or" in qs:
+            seen, key = re.match(r'\(last_seen\.lt\.(\d+),and\(last_seen\.eq\.\d+,session_key\.gt\."(.*)"\)\)$',
+                                 qs["or"][0]).groups()
+            rows = [r for r in rows if r["last_seen"] < int(seen)
+                    or (r["last_seen"] == int(seen) and r["session_key"] > key)]
+        return sorted(rows, key=lambda r: (-r["last_seen"], r["session_key"]))
+
+
+def _env(open_vault, fake_postgrest, with_table):
+    from src.infrastructure.sync_manager import SyncManager
+    sm = open_vault("ADMIN", vault_key=False)
+    cloud = FakePresence(fake_postgrest(), with_table)
+    return sm, SyncManager(sm, cloud.url, "key"), cloud
+
+
+@pytest.fixture
+def env(open_vault, fake_postgrest):
+    return _env(open_vault, fake_postgrest, with_table=True)
+
+
+def test_pages_cover_whole_fleet_without_duplicates(env, monkeypatch):
+    sm, sync, cloud = env
+    now = int(time.time())
+    # 240 dispositivos latiendo cada 30 s: 1200 eventos en 5 minutos, mismos segundos repetidos
+    for tick in range(5):
+        for d in range(240):
+            cloud.beat(f"USER{d % 7}", f"pc-{d:03d}", now - 300 + tick * 60 + d % 3)
+    monkeypatch.setattr(type(sync), "SESSIONS_PAGE_SIZE", 50)
+
+    pages, cursor = [], None
+    while True:
+        page = sync.get_session_page(cursor)
+        pages.append(page["sessions"])
+        cursor = page["next"]
+        if not cursor: break
+    keys = [f"{s['username']}@{s['device_name']}" for p in pages for s in p]
+    assert [len(p) for p in pages] == [50, 50, 50, 50, 40]
+    assert len(keys) == len(set(keys)) == 240
+    seen = [s["last_seen"] for p in pages for s in p]
+    assert seen == sorted(seen, reverse=True)
+    assert len(sync.get_active_sessions()) == 240
+
+
+def test_revoked_and_counts_are_server_side(env):
+    sm, sync, cloud = env
+    now = int(time.time())
+    cloud.beat("ANA", "pc-1", now - 10)
+    cloud.beat("ANA", "pc-2", now - 20)
+    cloud.beat("ANA", "pc-2", now - 5, status="REVOKED")
+    cloud.beat("LUIS", "pc-3", now - 600)   # fuera de la ventana "activa", dentro de la de sesiones
+    cloud.beat("LUIS", "pc-3", now - 700)   # evento atrasado: no retrocede la presencia
+    by_key = {s["device_name"]: s for s in sync.get_active_sessions()}
+    assert by_key["pc-2"]["is_revoked"] and not by_key["pc-1"]["is_revoked"]
+    assert by_key["pc-3"]["last_seen"] == now - 600
+    cloud.requests.clear()
+    assert sync.count_active_sessions() == 1
+    assert len(cloud.requests) == 1 and cloud.requests[0].qs["limit"] == ["1"]
+
+
+def test_backend_without_presence_table_falls_back(open_vault, fake_postgrest):
+    sm, sync, cloud = _env(open_vault, fake_postgrest, with_table=False)
+    now = int(time.time())
+    cloud.beat("ANA", "pc-1", now - 30)
+    cloud.beat("ANA", "pc-1", now - 10)
+    cloud.beat("ANA", "Login failed for user", now - 5)
+    page = sync.get_session_page()
+    assert [(s["device_name"], s["last_seen"]) for s in page["sessions"]] == [("pc-1", now - 10)]
+    assert page["next"] is None and not sync._presence_table
+    assert sync.count_active_sessions() == 1
+
+
+def test_dialog_resolves_theme_and_host_once_per_page(env, monkeypatch):
+    pytest.importorskip("PyQt5")
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    import socket
+    from src.presentation.theme_manager import ThemeManager
+    from src.presentation.sessions_dialog import SessionsDialog
+    sm, sync, cloud = env
+    now = int(time.time())
+    for d in range(30): cloud.beat("ANA", f"pc-{d}", now - d)
+    monkeypatch.setattr(type(sync), "SESSIONS_PAGE_SIZE", 20)
+    monkeypatch.setattr(sync, "send_heartbeat", lambda *a, **k: None)
+    dialog = SessionsDialog(sync)
+
+    calls = {"colors": 0, "host": 0}
+    real_colors, real_host = ThemeManager.get_theme_colors, socket.gethostname
+    monkeypatch.setattr(ThemeManager, "get_theme_colors",
+                        lambda self, *a, **k: calls.__setitem__("colors", calls["colors"] + 1) or real_colors(self, *a, **k))
+    monkeypatch.setattr(socket, "gethostname", lambda: calls.__setitem__("host", calls["host"] + 1) or real_host())
+    dialog.load_sessions()
+    assert dialog.table.rowCount() == 20 and not dialog.btn_more.isHidden()
+    dialog._load_next_page()
+    assert dialog.table.rowCount() == 30 and dialog.btn_more.isHidden()
+    assert calls == {"colors": 2, "host": 2}
+    dialog.deleteLater()
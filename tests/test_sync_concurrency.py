@@ -0,0 +1,105 @@
+import os
+import sys
+import base64
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+LATENCY = 0.05
+
+
+class LatencySupabase:
+    """PostgREST sobre fake_postgrest con latencia inyectada por petición; server.peak da el máximo simultáneo."""
+    def __init__(self, server, latency=LATENCY):
+        server.latency = latency
+        self.server = server
+        self.url = server.url
+        self.cloud_rows = []
+        self.posted = {}
+        self.deleted = []
+        self._lock = threading.Lock()
+        server.route("GET", "/users", lambda req: [{"id": "uid-1"}] if req.qs.get("select") == ["id"] else [])
+        server.route("GET", "/secrets", lambda req: self.cloud_rows)
+        server.route("POST", "", self.post)
+        server.route("DELETE", "", self.delete)
+
+    def post(self, req):
+        with self._lock:
+            self.posted.setdefault(req.table, []).extend(req.body)
+        return 201, None
+
+    def delete(self, req):
+        with self._lock:
+            self.deleted.append(req.qs["id"][0])
+        return 204, None
+
+
+def _make_env(tmp_path, monkeypatch, server, name, workers):
+    from src.infrastructure.config.path_manager import PathManager
+    monkeypatch.setattr(PathManager, "DATA_DIR", tmp_path / name)
+    from src.infrastructure.secrets_manager import SecretsManager
+    from src.infrastructure.sync_manager import SyncManager
+    sm = SecretsManager()
+    sm.session.set_user("SYNCUSER", "uid-1", "admin", "vault-1")
+    sm.reconnect("SYNCUSER")
+    sm.session.vault_key = os.urandom(32)
+    sm.bulk_add_secrets([{"service": f"svc-{i}", "username": "u", "password": f"pw-{i}"} for i in range(100)])
+    for i in range(5): sm.log_event("VER", f"svc-{i}")
+
+    cloud = LatencySupabase(server)
+    cloud.cloud_rows = [{
+        "id": f"remote-{i}", "service": f"remote-{i}", "username": "r", "notes": None,
+        "secret": base64.b64encode(os.urandom(32)).decode(), "owner_name": "SYNCUSER", "is_private": 0,
+        "deleted": 0, "vault_id": "vault-1", "integrity_hash": f"h{i}", "version": 1, "updated_at": 1000,
+    } for i in range(10)]
+    sync = SyncManager(sm, cloud.url, "key", max_workers=workers)
+    sync.PUSH_PAGE_SIZE = 20
+    return sm, sync, cloud
+
+
+def _run(tmp_path, monkeypatch, server, name, workers):
+    sm, sync, cloud = _make_env(tmp_path, monkeypatch, server, name, workers)
+    try:
+        result = sync.sync()
+        return result, cloud, sm.count_encrypted(unsynced_only=True), sm.count_encrypted()
+    finally:
+        sm.audit.close()
+        sm.db.close()
+
+
+def test_concurrent_sync_matches_sequential_and_overlaps_requests(tmp_path, monkeypatch, fake_postgrest):
+    seq, seq_cloud, seq_pending, seq_total = _run(tmp_path, monkeypatch, fake_postgrest(), "seq", 1)
+    par, par_cloud, par_pending, par_total = _run(tmp_path, monkeypatch, fake_postgrest(), "par", 4)
+
+    # Mismo resultado observable
+    assert seq == par == {"uploaded": 100, "downloaded": 10, "errors": 0}
+    assert seq_pending == par_pending == 0 and seq_total == par_total == 110
+    assert len(par_cloud.posted["secrets"]) == 100 and len(par_cloud.posted["security_audit"]) >= 5
+
+    # Modo secuencial: nunca más de una petición en vuelo; concurrente: se solapan
+    assert seq_cloud.server.peak == 1 and par_cloud.server.peak > 1
+
+
+def test_ui_secret_writes_wait_for_the_sync_write_lock(tmp_path, monkeypatch):
+    from src.infrastructure.config.path_manager import PathManager
+    monkeypatch.setattr(PathManager, "DATA_DIR", tmp_path)
+    from src.infrastructure.secrets_manager import SecretsManager
+    from src.infrastructure.sync_manager import _vault_lock
+    sm = SecretsManager()
+    sm.session.set_user("LOCKUSER", "uid-1", "admin", "vault-1")
+    sm.reconnect("LOCKUSER")
+    sm.session.vault_key = os.urandom(32)
+
+    done = threading.Event()
+    with _vault_lock.write():
+        writer = threading.Thread(target=lambda: sm.add_secret("svc", "u", "pw") and done.set())
+        writer.start()
+        # Mientras el sync tiene el lock, la escritura de la UI no toca SQLite
+        assert not done.wait(0.2) and sm.count_encrypted() == 0
+    writer.join(5)
+    assert done.is_set() and sm.count_encrypted() == 1
+    sm.audit.close()
+    sm.db.close()
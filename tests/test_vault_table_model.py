@@ -0,0 +1,105 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import Qt
+from src.presentation.dashboard.vault_table_model import (
+    VaultTableModel, RecordRole, COL_SEL, COL_LVL, COL_SERVICE, COL_PASSWORD, COL_STATUS
+)
+
+app = QApplication.instance() or QApplication([])
+
+
+def _rec(rid, service, **kw):
+    base = {"id": rid, "service": service, "username": "u", "owner_name": "ADMIN",
+            "updated_at": 0, "deleted": 0, "synced": 0, "is_private": 0, "notes": ""}
+    base.update(kw)
+    return base
+
+
+def test_model_rows_and_incremental_updates():
+    model = VaultTableModel()
+    inserted = []
+    model.rowsInserted.connect(lambda *a: inserted.append(a[1]))
+    model.set_records([_rec(1, "alpha"), _rec(2, "beta")])
+
+    assert model.rowCount() == 2 and model.columnCount() == 10
+    assert model.data(model.index(1, COL_SERVICE)).endswith("beta")
+    assert model.data(model.index(0, 0), RecordRole)["id"] == 1
+    assert model.data(model.index(0, COL_LVL)) == "◌"
+
+    model.upsert_record(_rec(3, "gamma"))
+    assert inserted == [2] and model.row_for_id(3) == 2
+
+    model.upsert_record(_rec(1, "alpha-2"))
+    assert model.rowCount() == 3
+    assert model.data(model.index(0, COL_SERVICE)).endswith("alpha-2")
+
+    model.remove_record(2)
+    assert model.rowCount() == 2 and model.row_for_id(3) == 1
+
+
+def test_model_selection_reveal_and_health():
+    model = VaultTableModel()
+    model.set_records([_rec(1, "alpha"), _rec(2, "beta")])
+
+    assert model.toggle_selected(2) is True
+    assert model.data(model.index(1, COL_SEL)) == "●"
+    assert model.headerData(COL_SEL, Qt.Horizontal).strip() == "✖"
+    model.clear_selection()
+    assert not model.selected
+
+    model.set_revealed(1, "hunter2")
+    assert model.data(model.index(0, COL_PASSWORD)) == "hunter2"
+    model.set_revealed(1, None)
+    assert model.data(model.index(0, COL_PASSWORD)) == "••••••••"
+
+    model.set_health({1: 90, 2: 0}, {2})
+    assert model.data(model.index(0, COL_LVL)) == "🛡️"
+    assert model.data(model.index(1, COL_STATUS)) == "LOCKED"
+    assert model.data(model.index(1, COL_PASSWORD)) == "NODO_PROTEGIDO"
+
+
+def test_repository_change_events(tmp_path, monkeypatch):
+    from src.infrastructure.config.path_manager import PathManager
+    monkeypatch.setattr(PathManager, "DATA_DIR", tmp_path)
+
+    from src.infrastructure.secrets_manager import SecretsManager
+    sm = SecretsManager()
+    sm.session.set_user("EVTUSER", "uid-1", "admin", "vault-1")
+    sm.reconnect("EVTUSER")
+    sm.session.vault_key = os.urandom(32)
+
+    events = []
+    sm.add_change_listener(lambda kind, ids: events.append((kind, ids)))
+    sid = sm.add_secret("svc", "alice", "pw")
+    sm.update_secret(sid, "svc", "alice", "pw2")
+    sm.delete_secret(sid)
+    sm.hard_delete_secret(sid)
+    assert sm.list_metadata(ids=[sid]) == []
+    sm.bulk_add_secrets([{"service": "b", "password": "x"}])
+
+    kinds = [(k, ids) for k, ids in events]
+    assert ("upsert", [sid]) in kinds
+    assert ("delete", [sid]) in kinds
+    assert kinds[-1] == ("reset", [])
+    sm.audit.close()
+    sm.db.close()
+
+
+def test_metadata_by_ids_is_chunked(isolated_sm):
+    import sqlite3
+    sm = isolated_sm
+    sm.session.set_user("EVTUSER", "uid-1", "admin", "vault-1")
+    sm.reconnect("EVTUSER")
+    sm.session.vault_key = os.urandom(32)
+    sm.bulk_add_secrets([{"service": f"svc-{i}", "password": "x"} for i in range(1200)])
+    ids = [m["id"] for m in sm.list_metadata()]
+    # Con el límite de parámetros de los SQLite antiguos un IN sin trocear fallaría
+    sm.conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    rows = sm.list_metadata(ids=ids + [10 ** 9])
+    assert sorted(r["id"] for r in rows) == sorted(ids)